@@ -0,0 +1,187 @@
+"""
+Compara el cálculo de métricas climatológicas de ClimateAnalysisModule con la
+implementación original, que medía la distancia geodésica de cada evento del Caribe
+con DataFrame.apply en cada consulta.
+
+Para cada punto de consulta mide la búsqueda por radio (apply + geodesic frente al
+índice espacial) y calculate_metrics completo, y comprueba que los eventos
+seleccionados y las métricas coinciden.
+
+Ejemplos:
+    python benchmark_climate_metrics.py
+    python benchmark_climate_metrics.py --points 100 --radius 300 --output bench.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from geopy.distance import geodesic
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.climate_analysis_module import CARIBBEAN_BBOX, ClimateAnalysisModule  # noqa: E402
+
+# Sitios fijos de referencia además de los puntos aleatorios
+REFERENCE_SITES = [
+    (10.39, -75.51),   # Cartagena
+    (10.96, -74.80),   # Barranquilla
+    (11.54, -72.91),   # Riohacha
+    (12.58, -81.70),   # San Andrés
+]
+
+
+def legacy_nearby(df, lat, lon, radius_km):
+    """Eventos del Caribe a radius_km o menos, como en la implementación original."""
+    events = df[
+        (df["latitude_float"] >= CARIBBEAN_BBOX["min_lat"]) &
+        (df["latitude_float"] <= CARIBBEAN_BBOX["max_lat"]) &
+        (df["longitude_float"] >= CARIBBEAN_BBOX["min_lon"]) &
+        (df["longitude_float"] <= CARIBBEAN_BBOX["max_lon"])
+    ].copy()
+    if events.empty:
+        return events
+    events["distance_to_analysis_point"] = events.apply(
+        lambda row: geodesic((row["latitude_float"], row["longitude_float"]), (lat, lon)).km, axis=1)
+    return events[events["distance_to_analysis_point"] <= radius_km].copy()
+
+
+def legacy_calculate_metrics(module, df, lat, lon, radius_km):
+    """calculate_metrics original (apply + geodesic y métricas por storm_id)."""
+    nearby_events = legacy_nearby(df, lat, lon, radius_km)
+    if nearby_events.empty:
+        return module._empty_metrics()
+
+    event_density = nearby_events["storm_id"].nunique()
+    nearby_events["year"] = pd.to_datetime(nearby_events["date"] + nearby_events["time"], format="%Y%m%d%H%M").dt.year
+    total_years = nearby_events["year"].nunique()
+    event_frequency = nearby_events.groupby("storm_type")["storm_id"].nunique() / total_years if total_years > 0 else 0
+    event_frequency = event_frequency.to_dict()
+    event_intensity_profile = nearby_events.groupby("storm_type")["max_sustained_wind_knots"].mean().to_dict()
+    nearby_events["max_sustained_wind_ms"] = nearby_events["max_sustained_wind_knots"] * 0.514444
+    useful_wind_events = nearby_events[(nearby_events["max_sustained_wind_ms"] >= 12) &
+                                       (nearby_events["max_sustained_wind_ms"] <= 25)]
+    energy_opportunity_score = useful_wind_events["storm_id"].nunique() / event_density if event_density > 0 else 0
+    severe_wind_events = nearby_events[nearby_events["max_sustained_wind_ms"] > 30]
+    extreme_risk_index = severe_wind_events["storm_id"].nunique() / event_density if event_density > 0 else 0
+
+    storm_durations = nearby_events.groupby("storm_id").apply(lambda x:
+        (pd.to_datetime(x["date"] + x["time"], format="%Y%m%d%H%M").max() -
+         pd.to_datetime(x["date"] + x["time"], format="%Y%m%d%H%M").min()).total_seconds() / 3600,
+        include_groups=False)
+
+    event_duration_stats = {
+        "average_duration_hours": storm_durations.mean() if not storm_durations.empty else 0,
+        "std_dev_duration_hours": storm_durations.std() if not storm_durations.empty else 0
+    }
+
+    valid_pressures = nearby_events[nearby_events["min_central_pressure_mb"] != -999]["min_central_pressure_mb"]
+    historical_pressure_min = valid_pressures.min() if not valid_pressures.empty else -999
+
+    return {
+        "event_density": event_density,
+        "event_frequency": event_frequency,
+        "event_intensity_profile": event_intensity_profile,
+        "energy_opportunity_score": energy_opportunity_score,
+        "extreme_risk_index": extreme_risk_index,
+        "event_duration_stats": event_duration_stats,
+        "historical_pressure_min": historical_pressure_min
+    }
+
+
+def same_value(a, b, rel_tol=1e-9):
+    """Igualdad recursiva de métricas (floats con tolerancia, NaN == NaN)."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same_value(a[k], b[k], rel_tol) for k in a)
+    try:
+        a, b = float(a), float(b)
+    except (TypeError, ValueError):
+        return a == b
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return math.isclose(a, b, rel_tol=rel_tol, abs_tol=1e-9)
+
+
+def percentiles_ms(values):
+    arr = np.array(values) * 1000
+    return {f"p{p}": round(float(np.percentile(arr, p)), 3) for p in (50, 90, 99)} | \
+        {"mean": round(float(arr.mean()), 3), "max": round(float(arr.max()), 3)}
+
+
+def build_points(args):
+    """Puntos de consulta reproducibles en el Caribe ampliado (incluye puntos sin eventos cercanos)."""
+    rng = random.Random(args.seed)
+    points = list(REFERENCE_SITES)
+    while len(points) < args.points:
+        points.append((round(rng.uniform(CARIBBEAN_BBOX["min_lat"] - 2, CARIBBEAN_BBOX["max_lat"] + 2), 3),
+                       round(rng.uniform(CARIBBEAN_BBOX["min_lon"] - 2, CARIBBEAN_BBOX["max_lon"] + 2), 3)))
+    return points[:args.points]
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las métricas climatológicas (índice espacial vs apply)")
+    parser.add_argument("--points", type=int, default=50, help="Puntos de consulta")
+    parser.add_argument("--radius", type=float, default=200.0, help="Radio en km")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Guardar el resumen en JSON")
+    args = parser.parse_args()
+
+    module = ClimateAnalysisModule()
+    snapshot, load_seconds = timed(module.store.get)
+    points = build_points(args)
+
+    timings = {"legacy_radius": [], "index_radius": [], "legacy_metrics": [], "metrics": []}
+    selection_mismatches = metric_mismatches = 0
+    for lat, lon in points:
+        legacy_events, seconds = timed(legacy_nearby, snapshot.df, lat, lon, args.radius)
+        timings["legacy_radius"].append(seconds)
+        positions, seconds = timed(snapshot.index.query_radius, lat, lon, args.radius)
+        timings["index_radius"].append(seconds)
+        if len(legacy_events) != len(positions):
+            selection_mismatches += 1
+
+        legacy, seconds = timed(legacy_calculate_metrics, module, snapshot.df, lat, lon, args.radius)
+        timings["legacy_metrics"].append(seconds)
+        metrics, seconds = timed(module.calculate_metrics, lat, lon, args.radius, snapshot)
+        timings["metrics"].append(seconds)
+        if not same_value(legacy, metrics):
+            metric_mismatches += 1
+
+    summary = {
+        "points": len(points),
+        "radius_km": args.radius,
+        "hurdat_records": len(snapshot.df),
+        "caribbean_records": len(snapshot.caribbean_events),
+        "snapshot_load_seconds": round(load_seconds, 3),
+        "radius_query_ms": {"apply_geodesic": percentiles_ms(timings["legacy_radius"]),
+                            "spatial_index": percentiles_ms(timings["index_radius"])},
+        "calculate_metrics_ms": {"legacy": percentiles_ms(timings["legacy_metrics"]),
+                                 "current": percentiles_ms(timings["metrics"])},
+        "speedup": {
+            "radius_query": round(sum(timings["legacy_radius"]) / sum(timings["index_radius"]), 1),
+            "calculate_metrics": round(sum(timings["legacy_metrics"]) / sum(timings["metrics"]), 1),
+        },
+        "selection_mismatches": selection_mismatches,
+        "metric_mismatches": metric_mismatches,
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    return 0 if not (selection_mismatches or metric_mismatches) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
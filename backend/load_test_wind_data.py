@@ -0,0 +1,244 @@
+"""
+Ejecuta la cadena completa ERA5 -> MERRA-2 -> simulado del backend contra los
+servidores locales de mock_servers, sin internet ni credenciales reales.
+
+Ejemplos:
+    # ERA5 sano, 40 solicitudes con concurrencia 8
+    python load_test_wind_data.py --requests 40 --concurrency 8
+
+    # CDS siempre falla: todo debe servirse desde MERRA-2
+    python load_test_wind_data.py --cds-failure-rate 1
+
+    # Ambas fuentes caídas: fallback simulado
+    python load_test_wind_data.py --cds-failure-rate 1 --gesdisc-failure-rate 1
+
+    # Cola CDS lenta: se dispara el hedging hacia MERRA-2
+    python load_test_wind_data.py --queue-delay 20 --hedge-delay 5 --stream
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_servers.__main__ import add_mock_arguments  # noqa: E402
+from mock_servers.common import serve_in_thread  # noqa: E402
+
+# Región de referencia (Caribe colombiano)
+REGION = {"lat_min": 8.0, "lat_max": 14.0, "lon_min": -82.0, "lon_max": -72.0}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_servers(args):
+    """
+    Arranca los servidores simulados en un proceso aparte (como servicios externos;
+    además HDF5 no admite escribir y leer NetCDF desde hilos de un mismo proceso).
+
+    Returns:
+        Tuple: (proceso, URL CDS, URL GES DISC)
+    """
+    cds_port, gesdisc_port = free_port(), free_port()
+    command = [
+        sys.executable, "-m", "mock_servers",
+        "--cds-port", str(cds_port), "--gesdisc-port", str(gesdisc_port),
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--queue-delay", str(args.queue_delay),
+        "--cds-failure-rate", str(args.cds_failure_rate),
+        "--gesdisc-failure-rate", str(args.gesdisc_failure_rate),
+        "--gesdisc-disconnect-rate", str(args.gesdisc_disconnect_rate),
+        "--bandwidth", str(args.bandwidth),
+        "--merra2-extra-variables", str(args.merra2_extra_variables),
+        "--seed", str(args.seed),
+    ]
+    if args.data_dir:
+        command += ["--data-dir", args.data_dir]
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    cds_url, gesdisc_url = f"http://127.0.0.1:{cds_port}", f"http://127.0.0.1:{gesdisc_port}"
+
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            requests.get(f"{cds_url}/status.json", timeout=1).raise_for_status()
+            requests.get(f"{gesdisc_url}/_mock/stats", timeout=1).raise_for_status()
+            break
+        except requests.RequestException:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("No se pudieron arrancar los servidores simulados")
+            time.sleep(0.2)
+    return process, cds_url, gesdisc_url
+
+
+def configure_backend_environment(cds_url, gesdisc_url, args):
+    """Apunta el backend a los servidores simulados (antes de importar la app)."""
+    os.environ.update({
+        "CDSAPI_URL": cds_url,
+        "CDSAPI_KEY": "12345:mock-key",
+        "NASA_GES_DISC_URL": gesdisc_url,
+        "NASA_EARTHDATA_URL": gesdisc_url,
+        "NASA_USERNAME": "mock",
+        "NASA_PASSWORD": "mock",
+        "TEST_MODE": "false",
+        "SOURCE_HEDGE_DELAY_SECONDS": str(args.hedge_delay),
+        "ERA5_CACHE_ENABLED": "true" if args.era5_cache else "false",
+        "ERA5_CACHE_DIR": args.cache_dir or tempfile.mkdtemp(prefix="era5-cache-load-"),
+    })
+
+
+def build_requests(args):
+    """Solicitudes aleatorias (reproducibles) dentro de la región de referencia."""
+    rng = random.Random(args.seed)
+    first_day = date(2019, 1, 1)
+    bodies = []
+    for _ in range(args.requests):
+        size = rng.choice([0.5, 1.0, 2.0])
+        lat_min = round(rng.uniform(REGION["lat_min"], REGION["lat_max"] - size), 2)
+        lon_min = round(rng.uniform(REGION["lon_min"], REGION["lon_max"] - size), 2)
+        start = first_day + timedelta(days=rng.randrange(0, 4 * 365))
+        body = {
+            "lat_min": lat_min, "lat_max": lat_min + size,
+            "lon_min": lon_min, "lon_max": lon_min + size,
+            "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=args.days - 1)).isoformat(),
+        }
+        if args.stream:
+            body["stream"] = True
+        bodies.append(body)
+    return bodies
+
+
+def send(url, body, timeout):
+    """Envía una solicitud y mide latencia total y tiempo al primer byte."""
+    started = time.perf_counter()
+    result = {"ok": False, "source": None, "ttfb": None}
+    try:
+        with requests.post(url, json=body, timeout=timeout, stream=True) as response:
+            first = True
+            chunks = []
+            for chunk in response.iter_content(chunk_size=65536):
+                if first:
+                    result["ttfb"] = time.perf_counter() - started
+                    first = False
+                chunks.append(chunk)
+            payload = b"".join(chunks)
+        result["status"] = response.status_code
+        result["bytes"] = len(payload)
+        if body.get("stream"):
+            lines = [json.loads(line) for line in payload.splitlines() if line.strip()]
+            header = lines[0] if lines else {}
+            result["source"] = header.get("data_source")
+            result["ok"] = response.status_code == 200 and bool(lines) and lines[-1].get("type") == "summary"
+            result["chunks"] = sum(1 for line in lines if line.get("type") == "chunk")
+        else:
+            data = json.loads(payload)
+            result["source"] = data.get("data_source")
+            result["ok"] = response.status_code == 200 and data.get("status") == "success"
+            if not result["ok"]:
+                result["error"] = data.get("details") or data.get("error")
+    except Exception as e:
+        result["status"] = None
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    arr = np.array(values)
+    return {f"p{p}": round(float(np.percentile(arr, p)), 3) for p in (50, 90, 99)} | \
+        {"max": round(float(arr.max()), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de /api/wind-data con fuentes simuladas")
+    parser.add_argument("--requests", type=int, default=20, help="Número de solicitudes")
+    parser.add_argument("--concurrency", type=int, default=4, help="Solicitudes simultáneas")
+    parser.add_argument("--days", type=int, default=3, help="Días por solicitud")
+    parser.add_argument("--stream", action="store_true", help="Usar el modo NDJSON")
+    parser.add_argument("--hedge-delay", type=float, default=30.0, help="SOURCE_HEDGE_DELAY_SECONDS del backend")
+    parser.add_argument("--era5-cache", action="store_true", help="Activar la caché de tiles ERA5")
+    parser.add_argument("--cache-dir", default=None, help="ERA5_CACHE_DIR (por defecto, temporal)")
+    parser.add_argument("--timeout", type=float, default=900.0)
+    parser.add_argument("--output", default=None, help="Guardar el resumen en JSON")
+    parser.add_argument("--verbose", action="store_true")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if not args.verbose:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    mocks, cds_url, gesdisc_url = start_mock_servers(args)
+    configure_backend_environment(cds_url, gesdisc_url, args)
+
+    from src.main import app  # noqa: E402  (importar después de configurar el entorno)
+    backend = serve_in_thread(app)
+    url = f"{backend.url}/api/wind-data"
+    print(f"🧪 CDS {cds_url} | GES DISC {gesdisc_url} | backend {backend.url}")
+
+    bodies = build_requests(args)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda body: send(url, body, args.timeout), bodies))
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["ok"]]
+    summary = {
+        "requests": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "concurrency": args.concurrency,
+        "days_per_request": args.days,
+        "stream": args.stream,
+        "wall_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 3) if elapsed else None,
+        "latency_seconds": percentiles([r["seconds"] for r in ok]),
+        "ttfb_seconds": percentiles([r["ttfb"] for r in ok if r["ttfb"] is not None]),
+        "sources": dict(Counter(r["source"] for r in ok)),
+        "response_bytes": percentiles([r["bytes"] for r in ok]),
+        "errors": dict(Counter(r.get("error") for r in results if not r["ok"])),
+        "mock_stats": {
+            "cds": requests.get(f"{cds_url}/_mock/stats", timeout=10).json(),
+            "gesdisc": requests.get(f"{gesdisc_url}/_mock/stats", timeout=10).json(),
+        },
+        "mock_config": {
+            "latency": args.latency, "queue_delay": args.queue_delay,
+            "cds_failure_rate": args.cds_failure_rate, "gesdisc_failure_rate": args.gesdisc_failure_rate,
+            "bandwidth": args.bandwidth,
+        },
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    mocks.terminate()
+    mocks.wait(timeout=10)
+    threading.Thread(target=backend.stop, daemon=True).start()
+    return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Servidores HTTP locales que sustituyen a Copernicus CDS y a NASA Earthdata / GES DISC.
+
+Implementan lo necesario del protocolo de colas de CDS (cliente cdsapi "legacy")
+y de la estructura de archivos de GES DISC para ejecutar la cadena completa
+ERA5 -> MERRA-2 -> simulado sin internet ni credenciales reales, sirviendo
+NetCDF sintéticos con dimensiones reales y con latencia, espera en cola y
+fallos configurables.
+
+Uso:
+    python -m mock_servers --cds-port 8701 --gesdisc-port 8702 --latency 0.2 --queue-delay 3
+
+y en el backend:
+    CDSAPI_URL=http://127.0.0.1:8701 CDSAPI_KEY=12345:mock-key
+    NASA_GES_DISC_URL=http://127.0.0.1:8702 NASA_EARTHDATA_URL=http://127.0.0.1:8702
+    NASA_USERNAME=mock NASA_PASSWORD=mock
+"""
+
+from mock_servers.common import MockServerConfig, MockServerHandle, serve_in_thread
+from mock_servers.cds import create_cds_app
+from mock_servers.gesdisc import create_gesdisc_app
+from mock_servers.synthetic import SyntheticFileStore
+
+__all__ = [
+    "MockServerConfig",
+    "MockServerHandle",
+    "SyntheticFileStore",
+    "create_cds_app",
+    "create_gesdisc_app",
+    "serve_in_thread",
+]
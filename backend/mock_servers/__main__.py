@@ -0,0 +1,73 @@
+"""
+Arranca los servidores simulados de CDS y GES DISC.
+
+    python -m mock_servers --cds-port 8701 --gesdisc-port 8702 --latency 0.2 --queue-delay 3
+"""
+
+import argparse
+import logging
+import time
+
+from mock_servers.cds import create_cds_app
+from mock_servers.common import MockServerConfig, serve_in_thread
+from mock_servers.gesdisc import create_gesdisc_app
+from mock_servers.synthetic import SyntheticFileStore
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    """Opciones de comportamiento de los servidores simulados."""
+    parser.add_argument("--latency", type=float, default=0.05, help="Latencia por respuesta (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variación aleatoria de la latencia (s)")
+    parser.add_argument("--queue-delay", type=float, default=2.0, help="Tiempo en cola de cada solicitud CDS (s)")
+    parser.add_argument("--cds-failure-rate", type=float, default=0.0, help="Probabilidad de fallo de una tarea CDS")
+    parser.add_argument("--gesdisc-failure-rate", type=float, default=0.0,
+                        help="Probabilidad de HTTP 503 en una descarga MERRA-2")
+    parser.add_argument("--gesdisc-disconnect-rate", type=float, default=0.0,
+                        help="Probabilidad de cortar la conexión a mitad de una descarga MERRA-2")
+    parser.add_argument("--bandwidth", type=int, default=0, help="Límite de descarga en bytes/s (0 = sin límite)")
+    parser.add_argument("--merra2-extra-variables", type=int, default=0,
+                        help="Variables de relleno para acercar el tamaño del archivo MERRA-2 al real")
+    parser.add_argument("--data-dir", default=None, help="Directorio para los NetCDF sintéticos")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def build_configs(args):
+    """(config CDS, config GES DISC) a partir de los argumentos."""
+    common = dict(latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth, seed=args.seed)
+    cds_config = MockServerConfig(queue_delay=args.queue_delay, failure_rate=args.cds_failure_rate, **common)
+    gesdisc_config = MockServerConfig(failure_rate=args.gesdisc_failure_rate,
+                                      disconnect_rate=args.gesdisc_disconnect_rate,
+                                      merra2_extra_variables=args.merra2_extra_variables, **common)
+    return cds_config, gesdisc_config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidores simulados de CDS y GES DISC")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--cds-port", type=int, default=8701)
+    parser.add_argument("--gesdisc-port", type=int, default=8702)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = SyntheticFileStore(args.data_dir)
+    cds_config, gesdisc_config = build_configs(args)
+    cds = serve_in_thread(create_cds_app(cds_config, store), args.host, args.cds_port)
+    gesdisc = serve_in_thread(create_gesdisc_app(gesdisc_config, store), args.host, args.gesdisc_port)
+
+    print(f"🧪 CDS simulado:     {cds.url}")
+    print(f"🧪 GES DISC simulado: {gesdisc.url}")
+    print("Variables de entorno para el backend:")
+    print(f"  CDSAPI_URL={cds.url} CDSAPI_KEY=12345:mock-key")
+    print(f"  NASA_GES_DISC_URL={gesdisc.url} NASA_EARTHDATA_URL={gesdisc.url}")
+    print("  NASA_USERNAME=mock NASA_PASSWORD=mock")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        cds.stop()
+        gesdisc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Servidor simulado de Copernicus CDS (protocolo del cliente cdsapi "legacy").
+
+Flujo que implementa:
+    POST /resources/<dataset>   -> {"state": "queued", "request_id": ...}
+    GET  /tasks/<request_id>    -> queued | running | completed (location, content_length) | failed
+    GET  /downloads/<file>      -> NetCDF (admite Range)
+    DELETE /tasks/<request_id>  -> libera la tarea
+
+cdsapi usa este protocolo cuando la clave tiene la forma "<UID>:<APIKEY>".
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from flask import Flask, jsonify, request
+
+from mock_servers.common import MockServerConfig, MockStats, file_response
+from mock_servers.synthetic import SyntheticFileStore
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DATASETS = {"reanalysis-era5-single-levels"}
+REQUIRED_FIELDS = ("variable", "year", "month", "day", "time")
+
+
+@dataclass
+class MockTask:
+    request_id: str
+    dataset: str
+    body: Dict
+    created_at: float
+    ready_at: float
+    fail: bool
+    path: Optional[str] = None
+    error: Optional[str] = None
+
+
+def create_cds_app(config: MockServerConfig = None, store: SyntheticFileStore = None) -> Flask:
+    """
+    Crea la aplicación Flask del CDS simulado.
+
+    Args:
+        config: Latencia, espera en cola y tasa de fallos
+        store: Almacén de archivos sintéticos (compartible con el servidor GES DISC)
+    """
+    config = config or MockServerConfig()
+    store = store or SyntheticFileStore()
+    stats = MockStats()
+    tasks: Dict[str, MockTask] = {}
+    tasks_lock = threading.Lock()
+    counter = itertools.count(1)
+
+    app = Flask("mock_cds")
+    app.config["MOCK_STATS"] = stats
+
+    def unauthorized():
+        stats.incr("unauthorized")
+        return jsonify({"message": "Authentication failed", "reason": "Invalid UID:KEY"}), 401
+
+    def task_reply(task: MockTask):
+        now = time.monotonic()
+        if now < task.ready_at:
+            half_way = task.created_at + (task.ready_at - task.created_at) / 2
+            return {"state": "queued" if now < half_way else "running", "request_id": task.request_id}
+
+        if task.fail:
+            return {
+                "state": "failed",
+                "request_id": task.request_id,
+                "error": {"message": "The job failed with: MockInjectedFailure",
+                          "reason": task.error or "Injected failure",
+                          "context": {"traceback": ""}},
+            }
+
+        if task.path is None:
+            try:
+                task.path = store.era5_file(task.body, config.seed)
+            except ValueError as e:
+                task.fail, task.error = True, str(e)
+                return task_reply(task)
+            stats.incr("files_served")
+
+        return {
+            "state": "completed",
+            "request_id": task.request_id,
+            "location": f"/downloads/{task.request_id}.nc",
+            "content_length": os.path.getsize(task.path),
+            "content_type": "application/x-netcdf",
+            "result_provided_by": task.request_id,
+        }
+
+    @app.route("/status.json", methods=["GET"])
+    def status():
+        return jsonify({"info": [], "warning": []})
+
+    @app.route("/resources/<dataset>", methods=["POST"])
+    def submit(dataset):
+        config.delay()
+        stats.incr("requests")
+        if not config.check_auth(request.authorization):
+            return unauthorized()
+        if dataset not in SUPPORTED_DATASETS:
+            return jsonify({"message": f"Resource {dataset} not found", "reason": "not_found"}), 404
+
+        body = request.get_json(silent=True) or {}
+        missing = [f for f in REQUIRED_FIELDS if not body.get(f)]
+        if missing:
+            stats.incr("bad_requests")
+            return jsonify({"message": f"Missing required fields: {missing}", "reason": "bad_request"}), 400
+
+        now = time.monotonic()
+        task = MockTask(
+            request_id=f"{next(counter):06d}-{uuid.uuid4().hex[:8]}",
+            dataset=dataset,
+            body=body,
+            created_at=now,
+            ready_at=now + config.queue_delay,
+            fail=config.should_fail(),
+        )
+        if task.fail:
+            stats.incr("failures_injected")
+        with tasks_lock:
+            tasks[task.request_id] = task
+        logger.info(f"🧪 CDS simulado: tarea {task.request_id} en cola ({len(body.get('day', []))} días)")
+        return jsonify(task_reply(task)), 202
+
+    @app.route("/tasks/<request_id>", methods=["GET"])
+    def task_status(request_id):
+        config.delay()
+        stats.incr("polls")
+        with tasks_lock:
+            task = tasks.get(request_id)
+        if task is None:
+            return jsonify({"message": "Request not found", "reason": "not_found"}), 404
+        return jsonify(task_reply(task))
+
+    @app.route("/tasks/<request_id>", methods=["DELETE"])
+    def task_delete(request_id):
+        with tasks_lock:
+            tasks.pop(request_id, None)
+        return "", 204
+
+    @app.route("/downloads/<request_id>.nc", methods=["GET", "HEAD"])
+    def download(request_id):
+        config.delay()
+        with tasks_lock:
+            task = tasks.get(request_id)
+        if task is None or task.path is None:
+            return jsonify({"message": "File not found", "reason": "not_found"}), 404
+        stats.incr("downloads")
+        return file_response(task.path, config, stats)
+
+    @app.route("/_mock/stats", methods=["GET"])
+    def mock_stats():
+        with tasks_lock:
+            pending = len(tasks)
+        return jsonify({"server": "cds", "tasks": pending, **stats.snapshot()})
+
+    return app
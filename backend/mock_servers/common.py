@@ -0,0 +1,223 @@
+"""
+Piezas comunes de los servidores simulados: configuración de latencia y fallos,
+estadísticas, respuesta de archivos con soporte de Range y arranque en un hilo.
+"""
+
+import base64
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from flask import Response, request
+from werkzeug.serving import make_server
+
+# Tamaño de los bloques enviados al servir archivos
+SEND_CHUNK_BYTES = 64 * 1024
+
+
+@dataclass
+class MockServerConfig:
+    """
+    Comportamiento de un servidor simulado.
+
+    Attributes:
+        latency: Segundos añadidos a cada respuesta
+        jitter: Variación aleatoria máxima (+/- segundos) sobre la latencia
+        queue_delay: Segundos que una solicitud CDS permanece en cola antes de completarse
+        failure_rate: Probabilidad (0-1) de que una solicitud falle
+        disconnect_rate: Probabilidad (0-1) de cortar la conexión a mitad de un archivo
+        bandwidth: Límite de envío de archivos en bytes/s (0 = sin límite)
+        username, password: Credenciales aceptadas (None = cualquiera no vacía)
+        merra2_extra_variables: Variables de relleno en los archivos MERRA-2
+                                (el archivo real tiene ~47 variables)
+        seed: Semilla de los datos sintéticos y de la inyección de fallos
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    queue_delay: float = 0.0
+    failure_rate: float = 0.0
+    disconnect_rate: float = 0.0
+    bandwidth: int = 0
+    username: Optional[str] = None
+    password: Optional[str] = None
+    merra2_extra_variables: int = 0
+    seed: int = 0
+    _rng: random.Random = field(default=None, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    def delay(self):
+        """Aplica la latencia configurada."""
+        with self._lock:
+            extra = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        pause = max(0.0, self.latency + extra)
+        if pause:
+            time.sleep(pause)
+
+    def should_fail(self) -> bool:
+        """Sorteo de la inyección de fallos."""
+        if self.failure_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.failure_rate
+
+    def disconnect_after(self, length: int) -> Optional[int]:
+        """Sorteo del corte de conexión: bytes a enviar antes de cortar, o None."""
+        if self.disconnect_rate <= 0 or length <= 1:
+            return None
+        with self._lock:
+            if self._rng.random() >= self.disconnect_rate:
+                return None
+            return self._rng.randrange(1, length)
+
+    def check_auth(self, auth) -> bool:
+        """Valida credenciales básicas HTTP."""
+        if auth is None or not auth.username or not auth.password:
+            return False
+        if self.username is not None and auth.username != self.username:
+            return False
+        if self.password is not None and auth.password != self.password:
+            return False
+        return True
+
+
+class MockStats:
+    """Contadores de un servidor simulado (seguros entre hilos)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+_digests: Dict[tuple, str] = {}
+_digests_lock = threading.Lock()
+
+
+def _sha256_digest(path: str, st: os.stat_result) -> str:
+    """SHA-256 en base64 del archivo completo (cabecera Digest), calculado una vez por versión."""
+    key = (path, st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        if key in _digests:
+            return _digests[key]
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    value = base64.b64encode(sha.digest()).decode()
+    with _digests_lock:
+        _digests[key] = value
+    return value
+
+
+def file_response(path: str, config: MockServerConfig, stats: MockStats,
+                  mimetype: str = "application/x-netcdf") -> Response:
+    """
+    Sirve un archivo con soporte de cabecera Range (una sola franja) e If-Range,
+    HEAD, ETag y Digest (SHA-256 del archivo completo), límite de ancho de banda
+    y cortes de conexión simulados.
+    """
+    st = os.stat(path)
+    size = st.st_size
+    etag = f'"{size:x}-{st.st_mtime_ns:x}"'
+    start, end = 0, size - 1
+    status = 200
+
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and if_range is not None and if_range != etag:
+        # El archivo cambió desde la descarga parcial: se envía completo
+        range_header = None
+    if range_header:
+        match = _RANGE_RE.match(range_header.strip())
+        if not match or (not match.group(1) and not match.group(2)):
+            return Response(status=416, headers={"Content-Range": f"bytes */{size}"})
+        if match.group(1):
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), size - 1)
+        else:
+            start = max(0, size - int(match.group(2)))
+        if start >= size or start > end:
+            return Response(status=416, headers={"Content-Range": f"bytes */{size}"})
+        status = 206
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        "ETag": etag,
+        "Digest": f"SHA-256={_sha256_digest(path, st)}",
+    }
+    if status == 206:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    if request.method == "HEAD":
+        return Response(status=status, headers=headers, mimetype=mimetype)
+
+    cut_after = config.disconnect_after(end - start + 1)
+
+    def generate():
+        remaining = end - start + 1
+        sent = 0
+        with open(path, "rb") as f:
+            f.seek(start)
+            while remaining > 0:
+                if cut_after is not None and sent >= cut_after:
+                    stats.incr("disconnects_injected")
+                    raise ConnectionAbortedError("mock disconnect")
+                chunk = f.read(min(SEND_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                sent += len(chunk)
+                stats.incr("bytes_sent", len(chunk))
+                if config.bandwidth:
+                    time.sleep(len(chunk) / config.bandwidth)
+                yield chunk
+
+    return Response(generate(), status=status, headers=headers, mimetype=mimetype,
+                    direct_passthrough=True)
+
+
+class MockServerHandle:
+    """Servidor WSGI en un hilo de fondo."""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        self._server = make_server(host, port, app, threaded=True)
+        self.host = host
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name=f"mock-{app.name}-{self.port}")
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "MockServerHandle":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._thread.join(timeout=5)
+
+
+def serve_in_thread(app, host: str = "127.0.0.1", port: int = 0) -> MockServerHandle:
+    """Arranca app en un hilo; port=0 elige un puerto libre (ver handle.url)."""
+    return MockServerHandle(app, host, port).start()
@@ -0,0 +1,158 @@
+"""
+Servidor simulado de NASA Earthdata Login y GES DISC.
+
+    GET  /api/users/user                         -> perfil del usuario (autenticación básica)
+    GET  /data/MERRA2/M2T1NXSLV.5.12.4/YYYY/MM/MERRA2_400.tavg1_2d_slv_Nx.YYYYMMDD.nc4
+    HEAD (misma ruta)                            -> comprobación de acceso
+    GET  /opendap/MERRA2/M2T1NXSLV.5.12.4/YYYY/MM/MERRA2_400.tavg1_2d_slv_Nx.YYYYMMDD.nc4.nc4?U10M[0:23][200:206][150:163],...
+                                                 -> recorte OPeNDAP (DAP2, salida NetCDF)
+
+Las rutas de datos siguen la estructura de goldsmr4.gesdisc.eosdis.nasa.gov, así que
+NASAConfigManager solo necesita NASA_GES_DISC_URL / NASA_EARTHDATA_URL apuntando aquí.
+"""
+
+import logging
+import re
+from datetime import date
+from typing import Dict
+from urllib.parse import unquote
+
+from flask import Flask, jsonify, request
+
+from mock_servers.common import MockServerConfig, MockStats, file_response
+from mock_servers.synthetic import SyntheticFileStore
+
+logger = logging.getLogger(__name__)
+
+SLV_FILE_RE = re.compile(r"^MERRA2_\d{3}\.tavg1_2d_slv_Nx\.(\d{4})(\d{2})(\d{2})\.nc4$")
+
+# Proyección DAP2: nombre seguido de hiperrectángulos [inicio], [inicio:fin] o [inicio:paso:fin]
+PROJECTION_RE = re.compile(r"^(\w+)((?:\[\d+(?::\d+){0,2}\])*)$")
+HYPERSLAB_RE = re.compile(r"\[(\d+)(?::(\d+))?(?::(\d+))?\]")
+MERRA2_DIMS = ("time", "lat", "lon")
+
+
+def parse_dap_constraint(constraint: str) -> Dict[str, Dict[str, slice]]:
+    """
+    Convierte una expresión de restricción DAP2 (solo proyecciones) en recortes por
+    variable; los índices finales son inclusivos, como en OPeNDAP.
+
+    Raises:
+        ValueError: Expresión no soportada
+    """
+    selection = {}
+    for projection in filter(None, unquote(constraint).split(",")):
+        match = PROJECTION_RE.match(projection.strip())
+        if not match:
+            raise ValueError(f"Unsupported projection: {projection}")
+        name, slabs = match.groups()
+        dims = (name,) if name in MERRA2_DIMS else MERRA2_DIMS
+        ranges = HYPERSLAB_RE.findall(slabs)
+        if len(ranges) > len(dims):
+            raise ValueError(f"Too many dimensions for {name}")
+        selected = {}
+        for dim, (start, second, third) in zip(dims, ranges):
+            start = int(start)
+            step, stop = (int(second), int(third)) if third else (1, int(second) if second else start)
+            if stop < start or step < 1:
+                raise ValueError(f"Invalid hyperslab for {name}")
+            selected[dim] = slice(start, stop + 1, step)
+        selection[name] = selected
+    if not selection:
+        raise ValueError("Empty constraint")
+    return selection
+
+
+def create_gesdisc_app(config: MockServerConfig = None, store: SyntheticFileStore = None) -> Flask:
+    """
+    Crea la aplicación Flask de Earthdata / GES DISC simulados.
+
+    Args:
+        config: Latencia, ancho de banda, tasa de fallos y credenciales aceptadas
+        store: Almacén de archivos sintéticos
+    """
+    config = config or MockServerConfig()
+    store = store or SyntheticFileStore()
+    stats = MockStats()
+
+    app = Flask("mock_gesdisc")
+    app.config["MOCK_STATS"] = stats
+
+    def unauthorized():
+        stats.incr("unauthorized")
+        return ("Unauthorized", 401, {"WWW-Authenticate": 'Basic realm="Please enter your Earthdata Login credentials"'})
+
+    @app.route("/api/users/user", methods=["GET"])
+    def earthdata_user():
+        config.delay()
+        stats.incr("auth_requests")
+        auth = request.authorization
+        if not config.check_auth(auth):
+            return unauthorized()
+        return jsonify({"uid": auth.username, "first_name": "Mock", "last_name": "User",
+                        "email_address": f"{auth.username}@example.org", "user_type": "mock"})
+
+    @app.route("/data/MERRA2/M2T1NXSLV.5.12.4/<year>/<month>/<filename>", methods=["GET", "HEAD"])
+    def merra2_slv(year, month, filename):
+        config.delay()
+        stats.incr("requests")
+        if not config.check_auth(request.authorization):
+            return unauthorized()
+
+        match = SLV_FILE_RE.match(filename)
+        if not match or match.group(1) != year or match.group(2) != month:
+            stats.incr("not_found")
+            return "Not Found", 404
+        try:
+            day = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            stats.incr("not_found")
+            return "Not Found", 404
+
+        if request.method == "GET" and config.should_fail():
+            stats.incr("failures_injected")
+            return "Service Temporarily Unavailable (mock)", 503
+
+        path = store.merra2_file(day, config.seed, config.merra2_extra_variables)
+        if request.method == "GET":
+            stats.incr("downloads")
+        return file_response(path, config, stats)
+
+    @app.route("/opendap/MERRA2/M2T1NXSLV.5.12.4/<year>/<month>/<filename>", methods=["GET"])
+    def merra2_opendap(year, month, filename):
+        config.delay()
+        stats.incr("requests")
+        if not config.check_auth(request.authorization):
+            return unauthorized()
+
+        # Hyrax devuelve NetCDF al añadir la extensión .nc4 al nombre del granule
+        match = SLV_FILE_RE.match(filename[:-len(".nc4")]) if filename.endswith(".nc4.nc4") else None
+        if not match or match.group(1) != year or match.group(2) != month:
+            stats.incr("not_found")
+            return "Not Found", 404
+        try:
+            day = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            stats.incr("not_found")
+            return "Not Found", 404
+
+        if config.should_fail():
+            stats.incr("failures_injected")
+            return "Service Temporarily Unavailable (mock)", 503
+
+        constraint = request.query_string.decode()
+        try:
+            selection = {name: dims for name, dims in parse_dap_constraint(constraint).items()
+                         if name not in MERRA2_DIMS}
+            path = store.merra2_subset_file(day, selection, config.seed, config.merra2_extra_variables)
+        except (KeyError, ValueError, IndexError) as e:
+            stats.incr("bad_constraints")
+            return f"Error {{ code = 400; message = \"{e}\"; }}", 400
+        stats.incr("subset_downloads")
+        return file_response(path, config, stats)
+
+    @app.route("/_mock/stats", methods=["GET"])
+    def mock_stats():
+        return jsonify({"server": "gesdisc", **stats.snapshot()})
+
+    return app
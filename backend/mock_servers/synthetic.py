@@ -0,0 +1,244 @@
+"""
+NetCDF sintéticos con la estructura de los productos reales.
+
+- ERA5 (reanalysis-era5-single-levels vía CDS): malla regular de 0.25° recortada
+  al área pedida, dims (valid_time, latitude, longitude), coords number/expver.
+- MERRA-2 (M2T1NXSLV, tavg1_2d_slv_Nx): archivo diario global de 24 pasos
+  horarios centrados en HH:30, lat -90..90 cada 0.5° (361) y lon -180..179.375
+  cada 0.625° (576).
+
+Los campos son suaves (ciclo diurno y gradientes) con ruido pequeño, para que
+la compresión y los tamaños de archivo se parezcan a los reales.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# Nombres CDS -> nombres cortos en el NetCDF de ERA5
+ERA5_SHORT_NAMES = {
+    "10m_u_component_of_wind": "u10",
+    "10m_v_component_of_wind": "v10",
+    "100m_u_component_of_wind": "u100",
+    "100m_v_component_of_wind": "v100",
+    "2m_temperature": "t2m",
+    "surface_pressure": "sp",
+}
+
+ERA5_UNITS = {"u10": "m s**-1", "v10": "m s**-1", "u100": "m s**-1", "v100": "m s**-1",
+              "t2m": "K", "sp": "Pa"}
+
+# Malla MERRA-2 (producto 2D horario)
+MERRA2_N_LAT = 361
+MERRA2_N_LON = 576
+MERRA2_VARIABLES = {"U10M": "m s-1", "V10M": "m s-1", "T2M": "K", "PS": "Pa"}
+
+_ENCODING = {"zlib": True, "complevel": 1}
+
+
+def _as_list(value) -> List[str]:
+    return value if isinstance(value, list) else [value]
+
+
+def _request_seed(payload, seed: int) -> int:
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    return (int(digest[:12], 16) + seed) % (2 ** 32)
+
+
+def _field(rng, hours, lat, lon, base, diurnal, gradient, noise, phase=0.0):
+    """Campo (time, lat, lon) con ciclo diurno, gradiente meridional y ruido."""
+    cycle = diurnal * np.sin(2 * np.pi * (hours - phase) / 24)[:, None, None]
+    spatial = gradient * np.sin(np.deg2rad(lat))[None, :, None]
+    values = base + cycle + spatial + noise * rng.standard_normal((len(hours), len(lat), len(lon)))
+    return values.astype("float32")
+
+
+def era5_times(request: Dict) -> pd.DatetimeIndex:
+    """Instantes pedidos (se omiten fechas inexistentes, como hace CDS)."""
+    times = []
+    for year in _as_list(request["year"]):
+        for month in _as_list(request["month"]):
+            for day in _as_list(request["day"]):
+                try:
+                    day_date = date(int(year), int(month), int(day))
+                except ValueError:
+                    continue
+                for hour in _as_list(request["time"]):
+                    hh, mm = str(hour).split(":")
+                    times.append(datetime(day_date.year, day_date.month, day_date.day, int(hh), int(mm)))
+    return pd.DatetimeIndex(sorted(set(times)))
+
+
+def era5_grid(request: Dict):
+    """Latitudes (descendentes) y longitudes de la malla dentro del área [N, W, S, E]."""
+    step_lat, step_lon = [float(g) for g in request.get("grid", [0.25, 0.25])]
+    north, west, south, east = [float(a) for a in request.get("area", [90, -180, -90, 180])]
+    lat_top = np.floor(north / step_lat + 1e-9) * step_lat
+    lat_bottom = np.ceil(south / step_lat - 1e-9) * step_lat
+    lon_left = np.ceil(west / step_lon - 1e-9) * step_lon
+    lon_right = np.floor(east / step_lon + 1e-9) * step_lon
+    lat = np.round(np.arange(lat_top, lat_bottom - 1e-9, -step_lat), 6)
+    lon = np.round(np.arange(lon_left, lon_right + 1e-9, step_lon), 6)
+    return lat, lon
+
+
+def era5_dataset(request: Dict, seed: int = 0) -> xr.Dataset:
+    """
+    Dataset ERA5 sintético para una solicitud CDS.
+
+    Raises:
+        ValueError: Variable desconocida o área/fechas vacías
+    """
+    variables = _as_list(request["variable"])
+    unknown = [v for v in variables if v not in ERA5_SHORT_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown variable(s): {unknown}")
+
+    times = era5_times(request)
+    lat, lon = era5_grid(request)
+    if len(times) == 0 or len(lat) == 0 or len(lon) == 0:
+        raise ValueError("Request produces an empty selection")
+
+    rng = np.random.default_rng(_request_seed(request, seed))
+    hours = times.hour.values + times.minute.values / 60.0
+    u10 = _field(rng, hours, lat, lon, -5.5, 1.5, -1.0, 0.6)
+    v10 = _field(rng, hours, lat, lon, -1.5, 0.8, 0.5, 0.6, phase=6)
+    generated = {
+        "u10": u10,
+        "v10": v10,
+        "u100": (u10 * 1.25).astype("float32"),
+        "v100": (v10 * 1.25).astype("float32"),
+        "t2m": _field(rng, hours, lat, lon, 300.5, 1.8, -2.0, 0.3, phase=9),
+        "sp": _field(rng, hours, lat, lon, 101150.0, 120.0, 80.0, 15.0, phase=4),
+    }
+
+    dims = ("valid_time", "latitude", "longitude")
+    data_vars = {}
+    for cds_name in variables:
+        short = ERA5_SHORT_NAMES[cds_name]
+        data_vars[short] = (dims, generated[short], {"units": ERA5_UNITS[short], "long_name": cds_name})
+
+    return xr.Dataset(
+        data_vars,
+        coords={
+            "valid_time": times,
+            "latitude": lat,
+            "longitude": lon,
+            "number": 0,
+            "expver": ("valid_time", np.array(["0001"] * len(times))),
+        },
+        attrs={"GRIB_centre": "ecmf", "Conventions": "CF-1.7", "institution": "mock-cds"},
+    )
+
+
+def merra2_dataset(day: date, seed: int = 0, extra_variables: int = 0) -> xr.Dataset:
+    """Archivo diario MERRA-2 tavg1_2d_slv_Nx sintético (global, 24 pasos horarios)."""
+    rng = np.random.default_rng(_request_seed(day.isoformat(), seed))
+    times = pd.date_range(datetime(day.year, day.month, day.day, 0, 30), periods=24, freq="h")
+    lat = np.linspace(-90.0, 90.0, MERRA2_N_LAT)
+    lon = -180.0 + 0.625 * np.arange(MERRA2_N_LON)
+    hours = times.hour.values + 0.5
+
+    fields = {
+        "U10M": _field(rng, hours, lat, lon, -4.0, 1.2, -3.0, 0.8),
+        "V10M": _field(rng, hours, lat, lon, -1.0, 0.7, 1.0, 0.8, phase=6),
+        "T2M": _field(rng, hours, lat, lon, 288.0, 2.0, 12.0, 0.4, phase=9),
+        "PS": _field(rng, hours, lat, lon, 98500.0, 100.0, 800.0, 20.0, phase=4),
+    }
+    for i in range(extra_variables):
+        fields[f"EXTRA{i:02d}"] = _field(rng, hours, lat, lon, 1.0, 0.1, 0.5, 0.05)
+
+    dims = ("time", "lat", "lon")
+    data_vars = {
+        name: (dims, values, {"units": MERRA2_VARIABLES.get(name, "1"), "long_name": name})
+        for name, values in fields.items()
+    }
+    ds = xr.Dataset(
+        data_vars,
+        coords={"time": times, "lat": lat, "lon": lon},
+        attrs={"ShortName": "M2T1NXSLV", "VersionID": "5.12.4",
+               "Filename": f"MERRA2_400.tavg1_2d_slv_Nx.{day:%Y%m%d}.nc4"},
+    )
+    ds.time.encoding["units"] = f"minutes since {day:%Y-%m-%d} 00:30:00"
+    return ds
+
+
+class SyntheticFileStore:
+    """
+    Genera y guarda en disco los archivos sintéticos, una sola vez por clave
+    (solicitudes concurrentes por la misma clave esperan a la primera).
+    """
+
+    def __init__(self, root_dir: Optional[str] = None):
+        self.root_dir = root_dir or tempfile.mkdtemp(prefix="mock-reanalysis-")
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        # La librería HDF5 no es segura entre hilos: una escritura a la vez
+        self._write_lock = threading.Lock()
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_or_create(self, key: str, build) -> str:
+        """
+        Ruta del archivo para key, generándolo con build() -> xr.Dataset si no existe.
+        """
+        path = os.path.join(self.root_dir, key)
+        with self._key_lock(key):
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                ds = build()
+                encoding = {name: dict(_ENCODING) for name in ds.data_vars}
+                tmp_path = path + ".tmp"
+                with self._write_lock:
+                    ds.to_netcdf(tmp_path, encoding=encoding)
+                os.replace(tmp_path, path)
+        return path
+
+    def era5_file(self, request: Dict, seed: int = 0) -> str:
+        key = f"era5/{_request_seed(request, seed):08x}.nc"
+        return self.get_or_create(key, lambda: era5_dataset(request, seed))
+
+    def merra2_file(self, day: date, seed: int = 0, extra_variables: int = 0) -> str:
+        key = f"merra2/x{extra_variables}/MERRA2_400.tavg1_2d_slv_Nx.{day:%Y%m%d}.nc4"
+        return self.get_or_create(key, lambda: merra2_dataset(day, seed, extra_variables))
+
+    def merra2_subset_file(self, day: date, selection: Dict[str, Dict[str, slice]],
+                           seed: int = 0, extra_variables: int = 0) -> str:
+        """
+        Recorte de un archivo diario MERRA-2 (como la salida NetCDF de OPeNDAP).
+
+        Args:
+            selection: Variable -> {dimensión: slice de índices}
+
+        Raises:
+            KeyError: Variable inexistente
+            ValueError: Recortes incompatibles entre variables o selección vacía
+        """
+        source = self.merra2_file(day, seed, extra_variables)
+        digest = hashlib.sha256(repr(sorted(
+            (name, sorted((dim, (s.start, s.stop, s.step)) for dim, s in dims.items()))
+            for name, dims in selection.items())).encode()).hexdigest()[:16]
+        key = f"merra2_subset/x{extra_variables}/{day:%Y%m%d}_{digest}.nc4"
+
+        def build():
+            # La lectura también pasa por el candado: HDF5 no admite leer y escribir a la vez
+            with self._write_lock, xr.open_dataset(source) as ds:
+                parts = [ds[[name]].isel(dims) for name, dims in selection.items()]
+                subset = xr.merge(parts, join="exact").load()
+            if any(size == 0 for size in subset.sizes.values()):
+                raise ValueError("Empty selection")
+            subset.attrs = dict(ds.attrs)
+            return subset
+
+        return self.get_or_create(key, build)
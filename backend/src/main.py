@@ -8,8 +8,9 @@ from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.climate import climate_bp
-from src.routes.era5 import era5_bp
+from src.routes.era5 import era5_bp, get_era5_service
 from src.routes.analysis import analysis_bp
+from src.services.prefetch_scheduler import start_prefetch_scheduler
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -34,6 +35,9 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
+# Precarga de las cachés ERA5/MERRA-2 de las regiones habituales en horas de poca carga
+start_prefetch_scheduler(get_era5_service)
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -54,4 +58,4 @@ print(" - parsed_hurdat_data.csv existe:", os.path.exists(os.path.join(os.path.d
 print(" - random_forest_model.joblib existe:", os.path.exists(os.path.join(os.path.dirname(__file__), 'database', 'random_forest_model.joblib')))
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    app.run(host='0.0.0.0', port=5000, threaded=True)
@@ -1,9 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
-import os
-import sys
 import numpy as np
 
+from src.services.climate_analysis_module import get_climate_module
+
 def convert_numpy(obj):
     """
     Convierte objetos numpy.* a tipos nativos de Python para evitar errores de serialización.
@@ -23,27 +23,10 @@ def convert_numpy(obj):
     else:
         return obj
 
-# Importar el módulo de análisis climatológico
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
-from climate_analysis_module import ClimateAnalysisModule
-
 ai_bp = Blueprint('ai', __name__)
 
-# Rutas a los archivos de datos y modelo
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DATABASE_PATH = os.path.join(PROJECT_ROOT, 'database')
-
-HURDAT_DATA_PATH = os.path.join(DATABASE_PATH, 'parsed_hurdat_data.csv')
-MODEL_PATH = os.path.join(DATABASE_PATH, 'random_forest_model.joblib')
-
-# Inicializar el módulo de análisis climatológico
-climate_module = ClimateAnalysisModule(
-    hurdat_data_path=HURDAT_DATA_PATH,
-    model_path=MODEL_PATH
-)
-# 👇 Debug: imprimir rutas cargadas
-print("📂 Ruta CSV:", HURDAT_DATA_PATH)
-print("📂 Ruta modelo:", MODEL_PATH)
+# Módulo de análisis climatológico compartido con las rutas de clima
+climate_module = get_climate_module()
 
 @ai_bp.route('/ai-diagnosis', methods=['POST'])
 @cross_origin()
@@ -28,9 +28,14 @@ def perform_wind_analysis():
 
         results = analyzer.comprehensive_wind_analysis(wind_speeds, air_density)
 
-        # Agregar time_series para gráfico temporal
+        # Agregar time_series para gráfico temporal. Con un área, las respuestas de /wind-data
+        # traen un timestamp por paso de tiempo y los valores de todas sus celdas (orden
+        # tiempo, lat, lon): la serie usa la media espacial de cada paso
+        series_speeds = wind_speeds
+        if len(timestamps) and len(wind_speeds) > len(timestamps) and len(wind_speeds) % len(timestamps) == 0:
+            series_speeds = wind_speeds.reshape(len(timestamps), -1).mean(axis=1)
         results["time_series"] = [
-            {"time": ts, "speed": float(s)} for ts, s in zip(timestamps, wind_speeds)
+            {"time": ts, "speed": float(s)} for ts, s in zip(timestamps, series_speeds)
         ]
 
         # Agregar gráfico de Weibull
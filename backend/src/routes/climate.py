@@ -1,19 +1,16 @@
+import math
+
+import numpy as np
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
-import os
-import sys
 
-# Importar el módulo de análisis climatológico
-sys.path.append(os.path.dirname(__file__))
-from src.services.climate_analysis_module import ClimateAnalysisModule
+from src.routes.ai import convert_numpy
+from src.services.climate_analysis_module import batch_max_points, get_climate_module, grid_axis, grid_axis_size
 
 climate_bp = Blueprint('climate', __name__)
 
-# Inicializar el módulo de análisis climatológico
-climate_module = ClimateAnalysisModule(
-    hurdat_data_path=os.path.join(os.path.dirname(__file__), 'parsed_hurdat_data.csv'),
-    model_path=os.path.join(os.path.dirname(__file__), 'random_forest_model.joblib')
-)
+# Módulo de análisis climatológico compartido con las rutas de IA (datos en src/database)
+climate_module = get_climate_module()
 
 @climate_bp.route('/climate-analysis', methods=['POST'])
 @cross_origin()
@@ -36,6 +33,7 @@ def climate_analysis():
             "longitude": float,
             "radius_km": float,
             "metrics": dict,
+            "metrics_source": "raster" | "exact",
             "predicted_impact": str,
             "recommendation": str
         },
@@ -97,17 +95,18 @@ def climate_analysis():
         result = climate_module.analyze_point(latitude, longitude, radius_km)
         
         if result.get("success"):
-            return jsonify({
+            return jsonify(convert_numpy({
                 "success": True,
                 "data": {
                     "latitude": result["latitude"],
                     "longitude": result["longitude"],
                     "radius_km": result["radius_km"],
                     "metrics": result["metrics"],
+                    "metrics_source": result["metrics_source"],
                     "predicted_impact": result["predicted_impact"],
                     "recommendation": result["recommendation"]
                 }
-            }), 200
+            })), 200
         else:
             return jsonify({
                 "success": False,
@@ -120,6 +119,197 @@ def climate_analysis():
             "error": f"Error interno del servidor: {str(e)}"
         }), 500
 
+def _json_floats(values):
+    """Lista JSON de un array: NaN (p. ej. desviación con una sola tormenta) pasa a null."""
+    return [None if isinstance(v, float) and math.isnan(v) else v for v in np.asarray(values).tolist()]
+
+
+def _parse_batch_points(data):
+    """
+    Puntos de una solicitud en lote: lista 'points' ([lat, lon] u objetos con
+    latitude/longitude) o malla 'grid' (lat_min, lat_max, lon_min, lon_max, step).
+
+    Returns:
+        tuple: (latitudes, longitudes, malla o None)
+
+    Raises:
+        ValueError: Si faltan los puntos o no son válidos
+    """
+    if data.get('grid') is not None:
+        grid = data['grid']
+        try:
+            lat_min, lat_max = float(grid['lat_min']), float(grid['lat_max'])
+            lon_min, lon_max = float(grid['lon_min']), float(grid['lon_max'])
+            step = float(grid.get('step', 0.1))
+        except (KeyError, ValueError, TypeError, AttributeError):
+            raise ValueError("La malla requiere 'lat_min', 'lat_max', 'lon_min', 'lon_max' numéricos y 'step' opcional")
+        if not all(math.isfinite(v) for v in (lat_min, lat_max, lon_min, lon_max, step)):
+            raise ValueError("Los límites y el paso de la malla deben ser números finitos")
+        if step <= 0 or lat_min > lat_max or lon_min > lon_max:
+            raise ValueError("La malla requiere step > 0, lat_min <= lat_max y lon_min <= lon_max")
+        # Tamaño calculado antes de construir los ejes: un paso diminuto no debe reservar memoria
+        n_points = grid_axis_size(lat_min, lat_max, step) * grid_axis_size(lon_min, lon_max, step)
+        if n_points > batch_max_points():
+            raise ValueError(f"La malla tiene {n_points} puntos; el máximo es {batch_max_points()}")
+        axis_lats, axis_lons = grid_axis(lat_min, lat_max, step), grid_axis(lon_min, lon_max, step)
+        lats, lons = np.meshgrid(axis_lats, axis_lons, indexing='ij')
+        grid_info = {"latitudes": axis_lats, "longitudes": axis_lons, "shape": [len(axis_lats), len(axis_lons)],
+                     "step": step}
+        return lats.ravel(), lons.ravel(), grid_info
+
+    points = data.get('points')
+    if not isinstance(points, list) or not points:
+        raise ValueError("Se requiere 'points' (lista de [latitud, longitud]) o 'grid'")
+    if len(points) > batch_max_points():
+        raise ValueError(f"Se recibieron {len(points)} puntos; el máximo es {batch_max_points()}")
+    try:
+        coords = [(p['latitude'], p['longitude']) if isinstance(p, dict) else (p[0], p[1]) for p in points]
+        lats = np.array([float(lat) for lat, _ in coords])
+        lons = np.array([float(lon) for _, lon in coords])
+    except (KeyError, IndexError, ValueError, TypeError):
+        raise ValueError("Cada punto debe ser [latitud, longitud] o {'latitude': ..., 'longitude': ...} numéricos")
+    if not (np.all(np.isfinite(lats)) and np.all(np.isfinite(lons))):
+        raise ValueError("Las coordenadas de los puntos deben ser números finitos")
+    return lats, lons, None
+
+
+def _batch_point_metrics(result, k):
+    """Métricas del punto k con la misma forma que las de /climate-analysis."""
+    metrics = result["metrics"]
+
+    def by_category(values):
+        return {c: values[k, j] for j, c in enumerate(result["categories"]) if not np.isnan(values[k, j])}
+
+    std = metrics["std_dev_duration_hours"][k]
+    return {
+        "event_density": metrics["event_density"][k],
+        "event_frequency": by_category(metrics["event_frequency"]),
+        "event_intensity_profile": by_category(metrics["event_intensity_profile"]),
+        "energy_opportunity_score": metrics["energy_opportunity_score"][k],
+        "extreme_risk_index": metrics["extreme_risk_index"][k],
+        "event_duration_stats": {
+            "average_duration_hours": metrics["average_duration_hours"][k],
+            "std_dev_duration_hours": None if np.isnan(std) else std
+        },
+        "historical_pressure_min": metrics["historical_pressure_min"][k]
+    }
+
+
+def _batch_geojson(result):
+    features = []
+    for k in range(len(result["latitude"])):
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [result["longitude"][k], result["latitude"][k]]},
+            "properties": {
+                "metrics": _batch_point_metrics(result, k),
+                "predicted_impact": result["classification"][k],
+                "confidence": result["confidence"][k],
+                "class_probabilities": dict(zip(result["classes"], result["class_probabilities"][k]))
+            }
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _batch_arrays(result):
+    metrics = result["metrics"]
+
+    def by_category(values):
+        # Solo los tipos de evento presentes en algún punto
+        return {c: _json_floats(values[:, j]) for j, c in enumerate(result["categories"])
+                if not np.isnan(values[:, j]).all()}
+
+    return {
+        "latitude": result["latitude"],
+        "longitude": result["longitude"],
+        "metrics": {
+            "event_density": metrics["event_density"],
+            "event_frequency": by_category(metrics["event_frequency"]),
+            "event_intensity_profile": by_category(metrics["event_intensity_profile"]),
+            "energy_opportunity_score": metrics["energy_opportunity_score"],
+            "extreme_risk_index": metrics["extreme_risk_index"],
+            "event_duration_stats": {
+                "average_duration_hours": metrics["average_duration_hours"],
+                "std_dev_duration_hours": _json_floats(metrics["std_dev_duration_hours"])
+            },
+            "historical_pressure_min": metrics["historical_pressure_min"]
+        },
+        "predicted_impact": result["classification"],
+        "confidence": result["confidence"],
+        "class_probabilities": {label: result["class_probabilities"][:, j] for j, label in enumerate(result["classes"])}
+    }
+
+
+@climate_bp.route('/climate-analysis/batch', methods=['POST'])
+@cross_origin()
+def climate_analysis_batch():
+    """
+    Análisis climatológico de muchos puntos en una sola solicitud (mapas de riesgo).
+
+    Esperado en el body (JSON), 'points' o 'grid':
+    {
+        "points": [[lat, lon], ...] o [{"latitude": float, "longitude": float}, ...],
+        "grid": {"lat_min": float, "lat_max": float, "lon_min": float, "lon_max": float, "step": float},
+        "radius_km": float (opcional, default: 200),
+        "format": "arrays" | "geojson" (opcional, default: "arrays")
+    }
+
+    Retorna:
+    {
+        "success": bool,
+        "data": {
+            "count": int, "radius_km": float, "format": str,
+            "grid": {...} (si se pidió una malla; arrays en orden fila por latitud),
+            arrays: "latitude", "longitude", "metrics", "predicted_impact",
+                    "confidence", "class_probabilities" (un valor por punto)
+            geojson: "type": "FeatureCollection", "features" (un Point por punto)
+            "key_factors": list, "recommendations": {clase: str}
+        },
+        "error": str (si hay error)
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"success": False, "error": "No se proporcionaron datos en el request"}), 400
+
+        output_format = data.get('format', 'arrays')
+        if output_format not in ('arrays', 'geojson'):
+            return jsonify({"success": False, "error": "El formato debe ser 'arrays' o 'geojson'"}), 400
+        try:
+            radius_km = float(data.get('radius_km', 200))
+        except (ValueError, TypeError):
+            return jsonify({"success": False, "error": "El radio debe ser un número válido"}), 400
+        if not math.isfinite(radius_km) or radius_km <= 0:
+            return jsonify({"success": False, "error": "El radio debe ser un número positivo"}), 400
+
+        try:
+            latitudes, longitudes, grid = _parse_batch_points(data)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if not (np.all((-90 <= latitudes) & (latitudes <= 90)) and np.all((-180 <= longitudes) & (longitudes <= 180))):
+            return jsonify({"success": False,
+                            "error": "Las latitudes deben estar entre -90 y 90 y las longitudes entre -180 y 180"}), 400
+
+        try:
+            result = climate_module.analyze_points(latitudes, longitudes, radius_km)
+        except Exception as e:
+            return jsonify({"success": False, "error": f"Error durante el análisis: {str(e)}"}), 500
+
+        payload = {"count": len(latitudes), "radius_km": radius_km, "format": output_format}
+        if grid is not None:
+            payload["grid"] = grid
+        payload.update(_batch_geojson(result) if output_format == 'geojson' else _batch_arrays(result))
+        payload["key_factors"] = result["key_factors"]
+        payload["recommendations"] = result["recommendations"]
+        return jsonify(convert_numpy({"success": True, "data": payload})), 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Error interno del servidor: {str(e)}"
+        }), 500
+
 @climate_bp.route('/health', methods=['GET'])
 @cross_origin()
 def health_check():
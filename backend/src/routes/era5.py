@@ -1,16 +1,28 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+import json
 import logging
 import os
-from datetime import datetime, timedelta
-import numpy as np
+from datetime import datetime
 import pandas as pd
-import random
 import cdsapi
 import xarray as xr
-import tempfile
+import threading
 
 # Importar servicio MERRA-2
-from src.services.merra2_service import MERRA2Service
+from src.services.download_spool import NETCDF_IO_LOCK, release_download_target, spool_file_path
+from src.services.merra2_cache import get_merra2_cache
+from src.services.merra2_service import get_merra2_service
+from src.services.prefetch_scheduler import get_prefetch_scheduler
+from src.services.era5_cache import ERA5_GRID_STEP, ERA5_VARIABLES, get_era5_cache, normalize_era5_dataset
+from src.services.era5_request_planner import DEFAULT_HOURS, date_range, execute_plan, plan_era5_requests
+from src.services.reanalysis_processing import (
+    FRONTEND_VARIABLES, INTERPOLATION_METHODS, ClosingBlocks, FrontendBlockStream, FrontendPayloadBuilder, ResponseFormat,
+    build_frontend_payload, enclosing_cells, iter_file_blocks, iter_point_blocks, iter_time_blocks, payload_has_data,
+    time_chunk_size
+)
+from src.services.simulated_data import DEFAULT_GRID_SIZE, default_seed, generate_simulated_dataset
+from src.services.source_orchestrator import SourceCancelled, get_source_orchestrator
+from src.services.source_config import SourceRequestConfig
 
 # Configuración del logger
 logging.basicConfig(level=logging.INFO)
@@ -18,9 +30,35 @@ logger = logging.getLogger(__name__)
 
 era5_bp = Blueprint("era5", __name__)
 
+# Rango máximo de fechas de MERRA-2: descarga un archivo por día y no tiene el
+# planificador de solicitudes de ERA5, así que conserva el límite original
+MERRA2_MAX_RANGE_DAYS = 31
+
+
+def era5_max_range_days() -> int:
+    """Rango máximo de fechas (días) para ERA5, cuyas solicitudes reparte el planificador."""
+    return int(os.environ.get("ERA5_MAX_RANGE_DAYS", "3660"))
+
+
+def simulated_max_points() -> int:
+    """Máximo de puntos (pasos de tiempo x celdas) de /simulated_data (SIMULATED_MAX_POINTS)."""
+    return int(os.environ.get("SIMULATED_MAX_POINTS", "2000000"))
+
+
+def merra2_allowed(start_date: str, end_date: str) -> bool:
+    """Indica si el rango cabe en el límite de MERRA-2."""
+    days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days
+    return days <= MERRA2_MAX_RANGE_DAYS
+
 class ERA5Service:
-    def __init__(self):
-        self.test_mode = os.environ.get("TEST_MODE", "False").lower() == "true"
+    def __init__(self, config=None):
+        """
+        Args:
+            config: SourceRequestConfig por defecto del servicio; cada llamada puede
+                    recibir la suya propia, de modo que una instancia es compartible entre hilos
+        """
+        self.config = config or SourceRequestConfig.from_environment()
+        self.test_mode = self.config.test_mode
         logger.info(f"ERA5Service inicializado (test_mode={self.test_mode})")
 
     def safe_get(self, lst, index, default=None):
@@ -31,280 +69,587 @@ class ERA5Service:
         except (TypeError, IndexError):
             return default
 
-    def validate_parameters(self, data):
+    def validate_parameters(self, data, max_range_days=None):
         required_params = ['lat_min', 'lat_max', 'lon_min', 'lon_max', 'start_date', 'end_date']
         missing_params = [param for param in required_params if param not in data]
+        if missing_params:
+            raise ValueError(f'Parámetros faltantes: {missing_params}')
+        lat_min = float(data['lat_min'])
+        lat_max = float(data['lat_max'])
+        lon_min = float(data['lon_min'])
+        lon_max = float(data['lon_max'])
+
+        if lat_min >= lat_max or lon_min >= lon_max:
+            raise ValueError('Rangos geográficos inválidos')
+
+        start_date, end_date = self.validate_dates(data['start_date'], data['end_date'], max_range_days)
+        return lat_min, lat_max, lon_min, lon_max, start_date, end_date
+
+    def validate_point_parameters(self, data, max_range_days=None):
+        """
+        Valida una solicitud en modo punto: {"point": {"lat", "lon"}, "start_date",
+        "end_date", "interpolation"}.
+
+        Args:
+            data: Cuerpo JSON de la solicitud
+            max_range_days: Rango máximo de fechas aceptado (None: sin límite)
+
+        Returns:
+            Tuple: (lat, lon, start_date, end_date, método de interpolación)
+        """
+        point = data.get('point')
+        missing_params = [param for param in ['start_date', 'end_date'] if param not in data]
+        if not isinstance(point, dict) or 'lat' not in point or 'lon' not in point:
+            missing_params.insert(0, 'point.lat/point.lon')
         if missing_params:
             raise ValueError(f'Parámetros faltantes: {missing_params}')
         try:
-            lat_min = float(data['lat_min'])
-            lat_max = float(data['lat_max'])
-            lon_min = float(data['lon_min'])
-            lon_max = float(data['lon_max'])
-            start_date = data['start_date']
-            end_date = data['end_date']
+            lat = float(point['lat'])
+            lon = float(point['lon'])
+        except (TypeError, ValueError):
+            raise ValueError('point.lat y point.lon deben ser numéricos')
+        if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+            raise ValueError('Coordenadas del punto fuera de rango')
+
+        method = data.get('interpolation', 'bilinear')
+        if method not in INTERPOLATION_METHODS:
+            raise ValueError(f'Método de interpolación inválido. Use uno de {list(INTERPOLATION_METHODS)}')
 
-            if lat_min >= lat_max or lon_min >= lon_max:
-                raise ValueError('Rangos geográficos inválidos')
+        start_date, end_date = self.validate_dates(data['start_date'], data['end_date'], max_range_days)
+        return lat, lon, start_date, end_date, method
 
+    def validate_dates(self, start_date, end_date, max_range_days=None):
+        try:
             start_dt = datetime.strptime(start_date, '%Y-%m-%d')
             end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-            if start_dt > end_dt:
-                raise ValueError('Fecha de inicio debe ser anterior a fecha final')
-
-            if (end_dt - start_dt).days > 31:
-                raise ValueError('Rango de fechas muy amplio (máximo 31 días)')
-            return lat_min, lat_max, lon_min, lon_max, start_date, end_date
-        except ValueError as e:
-            if 'does not match format' in str(e):
-                raise ValueError('Formato de fecha inválido. Use YYYY-MM-DD')
+        except ValueError:
+            raise ValueError('Formato de fecha inválido. Use YYYY-MM-DD')
+        if start_dt > end_dt:
+            raise ValueError('Fecha de inicio debe ser anterior a fecha final')
+
+        if max_range_days is not None and (end_dt - start_dt).days > max_range_days:
+            raise ValueError(f'Rango de fechas muy amplio (máximo {max_range_days} días)')
+        return start_date, end_date
+
+    def parse_hours(self, data):
+        """
+        Horas UTC solicitadas: lista de enteros 0-23, "all" para resolución horaria,
+        o las cuatro horas sinópticas si no se indica nada.
+        """
+        hours = data.get('hours') if data else None
+        if hours is None:
+            return list(DEFAULT_HOURS)
+        if hours == 'all':
+            return list(range(24))
+        try:
+            parsed = sorted({int(h) for h in hours})
+        except (TypeError, ValueError):
+            raise ValueError('Parámetro hours inválido. Use una lista de horas 0-23 o "all"')
+        if not parsed or parsed[0] < 0 or parsed[-1] > 23:
+            raise ValueError('Parámetro hours inválido. Use una lista de horas 0-23 o "all"')
+        return parsed
+
+    def create_cds_client(self, config=None):
+        config = config or self.config
+        if not config.cds_url or not config.cds_key:
+            raise ValueError("Credenciales de CDS no configuradas")
+        return cdsapi.Client(url=config.cds_url, key=config.cds_key)
+
+    def retrieve_era5_file(self, chunk, area, variables, config=None):
+        """
+        Envía una solicitud mensual a CDS y descarga el NetCDF resultante en un archivo temporal.
+        Cada llamada usa su propio cliente para poder ejecutarse en paralelo. Si el tamaño
+        anunciado cabe en REANALYSIS_SPOOL_MAX_MB el temporal va al tmpfs (spool_file_path),
+        de modo que la descarga no pasa por el disco del contenedor.
+
+        Args:
+            chunk: Solicitud mensual (CDSRequestChunk)
+            area: Área [N, W, S, E]
+            variables: Nombres cortos de variables ERA5 (u10, v10, ...)
+            config: SourceRequestConfig de la solicitud
+
+        Returns:
+            str: Ruta del archivo descargado (el llamador debe eliminarlo)
+        """
+        logger.info(f"Descargando datos para el área: {area}, mes: {chunk}")
+        result = self.create_cds_client(config).retrieve(
+            "reanalysis-era5-single-levels",
+            chunk.to_request([ERA5_VARIABLES[v] for v in variables], area)
+        )
+        dataset_path = spool_file_path(getattr(result, 'content_length', None), suffix=".nc")
+        try:
+            result.download(dataset_path)
+        except Exception:
+            self._remove_file(dataset_path)
             raise
+        return dataset_path
+
+    def _remove_file(self, path):
+        # Libera también el espacio reservado en el tmpfs por spool_file_path
+        release_download_target(path)
+
+    def open_era5_blocks(self, lat_min, lat_max, lon_min, lon_max, dates, hours, cancel_event=None,
+                         config=None, max_workers=None, final_before=None):
+        """
+        Obtiene los datos ERA5 del área y periodo, sirviendo desde la caché local
+        de tiles y pidiendo a CDS solo los tiles/días que faltan, en solicitudes
+        mensuales concurrentes (como mucho max_workers; por defecto ERA5_MAX_CONCURRENT_REQUESTS).
+        Con final_before se vuelven a pedir también los días ERA5T cacheados hasta esa fecha.
+        Las entradas de la ventana quedan fijadas en la caché hasta que se agota o se cierra
+        el iterador; si no caben a la vez en la cuota, se sirven las descargas sin caché.
+
+        Returns:
+            Iterator[xr.Dataset]: Bloques temporales consecutivos (time, latitude, longitude)
+            con las variables ERA5; se leen de disco a medida que se consumen
+        """
+        variables = list(ERA5_VARIABLES.keys())
+        cache = get_era5_cache()
+        days = [d.date() if isinstance(d, datetime) else d for d in dates]
+
+        if cache is not None:
+            window = cache.cell_window(lat_min, lat_max, lon_min, lon_max)
+            if not cache.fits(window, days, variables, hours):
+                logger.info(f"📦 Caché ERA5: la ventana ({len(days)} días) no cabe en la cuota; "
+                            f"se sirve desde las descargas sin cachear")
+                cache = None
+
+        if cache is None:
+            area = [lat_max, lon_min, lat_min, lon_max]
+            downloaded = {}
 
-    def get_real_wind_data(self, lat_min, lat_max, lon_min, lon_max, start_date, end_date):
-        try:
-            cds_url = os.environ.get("CDSAPI_URL")
-            cds_key = os.environ.get("CDSAPI_KEY")
-            if not cds_url or not cds_key:
-                raise ValueError("Credenciales de CDS no configuradas")
+            def collect(chunk, path):
+                downloaded[(chunk.year, chunk.month)] = path
 
-            c = cdsapi.Client(url=cds_url, key=cds_key)
-            area = [lat_max, lon_min, lat_min, lon_max]
-            
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-            dates = [start_dt + timedelta(days=x) for x in range((end_dt - start_dt).days + 1)]
-            years = sorted(list(set([d.strftime('%Y') for d in dates])))
-            months = sorted(list(set([d.strftime('%m') for d in dates])))
-            days = sorted(list(set([d.strftime('%d') for d in dates])))
-            variables = [
-                "10m_u_component_of_wind", "10m_v_component_of_wind",
-                "100m_u_component_of_wind", "100m_v_component_of_wind",
-                "2m_temperature", "surface_pressure"
-            ]
-
-            with tempfile.NamedTemporaryFile(suffix=".nc", delete=False) as tmp_file:
-                dataset_path = tmp_file.name
-
-            logger.info(f"Descargando datos para el área: {area}, Años: {years}, Meses: {months}, Días: {days}")
-            
-            c.retrieve(
-                "reanalysis-era5-single-levels",
-                {
-                    "product_type": "reanalysis",
-                    "variable": variables,
-                    "year": years,
-                    "month": months,
-                    "day": days,
-                    "time": ["00:00", "06:00", "12:00", "18:00"],
-                    "format": "netcdf",
-                    "area": area
-                },
-                dataset_path
-            )
-
-            ds = xr.open_dataset(dataset_path)
-            logger.info(f"Datos descargados y abiertos: {ds.variables.keys()}")
-            data_for_frontend = {}
-            timestamps = [pd.Timestamp(t).isoformat() for t in ds.time.values]
-            data_for_frontend['timestamps'] = timestamps
-
-            if "u10" in ds and "v10" in ds:
-                wind_speed_10m = np.sqrt(ds["u10"]**2 + ds["v10"]**2)
-                wind_direction_10m = (180 / np.pi) * np.arctan2(ds["u10"], ds["v10"])
-                wind_direction_10m = (wind_direction_10m + 360) % 360
-                data_for_frontend['wind_speed_10m'] = wind_speed_10m.values.flatten().tolist()
-                data_for_frontend['wind_direction_10m'] = wind_direction_10m.values.flatten().tolist()
-            else:
-                logger.warning("Variables u10 o v10 no encontradas.")
-                data_for_frontend['wind_speed_10m'] = []
-                data_for_frontend['wind_direction_10m'] = []
-
-            if "u100" in ds and "v100" in ds:
-                wind_speed_100m = np.sqrt(ds["u100"]**2 + ds["v100"]**2)
-                wind_direction_100m = (180 / np.pi) * np.arctan2(ds["u100"], ds["v100"])
-                wind_direction_100m = (wind_direction_100m + 360) % 360
-                data_for_frontend['wind_speed_100m'] = wind_speed_100m.values.flatten().tolist()
-                data_for_frontend['wind_direction_100m'] = wind_direction_100m.values.flatten().tolist()
-            else:
-                logger.warning("Variables u100 o v100 no encontradas.")
-                data_for_frontend['wind_speed_100m'] = []
-                data_for_frontend['wind_direction_100m'] = []
+            execute_plan(plan_era5_requests(dates, hours),
+                         lambda chunk: self.retrieve_era5_file(chunk, area, variables, config),
+                         collect, discard=self._remove_file, max_workers=max_workers, cancel_event=cancel_event)
+            return self._iter_downloaded_blocks([downloaded[k] for k in sorted(downloaded)])
 
-            if "t2m" in ds:
-                temperature_2m_celsius = ds["t2m"] - 273.15 
-                data_for_frontend['temperature_2m'] = temperature_2m_celsius.values.flatten().tolist()
+        lease = cache.lease()
+        try:
+            missing = cache.find_missing(window, days, variables, hours, final_before, lease)
+
+            if missing:
+                missing_days = sorted({m[1] for m in missing})
+                missing_tiles = sorted({m[2] for m in missing})
+                missing_vars = [v for v in variables if v in {m[0] for m in missing}]
+                area = cache.tiles_area(missing_tiles)
+                logger.info(f"📦 Caché ERA5: faltan {len(missing)} entradas "
+                            f"({len(missing_days)} días, {len(missing_tiles)} tiles)")
+
+                def store(chunk, path):
+                    try:
+                        # Solo la lectura va con el candado: store_dataset lo toma por entrada,
+                        # y otras solicitudes leen entre escrituras de tiles
+                        with NETCDF_IO_LOCK, xr.open_dataset(path) as opened:
+                            fetched = opened.load()
+                        stored = cache.store_dataset(fetched, lease)
+                        logger.info(f"📦 Caché ERA5: {stored} entradas almacenadas ({chunk})")
+                    finally:
+                        self._remove_file(path)
+
+                execute_plan(plan_era5_requests(missing_days, hours),
+                             lambda chunk: self.retrieve_era5_file(chunk, area, missing_vars, config),
+                             store, discard=self._remove_file, max_workers=max_workers, cancel_event=cancel_event)
             else:
-                logger.warning("Variable t2m no encontrada.")
-                data_for_frontend['temperature_2m'] = []
+                logger.info("📦 Caché ERA5: solicitud servida completamente desde caché")
+        except BaseException:
+            lease.release()
+            raise
 
-            if "sp" in ds:
-                surface_pressure_hpa = ds["sp"] / 100.0
-                data_for_frontend['surface_pressure'] = surface_pressure_hpa.values.flatten().tolist()
-            else:
-                logger.warning("Variable sp no encontrada.")
-                data_for_frontend['surface_pressure'] = []
-            
-            wind_df = pd.DataFrame({
-                "timestamp": pd.to_datetime(timestamps),
-                "speed": data_for_frontend["wind_speed_10m"],
-                "direction": data_for_frontend["wind_direction_10m"]
-                })
-            bins = np.arange(0, 361, 30)
-            labels = [f"{i}-{i+30}" for i in bins[:-1]]
-            wind_df["dir_bin"] = pd.cut(wind_df["direction"], bins=bins, labels=labels, right=False)
-            data_for_frontend["wind_rose_data"] = wind_df.groupby("dir_bin")["speed"].count().reindex(labels, fill_value=0).to_dict()
-
-            wind_df["hour"] = wind_df["timestamp"].dt.hour
-            data_for_frontend["hourly_patterns"] = wind_df.groupby("hour")["speed"].mean().round(2).to_dict()
-
-            wind_df["date"] = wind_df["timestamp"].dt.date
-            daily_avg = wind_df.groupby("date")["speed"].mean().round(2)
-            data_for_frontend["time_series"] = {date.isoformat(): val for date, val in daily_avg.items()}
+        days_per_block = max(1, time_chunk_size() // len(hours))
+        return cache.iter_load(window, days, variables, hours, days_per_block, lease)
+
+    def missing_era5_days(self, lat_min, lat_max, lon_min, lon_max, dates, hours, final_before=None):
+        """
+        Días del área a los que les falta en la caché de tiles alguna variable u hora,
+        o que siguen en ERA5T pese a ser anteriores a final_before.
+
+        Raises:
+            ValueError: Si la caché ERA5 está desactivada
+        """
+        cache = get_era5_cache()
+        if cache is None:
+            raise ValueError("Caché ERA5 desactivada")
+        window = cache.cell_window(lat_min, lat_max, lon_min, lon_max)
+        days = [d.date() if isinstance(d, datetime) else d for d in dates]
+        return sorted({m[1] for m in cache.find_missing(window, days, list(ERA5_VARIABLES), hours, final_before)})
+
+    def preliminary_era5_days(self, lat_min, lat_max, lon_min, lon_max, final_before):
+        """
+        Días hasta final_before que la caché de tiles del área guarda como ERA5T.
+
+        Raises:
+            ValueError: Si la caché ERA5 está desactivada
+        """
+        cache = get_era5_cache()
+        if cache is None:
+            raise ValueError("Caché ERA5 desactivada")
+        return sorted(cache.preliminary_days(cache.cell_window(lat_min, lat_max, lon_min, lon_max), final_before))
+
+    def warm_era5_cache(self, lat_min, lat_max, lon_min, lon_max, dates, hours, cancel_event=None, config=None,
+                        final_before=None):
+        """
+        Descarga a la caché de tiles los días del área que falten, con una sola
+        solicitud CDS a la vez y sin leer los datos (precarga en segundo plano). Los
+        agregados diarios de la pirámide se guardan al almacenar los tiles. Con
+        final_before también se reemplazan los días ERA5T hasta esa fecha.
+
+        Returns:
+            int: Días que faltaban y se pidieron a CDS
+        """
+        config = config or self.config
+        if not config.cds_url or not config.cds_key:
+            raise ValueError("Credenciales de CDS no configuradas")
+        missing = self.missing_era5_days(lat_min, lat_max, lon_min, lon_max, dates, hours, final_before)
+        if missing:
+            blocks = self.open_era5_blocks(lat_min, lat_max, lon_min, lon_max, missing, hours, cancel_event,
+                                           config, max_workers=1, final_before=final_before)
+            blocks.close()
+        return len(missing)
+
+    def _iter_downloaded_blocks(self, paths):
+        """Recorre por bloques los NetCDF mensuales descargados y los elimina al agotarse o cerrarse."""
+        def remove_files():
+            for path in paths:
+                self._remove_file(path)
+
+        return ClosingBlocks(iter_file_blocks(paths, preprocess=normalize_era5_dataset), remove_files)
+
+    def get_real_wind_data(self, lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours=None,
+                           cancel_event=None, config=None, response_format=None):
+        try:
+            config = config or self.config
+            if not config.cds_url or not config.cds_key:
+                raise ValueError("Credenciales de CDS no configuradas")
 
+            hours = hours if hours is not None else list(DEFAULT_HOURS)
+            dates = date_range(start_date, end_date)
+
+            blocks = self.open_era5_blocks(lat_min, lat_max, lon_min, lon_max, dates, hours, cancel_event, config)
+            try:
+                summaries = self.pyramid_summaries(lat_min, lat_max, lon_min, lon_max, dates, hours)
+                skip_values = (summaries is not None and response_format is not None
+                               and not response_format.include_values)
+                # Con skip_values solo hacen falta agregados y la pirámide los tiene: no se leen los datos horarios
+                builder = build_frontend_payload(iter(()) if skip_values else blocks, 'era5', response_format,
+                                                 summaries=summaries)
+            finally:
+                # Suelta las entradas fijadas de la caché y los archivos descargados
+                blocks.close()
+            data_for_frontend = builder.build(response_format)
+            logger.info(f"Datos ERA5 procesados: {sorted(builder.present)} "
+                        f"(resúmenes {'desde la pirámide' if summaries is not None else 'por recorrido'})")
+
+            n_times, n_lat, n_lon = len(builder.timestamps), builder.n_lat, builder.n_lon
+            if skip_values:
+                i0, i1, j0, j1 = get_era5_cache().cell_window(lat_min, lat_max, lon_min, lon_max)
+                n_times, n_lat, n_lon = len(dates) * len(hours), i1 - i0 + 1, j1 - j0 + 1
             data_for_frontend['metadata'] = {
-                'total_points': len(timestamps) * ds.latitude.size * ds.longitude.size,
-                'spatial_resolution': f'{ds.latitude.size} lat x {ds.longitude.size} lon puntos',
-                'temporal_resolution': f'{len(timestamps)} timesteps',
+                'total_points': n_times * n_lat * n_lon,
+                'spatial_resolution': f'{n_lat} lat x {n_lon} lon puntos',
+                'temporal_resolution': f'{n_times} timesteps',
+                'summary_source': 'pyramid' if summaries is not None else 'scan',
                 'area': f'lat:[{lat_min},{lat_max}] lon:[{lon_min},{lon_max}]',
                 'period': f'{start_date} to {end_date}',
-                'test_mode': False,
+                'test_mode': config.test_mode,
                 'region': 'Caribe Colombiano (ERA5)',
                 'generated_at': datetime.now().isoformat(),
                 'version': 'era5-v1.0'
             }
 
-            try:
-                os.remove(dataset_path)
-            except OSError as e:
-                logger.warning(f"No se pudo eliminar el archivo temporal: {e}")
             return data_for_frontend
 
+        except SourceCancelled:
+            logger.info("ERA5 cancelado: otra fuente respondió antes")
+            raise
         except Exception as e:
             logger.error(f"Fallo descarga/procesamiento datos reales: {e}")
             # No generar datos simulados aquí, lanzar excepción para activar fallback
             raise Exception(f"ERA5 falló: {e}")
 
-    def generate_simulated_data_for_frontend(self, lat_min, lat_max, lon_min, lon_max, start_date, end_date):
-        logger.info("🔄 Generando datos simulados compatibles con frontend")
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
-        days_count = (end - start).days + 1
-
-        num_lat_points = 5
-        num_lon_points = 5
-        spatial_points = num_lat_points * num_lon_points
-        temporal_points = days_count * 4
-        total_points = spatial_points * temporal_points
-
-        timestamps = []
-        current_dt = start
-        for _ in range(days_count):
-            for hour in [0, 6, 12, 18]:
-                timestamps.append((current_dt + timedelta(hours=hour)).isoformat())
-            current_dt += timedelta(days=1)
-
-        flat_total_points = len(timestamps) * spatial_points
-
-        wind_speed_10m = []
-        wind_speed_100m = []
-        wind_direction_10m = []
-        wind_direction_100m = []
-        surface_pressure = []
-        temperature_2m = []
-
-        base_wind_10 = 6.5
-        base_wind_100 = 8.2
-        base_pressure = 1013
-        base_temp = 28
-
-        for i in range(flat_total_points):
-            time_factor = 0.8 + 0.4 * np.sin(2 * np.pi * ((i // spatial_points) % 4) / 4)
-            random_factor = 0.7 + 0.6 * random.random()
-            seasonal_factor = 0.9 + 0.2 * np.sin(2 * np.pi * ((i // spatial_points) % (365*4)) / (365*4))
-
-            wind_10 = base_wind_10 * time_factor * random_factor * seasonal_factor
-            wind_speed_10m.append(round(max(1.0, min(12.0, wind_10)), 2))
-            wind_100 = wind_10 * 1.27
-            wind_speed_100m.append(round(max(1.5, min(15.0, wind_100)), 2))
-
-            wind_direction_10m.append(round(random.uniform(0, 360), 1))
-            wind_direction_100m.append(round(random.uniform(0, 360), 1))
-
-            pressure_var = 5 * np.sin(2 * np.pi * ((i // spatial_points) % 4) / 4) + 3 * (random.random() - 0.5)
-            pressure = base_pressure + pressure_var
-            surface_pressure.append(round(max(1000, min(1025, pressure)), 1))
-
-            temp_var = 4 * np.sin(2 * np.pi * ((i // spatial_points) % 4) / 4 - np.pi/4) + 2 * (random.random() - 0.5)
-            temp = base_temp + temp_var * seasonal_factor
-            temperature_2m.append(round(max(20, min(35, temp)), 1))
-
-        replicated_timestamps = []
-        for ts in timestamps:
-            replicated_timestamps.extend([ts] * spatial_points)
-        # 🧠 Análisis adicionales esperados por el frontend
-        assert len(replicated_timestamps) == len(wind_direction_10m) == len(wind_speed_10m), "❌ Error: listas desalineadas"
-        sim_df = pd.DataFrame({
-            "timestamp": pd.to_datetime(replicated_timestamps),
-            "speed": wind_speed_10m,
-            "direction": wind_direction_10m
-            })
-        sim_df.dropna(subset=["timestamp", "speed", "direction"], inplace=True)
-        sim_df = sim_df[np.isfinite(sim_df["speed"]) & np.isfinite(sim_df["direction"])]
-        
-        bins = np.arange(0, 361, 30)
-        labels = [f"{i}-{i+30}" for i in bins[:-1]]
-        sim_df["dir_bin"] = pd.cut(sim_df["direction"], bins=bins, labels=labels, right=False, include_lowest=True)
-        wind_rose_data = {
-            str(k): int(v)
-            for k, v in sim_df.groupby("dir_bin")["speed"]
-            .count()
-            .reindex(labels, fill_value=0)
-            .to_dict()
-            .items()
-            }
+    def pyramid_summaries(self, lat_min, lat_max, lon_min, lon_max, dates, hours):
+        """
+        Resúmenes del área y periodo desde la pirámide temporal de la caché ERA5.
+
+        Returns:
+            Dict: Resúmenes, o None si la caché está desactivada o le falta algún día
+        """
+        cache = get_era5_cache()
+        if cache is None:
+            return None
+        days = [d.date() if isinstance(d, datetime) else d for d in dates]
+        try:
+            return cache.summarize(cache.cell_window(lat_min, lat_max, lon_min, lon_max), days, hours)
+        except Exception as e:
+            logger.warning(f"⚠️ Pirámide ERA5 no disponible, se recorren los datos: {e}")
+            return None
+
+    def get_point_wind_data(self, lat, lon, start_date, end_date, hours=None, method='bilinear',
+                            cancel_event=None, config=None, response_format=None):
+        """
+        Serie temporal ERA5 en un punto: solo se piden (a la caché o a CDS) los
+        2x2 nodos de la malla de 0.25° que lo encierran, y se interpolan todos los
+        pasos de tiempo a la vez. El coste no depende del tamaño del bbox dibujado.
+
+        Returns:
+            Dict: Payload del frontend con una sola celda (n_lat = n_lon = 1)
+        """
+        try:
+            config = config or self.config
+            if not config.cds_url or not config.cds_key:
+                raise ValueError("Credenciales de CDS no configuradas")
 
-        sim_df["hour"] = sim_df["timestamp"].dt.hour
-        hourly_patterns = sim_df.groupby("hour")["speed"].mean().round(2).to_dict()
-
-        sim_df["date"] = sim_df["timestamp"].dt.date
-        daily_avg = sim_df.groupby("date")["speed"].mean().round(2)
-        time_series = {date.isoformat(): val for date, val in daily_avg.items()}
-
-        assert all(isinstance(v, int) and not pd.isna(v) for v in wind_rose_data.values()), "❌ Error: valores inválidos en rosa de vientos"
-
-        simulated_data = {
-            'wind_speed_10m': wind_speed_10m,
-            'wind_speed_100m': wind_speed_100m,
-            'wind_direction_10m': wind_direction_10m,
-            'wind_direction_100m': wind_direction_100m,
-            'surface_pressure': surface_pressure,
-            'temperature_2m': temperature_2m,
-            'timestamps': replicated_timestamps,
-            'wind_rose_data': wind_rose_data,
-            'hourly_patterns': hourly_patterns,
-            'time_series': time_series,
-            'metadata': {
-                'total_points': flat_total_points,
-                'spatial_resolution': f'{spatial_points} puntos simulados',
-                'temporal_resolution': f'{len(timestamps)} timesteps simulados',
-                'area': f'lat:[{lat_min},{lat_max}] lon:[{lon_min},{lon_max}]',
+            hours = hours if hours is not None else list(DEFAULT_HOURS)
+            dates = date_range(start_date, end_date)
+            lat0, lat1 = enclosing_cells(lat, ERA5_GRID_STEP)
+            lon0, lon1 = enclosing_cells(lon, ERA5_GRID_STEP)
+
+            blocks = self.open_era5_blocks(lat0, lat1, lon0, lon1, dates, hours, cancel_event, config)
+            try:
+                builder = build_frontend_payload(iter_point_blocks(blocks, lat, lon, method), 'era5', response_format)
+            finally:
+                blocks.close()
+            data_for_frontend = builder.build(response_format)
+            logger.info(f"Serie ERA5 interpolada ({method}) en ({lat}, {lon}): {len(builder.timestamps)} timesteps")
+
+            data_for_frontend['metadata'] = {
+                'total_points': builder.total_points,
+                'spatial_resolution': '1 punto interpolado',
+                'temporal_resolution': f'{len(builder.timestamps)} timesteps',
+                'point': {'lat': lat, 'lon': lon},
+                'interpolation': method,
+                'grid_cells': {'lat': [lat0, lat1], 'lon': [lon0, lon1]},
                 'period': f'{start_date} to {end_date}',
-                'test_mode': True,
-                'region': 'Caribe Colombiano (Simulado)',
+                'test_mode': config.test_mode,
+                'region': 'Caribe Colombiano (ERA5)',
                 'generated_at': datetime.now().isoformat(),
-                'version': 'simulated-v1.0'
+                'version': 'era5-v1.0'
             }
+            return data_for_frontend
+
+        except SourceCancelled:
+            logger.info("ERA5 cancelado: otra fuente respondió antes")
+            raise
+        except Exception as e:
+            logger.error(f"Fallo descarga/procesamiento de la serie puntual: {e}")
+            raise Exception(f"ERA5 falló: {e}")
+
+    def open_real_wind_stream(self, lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours=None,
+                              cancel_event=None, config=None):
+        """
+        Como get_real_wind_data, pero devuelve los campos derivados por bloques
+        temporales para emitirlos en streaming sin construir la respuesta completa.
+
+        Returns:
+            FrontendBlockStream: Bloques derivados con metadatos de la fuente
+        """
+        config = config or self.config
+        try:
+            hours = hours if hours is not None else list(DEFAULT_HOURS)
+            dates = date_range(start_date, end_date)
+            blocks = self.open_era5_blocks(lat_min, lat_max, lon_min, lon_max, dates, hours, cancel_event, config)
+            return FrontendBlockStream(blocks, 'era5', metadata={
+                'area': f'lat:[{lat_min},{lat_max}] lon:[{lon_min},{lon_max}]',
+                'period': f'{start_date} to {end_date}',
+                'test_mode': config.test_mode,
+                'region': 'Caribe Colombiano (ERA5)',
+                'version': 'era5-v1.0'
+            })
+        except SourceCancelled:
+            logger.info("ERA5 cancelado: otra fuente respondió antes")
+            raise
+        except Exception as e:
+            logger.error(f"Fallo descarga/procesamiento datos reales: {e}")
+            raise Exception(f"ERA5 falló: {e}")
+
+    def generate_simulated_dataset(self, lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours=None,
+                                   n_lat=DEFAULT_GRID_SIZE, n_lon=DEFAULT_GRID_SIZE, seed=None):
+        """Dataset simulado (time, latitude, longitude); seed None usa SIMULATED_DATA_SEED."""
+        seed = seed if seed is not None else default_seed()
+        return generate_simulated_dataset(lat_min, lat_max, lon_min, lon_max, start_date, end_date,
+                                          hours=hours, n_lat=n_lat, n_lon=n_lon, seed=seed)
+
+    def _simulated_metadata(self, ds, lat_min, lat_max, lon_min, lon_max, start_date, end_date):
+        return {
+            'spatial_resolution': f"{ds.sizes['latitude'] * ds.sizes['longitude']} puntos simulados",
+            'area': f'lat:[{lat_min},{lat_max}] lon:[{lon_min},{lon_max}]',
+            'period': f'{start_date} to {end_date}',
+            'test_mode': True,
+            'region': 'Caribe Colombiano (Simulado)',
+            'seed': ds.attrs.get('seed'),
+            'version': 'simulated-v2.0'
         }
+
+    def generate_simulated_data_for_frontend(self, lat_min, lat_max, lon_min, lon_max, start_date, end_date,
+                                             hours=None, n_lat=DEFAULT_GRID_SIZE, n_lon=DEFAULT_GRID_SIZE,
+                                             seed=None, response_format=None):
+        logger.info("🔄 Generando datos simulados compatibles con frontend")
+        ds = self.generate_simulated_dataset(lat_min, lat_max, lon_min, lon_max, start_date, end_date,
+                                             hours, n_lat, n_lon, seed)
+
+        builder = build_frontend_payload(iter_time_blocks(ds), 'simulated', response_format)
+        simulated_data = builder.build(response_format)
+        simulated_data['metadata'] = self._simulated_metadata(ds, lat_min, lat_max, lon_min, lon_max,
+                                                              start_date, end_date)
+        simulated_data['metadata'].update({
+            'total_points': builder.total_points,
+            'temporal_resolution': f'{len(builder.timestamps)} timesteps simulados',
+            'generated_at': datetime.now().isoformat()
+        })
         logger.info("Datos simulados generados.")
         return simulated_data
 
-    def generate_frontend_compatible_data(self, lat_min, lat_max, lon_min, lon_max, start_date, end_date):
-        if self.test_mode:
+    def open_simulated_stream(self, lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours=None,
+                              n_lat=DEFAULT_GRID_SIZE, n_lon=DEFAULT_GRID_SIZE, seed=None):
+        """Datos simulados por bloques temporales para el modo streaming."""
+        ds = self.generate_simulated_dataset(lat_min, lat_max, lon_min, lon_max, start_date, end_date,
+                                             hours, n_lat, n_lon, seed)
+        return FrontendBlockStream(iter_time_blocks(ds), 'simulated', metadata=self._simulated_metadata(
+            ds, lat_min, lat_max, lon_min, lon_max, start_date, end_date))
+
+    def generate_frontend_compatible_data(self, lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours=None,
+                                          config=None, response_format=None):
+        config = config or self.config
+        if config.test_mode:
             logger.info("🔧 Modo de prueba activo: Generando datos simulados")
-            return self.generate_simulated_data_for_frontend(lat_min, lat_max, lon_min, lon_max, start_date, end_date)
+            return self.generate_simulated_data_for_frontend(lat_min, lat_max, lon_min, lon_max, start_date, end_date,
+                                                             hours, response_format=response_format)
         else:
             logger.info("🌍 Modo real: Intentando obtener datos reales ERA5")
-            return self.get_real_wind_data(lat_min, lat_max, lon_min, lon_max, start_date, end_date)
+            return self.get_real_wind_data(lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours,
+                                           config=config, response_format=response_format)
+
+
+_era5_service = None
+_era5_service_lock = threading.Lock()
+
+
+def get_era5_service():
+    """Instancia compartida de ERA5Service (sin estado por solicitud, segura entre hilos)."""
+    global _era5_service
+    with _era5_service_lock:
+        if _era5_service is None:
+            _era5_service = ERA5Service()
+        return _era5_service
+
+def _ndjson(record):
+    return json.dumps(record) + "\n"
+
+
+def stream_wind_data(lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours):
+    """
+    Modo streaming de /wind-data (NDJSON): una línea de cabecera con metadatos,
+    una línea por bloque temporal con sus valores y una línea final con los
+    agregados. Los bloques se emiten a medida que se leen del dataset, así que
+    la memoria del servidor no depende del tamaño de la respuesta.
+    """
+    real_config = SourceRequestConfig.from_environment(test_mode=False)
+
+    def fetch_era5(cancel_event):
+        return get_era5_service().open_real_wind_stream(
+            lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours,
+            cancel_event=cancel_event, config=real_config)
+
+    def fetch_merra2(cancel_event):
+        return get_merra2_service().open_merra2_stream(
+            lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours,
+            cancel_event=cancel_event, config=real_config)
+
+    # Más allá de MERRA2_MAX_RANGE_DAYS no se consulta MERRA-2; los datos simulados siguen de fallback
+    sources = [('era5', fetch_era5)]
+    if merra2_allowed(start_date, end_date):
+        sources.append(('merra2', fetch_merra2))
+
+    logger.info("🌍 PASO 1-2 (streaming): Abriendo ERA5 / MERRA-2 (hedging)...")
+    # Los streams no elegidos (vacíos, perdedores o tardíos) se cierran: tienen datasets
+    # abiertos y descargas temporales
+    orchestration = get_source_orchestrator().run(
+        sources,
+        is_valid=lambda stream: bool(stream),
+        discard=lambda stream: stream.close()
+    )
+    source_latencies = dict(orchestration.latencies)
+    fallback_reason = " | ".join(
+        f"{name.upper()} error: {error}" for name, error in orchestration.errors.items()) or None
+
+    stream = orchestration.data
+    data_source_used = orchestration.source
+    if stream is None:
+        logger.info("🔄 PASO 3 (streaming): Generando datos simulados (fallback final)...")
+        simulated_started = datetime.now()
+        stream = get_era5_service().open_simulated_stream(
+            lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours
+        )
+        data_source_used = 'simulated'
+        source_latencies['simulated'] = {
+            'status': 'success', 'seconds': round((datetime.now() - simulated_started).total_seconds(), 3)}
+        stream.metadata['region'] = 'Caribe Colombiano (Simulado - Fallback)'
+        stream.metadata['fallback_reason'] = fallback_reason
+
+    metadata = dict(stream.metadata)
+    metadata['generated_at'] = datetime.now().isoformat()
+    metadata['source_latencies'] = source_latencies
+
+    header = {
+        'type': 'header',
+        'status': 'success',
+        'message': f'Datos obtenidos exitosamente desde {data_source_used.upper()}',
+        'data_source': data_source_used,
+        'variables': FRONTEND_VARIABLES,
+        'metadata': metadata
+    }
+    if data_source_used != 'era5':
+        header['fallback_info'] = {
+            'attempted_sources': orchestration.attempted_sources,
+            'fallback_reason': fallback_reason,
+            'final_source': data_source_used
+        }
+
+    def generate():
+        yield _ndjson(header)
+
+        builder = FrontendPayloadBuilder(keep_values=False)
+        try:
+            for index, fields in enumerate(stream):
+                builder.add(fields)
+                chunk = {
+                    'type': 'chunk',
+                    'index': index,
+                    'timestamps': [pd.Timestamp(t).isoformat() for t in fields.time.values],
+                    'shape': [fields.sizes['time'], builder.n_lat, builder.n_lon]
+                }
+                for var in FRONTEND_VARIABLES:
+                    if var in fields:
+                        chunk[var] = fields[var].values.ravel().tolist()
+                yield _ndjson(chunk)
+
+            summary = {'type': 'summary'}
+            summary.update(builder.summaries())
+            summary['metadata'] = {
+                'total_points': builder.total_points,
+                'spatial_resolution': f'{builder.n_lat} lat x {builder.n_lon} lon puntos',
+                'temporal_resolution': f'{len(builder.timestamps)} timesteps'
+            }
+            yield _ndjson(summary)
+            logger.info(f"✅ Streaming {data_source_used.upper()} completado: {builder.total_points} puntos")
+        except Exception as e:
+            # La cabecera ya se envió: el error se notifica como última línea
+            logger.exception("💥 Error durante el streaming de /wind-data")
+            yield _ndjson({
+                'type': 'error',
+                'error': 'Error procesando los datos',
+                'details': str(e),
+                'technical_error': type(e).__name__
+            })
+        finally:
+            stream.close()
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    # Si el cliente se va antes de leer el cuerpo, generate() no llega a ejecutarse
+    response.call_on_close(stream.close)
+    return response
+
 
 @era5_bp.route('/wind-data', methods=['POST'])
 def get_wind_data():
@@ -327,10 +672,22 @@ def get_wind_data():
                 }
             }), 400
 
+        # Modo punto: {"point": {"lat", "lon"}, "interpolation": "bilinear"|"nearest"|"idw"}
+        point_mode = data.get('point') is not None
+
         try:
             # Validar parámetros usando ERA5Service (validación común)
-            era5_service = ERA5Service()
-            lat_min, lat_max, lon_min, lon_max, start_date, end_date = era5_service.validate_parameters(data)
+            era5_service = get_era5_service()
+            if point_mode:
+                lat, lon, start_date, end_date, method = era5_service.validate_point_parameters(
+                    data, era5_max_range_days())
+                lat_min = lat_max = lat
+                lon_min = lon_max = lon
+            else:
+                lat_min, lat_max, lon_min, lon_max, start_date, end_date = era5_service.validate_parameters(
+                    data, era5_max_range_days())
+            hours = era5_service.parse_hours(data)
+            response_format = ResponseFormat.from_request(data)
             logger.info(f"📍 Parámetros validados: lat=[{lat_min:.2f},{lat_max:.2f}], lon=[{lon_min:.2f},{lon_max:.2f}], fechas=[{start_date} a {end_date}]")
         except ValueError as ve:
             logger.warning(f"❌ Error en validación de parámetros: {ve}")
@@ -341,72 +698,87 @@ def get_wind_data():
                 'received_data': data
             }), 400
 
-        # Implementar lógica de fallback: ERA5 -> MERRA-2 -> Simulado
+        # Modo streaming (NDJSON): {"stream": true} o Accept: application/x-ndjson.
+        # Una serie puntual es pequeña: en modo punto siempre se responde en JSON
+        if not point_mode and (data.get('stream') or request.accept_mimetypes.best == 'application/x-ndjson'):
+            logger.info("📡 Modo streaming NDJSON solicitado")
+            return stream_wind_data(lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours)
+
+        # Implementar lógica de fallback: ERA5 || MERRA-2 (especulativo) -> Simulado
         wind_data = None
         data_source_used = None
         fallback_reason = None
 
-        # PASO 1: Intentar ERA5
-        logger.info("🌍 PASO 1: Intentando obtener datos de ERA5...")
-        try:
-            # Forzar modo real para ERA5 (desactivar TEST_MODE temporalmente)
-            original_test_mode = os.environ.get("TEST_MODE", "False")
-            os.environ["TEST_MODE"] = "False"
-            
-            era5_service_real = ERA5Service()
-            wind_data = era5_service_real.get_real_wind_data(lat_min, lat_max, lon_min, lon_max, start_date, end_date)
-            
-            # Restaurar TEST_MODE original
-            os.environ["TEST_MODE"] = original_test_mode
-            
-            if wind_data and len(wind_data.get('wind_speed_10m', [])) > 0:
-                data_source_used = 'era5'
-                logger.info("✅ ERA5: Datos obtenidos exitosamente")
-            else:
-                raise ValueError("ERA5 devolvió datos vacíos")
-                
-        except Exception as e:
-            logger.warning(f"⚠️ ERA5 falló: {e}")
-            fallback_reason = f"ERA5 error: {str(e)}"
-            wind_data = None
+        # Forzar modo real para las fuentes reales, solo para esta solicitud
+        real_config = SourceRequestConfig.from_environment(test_mode=False)
 
-        # PASO 2: Si ERA5 falló, intentar MERRA-2
-        if wind_data is None:
-            logger.info("🛰️ PASO 2: Intentando obtener datos de MERRA-2...")
-            try:
-                # Forzar modo real para MERRA-2
-                original_test_mode = os.environ.get("TEST_MODE", "False")
-                os.environ["TEST_MODE"] = "False"
-                
-                merra2_service = MERRA2Service()
-                wind_data = merra2_service.get_merra2_data(lat_min, lat_max, lon_min, lon_max, start_date, end_date)
-                
-                # Restaurar TEST_MODE original
-                os.environ["TEST_MODE"] = original_test_mode
-                
-                if wind_data and len(wind_data.get('wind_speed_10m', [])) > 0:
-                    data_source_used = 'merra2'
-                    logger.info("✅ MERRA-2: Datos obtenidos exitosamente")
-                else:
-                    raise ValueError("MERRA-2 devolvió datos vacíos")
-                    
-            except Exception as e:
-                logger.warning(f"⚠️ MERRA-2 falló: {e}")
-                fallback_reason += f" | MERRA-2 error: {str(e)}"
-                wind_data = None
+        if point_mode:
+            logger.info(f"📌 Modo punto: ({lat}, {lon}), interpolación {method}")
+
+            def fetch_era5(cancel_event):
+                return get_era5_service().get_point_wind_data(
+                    lat, lon, start_date, end_date, hours, method,
+                    cancel_event=cancel_event, config=real_config, response_format=response_format)
+
+            def fetch_merra2(cancel_event):
+                return get_merra2_service().get_merra2_point_data(
+                    lat, lon, start_date, end_date, hours, method,
+                    cancel_event=cancel_event, config=real_config, response_format=response_format)
+
+            def simulate():
+                simulated = era5_service.generate_simulated_data_for_frontend(
+                    lat, lat, lon, lon, start_date, end_date, hours, n_lat=1, n_lon=1,
+                    response_format=response_format)
+                simulated['metadata']['point'] = {'lat': lat, 'lon': lon}
+                return simulated
+        else:
+            def fetch_era5(cancel_event):
+                return get_era5_service().get_real_wind_data(
+                    lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours,
+                    cancel_event=cancel_event, config=real_config, response_format=response_format)
+
+            def fetch_merra2(cancel_event):
+                return get_merra2_service().get_merra2_data(
+                    lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours,
+                    cancel_event=cancel_event, config=real_config, response_format=response_format)
+
+            def simulate():
+                return era5_service.generate_simulated_data_for_frontend(
+                    lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours,
+                    response_format=response_format)
+
+        # PASO 1 y 2: ERA5 y, si tarda o falla, MERRA-2 en paralelo. Más allá de
+        # MERRA2_MAX_RANGE_DAYS no se consulta MERRA-2
+        sources = [('era5', fetch_era5)]
+        if merra2_allowed(start_date, end_date):
+            sources.append(('merra2', fetch_merra2))
+        logger.info("🌍 PASO 1-2: Obteniendo datos de ERA5 / MERRA-2 (hedging)...")
+        orchestration = get_source_orchestrator().run(
+            sources,
+            is_valid=payload_has_data
+        )
+
+        source_latencies = dict(orchestration.latencies)
+        if orchestration.data is not None:
+            wind_data = orchestration.data
+            data_source_used = orchestration.source
+        if orchestration.errors:
+            fallback_reason = " | ".join(
+                f"{name.upper()} error: {error}" for name, error in orchestration.errors.items())
 
         # PASO 3: Si ambos fallaron, generar datos simulados
         if wind_data is None:
             logger.info("🔄 PASO 3: Generando datos simulados (fallback final)...")
             try:
                 # Usar datos simulados de ERA5 como fallback
-                wind_data = era5_service.generate_simulated_data_for_frontend(
-                    lat_min, lat_max, lon_min, lon_max, start_date, end_date
-                )
+                simulated_started = datetime.now()
+                wind_data = simulate()
                 data_source_used = 'simulated'
                 logger.info("✅ Datos simulados generados exitosamente")
                 
                 # Actualizar metadatos para indicar que es fallback
+                source_latencies['simulated'] = {
+                    'status': 'success', 'seconds': round((datetime.now() - simulated_started).total_seconds(), 3)}
                 wind_data['metadata']['fallback_reason'] = fallback_reason
                 wind_data['metadata']['region'] = 'Caribe Colombiano (Simulado - Fallback)'
                 
@@ -420,6 +792,8 @@ def get_wind_data():
                     'final_error': str(e)
                 }), 500
 
+        wind_data['metadata']['source_latencies'] = source_latencies
+
         # Preparar respuesta
         response = {
             'status': 'success',
@@ -431,17 +805,15 @@ def get_wind_data():
         # Agregar información de fallback si aplica
         if data_source_used != 'era5':
             response['fallback_info'] = {
-                'attempted_sources': ['era5', 'merra2'] if data_source_used == 'simulated' else ['era5'],
+                'attempted_sources': orchestration.attempted_sources,
                 'fallback_reason': fallback_reason,
                 'final_source': data_source_used
             }
 
         logger.info("✅ Datos listos para el frontend:")
         logger.info(f"   - Fuente final: {data_source_used.upper()}")
-        logger.info(f"   - wind_speed_10m: {len(wind_data.get('wind_speed_10m', []))} valores")
-        logger.info(f"   - wind_speed_100m: {len(wind_data.get('wind_speed_100m', []))} valores")
-        logger.info(f"   - surface_pressure: {len(wind_data.get('surface_pressure', []))} valores")
-        logger.info(f"   - temperature_2m: {len(wind_data.get('temperature_2m', []))} valores")
+        logger.info(f"   - Esquema: {response_format.schema} ({response_format.encoding})")
+        logger.info(f"   - Puntos: {wind_data['metadata'].get('total_points')}")
         
         if data_source_used != 'era5':
             logger.info(f"   - Fallback aplicado: {fallback_reason}")
@@ -460,7 +832,7 @@ def get_wind_data():
 
 @era5_bp.route("/simulated_data", methods=["POST"])
 def get_simulated_data_endpoint():
-    service = ERA5Service()
+    service = get_era5_service()
     try:
         data = request.get_json()
         if not data:
@@ -468,9 +840,28 @@ def get_simulated_data_endpoint():
         
         logger.info(f"Solicitud de datos simulados recibida: {data}")
         lat_min, lat_max, lon_min, lon_max, start_date, end_date = service.validate_parameters(data)
+        hours = service.parse_hours(data)
+        try:
+            n_lat = int(data.get('n_lat', DEFAULT_GRID_SIZE))
+            n_lon = int(data.get('n_lon', DEFAULT_GRID_SIZE))
+            seed = int(data['seed']) if data.get('seed') is not None else None
+        except (TypeError, ValueError):
+            raise ValueError('n_lat, n_lon y seed deben ser enteros')
+        max_grid_size = int(os.environ.get("SIMULATED_MAX_GRID_SIZE", "100"))
+        if not (1 <= n_lat <= max_grid_size and 1 <= n_lon <= max_grid_size):
+            raise ValueError(f'n_lat y n_lon deben estar entre 1 y {max_grid_size}')
+        # El rango de fechas no tiene límite propio: se acota el total de puntos
+        n_days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
+        n_times = n_days * len(hours)
+        max_points = simulated_max_points()
+        if n_times * n_lat * n_lon > max_points:
+            raise ValueError(f'Demasiados puntos ({n_times} pasos x {n_lat * n_lon} celdas); '
+                             f'el máximo es {max_points}')
+        response_format = ResponseFormat.from_request(data)
         
         simulated_data = service.generate_simulated_data_for_frontend(
-            lat_min, lat_max, lon_min, lon_max, start_date, end_date
+            lat_min, lat_max, lon_min, lon_max, start_date, end_date, hours, n_lat, n_lon, seed,
+            response_format=response_format
         )
         return jsonify(simulated_data)
 
@@ -480,3 +871,33 @@ def get_simulated_data_endpoint():
     except Exception as e:
         logger.exception(f"Error inesperado en el endpoint de datos simulados: {e}")
         return jsonify({"error": "Error interno del servidor al generar datos simulados"}), 500
+
+@era5_bp.route("/era5-cache/stats", methods=["GET"])
+def get_era5_cache_stats():
+    cache = get_era5_cache()
+    if cache is None:
+        return jsonify({"status": "disabled", "cache": None})
+    return jsonify({"status": "success", "cache": cache.stats()})
+
+@era5_bp.route("/merra2-cache/stats", methods=["GET"])
+def get_merra2_cache_stats():
+    cache = get_merra2_cache()
+    if cache is None:
+        return jsonify({"status": "disabled", "cache": None})
+    return jsonify({"status": "success", "cache": cache.stats()})
+
+@era5_bp.route("/prefetch/status", methods=["GET"])
+def get_prefetch_status():
+    scheduler = get_prefetch_scheduler()
+    if scheduler is None:
+        return jsonify({"status": "disabled", "prefetch": None})
+    return jsonify({"status": "success", "prefetch": scheduler.status()})
+
+@era5_bp.route("/data-sources/status", methods=["GET"])
+def get_data_sources_status():
+    orchestrator = get_source_orchestrator()
+    return jsonify({
+        "status": "success",
+        "hedge_delay_seconds": orchestrator.hedge_delay_seconds,
+        "circuit_breakers": orchestrator.breaker_states()
+    })
@@ -1,96 +1,259 @@
+"""
+Análisis climatológico de eventos extremos (HURDAT) para proyectos eólicos en el
+Caribe colombiano.
 
-import pandas as pd
+Los datos HURDAT, el modelo de impacto, los eventos del Caribe, su índice espacial
+y las columnas precalculadas viven en una instantánea inmutable compartida por el
+proceso (ClimateSnapshotStore). Se recarga en caliente cuando cambian el mtime o el
+tamaño del CSV o del modelo. Las solicitudes en curso terminan con la instantánea
+que tomaron, y si la versión nueva no se puede leer se mantiene la anterior.
+"""
+
+import hashlib
+import logging
+import math
 import os
-from geopy.distance import geodesic
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
 import joblib
+import numpy as np
+import pandas as pd
+
+from src.services.climate_raster import get_climate_raster, raster_interpolation
+from src.services.hurdat_tables import EventTable
+from src.services.spatial_index import RadiusIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'database'))
+
+# Caribe colombiano: región de los eventos que se analizan
+CARIBBEAN_BBOX = {
+    "min_lat": 10.0,
+    "max_lat": 13.0,
+    "min_lon": -82.0,
+    "max_lon": -74.0
+}
+
+# Variables del modelo de impacto, en el orden de entrenamiento
+IMPACT_FEATURES = ['event_density', 'avg_wind_speed_hu', 'avg_wind_speed_ts', 'energy_opportunity_score',
+                   'extreme_risk_index', 'avg_duration_hours', 'min_pressure']
+
+# (mtime en ns, tamaño) de un archivo
+FileStamp = Tuple[int, int]
+
+
+def caribbean_events(df: pd.DataFrame, bbox: Dict[str, float] = CARIBBEAN_BBOX) -> pd.DataFrame:
+    """Registros HURDAT dentro del bbox (índice reiniciado para consultar por posición)."""
+    return df[
+        (df["latitude_float"] >= bbox["min_lat"]) &
+        (df["latitude_float"] <= bbox["max_lat"]) &
+        (df["longitude_float"] >= bbox["min_lon"]) &
+        (df["longitude_float"] <= bbox["max_lon"])
+    ].reset_index(drop=True)
+
+
+def file_stamp(path: str) -> FileStamp:
+    """Marca de modificación de un archivo (mtime en ns y tamaño)."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 del contenido de un archivo (identifica los datos con que se construyó el ráster)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def batch_max_points() -> int:
+    """Puntos como máximo por solicitud de análisis en lote (CLIMATE_BATCH_MAX_POINTS)."""
+    return int(os.environ.get("CLIMATE_BATCH_MAX_POINTS", "20000"))
+
+
+def batch_chunk_points() -> int:
+    """Puntos por bloque de la unión de distancias en lote (CLIMATE_BATCH_CHUNK_POINTS); acota la memoria."""
+    return max(1, int(os.environ.get("CLIMATE_BATCH_CHUNK_POINTS", "1024")))
+
+
+def grid_axis_size(start: float, stop: float, step: float) -> int:
+    """
+    Número de valores de grid_axis(start, stop, step), sin construir el eje.
+
+    Raises:
+        ValueError: Si los límites o el paso no son finitos, o el paso es tan pequeño
+                    que el número de valores no es representable
+    """
+    if not all(math.isfinite(v) for v in (start, stop, step)) or step <= 0:
+        raise ValueError("Los límites y el paso de la malla deben ser números finitos, con paso positivo")
+    span = (stop - start) / step
+    if not math.isfinite(span):
+        raise ValueError("El paso de la malla es demasiado pequeño para sus límites")
+    return max(math.floor(span + 1e-9) + 1, 0)
+
+
+def grid_axis(start: float, stop: float, step: float) -> np.ndarray:
+    """Valores start, start + step, ... hasta stop inclusive (tolerando el redondeo)."""
+    return np.round(start + step * np.arange(grid_axis_size(start, stop, step)), 6)
+
+
+@dataclass(frozen=True)
+class ClimateSnapshot:
+    """
+    Datos HURDAT y modelo cargados de una vez, con los eventos del Caribe y su
+    índice espacial ya construidos. Es inmutable: una recarga crea una instantánea
+    nueva y las solicitudes en curso terminan con la que tomaron. Los DataFrames no
+    deben modificarse (se filtran con copias).
+    """
+    df: pd.DataFrame
+    model: Any
+    caribbean_events: pd.DataFrame
+    index: RadiusIndex
+    events: EventTable          # columnas de caribbean_events precalculadas, por posición
+    data_stamp: FileStamp
+    model_stamp: FileStamp
+    data_digest: str
+    model_digest: str
+    loaded_at: datetime
+
+    @property
+    def stamps(self) -> Tuple[FileStamp, FileStamp]:
+        return self.data_stamp, self.model_stamp
+
+
+class ClimateSnapshotStore:
+    """
+    Instantánea compartida del proceso para un par (CSV, modelo). Se carga la
+    primera vez que se pide y solo se recarga cuando cambia el mtime o el tamaño de
+    alguno de los archivos; la nueva instantánea se publica con una sola asignación.
+    """
+
+    def __init__(self, hurdat_data_path: str, model_path: str):
+        self.hurdat_data_path = hurdat_data_path
+        self.model_path = model_path
+        self._snapshot: Optional[ClimateSnapshot] = None
+        self._failed_stamps = None
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def current(self) -> Optional[ClimateSnapshot]:
+        """Última instantánea cargada, sin comprobar los archivos."""
+        return self._snapshot
+
+    def get(self) -> ClimateSnapshot:
+        """
+        Instantánea vigente, recargándola si los archivos cambiaron.
+
+        Raises:
+            OSError, ValueError: Si no hay ninguna instantánea y la carga falla
+        """
+        snapshot = self._snapshot
+        try:
+            stamps = (file_stamp(self.hurdat_data_path), file_stamp(self.model_path))
+        except OSError:
+            if snapshot is not None:
+                # Archivo reemplazándose: se sigue con la instantánea anterior
+                return snapshot
+            raise
+        if snapshot is not None and (snapshot.stamps == stamps or self._failed_stamps == stamps):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and (snapshot.stamps == stamps or self._failed_stamps == stamps):
+                return snapshot
+            try:
+                loaded = self._load(stamps)
+            except Exception as e:
+                if snapshot is None:
+                    raise
+                # Versión nueva ilegible (p. ej. a medio escribir): no reintentar hasta el próximo cambio
+                self._failed_stamps = stamps
+                logger.error(f"❌ No se pudo recargar el análisis climatológico, se mantiene la versión anterior: {e}")
+                return snapshot
+            self._snapshot = loaded
+            self._failed_stamps = None
+            return loaded
+
+    def _load(self, stamps: Tuple[FileStamp, FileStamp]) -> ClimateSnapshot:
+        # Las marcas se toman antes de leer: si el archivo cambia durante la lectura, la
+        # siguiente solicitud verá otra marca y volverá a cargar
+        df = pd.read_csv(self.hurdat_data_path, dtype={"date": str, "time": str})
+        model = joblib.load(self.model_path)
+        digests = file_digest(self.hurdat_data_path), file_digest(self.model_path)
+        events = caribbean_events(df)
+        index = RadiusIndex(events["latitude_float"].to_numpy(), events["longitude_float"].to_numpy())
+        table = EventTable.from_frame(events)
+        self.loads += 1
+        logger.info(f"📂 Análisis climatológico cargado: {len(df)} registros HURDAT ({len(events)} en el Caribe, "
+                    f"{len(table.storm_ids)} tormentas, indexados), modelo {type(model).__name__} "
+                    f"({'recarga' if self.loads > 1 else 'inicial'})")
+        return ClimateSnapshot(df, model, events, index, table, stamps[0], stamps[1], digests[0], digests[1],
+                               datetime.now())
+
+
+_stores: Dict[Tuple[str, str], ClimateSnapshotStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_climate_snapshot_store(hurdat_data_path: str, model_path: str) -> ClimateSnapshotStore:
+    """Almacén compartido por todas las instancias que usan el mismo par de archivos."""
+    key = (os.path.abspath(hurdat_data_path), os.path.abspath(model_path))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ClimateSnapshotStore(*key)
+        return _stores[key]
+
 
 class ClimateAnalysisModule:
     """
     Módulo de análisis climatológico para evaluar la viabilidad de proyectos eólicos
     considerando eventos climáticos extremos en el Caribe colombiano.
+
+    Los datos y el modelo viven en una instantánea compartida del proceso
+    (ClimateSnapshotStore) que se recarga al cambiar los archivos.
     """
 
     def __init__(self, hurdat_data_path=None, model_path=None):
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'database'))
-        self.hurdat_data_path = hurdat_data_path or os.path.join(base_dir, 'parsed_hurdat_data.csv')
-        self.model_path = model_path or os.path.join(base_dir, 'random_forest_model.joblib')
-        self.df = None
-        self.model = None
-        self.caribbean_bbox = {
-            "min_lat": 10.0,
-            "max_lat": 13.0,
-            "min_lon": -82.0,
-            "max_lon": -74.0
-        }
+        self.hurdat_data_path = hurdat_data_path or os.path.join(DEFAULT_DATABASE_DIR, 'parsed_hurdat_data.csv')
+        self.model_path = model_path or os.path.join(DEFAULT_DATABASE_DIR, 'random_forest_model.joblib')
+        self.store = get_climate_snapshot_store(self.hurdat_data_path, self.model_path)
+        self.caribbean_bbox = dict(CARIBBEAN_BBOX)
+
+    @property
+    def df(self):
+        snapshot = self.store.current()
+        return snapshot.df if snapshot is not None else None
+
+    @property
+    def model(self):
+        snapshot = self.store.current()
+        return snapshot.model if snapshot is not None else None
 
     def load_data(self):
+        """Carga (o recarga si cambiaron los archivos) la instantánea compartida."""
         try:
-            print(f"📂 Verificando existencia de archivos...")
-            print(f"🧪 CSV path: {self.hurdat_data_path} | Existe: {os.path.exists(self.hurdat_data_path)}")
-            print(f"🧪 Model path: {self.model_path} | Existe: {os.path.exists(self.model_path)}")
-            self.df = pd.read_csv(self.hurdat_data_path, dtype={"date": str, "time": str})
-            self.model = joblib.load(self.model_path)
+            self.store.get()
             return True
         except Exception as e:
-            print(f"Error cargando datos o modelo: {e}")
+            logger.error(f"Error cargando datos o modelo: {e}")
             return False
 
-    def calculate_metrics(self, lat, lon, radius_km=200):
-        if self.df is None:
+    def calculate_metrics(self, lat, lon, radius_km=200, snapshot=None):
+        snapshot = snapshot or self.store.current()
+        if snapshot is None:
             raise ValueError("Los datos no han sido cargados. Llama a load_data() primero.")
 
-        caribbean_events = self.df[
-            (self.df["latitude_float"] >= self.caribbean_bbox["min_lat"]) &
-            (self.df["latitude_float"] <= self.caribbean_bbox["max_lat"]) &
-            (self.df["longitude_float"] >= self.caribbean_bbox["min_lon"]) &
-            (self.df["longitude_float"] <= self.caribbean_bbox["max_lon"])
-        ].copy()
-
-        if caribbean_events.empty:
-            return self._empty_metrics()
-
-        caribbean_events["distance_to_analysis_point"] = caribbean_events.apply(
-            lambda row: geodesic((row["latitude_float"], row["longitude_float"]), (lat, lon)).km, axis=1)
-
-        nearby_events = caribbean_events[caribbean_events["distance_to_analysis_point"] <= radius_km].copy()
-
-        if nearby_events.empty:
-            return self._empty_metrics()
-
-        event_density = nearby_events["storm_id"].nunique()
-        nearby_events["year"] = pd.to_datetime(nearby_events["date"] + nearby_events["time"], format="%Y%m%d%H%M").dt.year
-        total_years = nearby_events["year"].nunique()
-        event_frequency = nearby_events.groupby("storm_type")["storm_id"].nunique() / total_years if total_years > 0 else 0
-        event_frequency = event_frequency.to_dict()
-        event_intensity_profile = nearby_events.groupby("storm_type")["max_sustained_wind_knots"].mean().to_dict()
-        nearby_events["max_sustained_wind_ms"] = nearby_events["max_sustained_wind_knots"] * 0.514444
-        useful_wind_events = nearby_events[(nearby_events["max_sustained_wind_ms"] >= 12) & (nearby_events["max_sustained_wind_ms"] <= 25)]
-        energy_opportunity_score = useful_wind_events["storm_id"].nunique() / event_density if event_density > 0 else 0
-        severe_wind_events = nearby_events[nearby_events["max_sustained_wind_ms"] > 30]
-        extreme_risk_index = severe_wind_events["storm_id"].nunique() / event_density if event_density > 0 else 0
-
-        storm_durations = nearby_events.groupby("storm_id").apply(lambda x:
-            (pd.to_datetime(x["date"] + x["time"], format="%Y%m%d%H%M").max() -
-             pd.to_datetime(x["date"] + x["time"], format="%Y%m%d%H%M").min()).total_seconds() / 3600,
-            include_groups=False)
-
-        event_duration_stats = {
-            "average_duration_hours": storm_durations.mean() if not storm_durations.empty else 0,
-            "std_dev_duration_hours": storm_durations.std() if not storm_durations.empty else 0
-        }
-
-        valid_pressures = nearby_events[nearby_events["min_central_pressure_mb"] != -999]["min_central_pressure_mb"]
-        historical_pressure_min = valid_pressures.min() if not valid_pressures.empty else -999
-
-        return {
-            "event_density": event_density,
-            "event_frequency": event_frequency,
-            "event_intensity_profile": event_intensity_profile,
-            "energy_opportunity_score": energy_opportunity_score,
-            "extreme_risk_index": extreme_risk_index,
-            "event_duration_stats": event_duration_stats,
-            "historical_pressure_min": historical_pressure_min
-        }
+        # Consulta por radio en el índice espacial (geodésica exacta solo cerca del borde)
+        # y reducciones sobre las columnas precalculadas de esos eventos
+        positions = snapshot.index.query_radius(lat, lon, radius_km)
+        metrics = snapshot.events.metrics(positions)
+        return metrics if metrics is not None else self._empty_metrics()
 
     def _empty_metrics(self):
         return {
@@ -103,15 +266,16 @@ class ClimateAnalysisModule:
             "historical_pressure_min": -999
         }
 
-    def predict_impact_details(self, metrics):
-        if self.model is None:
+    def predict_impact_details(self, metrics, snapshot=None):
+        model = snapshot.model if snapshot is not None else self.model
+        if model is None:
             raise ValueError("El modelo no ha sido cargado.")
 
         avg_wind_speed_hu = metrics["event_intensity_profile"].get("HU", 0)
         avg_wind_speed_ts = metrics["event_intensity_profile"].get("TS", 0)
         avg_duration_hours = metrics["event_duration_stats"]["average_duration_hours"]
 
-        input_data = {
+        input_data = {  # en el orden de IMPACT_FEATURES
             'event_density': metrics["event_density"],
             'avg_wind_speed_hu': avg_wind_speed_hu,
             'avg_wind_speed_ts': avg_wind_speed_ts,
@@ -122,15 +286,11 @@ class ClimateAnalysisModule:
         }
 
         input_df = pd.DataFrame([input_data])
-        predicted_class = self.model.predict(input_df)[0]
-        proba = self.model.predict_proba(input_df)[0]
-        class_labels = self.model.classes_
+        predicted_class = model.predict(input_df)[0]
+        proba = model.predict_proba(input_df)[0]
+        class_labels = model.classes_
         class_probabilities = {label: float(prob) for label, prob in zip(class_labels, proba)}
         confidence = max(proba) * 100
-        top_features = sorted(
-            zip(input_data.keys(), self.model.feature_importances_),
-            key=lambda x: x[1], reverse=True
-        )[:5]
 
         recommendation = self.generate_recommendation(predicted_class)
 
@@ -138,10 +298,64 @@ class ClimateAnalysisModule:
             "classification": predicted_class,
             "confidence": round(confidence, 2),
             "class_probabilities": class_probabilities,
-            "key_factors": [{"feature": f, "importance": round(i, 3)} for f, i in top_features],
+            "key_factors": self._key_factors(model),
             "recommendation": recommendation
         }
 
+    def impact_from_probabilities(self, class_probabilities: Dict[str, float], snapshot: ClimateSnapshot) -> Dict:
+        """Lo mismo que predict_impact_details a partir de probabilidades ya calculadas (ráster)."""
+        predicted_class = max(class_probabilities, key=class_probabilities.get)
+        return {
+            "classification": predicted_class,
+            "confidence": round(class_probabilities[predicted_class] * 100, 2),
+            "class_probabilities": class_probabilities,
+            "key_factors": self._key_factors(snapshot.model),
+            "recommendation": self.generate_recommendation(predicted_class)
+        }
+
+    def _key_factors(self, model):
+        top_features = sorted(
+            zip(IMPACT_FEATURES, model.feature_importances_),
+            key=lambda x: x[1], reverse=True
+        )[:5]
+        return [{"feature": f, "importance": round(i, 3)} for f, i in top_features]
+
+    def predict_impact_batch(self, metrics: Dict[str, np.ndarray], categories, snapshot: ClimateSnapshot) -> Dict:
+        """
+        Clasificación de muchos puntos con una sola llamada a predict_proba.
+
+        Args:
+            metrics: Arrays de EventTable.batch_metrics
+            categories: Etiquetas de las columnas de event_intensity_profile
+
+        Returns:
+            Dict: classification y confidence por punto, class_probabilities
+                  (puntos x clases) y classes
+        """
+        def intensity(label):
+            if label not in categories:
+                return np.zeros(len(metrics["event_density"]))
+            return np.nan_to_num(metrics["event_intensity_profile"][:, categories.index(label)], nan=0.0)
+
+        features = pd.DataFrame({
+            'event_density': metrics["event_density"],
+            'avg_wind_speed_hu': intensity("HU"),
+            'avg_wind_speed_ts': intensity("TS"),
+            'energy_opportunity_score': metrics["energy_opportunity_score"],
+            'extreme_risk_index': metrics["extreme_risk_index"],
+            'avg_duration_hours': metrics["average_duration_hours"],
+            'min_pressure': metrics["historical_pressure_min"]
+        }, columns=IMPACT_FEATURES)
+        model = snapshot.model
+        proba = model.predict_proba(features) if len(features) else np.empty((0, len(model.classes_)))
+        # Igual que model.predict en un RandomForestClassifier: la clase de mayor probabilidad
+        return {
+            "classification": model.classes_[proba.argmax(axis=1)],
+            "confidence": np.round(proba.max(axis=1, initial=0) * 100, 2),
+            "class_probabilities": proba,
+            "classes": list(model.classes_),
+        }
+
     def generate_recommendation(self, predicted_impact):
         recommendations = {
             'positivo': (
@@ -157,16 +371,27 @@ class ClimateAnalysisModule:
         return recommendations.get(predicted_impact, "No se pudo generar una recomendación debido a un impacto no reconocido.")
 
     def analyze_point(self, latitude, longitude, radius_km=200):
-        if not self.load_data():
+        try:
+            # Una sola instantánea para toda la solicitud, aunque otra la reemplace entretanto
+            snapshot = self.store.get()
+        except Exception as e:
+            logger.error(f"Error cargando datos o modelo: {e}")
             return {"error": "No se pudieron cargar los datos o el modelo", "success": False}
         try:
-            metrics = self.calculate_metrics(latitude, longitude, radius_km)
-            impact_info = self.predict_impact_details(metrics)
+            # Ráster precalculado si cubre el punto y el radio; si no, cálculo exacto
+            cell = self._raster_lookup(latitude, longitude, radius_km, snapshot)
+            if cell is not None:
+                metrics = cell[0]
+                impact_info = self.impact_from_probabilities(cell[1], snapshot)
+            else:
+                metrics = self.calculate_metrics(latitude, longitude, radius_km, snapshot)
+                impact_info = self.predict_impact_details(metrics, snapshot)
             return {
                 "latitude": latitude,
                 "longitude": longitude,
                 "radius_km": radius_km,
                 "metrics": metrics,
+                "metrics_source": "raster" if cell is not None else "exact",
                 "predicted_impact": impact_info["classification"],
                 "recommendation": impact_info["recommendation"],
                 "ai_diagnosis": {
@@ -180,3 +405,72 @@ class ClimateAnalysisModule:
             }
         except Exception as e:
             return {"error": f"Error durante el análisis: {str(e)}", "success": False}
+
+    def _raster_lookup(self, latitude, longitude, radius_km, snapshot):
+        raster = get_climate_raster()
+        if raster is None or not raster.matches(snapshot.data_digest, snapshot.model_digest):
+            return None
+        return raster.lookup(latitude, longitude, radius_km, raster_interpolation())
+
+    def analyze_points(self, latitudes, longitudes, radius_km=200, chunk_size=None) -> Dict:
+        """
+        Análisis de muchos puntos con la misma instantánea: unión de distancias
+        vectorizada por bloques de puntos contra los eventos del Caribe, métricas como
+        reducciones matriciales y una sola inferencia del modelo para todos.
+
+        Args:
+            latitudes, longitudes: Coordenadas de los puntos (misma longitud)
+            radius_km: Radio de búsqueda en km
+            chunk_size: Puntos por bloque (por defecto CLIMATE_BATCH_CHUNK_POINTS)
+
+        Returns:
+            Dict: latitude/longitude, categories (columnas de event_frequency y
+                  event_intensity_profile), metrics (un array por métrica), las
+                  predicciones de predict_impact_batch, key_factors y recommendations
+
+        Raises:
+            ValueError: Si las coordenadas no tienen la misma longitud
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        if latitudes.shape != longitudes.shape:
+            raise ValueError("latitudes y longitudes deben tener la misma longitud")
+        snapshot = self.store.get()
+        events = snapshot.events
+        chunk_size = chunk_size or batch_chunk_points()
+
+        parts = []
+        for start in range(0, len(latitudes), chunk_size):
+            stop = start + chunk_size
+            within = snapshot.index.within_radius(latitudes[start:stop], longitudes[start:stop], radius_km)
+            parts.append(events.batch_metrics(within))
+        if parts:
+            metrics = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+        else:
+            metrics = events.batch_metrics(np.zeros((0, len(events)), dtype=bool))
+
+        categories = [str(c) for c in events.categories]
+        result = {
+            "latitude": latitudes,
+            "longitude": longitudes,
+            "radius_km": radius_km,
+            "categories": categories,
+            "metrics": metrics,
+        }
+        result.update(self.predict_impact_batch(metrics, categories, snapshot))
+        result["key_factors"] = self._key_factors(snapshot.model)
+        result["recommendations"] = {label: self.generate_recommendation(label) for label in result["classes"]}
+        return result
+
+
+_climate_module = None
+_climate_module_lock = threading.Lock()
+
+
+def get_climate_module() -> ClimateAnalysisModule:
+    """Instancia compartida por las rutas de clima y de IA (rutas por defecto en src/database)."""
+    global _climate_module
+    with _climate_module_lock:
+        if _climate_module is None:
+            _climate_module = ClimateAnalysisModule()
+        return _climate_module
@@ -0,0 +1,345 @@
+"""
+Ráster precalculado del análisis climatológico.
+
+El histórico HURDAT cambia una vez al año, así que las métricas y las
+probabilidades del modelo pueden calcularse de antemano sobre una malla regular
+(por ejemplo 0.05°) para unos radios estándar. El ráster se guarda en un .npy
+(radios x campos x latitudes x longitudes, float64) que se abre con memmap, más un
+.json con la malla, los campos y los SHA-256 del CSV y del modelo con que se
+construyó. analyze_point responde con una lectura en O(1) (nodo exacto, vecino más
+cercano o interpolación bilineal) y vuelve al cálculo exacto si el radio no es uno de
+los precalculados, el punto cae fuera de la malla o el ráster no corresponde a los
+datos cargados.
+
+Construcción (se ejecuta al desplegar, no en las solicitudes):
+    python -m src.services.climate_raster --step 0.05 --radii 50,100,200,300
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RASTER_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', 'database', 'climate_raster.npy')
+)
+DEFAULT_RADII_KM = (50.0, 100.0, 200.0, 300.0)
+DEFAULT_STEP_DEG = 0.05
+
+RASTER_VERSION = 1
+
+# Métricas escalares; después van event_frequency:<tipo>, event_intensity_profile:<tipo>
+# y class_probability:<clase>
+SCALAR_FIELDS = ["event_density", "energy_opportunity_score", "extreme_risk_index",
+                 "average_duration_hours", "std_dev_duration_hours", "historical_pressure_min"]
+
+# Campos que no se interpolan fuera de los nodos: el número de tormentas se toma del nodo
+# más cercano y la presión mínima es la menor de las esquinas, para que sigan siendo un
+# conteo entero y una presión registrada
+NEAREST_FIELDS = {"event_density"}
+MINIMUM_FIELDS = {"historical_pressure_min"}
+
+# Tolerancia (grados) para considerar que un punto está sobre un nodo o dentro de la malla
+_NODE_TOLERANCE = 1e-6
+# Tolerancia relativa para reconocer un radio precalculado
+_RADIUS_TOLERANCE = 1e-9
+
+MISSING_PRESSURE = -999
+
+
+def raster_enabled() -> bool:
+    return os.environ.get("CLIMATE_RASTER_ENABLED", "True").lower() == "true"
+
+
+def raster_path() -> str:
+    return os.environ.get("CLIMATE_RASTER_PATH", DEFAULT_RASTER_PATH)
+
+
+def raster_interpolation() -> str:
+    """Lectura fuera de los nodos: bilinear (por defecto) o nearest."""
+    mode = os.environ.get("CLIMATE_RASTER_INTERPOLATION", "bilinear").lower()
+    return mode if mode in ("bilinear", "nearest") else "bilinear"
+
+
+def metadata_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def raster_fields(categories: Sequence[str], classes: Sequence[str]) -> List[str]:
+    return (list(SCALAR_FIELDS) +
+            [f"event_frequency:{c}" for c in categories] +
+            [f"event_intensity_profile:{c}" for c in categories] +
+            [f"class_probability:{label}" for label in classes])
+
+
+def batch_columns(result: Dict) -> np.ndarray:
+    """Campos del ráster (puntos x campos) a partir de ClimateAnalysisModule.analyze_points."""
+    metrics = result["metrics"]
+    columns = [metrics[name] for name in SCALAR_FIELDS]
+    columns += list(metrics["event_frequency"].T) + list(metrics["event_intensity_profile"].T)
+    columns += list(result["class_probabilities"].T)
+    return np.column_stack(columns).astype(np.float64) if columns else np.empty((0, 0))
+
+
+class ClimateRaster:
+    """Ráster cargado (valores en memmap de solo lectura) y sus metadatos."""
+
+    def __init__(self, path: str, meta: Dict, values: np.ndarray):
+        self.path = path
+        self.meta = meta
+        self.values = values
+        self.fields: List[str] = meta["fields"]
+        self.categories: List[str] = meta["categories"]
+        self.classes: List[str] = meta["classes"]
+        self.radii_km: List[float] = meta["radii_km"]
+        self.step = float(meta["step"])
+        self.lat0, self.lon0 = float(meta["lat0"]), float(meta["lon0"])
+        self.n_lat, self.n_lon = int(meta["n_lat"]), int(meta["n_lon"])
+        self._field_index = {name: k for k, name in enumerate(self.fields)}
+        self._stale_logged = False
+
+    @classmethod
+    def load(cls, path: str) -> "ClimateRaster":
+        """
+        Raises:
+            OSError, ValueError: Si faltan los archivos o no son coherentes
+        """
+        with open(metadata_path(path)) as f:
+            meta = json.load(f)
+        if meta.get("version") != RASTER_VERSION:
+            raise ValueError(f"versión de ráster {meta.get('version')} no soportada")
+        values = np.load(path, mmap_mode="r")
+        expected = (len(meta["radii_km"]), len(meta["fields"]), meta["n_lat"], meta["n_lon"])
+        if values.shape != expected:
+            raise ValueError(f"forma {values.shape}, se esperaba {expected}")
+        return cls(path, meta, values)
+
+    def matches(self, data_digest: str, model_digest: str) -> bool:
+        """Si el ráster se construyó con el CSV y el modelo cargados."""
+        ok = self.meta.get("hurdat_sha256") == data_digest and self.meta.get("model_sha256") == model_digest
+        if not ok and not self._stale_logged:
+            self._stale_logged = True
+            logger.warning(f"⚠️ El ráster climatológico {self.path} no corresponde a los datos o al modelo "
+                           f"cargados; se usa el cálculo exacto hasta reconstruirlo")
+        return ok
+
+    def radius_slot(self, radius_km: float) -> Optional[int]:
+        for k, radius in enumerate(self.radii_km):
+            if math.isclose(radius, radius_km, rel_tol=_RADIUS_TOLERANCE):
+                return k
+        return None
+
+    def lookup(self, lat: float, lon: float, radius_km: float,
+               interpolation: str = "bilinear") -> Optional[Tuple[Dict, Dict]]:
+        """
+        Métricas y probabilidades de clase en (lat, lon) para un radio precalculado.
+
+        Args:
+            interpolation: bilinear o nearest para puntos fuera de los nodos
+
+        Returns:
+            tuple: (métricas con la forma de calculate_metrics, {clase: probabilidad}),
+                   o None si el radio no está precalculado o el punto cae fuera de la malla
+        """
+        slot = self.radius_slot(radius_km)
+        if slot is None:
+            return None
+        fi, fj = (lat - self.lat0) / self.step, (lon - self.lon0) / self.step
+        margin = _NODE_TOLERANCE / self.step
+        if not (-margin <= fi <= self.n_lat - 1 + margin and -margin <= fj <= self.n_lon - 1 + margin):
+            return None
+
+        ri, rj = int(round(fi)), int(round(fj))
+        on_node = abs(fi - ri) * self.step < _NODE_TOLERANCE and abs(fj - rj) * self.step < _NODE_TOLERANCE
+        if on_node or interpolation == "nearest":
+            return self._to_metrics(self.values[slot, :, ri, rj])
+
+        i0 = min(max(int(math.floor(fi)), 0), max(self.n_lat - 2, 0))
+        j0 = min(max(int(math.floor(fj)), 0), max(self.n_lon - 2, 0))
+        i1, j1 = min(i0 + 1, self.n_lat - 1), min(j0 + 1, self.n_lon - 1)
+        ti, tj = min(max(fi - i0, 0.0), 1.0), min(max(fj - j0, 0.0), 1.0)
+        corners = self.values[slot][:, [i0, i0, i1, i1], [j0, j1, j0, j1]].T
+        weights = np.array([(1 - ti) * (1 - tj), (1 - ti) * tj, ti * (1 - tj), ti * tj])
+        return self._to_metrics(self._blend(corners, weights))
+
+    def _blend(self, corners: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """
+        Interpolación bilineal de cada campo. Un tipo de evento ausente en una esquina
+        cuenta como frecuencia 0; para el resto de campos se renormalizan los pesos
+        sobre las esquinas con dato (intensidad y desviación NaN, presión -999).
+        event_density es el del nodo más cercano y historical_pressure_min el mínimo
+        de las esquinas con dato (NEAREST_FIELDS, MINIMUM_FIELDS).
+        """
+        blended = np.empty(corners.shape[1])
+        weighted = weights > 0
+        nearest = int(np.argmax(weights))
+        for k, name in enumerate(self.fields):
+            column = corners[:, k]
+            if name in NEAREST_FIELDS:
+                blended[k] = column[nearest]
+                continue
+            valid = weighted & (column != MISSING_PRESSURE if name == "historical_pressure_min"
+                                else np.isfinite(column))
+            if not valid.any():
+                blended[k] = MISSING_PRESSURE if name == "historical_pressure_min" else np.nan
+            elif name in MINIMUM_FIELDS:
+                blended[k] = float(column[valid].min())
+            elif name.startswith("event_frequency:"):
+                blended[k] = float(np.sum(weights[valid] * column[valid]))
+            else:
+                blended[k] = float(np.sum(weights[valid] * column[valid]) / np.sum(weights[valid]))
+        return blended
+
+    def _to_metrics(self, row: np.ndarray) -> Tuple[Dict, Dict]:
+        def value(name):
+            return float(row[self._field_index[name]])
+
+        def by_category(prefix):
+            return {c: value(f"{prefix}:{c}") for c in self.categories
+                    if not math.isnan(value(f"{prefix}:{c}"))}
+
+        metrics = {
+            "event_density": int(round(value("event_density"))),
+            "event_frequency": by_category("event_frequency"),
+            "event_intensity_profile": by_category("event_intensity_profile"),
+            "energy_opportunity_score": value("energy_opportunity_score"),
+            "extreme_risk_index": value("extreme_risk_index"),
+            "event_duration_stats": {
+                "average_duration_hours": value("average_duration_hours"),
+                "std_dev_duration_hours": value("std_dev_duration_hours")
+            },
+            "historical_pressure_min": int(round(value("historical_pressure_min")))
+        }
+        probabilities = {label: value(f"class_probability:{label}") for label in self.classes}
+        return metrics, probabilities
+
+
+_raster: Optional[ClimateRaster] = None
+_raster_stamp = None
+_raster_lock = threading.Lock()
+
+
+def get_climate_raster() -> Optional[ClimateRaster]:
+    """
+    Ráster compartido del proceso, recargado si cambian sus archivos. None si está
+    desactivado (CLIMATE_RASTER_ENABLED=false), no se ha construido o no se puede leer.
+    """
+    global _raster, _raster_stamp
+    if not raster_enabled():
+        return None
+    path = raster_path()
+    try:
+        stamp = tuple((s.st_mtime_ns, s.st_size) for s in (os.stat(path), os.stat(metadata_path(path))))
+    except OSError:
+        return None
+    if stamp == _raster_stamp:
+        return _raster
+    with _raster_lock:
+        if stamp != _raster_stamp:
+            try:
+                _raster = ClimateRaster.load(path)
+                logger.info(f"🗺️ Ráster climatológico cargado: {_raster.n_lat}x{_raster.n_lon} nodos de "
+                            f"{_raster.step}°, radios {_raster.radii_km} km")
+            except Exception as e:
+                _raster = None
+                logger.error(f"❌ No se pudo cargar el ráster climatológico {path}: {e}")
+            _raster_stamp = stamp
+        return _raster
+
+
+def build_climate_raster(module, output_path: str, step: float = DEFAULT_STEP_DEG,
+                         radii_km: Sequence[float] = DEFAULT_RADII_KM, bbox: Optional[Dict[str, float]] = None) -> Dict:
+    """
+    Calcula el ráster con el análisis en lote y lo escribe (.npy y .json) con
+    renombrado atómico.
+
+    Args:
+        module: ClimateAnalysisModule con los datos y el modelo de referencia
+        output_path: Ruta del .npy (el .json va al lado)
+        step: Resolución de la malla en grados
+        radii_km: Radios precalculados
+        bbox: Región (por defecto la del módulo)
+
+    Returns:
+        Dict: Metadatos escritos
+    """
+    from src.services.climate_analysis_module import grid_axis
+
+    bbox = bbox or module.caribbean_bbox
+    snapshot = module.store.get()
+    lats = grid_axis(bbox["min_lat"], bbox["max_lat"], step)
+    lons = grid_axis(bbox["min_lon"], bbox["max_lon"], step)
+    grid_lats, grid_lons = np.meshgrid(lats, lons, indexing="ij")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_values = output_path + ".tmp.npy"
+    values = None
+    meta = None
+    for k, radius in enumerate(radii_km):
+        result = module.analyze_points(grid_lats.ravel(), grid_lons.ravel(), radius)
+        if values is None:
+            fields = raster_fields(result["categories"], [str(c) for c in result["classes"]])
+            values = np.lib.format.open_memmap(tmp_values, mode="w+", dtype=np.float64,
+                                               shape=(len(radii_km), len(fields), len(lats), len(lons)))
+            meta = {
+                "version": RASTER_VERSION,
+                "step": step, "lat0": float(lats[0]), "lon0": float(lons[0]),
+                "n_lat": len(lats), "n_lon": len(lons),
+                "radii_km": [float(r) for r in radii_km],
+                "fields": fields,
+                "categories": result["categories"],
+                "classes": [str(c) for c in result["classes"]],
+                "hurdat_sha256": snapshot.data_digest,
+                "model_sha256": snapshot.model_digest,
+                "built_at": datetime.now().isoformat(timespec="seconds"),
+            }
+        values[k] = batch_columns(result).T.reshape(len(meta["fields"]), len(lats), len(lons))
+        logger.info(f"🗺️ Ráster climatológico: radio {radius} km calculado ({len(lats) * len(lons)} nodos)")
+    values.flush()
+    del values
+
+    tmp_meta = metadata_path(output_path) + ".tmp"
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_values, output_path)
+    os.replace(tmp_meta, metadata_path(output_path))
+    return meta
+
+
+def main():
+    from src.services.climate_analysis_module import CARIBBEAN_BBOX, get_climate_module
+
+    parser = argparse.ArgumentParser(description="Construye el ráster precalculado del análisis climatológico")
+    parser.add_argument("--step", type=float, default=DEFAULT_STEP_DEG, help="Resolución en grados")
+    parser.add_argument("--radii", default=",".join(f"{r:g}" for r in DEFAULT_RADII_KM),
+                        help="Radios en km separados por comas")
+    parser.add_argument("--bbox", default=None, help="lat_min,lat_max,lon_min,lon_max (por defecto el Caribe)")
+    parser.add_argument("--output", default=raster_path(), help="Ruta del .npy (el .json va al lado)")
+    args = parser.parse_args()
+
+    bbox = dict(CARIBBEAN_BBOX)
+    if args.bbox:
+        bbox = dict(zip(("min_lat", "max_lat", "min_lon", "max_lon"), (float(v) for v in args.bbox.split(","))))
+    radii = [float(r) for r in args.radii.split(",") if r.strip()]
+    if args.step <= 0 or not radii or any(r <= 0 for r in radii):
+        parser.error("step y los radios deben ser positivos")
+
+    started = datetime.now()
+    meta = build_climate_raster(get_climate_module(), args.output, args.step, radii, bbox)
+    size_mb = os.path.getsize(args.output) / 1024 / 1024
+    print(f"✅ Ráster {meta['n_lat']}x{meta['n_lon']} nodos, {len(meta['radii_km'])} radios, "
+          f"{len(meta['fields'])} campos: {args.output} ({size_mb:.1f} MB, "
+          f"{(datetime.now() - started).total_seconds():.1f} s)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,232 @@
+"""
+Caché genérica en disco con desalojo LRU y cuota de tamaño.
+Base común para las cachés locales de datos de reanálisis (ERA5, MERRA-2).
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Sufijo de los archivos parciales escritos antes del renombrado atómico
+TMP_SUFFIX = ".tmp"
+
+
+class DiskLRUCache:
+    """
+    Almacén de archivos en disco con política LRU y cuota máxima en bytes.
+
+    Las claves son rutas relativas dentro del directorio raíz. El orden LRU
+    se reconstruye al arrancar a partir del mtime de los archivos, y cada
+    acierto actualiza el mtime para que el orden sobreviva a reinicios.
+    Las entradas fijadas (get/put con pin=True, hasta unpin) no se desalojan:
+    la ruta devuelta sigue existiendo mientras quien la pidió la lee. Si se
+    descartan estando fijadas, salen del índice pero el archivo se borra al
+    soltarse la última fijación.
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int):
+        """
+        Args:
+            root_dir: Directorio raíz de la caché (se crea si no existe)
+            max_bytes: Cuota máxima de disco en bytes
+        """
+        self.root_dir = os.path.abspath(root_dir)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._doomed: Set[str] = set()  # descartadas con fijaciones pendientes
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Reconstruye el índice LRU recorriendo el directorio raíz."""
+        found = []
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name.endswith(TMP_SUFFIX):
+                    # Restos de escrituras interrumpidas
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                key = os.path.relpath(path, self.root_dir).replace(os.sep, "/")
+                found.append((st.st_mtime, key, st.st_size))
+
+        found.sort()
+        with self._lock:
+            for _, key, size in found:
+                self._entries[key] = size
+                self._total_bytes += size
+        logger.info(f"Caché en disco {self.root_dir}: {len(found)} entradas, {self._total_bytes} bytes")
+
+    def path_for(self, key: str) -> str:
+        """Ruta absoluta correspondiente a una clave."""
+        return os.path.join(self.root_dir, *key.split("/"))
+
+    def keys(self) -> List[str]:
+        """Instantánea de las claves presentes (de la menos a la más reciente)."""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def contains(self, key: str) -> bool:
+        """Indica si la clave existe sin alterar el orden LRU ni las estadísticas."""
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: str, pin: bool = False) -> Optional[str]:
+        """
+        Devuelve la ruta del archivo cacheado y lo marca como usado recientemente.
+
+        Args:
+            key: Clave relativa de la entrada
+            pin: Fijar la entrada hasta unpin(key) para que no se desaloje
+
+        Returns:
+            str: Ruta absoluta, o None si la clave no está en caché
+        """
+        path = self.path_for(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            if not os.path.exists(path):
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if pin:
+                self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key: str, writer: Callable[[str], None], pin: bool = False) -> str:
+        """
+        Escribe una entrada de forma atómica y aplica la cuota.
+
+        Args:
+            key: Clave relativa de la entrada
+            writer: Función que recibe una ruta temporal y escribe el contenido en ella
+            pin: Fijar la entrada hasta unpin(key) para que no se desaloje
+
+        Returns:
+            str: Ruta absoluta final de la entrada
+        """
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}{TMP_SUFFIX}"
+        try:
+            writer(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+        size = os.path.getsize(path)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._doomed.discard(key)
+            self.writes += 1
+            if pin:
+                self._pins[key] = self._pins.get(key, 0) + 1
+            self._evict_locked(protect=key)
+        return path
+
+    def unpin(self, key: str):
+        """
+        Libera una fijación de get/put(pin=True). Al soltarse la última, la entrada
+        vuelve a poder desalojarse y se aplica la cuota pendiente.
+        """
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+                return
+            self._pins.pop(key, None)
+            if key in self._doomed:
+                self._doomed.discard(key)
+                self._unlink(key)
+            self._evict_locked()
+
+    def discard(self, key: str):
+        """Elimina una entrada si existe; si está fijada, su archivo se borra al soltarla."""
+        with self._lock:
+            size = self._entries.pop(key, None)
+            if size is None:
+                return
+            self._total_bytes -= size
+            if key in self._pins:
+                self._doomed.add(key)
+                return
+        self._unlink(key)
+
+    def _unlink(self, key: str):
+        try:
+            os.unlink(self.path_for(key))
+        except OSError:
+            pass
+
+    def _evict_locked(self, protect: Optional[str] = None):
+        """
+        Desaloja las entradas menos usadas hasta cumplir la cuota. Las fijadas y la
+        recién escrita (protect) se saltan; si solo quedan esas, la cuota se supera
+        hasta que se liberen.
+        """
+        for oldest in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if oldest == protect or oldest in self._pins:
+                continue
+            size = self._entries.pop(oldest)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self.path_for(oldest))
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar entrada de caché {oldest}: {e}")
+
+    def stats(self) -> Dict:
+        """Estadísticas de uso de la caché."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "root_dir": self.root_dir,
+                "entries": len(self._entries),
+                "pinned": len(self._pins),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "usage_ratio": round(self._total_bytes / self.max_bytes, 4) if self.max_bytes else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
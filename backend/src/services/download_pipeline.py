@@ -0,0 +1,350 @@
+"""
+Canal de descarga y decodificación de archivos diarios de reanálisis.
+
+Tres etapas que se solapan, cada una con su propia concurrencia:
+  1. descarga: hilos (limitada por la red);
+  2. decodificación y recorte: procesos (limitada por CPU; HDF5 serializa las
+     lecturas entre hilos de un mismo proceso);
+  3. fusión: el hilo consumidor recibe los días en orden de fecha y los
+     concatena en bloques temporales.
+Una ventana acotada de días en curso (descargados o decodificados pero aún no
+fusionados) limita la memoria y el disco temporal: la descarga del día i + N no
+empieza hasta que se ha fusionado el día i.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import xarray as xr
+
+from src.services.reanalysis_processing import time_chunk_size
+from src.services.source_orchestrator import check_cancelled
+
+logger = logging.getLogger(__name__)
+
+# Intervalo de comprobación de cancelación mientras se espera al siguiente día
+WAIT_POLL_SECONDS = 0.2
+
+
+@dataclass
+class StageMetrics:
+    """Tiempos acumulados de una etapa del canal."""
+    name: str
+    workers: int
+    items: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    max_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, busy: float, wait: float = 0.0, failed: bool = False):
+        """
+        Args:
+            busy: Segundos de trabajo del elemento
+            wait: Segundos que el elemento esperó en la cola de la etapa
+            failed: Si la etapa no produjo resultado para el elemento
+        """
+        with self._lock:
+            self.items += 1
+            self.failed += int(failed)
+            self.busy_seconds += busy
+            self.wait_seconds += max(0.0, wait)
+            self.max_seconds = max(self.max_seconds, busy)
+
+    def summary(self, wall_seconds: float) -> Dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'items': self.items,
+                'failed': self.failed,
+                'busy_seconds': round(self.busy_seconds, 3),
+                'wait_seconds': round(self.wait_seconds, 3),
+                'max_seconds': round(self.max_seconds, 3),
+                # Fracción de la capacidad de la etapa ocupada durante el canal
+                'utilization': round(self.busy_seconds / (wall_seconds * self.workers), 3) if wall_seconds else None,
+            }
+
+
+@dataclass
+class PipelineMetrics:
+    """Métricas por etapa de una ejecución del canal."""
+    fetch: StageMetrics
+    decode: StageMetrics
+    merge: StageMetrics
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def summary(self) -> Dict:
+        wall = self.wall_seconds
+        return {
+            'wall_seconds': round(wall, 3),
+            'fetch': self.fetch.summary(wall),
+            'decode': self.decode.summary(wall),
+            'merge': self.merge.summary(wall),
+        }
+
+    def describe(self) -> str:
+        return (f"descarga {self.fetch.items} en {self.fetch.busy_seconds:.1f}s·hilo, "
+                f"decodificación {self.decode.items} en {self.decode.busy_seconds:.1f}s·proceso "
+                f"(cola {self.decode.wait_seconds:.1f}s), "
+                f"fusión {self.merge.busy_seconds:.1f}s (espera {self.merge.wait_seconds:.1f}s), "
+                f"total {self.wall_seconds:.1f}s")
+
+
+def _timed_call(function: Callable, path: str, args: Tuple):
+    """Ejecuta la decodificación en el proceso trabajador y mide su duración."""
+    started = time.monotonic()
+    result = function(path, *args)
+    return result, time.monotonic() - started
+
+
+_decode_pool = None
+_decode_pool_lock = threading.Lock()
+
+
+def get_decode_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Pool de procesos compartido para la decodificación. Se crea con 'spawn': el
+    servidor usa hilos y bifurcar un proceso con hilos (y HDF5) activos no es seguro.
+    El tamaño lo fija la primera solicitud que lo crea.
+    """
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is None:
+            _decode_pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+            logger.info(f"🧵 Pool de decodificación creado con {workers} procesos")
+        return _decode_pool
+
+
+def reset_decode_pool(pool: ProcessPoolExecutor):
+    """Descarta un pool roto (p. ej. un trabajador terminado) para que se vuelva a crear."""
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is pool:
+            _decode_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class DecodePipeline:
+    """
+    Iterador de bloques temporales producido por el canal descarga → decodificación
+    → fusión ordenada. Las descargas empiezan al pedir el primer bloque.
+
+    Un día cuya descarga o decodificación falla se omite sin detener a los demás;
+    las excepciones de la descarga (p. ej. SourceCancelled) se propagan al consumidor.
+    """
+
+    def __init__(self, items: Sequence, fetch: Callable[[int], Optional[str]],
+                 decode: Callable[..., Optional[xr.Dataset]], decode_args: Tuple = (),
+                 fetch_workers: int = 4, decode_workers: int = 1, queue_size: int = 8,
+                 block_size: Optional[int] = None, release: Optional[Callable[[str], None]] = None,
+                 cancel_event=None, name: str = "reanálisis"):
+        """
+        Args:
+            items: Elementos a procesar en orden (p. ej. fechas); solo se usan en los mensajes
+            fetch: Descarga el elemento i y devuelve la ruta del archivo o el DownloadSpool
+                (o None si falla);
+                debe abandonar la descarga cuando se activa `stop_event`
+            decode: Función de nivel de módulo (serializable) que abre el archivo y
+                devuelve el dataset recortado y cargado en memoria, o None
+            decode_args: Argumentos adicionales de decode tras la ruta
+            fetch_workers: Hilos de descarga
+            decode_workers: Procesos de decodificación
+            queue_size: Días en curso como máximo (descargando, por decodificar o por fusionar)
+            block_size: Pasos de tiempo por bloque (por defecto REANALYSIS_TIME_CHUNK)
+            release: Se llama con lo devuelto por fetch cuando ya no se necesita
+            cancel_event: threading.Event opcional para abandonar el canal
+            name: Nombre de la fuente para los mensajes
+        """
+        self.items = list(items)
+        self.fetch = fetch
+        self.decode = decode
+        self.decode_args = decode_args
+        self.fetch_workers = max(1, fetch_workers)
+        self.decode_workers = max(1, decode_workers)
+        self.queue_size = max(1, queue_size)
+        self.block_size = block_size or time_chunk_size()
+        self.release = release
+        self.cancel_event = cancel_event
+        self.name = name
+        self.metrics = PipelineMetrics(
+            fetch=StageMetrics('fetch', self.fetch_workers),
+            decode=StageMetrics('decode', self.decode_workers),
+            merge=StageMetrics('merge', 1),
+        )
+        # Se activa al cerrar el canal (agotado, cerrado, cancelado o con error)
+        self.stop_event = threading.Event()
+        self._fetch_pool: Optional[ThreadPoolExecutor] = None
+        self._blocks = self._run()
+
+    def __iter__(self) -> Iterator[xr.Dataset]:
+        return self
+
+    def __next__(self) -> xr.Dataset:
+        return next(self._blocks)
+
+    def close(self):
+        """Detiene el canal: cancela las descargas pendientes y libera los archivos."""
+        self._blocks.close()
+
+    def _run(self) -> Iterator[xr.Dataset]:
+        n = len(self.items)
+        self.metrics.started = time.monotonic()
+        self._fetch_pool = ThreadPoolExecutor(max_workers=min(self.fetch_workers, max(1, n)),
+                                              thread_name_prefix=f"{self.name}-dl")
+        logger.info(f"🔀 Canal {self.name}: {n} días, descarga={self.fetch_workers} hilos, "
+                    f"decodificación={self.decode_workers} procesos, cola={self.queue_size}")
+        pending: Dict[int, Future] = {}
+        next_submit = next_merge = 0
+        parts: List[xr.Dataset] = []
+        steps = 0
+        produced = False
+        try:
+            while next_merge < n:
+                while next_submit < n and next_submit - next_merge < self.queue_size:
+                    pending[next_submit] = self._start(next_submit)
+                    next_submit += 1
+
+                waited = time.monotonic()
+                result = self._wait(pending.pop(next_merge))
+                waited = time.monotonic() - waited
+                item = self.items[next_merge]
+                next_merge += 1
+                if result is None:
+                    logger.warning(f"No se pudo obtener {self.name} para {item}; se omite")
+                    self.metrics.merge.record(0.0, wait=waited, failed=True)
+                    continue
+
+                started = time.monotonic()
+                parts.append(result)
+                steps += result.sizes.get('time', 0)
+                ready = []
+                while steps >= self.block_size:
+                    merged = xr.concat(parts, dim='time') if len(parts) > 1 else parts[0]
+                    ready.append(merged.isel(time=slice(0, self.block_size)))
+                    rest = merged.isel(time=slice(self.block_size, None))
+                    parts = [rest] if rest.sizes['time'] else []
+                    steps -= self.block_size
+                self.metrics.merge.record(time.monotonic() - started, wait=waited)
+                for block in ready:
+                    produced = True
+                    yield block
+
+            if parts:
+                started = time.monotonic()
+                block = xr.concat(parts, dim='time') if len(parts) > 1 else parts[0]
+                parts = []
+                self.metrics.merge.busy_seconds += time.monotonic() - started
+                produced = True
+                yield block
+            if not produced:
+                raise ValueError(f"No se pudieron obtener datos {self.name} para ninguna fecha")
+        finally:
+            self.stop_event.set()
+            self._fetch_pool.shutdown(wait=False, cancel_futures=True)
+            self.metrics.finished = time.monotonic()
+            logger.info(f"📊 Canal {self.name}: {self.metrics.describe()}")
+
+    def _wait(self, future: Future):
+        """Espera el resultado de un día comprobando la cancelación."""
+        while True:
+            try:
+                return future.result(timeout=WAIT_POLL_SECONDS)
+            except FuturesTimeout:
+                check_cancelled(self.cancel_event, self.name)
+
+    def _start(self, index: int) -> Future:
+        """Lanza la descarga del elemento; su decodificación se encadena al terminar."""
+        out = Future()
+        out.set_running_or_notify_cancel()
+
+        def fetch_task():
+            started = time.monotonic()
+            path = None
+            try:
+                path = self.fetch(index)
+                return path
+            finally:
+                self.metrics.fetch.record(time.monotonic() - started, failed=path is None)
+
+        def after_fetch(future: Future):
+            if future.cancelled():
+                out.set_result(None)
+                return
+            error = future.exception()
+            if error is not None:
+                out.set_exception(error)
+                return
+            path = future.result()
+            if path is None:
+                out.set_result(None)
+            elif self.stop_event.is_set():
+                self._release(path)
+                out.set_result(None)
+            else:
+                self._submit_decode(index, path, out)
+
+        self._fetch_pool.submit(fetch_task).add_done_callback(after_fetch)
+        return out
+
+    def _submit_decode(self, index: int, path: str, out: Future):
+        queued = time.monotonic()
+        pool = get_decode_pool(self.decode_workers)
+
+        def finish(result, busy: float, failed: bool = False):
+            self._release(path)
+            self.metrics.decode.record(busy, wait=time.monotonic() - queued - busy, failed=failed)
+            out.set_result(result)
+
+        def decode_inline(reason: Exception):
+            # Un pool roto no debe perder el día: se decodifica en este hilo
+            logger.warning(f"⚠️ Pool de decodificación no disponible ({reason}); "
+                           f"se decodifica {self.items[index]} en el proceso principal")
+            reset_decode_pool(pool)
+            started = time.monotonic()
+            try:
+                result = self.decode(path, *self.decode_args)
+            except Exception as e:
+                logger.error(f"❌ Error decodificando {self.name} de {self.items[index]}: {e}")
+                result = None
+            finish(result, time.monotonic() - started, failed=result is None)
+
+        def after_decode(future: Future):
+            try:
+                result, busy = future.result()
+            except BrokenProcessPool as e:
+                decode_inline(e)
+                return
+            except Exception as e:
+                logger.error(f"❌ Error decodificando {self.name} de {self.items[index]}: {e}")
+                finish(None, time.monotonic() - queued, failed=True)
+                return
+            finish(result, busy, failed=result is None)
+
+        try:
+            future = pool.submit(_timed_call, self.decode, path, self.decode_args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            decode_inline(e)
+            return
+        future.add_done_callback(after_decode)
+
+    def _release(self, path: str):
+        if self.release is not None:
+            try:
+                self.release(path)
+            except Exception as e:
+                logger.warning(f"No se pudo liberar {path}: {e}")
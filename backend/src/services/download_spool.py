@@ -0,0 +1,409 @@
+"""
+Destinos de descarga sin pasar por el disco del contenedor.
+
+Las descargas NetCDF (archivos diarios MERRA-2, respuestas mensuales de CDS) se
+escribían en un temporal en disco para volver a leerse con xarray justo después.
+En contenedores con overlayfs ese ciclo escritura/lectura se nota. Aquí:
+
+  - DownloadSpool guarda la descarga en memoria y la abre directamente desde los
+    bytes (netCDF4 con memory=); si supera REANALYSIS_SPOOL_MAX_MB se vuelca a un
+    archivo en REANALYSIS_SPOOL_DIR (tmpfs /dev/shm por defecto).
+  - spool_file_path da una ruta para descargas que solo saben escribir en un
+    archivo (cdsapi): en el tmpfs si el tamaño anunciado cabe en el umbral.
+
+El tmpfs es pequeño (64 MB en Docker por defecto), así que los archivos del proceso
+en REANALYSIS_SPOOL_DIR comparten un presupuesto (REANALYSIS_SPOOL_DIR_MAX_MB) y se
+comprueba el espacio libre antes de cada reserva; lo que no cabe va al directorio
+temporal del sistema, también si un archivo volcado crece por encima de lo reservado.
+
+El disco solo se usa cuando la descarga se guarda en una caché. Con
+REANALYSIS_SPOOL_MODE=disk se vuelve a los temporales en disco.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from itertools import count
+from typing import Dict, Optional, Union
+
+import netCDF4
+import xarray as xr
+from xarray.backends.netCDF4_ import NETCDF4_PYTHON_LOCK
+
+logger = logging.getLogger(__name__)
+
+# Directorio tmpfs habitual en Linux
+SHM_DIR = "/dev/shm"
+
+# HDF5 no es seguro entre hilos y netCDF4 libera el GIL. xarray toma NETCDF4_PYTHON_LOCK
+# (no reentrante) llamada a llamada, pero no durante la apertura, lectura y cierre completos
+# de un archivo, y varios hilos escribiendo y leyendo cachés a la vez acaban en un
+# segfault. Toda E/S NetCDF con xarray entre hilos (cachés, lectura por bloques) se hace
+# con este candado reentrante. Nunca se pide teniendo NETCDF4_PYTHON_LOCK.
+NETCDF_IO_LOCK = threading.RLock()
+
+# Espacio que se deja siempre libre en el directorio de vuelco
+SPOOL_DIR_FREE_MARGIN = 8 * 1024 * 1024
+
+_spool_ids = count()
+
+# Bytes reservados por el proceso en el directorio de vuelco y reservas de spool_file_path
+_space_lock = threading.Lock()
+_space_reserved = 0
+_file_reservations: Dict[str, int] = {}
+
+
+def spool_mode() -> str:
+    """'memory' (por defecto) o 'disk' (REANALYSIS_SPOOL_MODE)."""
+    mode = os.environ.get("REANALYSIS_SPOOL_MODE", "memory").lower()
+    return mode if mode in ("memory", "disk") else "memory"
+
+
+def spool_max_bytes() -> int:
+    """Tamaño máximo de una descarga en memoria o en el tmpfs (REANALYSIS_SPOOL_MAX_MB)."""
+    return int(float(os.environ.get("REANALYSIS_SPOOL_MAX_MB", "256")) * 1024 * 1024)
+
+
+def spool_dir_max_bytes() -> int:
+    """Presupuesto del proceso en el directorio de vuelco (REANALYSIS_SPOOL_DIR_MAX_MB)."""
+    return int(float(os.environ.get("REANALYSIS_SPOOL_DIR_MAX_MB", "48")) * 1024 * 1024)
+
+
+def spool_dir() -> str:
+    """Directorio de desbordamiento (REANALYSIS_SPOOL_DIR; /dev/shm si existe y es escribible)."""
+    configured = os.environ.get("REANALYSIS_SPOOL_DIR")
+    if configured:
+        return configured
+    if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK):
+        return SHM_DIR
+    return tempfile.gettempdir()
+
+
+def _is_fallback_dir(directory: str) -> bool:
+    """Indica si el directorio es el temporal del sistema (sin presupuesto propio)."""
+    return os.path.realpath(directory) == os.path.realpath(tempfile.gettempdir())
+
+
+def _reserve_space(directory: str, nbytes: int) -> bool:
+    """
+    Reserva nbytes en el directorio de vuelco si caben en el presupuesto del proceso
+    y en el espacio libre del sistema de archivos (dejando SPOOL_DIR_FREE_MARGIN).
+    """
+    global _space_reserved
+    with _space_lock:
+        if _space_reserved + nbytes > spool_dir_max_bytes():
+            return False
+        try:
+            free = shutil.disk_usage(directory).free
+        except OSError:
+            return False
+        if free - nbytes < SPOOL_DIR_FREE_MARGIN:
+            return False
+        _space_reserved += nbytes
+        return True
+
+
+def _release_space(nbytes: int):
+    global _space_reserved
+    with _space_lock:
+        _space_reserved = max(0, _space_reserved - nbytes)
+
+
+def spool_file_path(expected_bytes: Optional[int] = None, suffix: str = ".nc") -> str:
+    """
+    Crea un archivo vacío para una descarga que el cliente escribe por ruta. Se
+    libera con release_download_target.
+
+    Args:
+        expected_bytes: Tamaño anunciado de la descarga (si se conoce)
+
+    Returns:
+        str: Ruta en el tmpfs si el modo es 'memory', el tamaño conocido cabe en el
+        umbral y hay espacio reservable; en el directorio temporal del sistema en otro caso
+    """
+    directory = None
+    if spool_mode() == "memory" and expected_bytes is not None and expected_bytes <= spool_max_bytes():
+        directory = spool_dir()
+        if not _is_fallback_dir(directory) and not _reserve_space(directory, expected_bytes):
+            logger.info(f"💾 Sin espacio reservable en {directory} para {expected_bytes / 1e6:.0f} MB; "
+                        f"se usa {tempfile.gettempdir()}")
+            directory, expected_bytes = None, None
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    os.close(fd)
+    if directory is not None and not _is_fallback_dir(directory):
+        with _space_lock:
+            _file_reservations[path] = expected_bytes
+    return path
+
+
+class _SpoolWriter:
+    """Escritura secuencial en un DownloadSpool, con vuelco a archivo al superar el umbral."""
+
+    def __init__(self, spool: "DownloadSpool", append: bool, buffering: int):
+        self.spool = spool
+        self.buffering = buffering
+        self._file = None
+        if spool.path is not None:
+            self._file = open(spool.path, 'ab' if append else 'wb', buffering=buffering)
+
+    def write(self, data: bytes) -> int:
+        spool = self.spool
+        if self._file is None and len(spool._buffer) + len(data) > spool.max_memory_bytes:
+            self._file = spool._spill(self.buffering)
+        if self._file is not None:
+            if spool._reserved is not None:
+                if _reserve_space(spool.spill_dir, len(data)):
+                    spool._reserved += len(data)
+                else:
+                    self._file = spool._move_to_disk(self._file, self.buffering)
+            return self._file.write(data)
+        spool._buffer += data
+        return len(data)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _MemoryReader:
+    """Lectura secuencial del búfer de un DownloadSpool sin copiarlo entero."""
+
+    def __init__(self, buffer: bytearray):
+        self._view = memoryview(buffer)
+        self._offset = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else self._offset + size
+        data = self._view[self._offset:end].tobytes()
+        self._offset += len(data)
+        return data
+
+    def close(self):
+        self._view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DownloadSpool:
+    """
+    Contenido de una descarga en memoria, con vuelco a un archivo en el tmpfs si
+    crece por encima de max_memory_bytes. Se abre con open() como un archivo
+    ('wb', 'ab' o 'rb') y se pasa a open_netcdf para leerlo con xarray.
+
+    Es serializable: al enviarse a otro proceso viaja el contenido (o la ruta del
+    archivo volcado, que sigue perteneciendo al proceso que lo creó).
+    """
+
+    def __init__(self, max_memory_bytes: Optional[int] = None, spill_dir: Optional[str] = None,
+                 suffix: str = ".nc4", name: Optional[str] = None):
+        """
+        Args:
+            max_memory_bytes: Umbral de vuelco (por defecto REANALYSIS_SPOOL_MAX_MB)
+            spill_dir: Directorio del archivo volcado (por defecto REANALYSIS_SPOOL_DIR)
+            suffix: Extensión del archivo volcado
+            name: Nombre para mensajes y para el dataset en memoria
+        """
+        self.max_memory_bytes = spool_max_bytes() if max_memory_bytes is None else max_memory_bytes
+        self.spill_dir = spill_dir or spool_dir()
+        self.suffix = suffix
+        self.name = name or f"spool-{next(_spool_ids)}{suffix}"
+        self.path: Optional[str] = None
+        self._buffer = bytearray()
+        # Bytes reservados en spill_dir por el archivo volcado (None si no está allí)
+        self._reserved: Optional[int] = None
+        self._owner = True
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        if self.path is not None:
+            try:
+                return os.path.getsize(self.path)
+            except OSError:
+                return 0
+        return len(self._buffer)
+
+    @property
+    def in_memory(self) -> bool:
+        return self.path is None
+
+    def open(self, mode: str = 'rb', buffering: int = -1):
+        """
+        Args:
+            mode: 'wb' (trunca), 'ab' (continúa) o 'rb'
+
+        Returns:
+            Objeto tipo archivo con write() o read(), usable con `with`
+        """
+        if mode == 'rb':
+            return open(self.path, 'rb') if self.path is not None else _MemoryReader(self._buffer)
+        if mode not in ('wb', 'ab'):
+            raise ValueError(f"Modo no soportado: {mode}")
+        if mode == 'wb':
+            # Reasignar en lugar de vaciar: un dataset abierto puede conservar el búfer anterior
+            self._buffer = bytearray()
+            if self._reserved:
+                _release_space(self._reserved)
+                self._reserved = 0
+        return _SpoolWriter(self, append=mode == 'ab', buffering=buffering)
+
+    def _spill(self, buffering: int):
+        """
+        Pasa el contenido a un archivo y devuelve el archivo abierto para seguir escribiendo:
+        en spill_dir si cabe en su presupuesto, o en el directorio temporal del sistema.
+        """
+        directory = self.spill_dir
+        if not _is_fallback_dir(directory):
+            if _reserve_space(directory, len(self._buffer)):
+                self._reserved = len(self._buffer)
+            else:
+                directory = tempfile.gettempdir()
+        fd, path = tempfile.mkstemp(suffix=self.suffix, dir=directory)
+        f = os.fdopen(fd, 'wb', buffering=buffering)
+        f.write(self._buffer)
+        self.path = path
+        self._buffer = bytearray()
+        logger.info(f"💾 Descarga {self.name} supera {self.max_memory_bytes / 1e6:.0f} MB; "
+                    f"se vuelca a {directory}")
+        return f
+
+    def _move_to_disk(self, f, buffering: int):
+        """Mueve el archivo volcado al directorio temporal del sistema y lo reabre para añadir."""
+        f.close()
+        fd, path = tempfile.mkstemp(suffix=self.suffix)
+        os.close(fd)
+        shutil.move(self.path, path)
+        self.path = path
+        self._free_reservation()
+        logger.info(f"💾 {self.spill_dir} sin espacio reservable; la descarga {self.name} sigue en {path}")
+        return open(path, 'ab', buffering=buffering)
+
+    def _free_reservation(self):
+        if self._reserved:
+            _release_space(self._reserved)
+        self._reserved = None
+
+    def save(self, path: str):
+        """Escribe el contenido en `path` (mueve el archivo volcado) y vacía el spool."""
+        if self.path is not None:
+            shutil.move(self.path, path)
+            self.path = None
+            self._free_reservation()
+        else:
+            with open(path, 'wb') as f:
+                f.write(self._buffer)
+        self._buffer = bytearray()
+
+    def close(self):
+        """Libera la memoria y borra el archivo volcado (si pertenece a este proceso)."""
+        with self._lock:
+            self._buffer = bytearray()
+            path, self.path = self.path, None
+            self._free_reservation()
+        if path is not None and self._owner:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar {path}: {e}")
+
+    def __getstate__(self):
+        return {'max_memory_bytes': self.max_memory_bytes, 'spill_dir': self.spill_dir, 'suffix': self.suffix,
+                'name': self.name, 'path': self.path, 'buffer': self._buffer}
+
+    def __setstate__(self, state):
+        self.max_memory_bytes = state['max_memory_bytes']
+        self.spill_dir = state['spill_dir']
+        self.suffix = state['suffix']
+        self.name = state['name']
+        self.path = state['path']
+        self._buffer = state['buffer']
+        self._reserved = None
+        self._owner = False
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        where = self.path if self.path is not None else "memoria"
+        return f"DownloadSpool({self.name}, {self.size} bytes, {where})"
+
+
+# Una descarga: ruta de archivo o spool
+DownloadTarget = Union[str, DownloadSpool]
+
+
+def new_download_target(suffix: str = ".nc4", name: Optional[str] = None) -> DownloadTarget:
+    """Spool en memoria, o un temporal en disco con REANALYSIS_SPOOL_MODE=disk."""
+    if spool_mode() == "memory":
+        return DownloadSpool(suffix=suffix, name=name)
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def open_download_target(target: DownloadTarget, mode: str = 'rb', buffering: int = -1):
+    """open() sobre una ruta o un DownloadSpool ('wb', 'ab' o 'rb')."""
+    if isinstance(target, DownloadSpool):
+        return target.open(mode, buffering)
+    return open(target, mode, buffering=buffering)
+
+
+def release_download_target(target: DownloadTarget):
+    """Libera un destino de descarga (borra el temporal o vacía el spool)."""
+    if isinstance(target, DownloadSpool):
+        target.close()
+        return
+    with _space_lock:
+        reserved = _file_reservations.pop(target, None)
+    if reserved:
+        _release_space(reserved)
+    try:
+        if os.path.exists(target):
+            os.unlink(target)
+    except OSError as e:
+        logger.warning(f"No se pudo eliminar archivo temporal {target}: {e}")
+
+
+def open_netcdf4(source: DownloadTarget) -> netCDF4.Dataset:
+    """
+    netCDF4.Dataset de solo lectura sobre una ruta o un DownloadSpool. El llamador
+    debe tener NETCDF4_PYTHON_LOCK mientras lo usa y cerrarlo al terminar.
+    """
+    if isinstance(source, DownloadSpool) and source.path is None:
+        return netCDF4.Dataset(source.name, mode='r', memory=source._buffer)
+    return netCDF4.Dataset(source.path if isinstance(source, DownloadSpool) else source, mode='r')
+
+
+def netcdf_source(source: DownloadTarget):
+    """
+    Lo que acepta xarray para abrir un destino de descarga: la ruta, o un
+    NetCDF4DataStore sobre los bytes si el spool está en memoria.
+    """
+    if not isinstance(source, DownloadSpool):
+        return source
+    if source.path is not None:
+        return source.path
+    if not source._buffer:
+        raise ValueError(f"{source.name} está vacío")
+    # HDF5 no admite aperturas concurrentes: el mismo candado que usa xarray al abrir por ruta
+    # (netCDF4 conserva una referencia al búfer mientras el dataset está abierto)
+    with NETCDF4_PYTHON_LOCK:
+        return xr.backends.NetCDF4DataStore(open_netcdf4(source))
+
+
+def open_netcdf(source: DownloadTarget, **kwargs) -> xr.Dataset:
+    """xr.open_dataset sobre una ruta o un DownloadSpool (desde memoria si es posible)."""
+    return xr.open_dataset(netcdf_source(source), **kwargs)
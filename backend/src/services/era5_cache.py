@@ -0,0 +1,544 @@
+"""
+Caché local de descargas ERA5 alineada a la malla nativa de 0.25°.
+Cada entrada guarda un tile (bloque de celdas de la malla), un día y una variable
+en un archivo NetCDF, de modo que solicitudes solapadas reutilizan lo ya descargado
+y a CDS solo se le piden los tiles que faltan. Las entradas con datos ERA5T
+(preliminares) se marcan en su clave para poder reemplazarlas por los finales.
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from src.services.disk_cache import DiskLRUCache
+from src.services.download_spool import NETCDF_IO_LOCK
+from src.services.reanalysis_processing import ClosingBlocks, WindAggregate, speed_direction
+from src.services.wind_pyramid import WindPyramid
+
+logger = logging.getLogger(__name__)
+
+# Resolución nativa de ERA5 single-levels
+ERA5_GRID_STEP = 0.25
+
+# Variables ERA5: nombre corto en NetCDF -> nombre de la API CDS
+ERA5_VARIABLES = {
+    "u10": "10m_u_component_of_wind",
+    "v10": "10m_v_component_of_wind",
+    "u100": "100m_u_component_of_wind",
+    "v100": "100m_v_component_of_wind",
+    "t2m": "2m_temperature",
+    "sp": "surface_pressure",
+}
+
+# Tamaño de una entrada sin datos (cabeceras NetCDF4/HDF5), medido con tiles de 2°
+ENTRY_OVERHEAD_BYTES = 12 * 1024
+
+# expver con que CDS marca los pasos de tiempo ERA5T ('0001' es ERA5 final)
+ERA5T_EXPVER = 5
+
+DEFAULT_CACHE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "temp", "era5_cache")
+)
+
+_KEY_PATTERN = re.compile(
+    r"^(?P<var>\w+)/(?P<y>\d{4})/(?P<m>\d{2})/(?P<d>\d{2})/"
+    r"tile_(?P<ti>-?\d+)_(?P<tj>-?\d+)_h(?P<mask>[0-9a-f]{6})(?P<era5t>_t)?\.nc$"
+)
+
+
+def normalize_era5_dataset(ds: xr.Dataset) -> xr.Dataset:
+    """
+    Normaliza un dataset ERA5 descargado de CDS (el formato nuevo usa
+    'valid_time' y añade coordenadas auxiliares como 'number' o 'expver').
+    """
+    if "valid_time" in ds.dims or "valid_time" in ds.coords:
+        ds = ds.rename({"valid_time": "time"})
+    return ds.drop_vars(["number", "expver"], errors="ignore")
+
+
+def preliminary_steps(ds: xr.Dataset) -> np.ndarray:
+    """
+    Pasos de tiempo con datos ERA5T de un dataset descargado de CDS, según su
+    coordenada expver (hay que consultarla antes de normalize_era5_dataset).
+
+    Returns:
+        np.ndarray: bool por paso de tiempo
+    """
+    n_times = ds.sizes.get("valid_time", ds.sizes.get("time", 1))
+    if "expver" not in ds.variables:
+        return np.zeros(n_times, dtype=bool)
+    flags = np.array([int(v) == ERA5T_EXPVER for v in np.atleast_1d(ds["expver"].values)])
+    if flags.size != n_times:
+        return np.full(n_times, bool(flags.any()))
+    return flags
+
+
+def hours_mask(hours: Iterable[int]) -> int:
+    """Máscara de bits (24 bits) con las horas UTC contenidas."""
+    mask = 0
+    for h in hours:
+        mask |= 1 << int(h)
+    return mask
+
+
+def _grid_floor(value: float) -> int:
+    return int(math.floor(round(value / ERA5_GRID_STEP, 6)))
+
+
+def _grid_ceil(value: float) -> int:
+    return int(math.ceil(round(value / ERA5_GRID_STEP, 6)))
+
+
+class TileLease:
+    """
+    Entradas de la caché fijadas para una solicitud, desde find_missing (las que ya
+    estaban) y store_dataset (las descargadas) hasta release(). Mientras tanto no se
+    desalojan por cuota ni se borran si otra solicitud las reemplaza al fusionar
+    horas, y load lee exactamente esas claves.
+    """
+
+    def __init__(self, store: DiskLRUCache):
+        self.store = store
+        self._keys: Dict[Tuple[str, date, int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, entry: Tuple[str, date, int, int], key: str):
+        """Registra una clave ya fijada; suelta la anterior del mismo (variable, día, tile)."""
+        with self._lock:
+            previous = self._keys.get(entry)
+            self._keys[entry] = key
+        if previous is not None:
+            self.store.unpin(previous)
+
+    def path(self, entry: Tuple[str, date, int, int]) -> Optional[str]:
+        """Ruta de la entrada fijada, o None si no forma parte del préstamo."""
+        with self._lock:
+            key = self._keys.get(entry)
+        return self.store.path_for(key) if key is not None else None
+
+    def release(self):
+        """Suelta todas las fijaciones (se puede llamar más de una vez)."""
+        with self._lock:
+            keys, self._keys = list(self._keys.values()), {}
+        for key in keys:
+            self.store.unpin(key)
+
+
+class ERA5TileCache:
+    """
+    Caché de tiles ERA5 en disco con desalojo LRU por cuota.
+
+    Una ventana de celdas se expresa en índices enteros de la malla
+    (lat = i * 0.25, lon = j * 0.25). Los tiles agrupan tile_cells x tile_cells
+    celdas y se identifican por (ti, tj) = (i // tile_cells, j // tile_cells).
+    """
+
+    def __init__(self, cache_dir: str = None, tile_size_deg: float = None, max_bytes: int = None,
+                 pyramid_dir: str = None):
+        cache_dir = cache_dir or os.environ.get("ERA5_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if tile_size_deg is None:
+            tile_size_deg = float(os.environ.get("ERA5_CACHE_TILE_DEG", "2.0"))
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("ERA5_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+        pyramid_dir = pyramid_dir or os.environ.get("ERA5_PYRAMID_DIR", os.path.normpath(cache_dir) + "_pyramid")
+        pyramid_bytes = int(float(os.environ.get("ERA5_PYRAMID_MAX_MB", "512")) * 1024 * 1024)
+
+        self.tile_cells = max(1, int(round(tile_size_deg / ERA5_GRID_STEP)))
+        self.store = DiskLRUCache(cache_dir, max_bytes)
+        # Agregados día/mes/año del viento a 10 m por tile (resúmenes sin leer datos horarios)
+        self.pyramid = WindPyramid(pyramid_dir, pyramid_bytes)
+        self._lock = threading.RLock()
+        # (variable, día, ti, tj) -> (clave, máscara de horas, datos ERA5T)
+        self._index: Dict[Tuple[str, date, int, int], Tuple[str, int, bool]] = {}
+        self._build_index()
+        logger.info(
+            f"ERA5TileCache inicializada en {cache_dir} "
+            f"(tile={self.tile_cells * ERA5_GRID_STEP}°, cuota={max_bytes} bytes)"
+        )
+
+    def _build_index(self):
+        for key in self.store.keys():
+            m = _KEY_PATTERN.match(key)
+            if not m:
+                continue
+            day = date(int(m["y"]), int(m["m"]), int(m["d"]))
+            self._index[(m["var"], day, int(m["ti"]), int(m["tj"]))] = (key, int(m["mask"], 16), bool(m["era5t"]))
+
+    @staticmethod
+    def _make_key(variable: str, day: date, ti: int, tj: int, mask: int, preliminary: bool = False) -> str:
+        suffix = "_t" if preliminary else ""
+        return f"{variable}/{day:%Y}/{day:%m}/{day:%d}/tile_{ti}_{tj}_h{mask:06x}{suffix}.nc"
+
+    # ------------------------------------------------------------------
+    # Geometría de la malla
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def cell_window(lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> Tuple[int, int, int, int]:
+        """
+        Ventana de celdas (i0, i1, j0, j1), inclusiva, que cubre el bbox
+        ajustado hacia afuera a la malla de 0.25°.
+        """
+        return _grid_floor(lat_min), _grid_ceil(lat_max), _grid_floor(lon_min), _grid_ceil(lon_max)
+
+    def tiles_for_window(self, window: Tuple[int, int, int, int]) -> List[Tuple[int, int]]:
+        """Tiles que intersectan una ventana de celdas."""
+        i0, i1, j0, j1 = window
+        c = self.tile_cells
+        return [(ti, tj)
+                for ti in range(i0 // c, i1 // c + 1)
+                for tj in range(j0 // c, j1 // c + 1)]
+
+    def tiles_area(self, tiles: Iterable[Tuple[int, int]]) -> List[float]:
+        """Área CDS [N, W, S, E] que cubre exactamente un conjunto de tiles."""
+        tiles = list(tiles)
+        c = self.tile_cells
+        ti_min = min(t[0] for t in tiles)
+        ti_max = max(t[0] for t in tiles)
+        tj_min = min(t[1] for t in tiles)
+        tj_max = max(t[1] for t in tiles)
+        return [
+            (ti_max * c + c - 1) * ERA5_GRID_STEP,
+            tj_min * c * ERA5_GRID_STEP,
+            ti_min * c * ERA5_GRID_STEP,
+            (tj_max * c + c - 1) * ERA5_GRID_STEP,
+        ]
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def _lookup(self, variable: str, day: date, ti: int, tj: int) -> Optional[Tuple[str, int, bool]]:
+        with self._lock:
+            entry = self._index.get((variable, day, ti, tj))
+            if entry is None:
+                return None
+            if not self.store.contains(entry[0]):
+                # Desalojada por LRU
+                del self._index[(variable, day, ti, tj)]
+                return None
+            return entry
+
+    def find_missing(self, window: Tuple[int, int, int, int], days: List[date], variables: List[str],
+                     hours: List[int], final_before: Optional[date] = None,
+                     lease: Optional[TileLease] = None) -> Set[Tuple[str, date, Tuple[int, int]]]:
+        """
+        Combinaciones (variable, día, tile) que no están en caché con todas las horas pedidas.
+
+        Args:
+            final_before: Si se indica, las entradas ERA5T de días hasta esa fecha (ya
+                          publicados como ERA5 final) también cuentan como ausentes
+            lease: Si se indica, fija las entradas presentes hasta lease.release()
+        """
+        wanted = hours_mask(hours)
+        missing = set()
+        for tile in self.tiles_for_window(window):
+            for day in days:
+                for var in variables:
+                    entry = self._lookup(var, day, tile[0], tile[1])
+                    if (entry is None or (entry[1] & wanted) != wanted or
+                            (final_before is not None and entry[2] and day <= final_before)):
+                        missing.add((var, day, tile))
+                    elif lease is not None:
+                        if self.store.get(entry[0], pin=True) is None:
+                            missing.add((var, day, tile))  # desalojada tras la consulta
+                        else:
+                            lease.add((var, day, tile[0], tile[1]), entry[0])
+        return missing
+
+    def lease(self) -> TileLease:
+        """Nuevo préstamo de entradas para find_missing/store_dataset/iter_load."""
+        return TileLease(self.store)
+
+    def fits(self, window: Tuple[int, int, int, int], days: List[date], variables: List[str],
+             hours: List[int]) -> bool:
+        """
+        Si las entradas de la ventana caben a la vez en la cuota (estimación por exceso,
+        sin compresión). Si no, fijarlas todas la superaría y guardarlas desalojaría
+        las primeras antes de leerlas.
+        """
+        c = self.tile_cells
+        entry_bytes = c * c * len(hours) * 4 + ENTRY_OVERHEAD_BYTES
+        n_entries = len(self.tiles_for_window(window)) * len(days) * len(variables)
+        return n_entries * entry_bytes <= self.store.max_bytes
+
+    def _read_entry(self, key: str) -> Optional[xr.Dataset]:
+        """
+        Lee en memoria una entrada, fijada mientras se abre para que no se desaloje
+        entre store.get y la apertura.
+
+        Returns:
+            xr.Dataset: Contenido de la entrada, o None si ya no está en caché
+        """
+        path = self.store.get(key, pin=True)
+        if path is None:
+            return None
+        try:
+            with NETCDF_IO_LOCK, xr.open_dataset(path) as f:
+                return f.load()
+        finally:
+            self.store.unpin(key)
+
+    def preliminary_days(self, window: Tuple[int, int, int, int], final_before: date) -> Set[date]:
+        """Días hasta final_before con alguna entrada ERA5T en los tiles de la ventana."""
+        tiles = set(self.tiles_for_window(window))
+        with self._lock:
+            entries = list(self._index.items())
+        return {day for (_, day, ti, tj), (key, _, preliminary) in entries
+                if preliminary and day <= final_before and (ti, tj) in tiles and self.store.contains(key)}
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def store_dataset(self, ds: xr.Dataset, lease: Optional[TileLease] = None) -> int:
+        """
+        Parte un dataset ERA5 descargado en tiles/día/variable y lo guarda.
+        Solo se guardan tiles completos alineados a la malla. Un tile-día es ERA5T si
+        lo es alguno de sus pasos de tiempo. Con lease, las entradas escritas quedan
+        fijadas hasta lease.release().
+
+        Returns:
+            int: Número de entradas escritas
+        """
+        # Leer en memoria con el candado; después se toma solo para leer o escribir cada
+        # entrada, de modo que otras solicitudes leen tiles entre una escritura y la siguiente
+        with NETCDF_IO_LOCK:
+            ds = ds.load()
+        preliminary = preliminary_steps(ds)
+        ds = normalize_era5_dataset(ds)
+        lat_idx = np.rint(ds.latitude.values / ERA5_GRID_STEP).astype(int)
+        lon_idx = np.rint(ds.longitude.values / ERA5_GRID_STEP).astype(int)
+        if (not np.allclose(lat_idx * ERA5_GRID_STEP, ds.latitude.values, atol=1e-4) or
+                not np.allclose(lon_idx * ERA5_GRID_STEP, ds.longitude.values, atol=1e-4)):
+            logger.warning("⚠️ Dataset ERA5 no alineado a la malla de 0.25°; no se cachea")
+            return 0
+
+        times = pd.DatetimeIndex(ds.time.values)
+        day_of = times.normalize()
+        c = self.tile_cells
+        written = 0
+
+        for ti in np.unique(lat_idx // c):
+            lat_pos = np.where(lat_idx // c == ti)[0]
+            if len(lat_pos) != c:
+                continue
+            for tj in np.unique(lon_idx // c):
+                lon_pos = np.where(lon_idx // c == tj)[0]
+                if len(lon_pos) != c:
+                    continue
+                for day in day_of.unique():
+                    t_pos = np.where(day_of == day)[0]
+                    mask = hours_mask(times[t_pos].hour)
+                    day_preliminary = bool(preliminary[t_pos].any())
+                    replaced = False
+                    for var in ds.data_vars:
+                        if var not in ERA5_VARIABLES:
+                            continue
+                        sub = ds[[var]].isel(time=t_pos, latitude=lat_pos, longitude=lon_pos).load()
+                        replaced |= self._write_entry(var, day.date(), int(ti), int(tj), mask, sub,
+                                                      day_preliminary, lease)
+                        written += 1
+                    if replaced:
+                        # Los agregados calculados con los datos ERA5T ya no valen
+                        self.pyramid.discard_day((int(ti), int(tj)), day.date())
+                    if "u10" in ds and "v10" in ds:
+                        wind = ds[["u10", "v10"]].isel(time=t_pos, latitude=lat_pos, longitude=lon_pos)
+                        self.pyramid.store_day((int(ti), int(tj)), day.date(), mask, self._tile_aggregate(wind))
+        return written
+
+    def _write_entry(self, variable: str, day: date, ti: int, tj: int, mask: int, sub: xr.Dataset,
+                     preliminary: bool = False, lease: Optional[TileLease] = None) -> bool:
+        """
+        Guarda una entrada, uniéndola con las horas ya cacheadas salvo que los datos
+        nuevos sean ERA5 final y los cacheados ERA5T: entonces la reemplazan.
+
+        Returns:
+            bool: Si se reemplazaron datos ERA5T por datos finales
+        """
+        existing = self._lookup(variable, day, ti, tj)
+        replaces_preliminary = existing is not None and existing[2] and not preliminary
+        if existing is not None and not replaces_preliminary and (existing[1] | mask) != mask:
+            # Unir con las horas ya cacheadas; prevalecen los datos nuevos
+            old = self._read_entry(existing[0])
+            if old is not None:
+                old = old.sel(time=~old.time.isin(sub.time.values))
+                sub = xr.concat([old, sub], dim="time").sortby("time")
+                mask |= existing[1]
+                preliminary = preliminary or existing[2]
+
+        key = self._make_key(variable, day, ti, tj, mask, preliminary)
+        encoding = {variable: {"zlib": True, "complevel": 1, "dtype": "float32"}}
+        def write(tmp_path):
+            with NETCDF_IO_LOCK:
+                sub.to_netcdf(tmp_path, encoding=encoding)
+
+        self.store.put(key, write, pin=lease is not None)
+        with self._lock:
+            if existing is not None and existing[0] != key:
+                self.store.discard(existing[0])
+            self._index[(variable, day, ti, tj)] = (key, mask, preliminary)
+        if lease is not None:
+            lease.add((variable, day, ti, tj), key)
+        return replaces_preliminary
+
+    # ------------------------------------------------------------------
+    # Pirámide de agregados
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _tile_aggregate(wind: xr.Dataset) -> WindAggregate:
+        """Agregado por celda de un tile-día (celdas en orden ascendente de lat y lon)."""
+        order = np.ix_(np.arange(wind.sizes["time"]), np.argsort(wind.latitude.values),
+                       np.argsort(wind.longitude.values))
+        u = wind["u10"].transpose("time", "latitude", "longitude").values[order]
+        v = wind["v10"].transpose("time", "latitude", "longitude").values[order]
+        speed, direction = speed_direction(u, v)
+        return WindAggregate.from_block(speed, direction, wind.time.values)
+
+    def day_aggregate(self, tile: Tuple[int, int], day: date, hours: List[int]) -> Optional[WindAggregate]:
+        """
+        Agregado diario de un tile calculado desde los datos cacheados (u10, v10),
+        o None si el tile no está en caché con todas las horas pedidas.
+        """
+        wanted = hours_mask(hours)
+        parts = []
+        for var in ("u10", "v10"):
+            entry = self._lookup(var, day, tile[0], tile[1])
+            part = self._read_entry(entry[0]) if entry and (entry[1] & wanted) == wanted else None
+            if part is None:
+                return None
+            parts.append(part)
+        wind = xr.merge(parts)
+        wind = wind.isel(time=np.isin(pd.DatetimeIndex(wind.time.values).hour, list(hours)))
+        return self._tile_aggregate(wind)
+
+    def summarize(self, window: Tuple[int, int, int, int], days: List[date], hours: List[int]) -> Optional[Dict]:
+        """
+        Resúmenes del payload (rosa de vientos, patrón horario, serie diaria y
+        estadísticos de la velocidad a 10 m) para una ventana y un rango de días
+        consecutivos, combinando niveles de la pirámide.
+
+        Returns:
+            Dict: Resúmenes, o None si algún tile/día no está disponible
+        """
+        days = sorted(days)
+        if not days or (days[-1] - days[0]).days + 1 != len(days):
+            return None
+        i0, i1, j0, j1 = window
+        c = self.tile_cells
+        mask = hours_mask(hours)
+        total = None
+        for ti, tj in self.tiles_for_window(window):
+            aggregate = self.pyramid.aggregate((ti, tj), days[0], days[-1], mask,
+                                               lambda tile, day: self.day_aggregate(tile, day, hours))
+            if aggregate is None:
+                return None
+            cells = (slice(max(i0 - ti * c, 0), min(i1 - ti * c, c - 1) + 1),
+                     slice(max(j0 - tj * c, 0), min(j1 - tj * c, c - 1) + 1))
+            total = aggregate.select_cells(cells).total().merge(total)
+        return total.summaries() if total is not None else None
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def load(self, window: Tuple[int, int, int, int], days: List[date],
+             variables: List[str], hours: List[int], lease: Optional[TileLease] = None) -> xr.Dataset:
+        """
+        Ensambla un dataset (time, latitude, longitude) para la ventana desde los tiles cacheados.
+        La latitud se devuelve en orden descendente, como en ERA5. Con lease se leen las
+        entradas fijadas en él.
+
+        Raises:
+            KeyError: Si falta algún tile en la caché
+        """
+        i0, i1, j0, j1 = window
+        hours = sorted(int(h) for h in hours)
+        hour_pos = {h: k for k, h in enumerate(hours)}
+        n_time = len(days) * len(hours)
+        lats = np.arange(i1, i0 - 1, -1) * ERA5_GRID_STEP
+        lons = np.arange(j0, j1 + 1) * ERA5_GRID_STEP
+        c = self.tile_cells
+
+        data_vars = {}
+        for var in variables:
+            out = np.full((n_time, len(lats), len(lons)), np.nan, dtype=np.float32)
+            for d_pos, day in enumerate(days):
+                for ti, tj in self.tiles_for_window(window):
+                    path = lease.path((var, day, ti, tj)) if lease is not None else None
+                    if path is not None:
+                        with NETCDF_IO_LOCK, xr.open_dataset(path) as f:
+                            f = f.load()
+                    else:
+                        entry = self._lookup(var, day, ti, tj)
+                        f = self._read_entry(entry[0]) if entry else None
+                    if f is None:
+                        raise KeyError(f"Tile ERA5 ausente en caché: {var} {day} ({ti},{tj})")
+                    f_hours = pd.DatetimeIndex(f.time.values).hour
+                    f_i = np.rint(f.latitude.values / ERA5_GRID_STEP).astype(int)
+                    f_j = np.rint(f.longitude.values / ERA5_GRID_STEP).astype(int)
+                    values = f[var].values
+
+                    t_src = np.array([k for k, h in enumerate(f_hours) if h in hour_pos], dtype=int)
+                    t_dst = np.array([d_pos * len(hours) + hour_pos[f_hours[k]] for k in t_src], dtype=int)
+                    i_src = np.where((f_i >= i0) & (f_i <= i1))[0]
+                    j_src = np.where((f_j >= j0) & (f_j <= j1))[0]
+                    block = values[np.ix_(t_src, i_src, j_src)]
+                    out[np.ix_(t_dst, i1 - f_i[i_src], f_j[j_src] - j0)] = block
+            data_vars[var] = (("time", "latitude", "longitude"), out)
+
+        times = [datetime.combine(day, datetime.min.time()) + timedelta(hours=h)
+                 for day in days for h in hours]
+        return xr.Dataset(
+            data_vars,
+            coords={"time": pd.DatetimeIndex(times), "latitude": lats, "longitude": lons},
+        )
+
+    def iter_load(self, window: Tuple[int, int, int, int], days: List[date],
+                  variables: List[str], hours: List[int], days_per_block: int = 1,
+                  lease: Optional[TileLease] = None) -> Iterator[xr.Dataset]:
+        """
+        Como load(), pero entrega el resultado en bloques de días consecutivos
+        para que la memoria no dependa de la longitud del periodo. Con lease, el
+        iterador lo suelta al agotarse o al cerrarse.
+        """
+        blocks = (self.load(window, days[start:start + days_per_block], variables, hours, lease)
+                  for start in range(0, len(days), days_per_block))
+        return ClosingBlocks(blocks, lease.release) if lease is not None else blocks
+
+    def stats(self) -> Dict:
+        """Estadísticas de la caché (uso de disco, aciertos, desalojos)."""
+        stats = self.store.stats()
+        stats["tile_size_deg"] = self.tile_cells * ERA5_GRID_STEP
+        stats["grid_step_deg"] = ERA5_GRID_STEP
+        with self._lock:
+            stats["preliminary_entries"] = sum(1 for entry in self._index.values() if entry[2])
+        stats["pyramid"] = self.pyramid.stats()
+        return stats
+
+
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_era5_cache() -> Optional[ERA5TileCache]:
+    """
+    Instancia compartida de la caché ERA5 del proceso.
+    Devuelve None si ERA5_CACHE_ENABLED=false.
+    """
+    global _cache_instance
+    if os.environ.get("ERA5_CACHE_ENABLED", "True").lower() != "true":
+        return None
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = ERA5TileCache()
+        return _cache_instance
@@ -0,0 +1,143 @@
+"""
+Planificador de solicitudes ERA5 para CDS.
+Descompone un rango de fechas y un conjunto de horas en solicitudes mínimas
+alineadas a meses (sin producto cartesiano años x meses x días), las envía
+en paralelo con un límite configurable y entrega cada resultado para
+unirlo en el eje temporal.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.services.source_orchestrator import check_cancelled
+
+logger = logging.getLogger(__name__)
+
+# Horas sinópticas usadas por defecto
+DEFAULT_HOURS = [0, 6, 12, 18]
+
+
+@dataclass(frozen=True)
+class CDSRequestChunk:
+    """Solicitud CDS limitada a un único mes."""
+    year: int
+    month: int
+    days: Tuple[int, ...]
+    hours: Tuple[int, ...]
+
+    @property
+    def dates(self) -> List[date]:
+        return [date(self.year, self.month, d) for d in self.days]
+
+    def to_request(self, variables: List[str], area: List[float]) -> Dict:
+        """
+        Construye el cuerpo de la solicitud para reanalysis-era5-single-levels.
+
+        Args:
+            variables: Nombres de variables de la API CDS
+            area: Área [N, W, S, E]
+        """
+        return {
+            "product_type": "reanalysis",
+            "variable": variables,
+            "year": [f"{self.year:04d}"],
+            "month": [f"{self.month:02d}"],
+            "day": [f"{d:02d}" for d in self.days],
+            "time": [f"{h:02d}:00" for h in self.hours],
+            "format": "netcdf",
+            "grid": [0.25, 0.25],
+            "area": area,
+        }
+
+    def __str__(self):
+        return f"{self.year:04d}-{self.month:02d} ({len(self.days)} días x {len(self.hours)} horas)"
+
+
+def date_range(start_date: str, end_date: str) -> List[date]:
+    """Lista de fechas entre start_date y end_date (YYYY-MM-DD), ambas incluidas."""
+    start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
+    return [start_dt + timedelta(days=x) for x in range((end_dt - start_dt).days + 1)]
+
+
+def plan_era5_requests(dates: Iterable[date], hours: Iterable[int] = None) -> List[CDSRequestChunk]:
+    """
+    Agrupa las fechas pedidas en una solicitud por mes, con exactamente los días
+    de ese mes que se necesitan. Así nunca se descargan días fuera del rango.
+
+    Args:
+        dates: Fechas a descargar (no necesariamente contiguas)
+        hours: Horas UTC (0-23); por defecto las cuatro sinópticas
+
+    Returns:
+        List[CDSRequestChunk]: Solicitudes ordenadas cronológicamente
+    """
+    hours = tuple(sorted({int(h) for h in (hours if hours is not None else DEFAULT_HOURS)}))
+    unique_dates = sorted({d.date() if isinstance(d, datetime) else d for d in dates})
+    plan = []
+    for (year, month), group in groupby(unique_dates, key=lambda d: (d.year, d.month)):
+        plan.append(CDSRequestChunk(year, month, tuple(d.day for d in group), hours))
+    return plan
+
+
+def max_concurrent_requests() -> int:
+    """Límite de solicitudes CDS simultáneas (ERA5_MAX_CONCURRENT_REQUESTS)."""
+    return max(1, int(os.environ.get("ERA5_MAX_CONCURRENT_REQUESTS", "4")))
+
+
+def execute_plan(plan: List[CDSRequestChunk],
+                 fetch: Callable[[CDSRequestChunk], str],
+                 on_result: Callable[[CDSRequestChunk, str], None],
+                 discard: Callable[[str], None] = None,
+                 max_workers: Optional[int] = None,
+                 cancel_event=None):
+    """
+    Ejecuta las solicitudes del plan en paralelo.
+
+    Args:
+        plan: Solicitudes a enviar
+        fetch: Descarga una solicitud y devuelve la ruta del NetCDF
+        on_result: Se invoca (en el hilo llamador) con cada resultado según va llegando
+        discard: Limpia los resultados descargados que no llegaron a procesarse tras un error
+        max_workers: Límite de concurrencia; por defecto ERA5_MAX_CONCURRENT_REQUESTS
+        cancel_event: threading.Event opcional; si se activa se abandonan las solicitudes pendientes
+
+    Raises:
+        Exception: La primera excepción de cualquier solicitud, tras cancelar las pendientes
+    """
+    if not plan:
+        return
+    workers = min(max_workers or max_concurrent_requests(), len(plan))
+    logger.info(f"🗓️ Plan ERA5: {len(plan)} solicitudes mensuales, concurrencia={workers}")
+
+    processed = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="era5-cds") as executor:
+        futures = {executor.submit(fetch, chunk): chunk for chunk in plan}
+        try:
+            for future in as_completed(futures):
+                chunk = futures[future]
+                processed.add(future)
+                path = future.result()
+                try:
+                    check_cancelled(cancel_event, "ERA5")
+                except Exception:
+                    if discard is not None:
+                        discard(path)
+                    raise
+                logger.info(f"✅ Solicitud ERA5 {chunk} completada")
+                on_result(chunk, path)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            if discard is not None:
+                for future in futures:
+                    if future not in processed and not future.cancelled() and future.exception() is None:
+                        discard(future.result())
+            raise
+
@@ -0,0 +1,203 @@
+"""
+Tablas precalculadas de eventos HURDAT para las métricas climatológicas.
+
+Al cargar la instantánea se convierten una sola vez las columnas que las métricas
+usan en cada consulta: marcas de tiempo int64 (antes se parseaba date + time con
+pd.to_datetime varias veces por solicitud), códigos enteros de tormenta y de tipo,
+viento en m/s y año. Con ellas las métricas de un subconjunto de puntos (las
+posiciones que devuelve el índice espacial) son reducciones vectorizadas de numpy,
+sin groupby().apply en Python.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+KNOTS_TO_MS = 0.514444
+
+# Valor de HURDAT para presión no registrada
+MISSING_PRESSURE = -999
+
+# Nanosegundos por segundo (las marcas de tiempo son int64 en ns)
+_NS_PER_SECOND = 1e9
+
+
+def event_timestamps(events: pd.DataFrame) -> pd.Series:
+    """Fecha y hora de cada registro HURDAT (columnas date YYYYMMDD y time HHMM)."""
+    return pd.to_datetime(events["date"] + events["time"], format="%Y%m%d%H%M")
+
+
+@dataclass(frozen=True)
+class EventTable:
+    """
+    Columnas de los eventos como arrays alineados por posición con el DataFrame (y
+    con el índice espacial) a partir del que se construyeron.
+    """
+    storm: np.ndarray          # código de tormenta (posición en storm_ids)
+    storm_ids: np.ndarray
+    category: np.ndarray       # código de storm_type (posición en categories, ordenadas)
+    categories: np.ndarray
+    timestamp: np.ndarray      # int64, ns desde 1970
+    year: np.ndarray
+    wind_knots: np.ndarray
+    wind_ms: np.ndarray
+    pressure: np.ndarray
+
+    @classmethod
+    def from_frame(cls, events: pd.DataFrame) -> "EventTable":
+        storm, storm_ids = pd.factorize(events["storm_id"], sort=True)
+        category, categories = pd.factorize(events["storm_type"], sort=True)
+        times = event_timestamps(events)
+        wind_knots = events["max_sustained_wind_knots"].to_numpy()
+        return cls(
+            storm=storm.astype(np.int64),
+            storm_ids=np.asarray(storm_ids),
+            category=category.astype(np.int64),
+            categories=np.asarray(categories),
+            timestamp=times.to_numpy().astype("datetime64[ns]").view(np.int64),
+            year=times.dt.year.to_numpy(),
+            wind_knots=wind_knots,
+            wind_ms=wind_knots * KNOTS_TO_MS,
+            pressure=events["min_central_pressure_mb"].to_numpy(),
+        )
+
+    def __len__(self) -> int:
+        return len(self.storm)
+
+    def metrics(self, positions: np.ndarray) -> Optional[Dict]:
+        """
+        Métricas climatológicas de los eventos en `positions`: las mismas que se
+        calculaban con pandas sobre los eventos cercanos.
+
+        Returns:
+            Dict: Métricas, o None si no hay eventos
+        """
+        if len(positions) == 0:
+            return None
+        storm = self.storm[positions]
+        category = self.category[positions]
+        n_storms, n_categories = len(self.storm_ids), len(self.categories)
+
+        storms, storm_of_point = np.unique(storm, return_inverse=True)
+        event_density = len(storms)
+        total_years = len(np.unique(self.year[positions]))
+
+        # Tormentas distintas y media de viento por tipo de evento
+        points_per_category = np.bincount(category, minlength=n_categories)
+        present = np.flatnonzero(points_per_category)
+        pairs = np.unique(category * n_storms + storm)
+        storms_per_category = np.bincount(pairs // n_storms, minlength=n_categories)
+        wind_per_category = np.bincount(category, weights=self.wind_knots[positions], minlength=n_categories)
+        event_frequency = {self.categories[c]: storms_per_category[c] / total_years for c in present}
+        event_intensity_profile = {self.categories[c]: wind_per_category[c] / points_per_category[c]
+                                   for c in present}
+
+        wind_ms = self.wind_ms[positions]
+        useful = (wind_ms >= 12) & (wind_ms <= 25)
+        energy_opportunity_score = len(np.unique(storm[useful])) / event_density
+        extreme_risk_index = len(np.unique(storm[wind_ms > 30])) / event_density
+
+        # Duración de cada tormenta entre sus puntos cercanos primero y último
+        timestamp = self.timestamp[positions]
+        first = np.full(event_density, np.iinfo(np.int64).max)
+        last = np.full(event_density, np.iinfo(np.int64).min)
+        np.minimum.at(first, storm_of_point, timestamp)
+        np.maximum.at(last, storm_of_point, timestamp)
+        durations = (last - first) / _NS_PER_SECOND / 3600
+        std_duration = np.std(durations, ddof=1) if len(durations) > 1 else np.float64("nan")
+
+        pressure = self.pressure[positions]
+        valid_pressures = pressure[pressure != MISSING_PRESSURE]
+
+        return {
+            "event_density": event_density,
+            "event_frequency": event_frequency,
+            "event_intensity_profile": event_intensity_profile,
+            "energy_opportunity_score": energy_opportunity_score,
+            "extreme_risk_index": extreme_risk_index,
+            "event_duration_stats": {
+                "average_duration_hours": durations.mean(),
+                "std_dev_duration_hours": std_duration
+            },
+            "historical_pressure_min": valid_pressures.min() if len(valid_pressures) else MISSING_PRESSURE
+        }
+
+    def batch_metrics(self, within: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Las métricas de `metrics` para varios puntos a la vez, como productos de la
+        matriz de pertenencia por indicadores (one-hot) de tormenta, año, tipo y par
+        (tipo, tormenta), y mínimos/máximos por tormenta con reduceat.
+
+        Args:
+            within: Matriz bool (puntos x eventos) de eventos dentro del radio de cada punto
+
+        Returns:
+            Dict: Un array por métrica con un valor por punto. event_frequency y
+                  event_intensity_profile son (puntos x categories), con NaN en los tipos
+                  sin eventos cercanos. Los puntos sin eventos llevan los valores de las
+                  métricas vacías (0, y -999 de presión).
+        """
+        n_storms, n_categories = len(self.storm_ids), len(self.categories)
+        member = within.astype(np.float64)
+        storm_hot, category_hot = _one_hot(self.storm, n_storms), _one_hot(self.category, n_categories)
+
+        storm_points = member @ storm_hot
+        present = storm_points > 0
+        event_density = present.sum(axis=1)
+        years, year_code = np.unique(self.year, return_inverse=True)
+        total_years = (member @ _one_hot(year_code, len(years)) > 0).sum(axis=1)
+        has_events = event_density > 0
+
+        pair, pair_codes = pd.factorize(self.category * n_storms + self.storm)
+        pair_storms = (member @ _one_hot(pair, len(pair_codes)) > 0) @ _one_hot(pair_codes // n_storms, n_categories)
+        category_points = member @ category_hot
+        category_wind = member @ (category_hot * self.wind_knots[:, None])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            event_frequency = np.where(category_points > 0, pair_storms / total_years[:, None], np.nan)
+            event_intensity_profile = np.where(category_points > 0, category_wind / category_points, np.nan)
+
+            useful = (self.wind_ms >= 12) & (self.wind_ms <= 25)
+            useful_storms = ((member * useful) @ storm_hot > 0).sum(axis=1)
+            severe_storms = ((member * (self.wind_ms > 30)) @ storm_hot > 0).sum(axis=1)
+            energy_opportunity_score = np.where(has_events, useful_storms / event_density, 0.0)
+            extreme_risk_index = np.where(has_events, severe_storms / event_density, 0.0)
+
+        # Primer y último registro cercano de cada tormenta (eventos agrupados por código)
+        durations = np.zeros(present.shape)
+        if n_storms:
+            order = np.argsort(self.storm, kind="stable")
+            starts = np.flatnonzero(np.r_[True, np.diff(self.storm[order]) != 0])
+            timestamp, within_sorted = self.timestamp[order], within[:, order]
+            first = np.minimum.reduceat(np.where(within_sorted, timestamp, np.iinfo(np.int64).max), starts, axis=1)
+            last = np.maximum.reduceat(np.where(within_sorted, timestamp, np.iinfo(np.int64).min), starts, axis=1)
+            durations = np.where(present, (last - first) / _NS_PER_SECOND / 3600, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_duration = np.where(has_events, durations.sum(axis=1) / event_density, 0.0)
+            squares = np.where(present, (durations - mean_duration[:, None]) ** 2, 0.0).sum(axis=1)
+            std_duration = np.where(event_density > 1, np.sqrt(squares / (event_density - 1)),
+                                    np.where(has_events, np.nan, 0.0))
+
+        valid = within & (self.pressure != MISSING_PRESSURE)
+        pressure_min = np.where(valid, self.pressure, np.iinfo(np.int64).max).min(axis=1)
+        historical_pressure_min = np.where(valid.any(axis=1), pressure_min, MISSING_PRESSURE)
+
+        return {
+            "event_density": event_density,
+            "event_frequency": event_frequency,
+            "event_intensity_profile": event_intensity_profile,
+            "energy_opportunity_score": energy_opportunity_score,
+            "extreme_risk_index": extreme_risk_index,
+            "average_duration_hours": mean_duration,
+            "std_dev_duration_hours": std_duration,
+            "historical_pressure_min": historical_pressure_min,
+        }
+
+
+def _one_hot(codes: np.ndarray, n: int) -> np.ndarray:
+    """Matriz indicadora (len(codes) x n) de códigos enteros."""
+    matrix = np.zeros((len(codes), n))
+    matrix[np.arange(len(codes)), codes] = 1.0
+    return matrix
+
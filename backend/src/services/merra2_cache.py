@@ -0,0 +1,280 @@
+"""
+Caché local de archivos MERRA-2 (granules diarios o sus recortes OPeNDAP).
+
+Cada entrada es un NetCDF de una colección y un día, identificado por la ventana
+de índices de la malla (j = latitud, i = longitud) y el hiperrectángulo de horas
+que contiene. Una solicitud se sirve desde cualquier entrada del mismo día que
+cubra su ventana y sus horas, de modo que periodos y áreas solapadas no vuelven a
+pasar por GES DISC. Las entradas se validan antes de guardarse, se escriben con
+renombrado atómico y las descargas de una misma clave se serializan con un
+candado de archivo (también entre procesos).
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from xarray.backends.netCDF4_ import NETCDF4_PYTHON_LOCK
+
+from src.services.disk_cache import DiskLRUCache
+from src.services.download_spool import DownloadSpool, DownloadTarget, open_download_target, open_netcdf4
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Ventana de índices (j0, j1, i0, i1), inclusiva
+Window = Tuple[int, int, int, int]
+# Hiperrectángulo temporal (inicio, paso, fin), inclusivo
+TimeSlab = Tuple[int, int, int]
+
+DEFAULT_CACHE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "temp", "merra2_cache")
+)
+
+_ENTRY_PATTERN = re.compile(
+    r"^j(?P<j0>\d+)-(?P<j1>\d+)_i(?P<i0>\d+)-(?P<i1>\d+)_t(?P<t0>\d+)-(?P<ts>\d+)-(?P<t1>\d+)\.nc4$"
+)
+
+# Primeros bytes de un NetCDF-4/HDF5 y de un NetCDF clásico
+_NETCDF_MAGIC = (b"\x89HDF\r\n\x1a\n", b"CDF\x01", b"CDF\x02", b"CDF\x05")
+
+
+def slab_hours(slab: TimeSlab) -> List[int]:
+    """Horas contenidas en un hiperrectángulo temporal."""
+    start, step, stop = slab
+    return list(range(start, stop + 1, step))
+
+
+def looks_like_netcdf(path: DownloadTarget) -> bool:
+    """Comprobación rápida de la cabecera del archivo o spool (sin abrirlo con HDF5)."""
+    try:
+        with open_download_target(path, "rb") as f:
+            header = f.read(8)
+    except OSError:
+        return False
+    return any(header.startswith(magic) for magic in _NETCDF_MAGIC)
+
+
+def verify_netcdf(path: DownloadTarget, variables: Iterable[str], sizes: Dict[str, int]):
+    """
+    Comprueba que un NetCDF descargado se puede abrir y tiene las variables y
+    dimensiones esperadas. Se lee con netCDF4 bajo el candado de HDF5 de xarray,
+    porque las verificaciones corren en los hilos de descarga.
+
+    Raises:
+        ValueError: Si el archivo está truncado, corrupto o no corresponde a lo pedido
+    """
+    if not looks_like_netcdf(path):
+        raise ValueError("la cabecera no corresponde a un NetCDF")
+    try:
+        with NETCDF4_PYTHON_LOCK:
+            nc = open_netcdf4(path)
+            try:
+                missing = [v for v in variables if v not in nc.variables]
+                if missing:
+                    raise ValueError(f"faltan variables {missing}")
+                for dim, expected in sizes.items():
+                    actual = nc.dimensions[dim].size if dim in nc.dimensions else None
+                    if actual != expected:
+                        raise ValueError(f"dimensión {dim}={actual}, se esperaba {expected}")
+                # Leer un valor de cada variable detecta bloques comprimidos truncados
+                for v in variables:
+                    var = nc.variables[v]
+                    var[(-1,) * var.ndim]
+            finally:
+                nc.close()
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"no se pudo leer: {e}")
+
+
+class MERRA2GranuleCache:
+    """
+    Caché de archivos MERRA-2 en disco con desalojo LRU por cuota.
+
+    Claves: {colección}/YYYY/MM/DD/j{j0}-{j1}_i{i0}-{i1}_t{inicio}-{paso}-{fin}.nc4
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            cache_dir: Directorio de la caché (por defecto MERRA2_CACHE_DIR)
+            max_bytes: Cuota de disco en bytes (por defecto MERRA2_CACHE_MAX_MB)
+        """
+        cache_dir = cache_dir or os.environ.get("MERRA2_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("MERRA2_CACHE_MAX_MB", "4096")) * 1024 * 1024)
+        self.store = DiskLRUCache(cache_dir, max_bytes)
+        # Los candados van fuera del directorio de la caché para no contarlos como entradas
+        self.lock_dir = os.path.normpath(self.store.root_dir) + ".locks"
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._by_day: Dict[str, Set[str]] = defaultdict(set)
+        for key in self.store.keys():
+            prefix, _, name = key.rpartition("/")
+            if _ENTRY_PATTERN.match(name):
+                self._by_day[prefix].add(key)
+        self.misses = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _day_prefix(collection: str, day: date) -> str:
+        return f"{collection}/{day:%Y/%m/%d}"
+
+    @classmethod
+    def key_for(cls, collection: str, day: date, window: Window, slab: TimeSlab) -> str:
+        j0, j1, i0, i1 = window
+        return f"{cls._day_prefix(collection, day)}/j{j0}-{j1}_i{i0}-{i1}_t{slab[0]}-{slab[1]}-{slab[2]}.nc4"
+
+    def find(self, collection: str, day: date, window: Window,
+             hours: Optional[Iterable[int]] = None, pin: bool = False) -> Optional[str]:
+        """
+        Entrada más pequeña del día que contiene la ventana y las horas pedidas.
+
+        Args:
+            hours: Horas UTC necesarias (por defecto las 24)
+            pin: Fijar la entrada para que no se desaloje hasta release(ruta)
+
+        Returns:
+            str: Ruta del archivo cacheado, o None si ninguna entrada lo cubre
+        """
+        needed = set(hours) if hours is not None else set(range(24))
+        prefix = self._day_prefix(collection, day)
+        with self._lock:
+            candidates = list(self._by_day.get(prefix, ()))
+
+        best = None
+        for key in candidates:
+            match = _ENTRY_PATTERN.match(key.rpartition("/")[2])
+            j0, j1, i0, i1, t0, ts, t1 = (int(match.group(g)) for g in ("j0", "j1", "i0", "i1", "t0", "ts", "t1"))
+            if not (j0 <= window[0] and window[1] <= j1 and i0 <= window[2] and window[3] <= i1):
+                continue
+            if not needed.issubset(range(t0, t1 + 1, ts)):
+                continue
+            cells = (j1 - j0 + 1) * (i1 - i0 + 1) * len(range(t0, t1 + 1, ts))
+            if best is None or cells < best[0]:
+                best = (cells, key)
+        path = self.store.get(best[1], pin=pin) if best is not None else None
+        if path is not None and not looks_like_netcdf(path):
+            logger.warning(f"⚠️ Entrada MERRA-2 dañada, se descarta: {best[1]}")
+            if pin:
+                self.store.unpin(best[1])
+            self.discard(best[1])
+            path = None
+        elif path is None and best is not None:
+            self._forget(best[1])
+        if path is None:
+            with self._lock:
+                self.misses += 1
+        return path
+
+    @contextlib.contextmanager
+    def lock(self, collection: str, day: date, window: Window, slab: TimeSlab):
+        """
+        Candado exclusivo de una clave: entre hilos con un Lock y entre procesos con
+        flock, para que solo uno descargue y los demás encuentren la entrada hecha.
+        """
+        key = self.key_for(collection, day, window, slab)
+        with self._lock:
+            thread_lock = self._key_locks.setdefault(key, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            digest = hashlib.sha1(key.encode()).hexdigest()[:20]
+            with open(os.path.join(self.lock_dir, f"{digest}.lock"), "a+") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def store_file(self, collection: str, day: date, window: Window, slab: TimeSlab,
+                   source_path: DownloadTarget, variables: Iterable[str], pin: bool = False) -> str:
+        """
+        Valida un archivo descargado y lo mueve a la caché (renombrado atómico).
+        Una descarga en memoria se valida desde los bytes y solo se escribe aquí.
+
+        Args:
+            source_path: Archivo o DownloadSpool descargado; se vacía si la operación tiene éxito
+            variables: Variables que debe contener
+            pin: Fijar la entrada para que no se desaloje hasta release(ruta)
+
+        Returns:
+            str: Ruta de la entrada en la caché
+
+        Raises:
+            ValueError: Si el archivo no supera la verificación de integridad
+        """
+        j0, j1, i0, i1 = window
+        sizes = {"lat": j1 - j0 + 1, "lon": i1 - i0 + 1, "time": len(slab_hours(slab))}
+        try:
+            verify_netcdf(source_path, list(variables), sizes)
+        except ValueError:
+            with self._lock:
+                self.rejected += 1
+            raise
+
+        key = self.key_for(collection, day, window, slab)
+        if isinstance(source_path, DownloadSpool):
+            path = self.store.put(key, source_path.save, pin=pin)
+        else:
+            path = self.store.put(key, lambda tmp_path: shutil.move(source_path, tmp_path), pin=pin)
+        with self._lock:
+            self._by_day[self._day_prefix(collection, day)].add(key)
+        return path
+
+    def release(self, path: str):
+        """Libera la fijación de una ruta devuelta por find/store_file con pin=True."""
+        self.store.unpin(os.path.relpath(path, self.store.root_dir).replace(os.sep, "/"))
+
+    def discard(self, key: str):
+        self.store.discard(key)
+        self._forget(key)
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._by_day.get(key.rpartition("/")[0], set()).discard(key)
+
+    def stats(self) -> Dict:
+        """Estadísticas de la caché (uso de disco, aciertos y archivos rechazados)."""
+        stats = self.store.stats()
+        with self._lock:
+            # Un fallo es una búsqueda sin ninguna entrada que cubra la solicitud
+            stats["misses"] = self.misses
+            lookups = stats["hits"] + self.misses
+            stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+            stats["rejected"] = self.rejected
+        return stats
+
+
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_merra2_cache() -> Optional[MERRA2GranuleCache]:
+    """
+    Instancia compartida de la caché MERRA-2 del proceso.
+    Devuelve None si MERRA2_CACHE_ENABLED=false.
+    """
+    global _cache_instance
+    if os.environ.get("MERRA2_CACHE_ENABLED", "True").lower() != "true":
+        return None
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = MERRA2GranuleCache()
+        return _cache_instance
@@ -4,24 +4,309 @@ Versión corregida con autenticación NASA Earthdata estándar
 Compatible con la estructura de respuesta JSON de ERA5
 """
 
+import base64
+import hashlib
 import logging
+import math
 import os
-import tempfile
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
-import numpy as np
-import pandas as pd
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional
 import xarray as xr
 import requests
-from src.services.nasa_config_manager import NASAConfigManager
+from src.services.download_pipeline import DecodePipeline
+from src.services.download_spool import (
+    NETCDF_IO_LOCK, DownloadTarget, new_download_target, open_download_target, open_netcdf, release_download_target
+)
+from src.services.merra2_cache import TimeSlab, Window, get_merra2_cache
+from src.services.nasa_config_manager import get_nasa_config_manager
+from src.services.source_orchestrator import SourceCancelled, check_cancelled
+from src.services.source_config import SourceRequestConfig
+from src.services.reanalysis_processing import (
+    FrontendBlockStream, ResponseFormat, build_frontend_payload, enclosing_cells, iter_mfdataset_blocks, iter_point_blocks
+)
 
 # Fecha mínima disponible en MERRA-2
 MIN_MERRA2_DATE = datetime(1980, 1, 1).date()
 
+# Variables de tavg1_2d_slv_Nx usadas (equivalentes ERA5: u10, v10, t2m, sp)
+MERRA2_VARIABLES = ['U10M', 'V10M', 'T2M', 'PS']
+
+# Malla de M2T1NXSLV: lat = -90 + 0.5 j, lon = -180 + 0.625 i
+MERRA2_LAT_STEP = 0.5
+MERRA2_LON_STEP = 0.625
+MERRA2_N_LAT = 361
+MERRA2_N_LON = 576
+# Pasos horarios por archivo diario (promedios centrados en HH:30)
+MERRA2_N_TIMES = 24
+MERRA2_COLLECTION = 'M2T1NXSLV.5.12.4'
+# Ventana y horas de un archivo diario global completo
+MERRA2_FULL_WINDOW = (0, MERRA2_N_LAT - 1, 0, MERRA2_N_LON - 1)
+MERRA2_FULL_SLAB = (0, 1, MERRA2_N_TIMES - 1)
+
+# Respuestas de GES DISC que justifican reintentar la descarga
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Intervalo mínimo entre mensajes de progreso de una descarga
+PROGRESS_LOG_SECONDS = 10.0
+
+# Retraso aproximado con que GES DISC publica los días MERRA-2
+MERRA2_DATA_DELAY_DAYS = 60
+
 # Configuración del logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def max_concurrent_downloads() -> int:
+    """Límite de descargas diarias simultáneas (MERRA2_MAX_CONCURRENT_DOWNLOADS)."""
+    return max(1, int(os.environ.get("MERRA2_MAX_CONCURRENT_DOWNLOADS", "6")))
+
+
+def decode_workers() -> int:
+    """
+    Procesos que decodifican y recortan los archivos descargados
+    (MERRA2_DECODE_WORKERS). Con 0 las etapas no se solapan: se descarga todo y
+    luego se leen los archivos por grupos en el hilo de la solicitud.
+    """
+    default = max(1, min(4, (os.cpu_count() or 2) - 1))
+    return max(0, int(os.environ.get("MERRA2_DECODE_WORKERS", str(default))))
+
+
+def pipeline_queue_size() -> int:
+    """Días en curso como máximo en el canal descarga → decodificación → fusión (MERRA2_PIPELINE_QUEUE)."""
+    return max(1, int(os.environ.get("MERRA2_PIPELINE_QUEUE", "12")))
+
+
+def merra2_subset_mode() -> str:
+    """
+    'opendap' (por defecto): recorte de área, horas y variables en el servidor;
+    'full': archivo diario global completo (MERRA2_SUBSET_MODE).
+    """
+    mode = os.environ.get("MERRA2_SUBSET_MODE", "opendap").lower()
+    return mode if mode in ('opendap', 'full') else 'opendap'
+
+
+def grid_index_range(value_min: float, value_max: float, origin: float, step: float,
+                     size: int) -> Optional[Tuple[int, int]]:
+    """
+    Índices (inclusivos) de los nodos de una malla regular dentro de [value_min, value_max],
+    o None si el intervalo no contiene ningún nodo.
+    """
+    first = max(0, int(math.ceil((value_min - origin) / step - 1e-9)))
+    last = min(size - 1, int(math.floor((value_max - origin) / step + 1e-9)))
+    return (first, last) if first <= last else None
+
+
+def merra2_window(lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> Window:
+    """
+    Índices (j0, j1, i0, i1) de los nodos de la malla MERRA-2 dentro del área.
+
+    Raises:
+        ValueError: Si el área no contiene ningún nodo de la malla MERRA-2
+    """
+    lat_range = grid_index_range(lat_min, lat_max, -90.0, MERRA2_LAT_STEP, MERRA2_N_LAT)
+    lon_range = grid_index_range(lon_min, lon_max, -180.0, MERRA2_LON_STEP, MERRA2_N_LON)
+    if lat_range is None or lon_range is None:
+        raise ValueError("El área no contiene nodos de la malla MERRA-2 (0.5° x 0.625°)")
+    return lat_range + lon_range
+
+
+def snap_window(window: Window, block: int) -> Window:
+    """Amplía una ventana a bloques alineados de block x block nodos (recortados a la malla)."""
+    j0, j1, i0, i1 = window
+    return ((j0 // block) * block, min(MERRA2_N_LAT - 1, (j1 // block + 1) * block - 1),
+            (i0 // block) * block, min(MERRA2_N_LON - 1, (i1 // block + 1) * block - 1))
+
+
+def time_slab(hours: Optional[List[int]] = None) -> TimeSlab:
+    """
+    Hiperrectángulo (inicio, paso, fin) de las horas pedidas: exacto si son
+    equiespaciadas; si no, el rango que las contiene (se filtra en subset_region).
+    """
+    hours = sorted(set(hours)) if hours else list(range(MERRA2_N_TIMES))
+    steps = {b - a for a, b in zip(hours, hours[1:])}
+    stride = steps.pop() if len(steps) == 1 else 1
+    return hours[0], stride, hours[-1]
+
+
+def opendap_constraint(window: Window, slab: TimeSlab) -> str:
+    """Restricción DAP2 con las variables usadas sobre una ventana de nodos y horas."""
+    time_part = f"[{slab[0]}:{slab[1]}:{slab[2]}]"
+    lat_part = f"[{window[0]}:{window[1]}]"
+    lon_part = f"[{window[2]}:{window[3]}]"
+
+    projections = [f"{name}{time_part}{lat_part}{lon_part}" for name in MERRA2_VARIABLES]
+    projections += [f"time{time_part}", f"lat{lat_part}", f"lon{lon_part}"]
+    return ",".join(projections)
+
+
+def cache_block_cells() -> int:
+    """Nodos por lado de los bloques en que se alinean los recortes cacheados (MERRA2_CACHE_BLOCK_CELLS)."""
+    return max(1, int(os.environ.get("MERRA2_CACHE_BLOCK_CELLS", "8")))
+
+
+def download_buffer_bytes() -> int:
+    """Tamaño de los bloques leídos de la red y del búfer de escritura (MERRA2_DOWNLOAD_BUFFER_KB)."""
+    return max(64, int(os.environ.get("MERRA2_DOWNLOAD_BUFFER_KB", "1024"))) * 1024
+
+
+def download_timeouts() -> Tuple[float, float]:
+    """
+    (conexión, lectura) en segundos; el de lectura es el máximo sin recibir datos,
+    no la duración total (MERRA2_CONNECT_TIMEOUT_SECONDS, MERRA2_READ_TIMEOUT_SECONDS).
+    """
+    return (float(os.environ.get("MERRA2_CONNECT_TIMEOUT_SECONDS", "30")),
+            float(os.environ.get("MERRA2_READ_TIMEOUT_SECONDS", "120")))
+
+
+def parse_content_range(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """(inicio, tamaño total) de una cabecera 'bytes inicio-fin/total'."""
+    match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", value or "")
+    if not match:
+        return None, None
+    return int(match.group(1)), (int(match.group(2)) if match.group(2) != '*' else None)
+
+
+def expected_digest(headers) -> Optional[Tuple[str, str]]:
+    """
+    Checksum anunciado por el servidor para el archivo completo: Digest (RFC 3230,
+    SHA-256 o MD5) o Content-MD5. Devuelve (algoritmo hashlib, valor base64) o None.
+    """
+    for part in (headers.get('Digest') or '').split(','):
+        name, _, value = part.strip().partition('=')
+        algorithm = {'sha-256': 'sha256', 'md5': 'md5'}.get(name.lower())
+        if algorithm and value:
+            return algorithm, value
+    if headers.get('Content-MD5'):
+        return 'md5', headers['Content-MD5']
+    return None
+
+
+@dataclass
+class DownloadProgress:
+    """
+    Estado de una descarga reanudable; se pasa también al callback de progreso.
+
+    Attributes:
+        path: Archivo local o DownloadSpool en memoria
+        bytes_done: Bytes ya escritos en el destino
+        total_bytes: Tamaño completo anunciado por el servidor (si se conoce)
+        bytes_transferred: Bytes recibidos en total, incluidas retransmisiones
+        resumes: Continuaciones con Range tras un corte
+        validator: ETag fuerte o Last-Modified para If-Range
+        digest: (algoritmo, valor base64) anunciado por el servidor
+    """
+    url: str
+    path: DownloadTarget
+    bytes_done: int = 0
+    total_bytes: Optional[int] = None
+    bytes_transferred: int = 0
+    resumes: int = 0
+    validator: Optional[str] = None
+    digest: Optional[Tuple[str, str]] = None
+    started: float = field(default_factory=time.monotonic)
+    _last_report: float = field(default=0.0, repr=False)
+
+    def restart(self):
+        """Descarta lo descargado (el archivo local se trunca aparte)."""
+        self.bytes_done = 0
+        self.total_bytes = None
+        self.validator = None
+        self.digest = None
+
+    def describe(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = self.bytes_transferred / elapsed / 1e6
+        done = f"{self.bytes_done / 1e6:.1f}"
+        if self.total_bytes:
+            return (f"{100 * self.bytes_done / self.total_bytes:.0f}% "
+                    f"({done}/{self.total_bytes / 1e6:.1f} MB, {rate:.1f} MB/s)")
+        return f"{done} MB ({rate:.1f} MB/s)"
+
+
+def download_retry_settings() -> Tuple[int, float]:
+    """
+    Reintentos por archivo y espera base del backoff exponencial
+    (MERRA2_DOWNLOAD_RETRIES, MERRA2_RETRY_BACKOFF_SECONDS).
+    """
+    retries = max(0, int(os.environ.get("MERRA2_DOWNLOAD_RETRIES", "3")))
+    backoff = max(0.0, float(os.environ.get("MERRA2_RETRY_BACKOFF_SECONDS", "1.0")))
+    return retries, backoff
+
+
+def max_resumes() -> int:
+    """Continuaciones con Range permitidas por archivo (MERRA2_MAX_RESUMES)."""
+    return max(0, int(os.environ.get("MERRA2_MAX_RESUMES", "20")))
+
+
+def subset_merra2_region(ds: xr.Dataset, lat_min: float, lat_max: float,
+                         lon_min: float, lon_max: float, hours: Optional[List[int]] = None) -> Optional[xr.Dataset]:
+    """
+    Recorta un dataset MERRA-2 a la región de interés, a las variables usadas y,
+    si se indican, a las horas UTC pedidas.
+
+    Args:
+        ds: Dataset MERRA-2 abierto (sin cargar)
+        lat_min, lat_max, lon_min, lon_max: Límites geográficos
+        hours: Horas UTC a conservar (por defecto todas)
+
+    Returns:
+        xr.Dataset: Dataset recortado (perezoso) o None si faltan coordenadas
+    """
+    if 'lon' in ds.coords:
+        lon_coord = 'lon'
+    elif 'longitude' in ds.coords:
+        lon_coord = 'longitude'
+    else:
+        logger.error("No se encontró coordenada de longitud")
+        return None
+
+    if 'lat' in ds.coords:
+        lat_coord = 'lat'
+    elif 'latitude' in ds.coords:
+        lat_coord = 'latitude'
+    else:
+        logger.error("No se encontró coordenada de latitud")
+        return None
+
+    # Convertir longitudes negativas a 0-360 solo si el archivo usa esa convención
+    # (los archivos MERRA-2 de GES DISC usan -180..180)
+    if float(ds[lon_coord].max()) > 180:
+        if lon_min < 0:
+            lon_min = lon_min + 360
+        if lon_max < 0:
+            lon_max = lon_max + 360
+
+    keep = [v for v in MERRA2_VARIABLES if v in ds.data_vars]
+    ds = ds[keep].sel(
+        {lat_coord: slice(lat_min, lat_max),
+         lon_coord: slice(lon_min, lon_max)}
+    )
+    if hours is not None and 'time' in ds.coords:
+        ds = ds.isel(time=ds['time'].dt.hour.isin(list(hours)))
+    return ds
+
+
+def decode_merra2_day(source: DownloadTarget, lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                      hours: Optional[List[int]] = None) -> Optional[xr.Dataset]:
+    """
+    Abre un archivo diario MERRA-2 (ruta o descarga en memoria), lo recorta y lo carga.
+    Se ejecuta en los procesos de decodificación del canal, por eso es una función de módulo.
+
+    Returns:
+        xr.Dataset: Día recortado y cargado, o None si faltan coordenadas
+    """
+    with NETCDF_IO_LOCK, open_netcdf(source) as ds:
+        region = subset_merra2_region(ds, lat_min, lat_max, lon_min, lon_max, hours)
+        return region.load() if region is not None else None
+
+
 class MERRA2Service:
     """
     Servicio para descarga y procesamiento de datos MERRA-2.
@@ -29,31 +314,27 @@ class MERRA2Service:
     Mantiene compatibilidad con la estructura de respuesta de ERA5.
     """
 
-    def __init__(self):
+    def __init__(self, config: Optional[SourceRequestConfig] = None):
         """
         Inicializa el servicio MERRA-2 con autenticación mejorada.
+
+        Args:
+            config: Configuración por defecto; cada llamada puede recibir la suya propia
         """
-        self.test_mode = os.environ.get("TEST_MODE", "False").lower() == "true"
+        self.config = config or SourceRequestConfig.from_environment()
+        self.test_mode = self.config.test_mode
         
         # Inicializar gestor de configuración NASA con credenciales desde variables de entorno
         username = os.environ.get("NASA_USERNAME") or os.environ.get("EARTHDATA_USERNAME")
         password = os.environ.get("NASA_PASSWORD") or os.environ.get("EARTHDATA_PASSWORD")
         
-        self.config_manager = NASAConfigManager(username=username, password=password)
+        # Gestor compartido: pool de sesiones y validación cacheada entre instancias
+        self.config_manager = get_nasa_config_manager(username=username, password=password)
         logger.info(f"MERRA2Service inicializado (test_mode={self.test_mode})")
         
-        # Validar credenciales al inicializar
-        validation_result = self.config_manager.validate_credentials()
-        if validation_result["status"] != "fully_functional":
-            logger.warning(f"⚠️ Problema con credenciales NASA: {validation_result['status']}")
-            if validation_result["status"] == "credentials_missing":
-                logger.error("❌ Credenciales NASA faltantes. Configure NASA_USERNAME y NASA_PASSWORD")
-            elif validation_result["status"] == "invalid_credentials":
-                logger.error("❌ Credenciales NASA inválidas. Verifique usuario y contraseña")
-            elif validation_result["status"] == "merra2_access_denied":
-                logger.error("❌ Acceso denegado a MERRA-2. Verifique permisos de cuenta NASA Earthdata")
-        else:
-            logger.info("✅ Credenciales NASA validadas correctamente")
+        # Validar credenciales sin bloquear: resultado cacheado con TTL, refresco en segundo plano
+        if self.config_manager.cached_validation(block=False) is None:
+            logger.info("🔍 Validación de credenciales NASA en segundo plano")
 
     def validate_parameters(self, data: Dict) -> Tuple[float, float, float, float, str, str]:
         """
@@ -99,63 +380,210 @@ class MERRA2Service:
                 raise ValueError('Formato de fecha inválido. Use YYYY-MM-DD')
             raise
 
-    def download_merra2_file(self, url: str, local_path: str) -> bool:
+    def download_merra2_file(self, url: str, local_path: DownloadTarget, session: Optional[requests.Session] = None,
+                             retries: Optional[int] = None, cancel_event=None,
+                             progress: Optional[Callable[[DownloadProgress], None]] = None) -> bool:
         """
         Descarga un archivo MERRA-2 desde NASA GES DISC con autenticación mejorada.
 
+        Si la conexión se corta, la descarga continúa desde el último byte escrito
+        con una cabecera Range (e If-Range para no mezclar versiones del archivo);
+        esas continuaciones no consumen reintentos mientras avancen. Los fallos sin
+        avance (timeouts, errores de conexión, HTTP 429/5xx) se reintentan con
+        backoff exponencial; 401/403/404 no se reintentan. Al terminar se comprueba
+        el tamaño anunciado y, si el servidor lo publica, el checksum.
+
         Args:
             url: URL del archivo MERRA-2
-            local_path: Ruta local donde guardar el archivo
+            local_path: Ruta local o DownloadSpool donde guardar el archivo (se sobrescribe)
+            session: Sesión autenticada (por defecto la del pool compartido)
+            retries: Reintentos sin avance tras el primer intento (por defecto MERRA2_DOWNLOAD_RETRIES)
+            cancel_event: threading.Event opcional para abandonar la descarga
+            progress: Callback opcional invocado con el DownloadProgress tras cada bloque
 
         Returns:
             bool: True si la descarga fue exitosa
+
+        Raises:
+            SourceCancelled: Si cancel_event se activa durante la descarga o la espera
         """
+        default_retries, backoff = download_retry_settings()
+        retries = default_retries if retries is None else retries
+        session = session or self.config_manager.session_pool.session()
+        state = DownloadProgress(url, local_path)
+        open_download_target(local_path, 'wb').close()
+
+        failures = 0
+        while True:
+            check_cancelled(cancel_event, "MERRA-2")
+            before = state.bytes_done
+            ok, retryable = self._download_attempt(session, state, cancel_event, progress)
+            if ok or not retryable:
+                return ok
+
+            if state.bytes_done > before and state.resumes < max_resumes():
+                # Hubo avance: continuar de inmediato desde el byte alcanzado
+                state.resumes += 1
+                logger.info(f"⏯️ Reanudando desde {state.bytes_done} bytes "
+                            f"({state.resumes}/{max_resumes()}): {url}")
+                continue
+
+            failures += 1
+            if failures > retries:
+                break
+            # Backoff exponencial con jitter para no sincronizar los reintentos de los hilos
+            delay = backoff * (2 ** (failures - 1)) * random.uniform(0.5, 1.5)
+            logger.info(f"🔁 Reintento {failures}/{retries} en {delay:.1f}s: {url}")
+            if cancel_event is not None:
+                cancel_event.wait(delay)
+            else:
+                time.sleep(delay)
+
+        logger.error(f"❌ Descarga fallida tras {failures} intentos sin avance "
+                     f"y {state.resumes} continuaciones: {url}")
+        return False
+
+    def _download_attempt(self, session: requests.Session, state: DownloadProgress, cancel_event=None,
+                          progress: Optional[Callable[[DownloadProgress], None]] = None) -> Tuple[bool, bool]:
+        """
+        Un intento de descarga, continuando desde state.bytes_done si es mayor que cero.
+
+        Returns:
+            Tuple[bool, bool]: (descarga exitosa, vale la pena reintentar)
+        """
+        url = state.url
+        offset = state.bytes_done
+        # Sin compresión de transporte: los desplazamientos de Range deben ser los del archivo
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+            if state.validator:
+                headers['If-Range'] = state.validator
+        buffer_size = download_buffer_bytes()
+
         try:
-            session = self.config_manager.get_auth_session()
-            
-            logger.info(f"Descargando: {url}")
+            logger.info(f"Descargando: {url}" + (f" (desde byte {offset})" if offset else ""))
             
             # Realizar solicitud con manejo de redirecciones
-            response = session.get(url, stream=True, timeout=300, allow_redirects=True)
-            
-            if response.status_code == 200:
-                with open(local_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
+            with session.get(url, stream=True, timeout=download_timeouts(), allow_redirects=True,
+                             headers=headers) as response:
+                if response.status_code == 206 and offset:
+                    start, total = parse_content_range(response.headers.get('Content-Range'))
+                    if start != offset:
+                        logger.warning(f"⚠️ Content-Range inesperado ({response.headers.get('Content-Range')}); "
+                                       f"se reinicia la descarga")
+                        self._restart_download(state)
+                        return False, True
+                    state.total_bytes = total
+                    mode = 'ab'
+
+                elif response.status_code == 200:
+                    if offset:
+                        logger.info("El servidor ignoró Range o el archivo cambió: descarga completa")
+                    self._restart_download(state)
+                    length = response.headers.get('Content-Length')
+                    state.total_bytes = int(length) if length and not response.headers.get('Content-Encoding') else None
+                    mode = 'wb'
+
+                elif response.status_code == 416 and offset:
+                    logger.warning("⚠️ Rango no satisfacible; se reinicia la descarga")
+                    self._restart_download(state)
+                    return False, True
+
+                elif response.status_code == 404:
+                    logger.warning(f"Archivo no encontrado: {url}")
+                    return False, False
+
+                elif response.status_code == 401:
+                    # Cookie caducada o credenciales cambiadas: la próxima descarga usa una sesión nueva
+                    self.config_manager.session_pool.invalidate(session)
+                    logger.error("Error de autenticación en descarga")
+                    logger.error("Verifique que las credenciales NASA sean válidas y tengan acceso a MERRA-2")
+                    return False, False
+
+                elif response.status_code == 403:
+                    logger.error("Acceso denegado al archivo MERRA-2")
+                    logger.error("Verifique que su cuenta NASA Earthdata tenga permisos para acceder a GES DISC")
+                    return False, False
+
+                else:
+                    logger.error(f"Error en descarga: HTTP {response.status_code}")
+                    logger.error(f"Respuesta del servidor: {response.text[:200]}")
+                    return False, response.status_code in RETRYABLE_STATUS
+
+                etag = response.headers.get('ETag')
+                state.validator = etag if etag and not etag.startswith('W/') else response.headers.get('Last-Modified')
+                state.digest = expected_digest(response.headers) or state.digest
+
+                with open_download_target(state.path, mode, buffer_size) as f:
+                    for chunk in response.iter_content(chunk_size=buffer_size):
+                        check_cancelled(cancel_event, "MERRA-2")
                         if chunk:
                             f.write(chunk)
-                
-                file_size = os.path.getsize(local_path)
-                logger.info(f"Descarga exitosa: {file_size} bytes")
-                return True
-                
-            elif response.status_code == 404:
-                logger.warning(f"Archivo no encontrado: {url}")
-                return False
-                
-            elif response.status_code == 401:
-                logger.error("Error de autenticación en descarga")
-                logger.error("Verifique que las credenciales NASA sean válidas y tengan acceso a MERRA-2")
-                return False
-                
-            elif response.status_code == 403:
-                logger.error("Acceso denegado al archivo MERRA-2")
-                logger.error("Verifique que su cuenta NASA Earthdata tenga permisos para acceder a GES DISC")
-                return False
-                
-            else:
-                logger.error(f"Error en descarga: HTTP {response.status_code}")
-                logger.error(f"Respuesta del servidor: {response.text[:200]}")
-                return False
+                            state.bytes_done += len(chunk)
+                            state.bytes_transferred += len(chunk)
+                            self._report_progress(state, progress)
+
+            if state.total_bytes is not None and state.bytes_done != state.total_bytes:
+                logger.warning(f"⚠️ Descarga incompleta: {state.bytes_done}/{state.total_bytes} bytes")
+                if state.bytes_done > state.total_bytes:
+                    self._restart_download(state)
+                return False, True
+            if not self._verify_checksum(state):
+                self._restart_download(state)
+                return False, True
+
+            logger.info(f"Descarga exitosa: {state.bytes_done} bytes"
+                        + (f", {state.resumes} continuaciones" if state.resumes else ""))
+            return True, False
 
         except requests.exceptions.Timeout:
             logger.error("Timeout en descarga de archivo MERRA-2")
-            return False
-        except requests.exceptions.ConnectionError:
-            logger.error("Error de conexión durante descarga")
-            return False
+            return False, True
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError):
+            logger.error(f"Error de conexión durante descarga ({state.bytes_done} bytes escritos)")
+            return False, True
+        except SourceCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error descargando archivo: {e}")
-            return False
+            return False, False
+
+    @staticmethod
+    def _restart_download(state: DownloadProgress):
+        state.restart()
+        open_download_target(state.path, 'wb').close()
+
+    @staticmethod
+    def _report_progress(state: DownloadProgress, progress: Optional[Callable[[DownloadProgress], None]]):
+        if progress is not None:
+            progress(state)
+        now = time.monotonic()
+        if now - state._last_report >= PROGRESS_LOG_SECONDS and now - state.started >= PROGRESS_LOG_SECONDS:
+            state._last_report = now
+            logger.info(f"⏬ {os.path.basename(state.url.split('?')[0])}: {state.describe()}")
+
+    @staticmethod
+    def _verify_checksum(state: DownloadProgress) -> bool:
+        """Compara el archivo completo con el checksum anunciado (si lo hay)."""
+        if state.digest is None:
+            return True
+        algorithm, expected = state.digest
+        digest = hashlib.new(algorithm)
+        with open_download_target(state.path, 'rb') as f:
+            for block in iter(lambda: f.read(download_buffer_bytes()), b''):
+                digest.update(block)
+        actual = base64.b64encode(digest.digest()).decode()
+        # Algunos servidores publican el valor en hexadecimal en lugar de base64
+        if expected in (actual, digest.hexdigest()):
+            return True
+        logger.error(f"❌ Checksum {algorithm} no coincide para {state.url}; se descarta el archivo")
+        return False
+
+    def subset_region(self, ds: xr.Dataset, lat_min: float, lat_max: float,
+                      lon_min: float, lon_max: float, hours: Optional[List[int]] = None) -> Optional[xr.Dataset]:
+        """Recorta un dataset MERRA-2 a la región, variables y horas pedidas (ver subset_merra2_region)."""
+        return subset_merra2_region(ds, lat_min, lat_max, lon_min, lon_max, hours)
 
     def process_merra2_data(self, file_path: str, lat_min: float, lat_max: float,
                            lon_min: float, lon_max: float) -> Optional[xr.Dataset]:
@@ -167,42 +595,15 @@ class MERRA2Service:
             lat_min, lat_max, lon_min, lon_max: Límites geográficos
 
         Returns:
-            xr.Dataset: Dataset procesado o None si hay error
+            xr.Dataset: Dataset procesado (cargado en memoria) o None si hay error
         """
         try:
-            # Abrir dataset
-            ds = xr.open_dataset(file_path)
-            logger.info(f"Dataset abierto: {list(ds.variables.keys())}")
-
-            # Ajustar longitudes si es necesario (MERRA-2 usa 0-360)
-            if 'lon' in ds.coords:
-                lon_coord = 'lon'
-            elif 'longitude' in ds.coords:
-                lon_coord = 'longitude'
-            else:
-                logger.error("No se encontró coordenada de longitud")
-                return None
-
-            # Convertir longitudes negativas a 0-360 si es necesario
-            if lon_min < 0:
-                lon_min = lon_min + 360
-            if lon_max < 0:
-                lon_max = lon_max + 360
-
-            # Seleccionar región geográfica
-            if 'lat' in ds.coords:
-                lat_coord = 'lat'
-            elif 'latitude' in ds.coords:
-                lat_coord = 'latitude'
-            else:
-                logger.error("No se encontró coordenada de latitud")
-                return None
-
-            # Filtrar por región
-            ds_region = ds.sel(
-                {lat_coord: slice(lat_min, lat_max),
-                 lon_coord: slice(lon_min, lon_max)}
-            )
+            with NETCDF_IO_LOCK, xr.open_dataset(file_path) as ds:
+                logger.info(f"Dataset abierto: {list(ds.variables.keys())}")
+                ds_region = self.subset_region(ds, lat_min, lat_max, lon_min, lon_max)
+                if ds_region is None:
+                    return None
+                ds_region = ds_region.load()
 
             logger.info(f"Región extraída: {ds_region.sizes}")
             return ds_region
@@ -211,130 +612,43 @@ class MERRA2Service:
             logger.error(f"Error procesando archivo MERRA-2: {e}")
             return None
 
-    def convert_to_era5_format(self, datasets: List[xr.Dataset],
+    def convert_to_era5_format(self, datasets: Iterable[xr.Dataset],
                               lat_min: float, lat_max: float,
                               lon_min: float, lon_max: float,
-                              start_date: str, end_date: str) -> Dict:
+                              start_date: str, end_date: str,
+                              config: Optional[SourceRequestConfig] = None,
+                              response_format: Optional[ResponseFormat] = None) -> Dict:
         """
         Convierte datos MERRA-2 al formato de respuesta compatible con ERA5.
+        Los datasets se procesan bloque a bloque en el orden recibido.
 
         Args:
-            datasets: Lista de datasets MERRA-2 procesados
+            datasets: Datasets (o bloques) MERRA-2 recortados, en orden temporal
             lat_min, lat_max, lon_min, lon_max: Límites geográficos
             start_date, end_date: Fechas de inicio y fin
+            config: Configuración de la solicitud
+            response_format: Esquema de la respuesta ('flat' por defecto)
 
         Returns:
             Dict: Datos en formato compatible con ERA5
         """
+        config = config or self.config
         try:
-            # Combinar todos los datasets
-            if not datasets:
+            # Campos derivados y agregados por bloques (velocidad, dirección, 100 m extrapolado)
+            builder = build_frontend_payload(datasets, 'merra2', response_format)
+            if not builder.timestamps:
                 raise ValueError("No hay datasets para procesar")
 
-            combined_ds = xr.concat(datasets, dim='time')
-            combined_ds = combined_ds.sortby('time')
-
-            # Mapeo de variables MERRA-2 a ERA5
-            var_mapping = {
-                'U10M': 'u10',    # Viento U a 10m
-                'V10M': 'v10',    # Viento V a 10m
-                'T2M': 't2m',     # Temperatura a 2m
-                'PS': 'sp'        # Presión superficial
-            }
-
-            # Extraer timestamps
-            timestamps = [pd.Timestamp(t).isoformat() for t in combined_ds.time.values]
-
-            # Inicializar estructura de datos
-            data_for_frontend = {
-                'timestamps': timestamps,
-                'wind_speed_10m': [],
-                'wind_direction_10m': [],
-                'wind_speed_100m': [],  # MERRA-2 no tiene 100m, usar extrapolación
-                'wind_direction_100m': [],
-                'temperature_2m': [],
-                'surface_pressure': []
-            }
-
-            # Procesar componentes de viento a 10m
-            if 'U10M' in combined_ds and 'V10M' in combined_ds:
-                u10 = combined_ds['U10M']
-                v10 = combined_ds['V10M']
-
-                # Calcular velocidad y dirección del viento
-                wind_speed_10m = np.sqrt(u10**2 + v10**2)
-                wind_direction_10m = (180 / np.pi) * np.arctan2(u10, v10)
-                wind_direction_10m = (wind_direction_10m + 360) % 360
-
-                data_for_frontend['wind_speed_10m'] = wind_speed_10m.values.flatten().tolist()
-                data_for_frontend['wind_direction_10m'] = wind_direction_10m.values.flatten().tolist()
-
-                # Extrapolación a 100m usando ley de potencia (exponente ~0.1 para océano)
-                wind_speed_100m = wind_speed_10m * (100/10)**0.1
-                data_for_frontend['wind_speed_100m'] = wind_speed_100m.values.flatten().tolist()
-                data_for_frontend['wind_direction_100m'] = wind_direction_10m.values.flatten().tolist()
-            else:
-                logger.warning("Variables de viento U10M o V10M no encontradas")
-                # Llenar con listas vacías
-                data_for_frontend['wind_speed_10m'] = []
-                data_for_frontend['wind_direction_10m'] = []
-                data_for_frontend['wind_speed_100m'] = []
-                data_for_frontend['wind_direction_100m'] = []
-
-            # Procesar temperatura
-            if 'T2M' in combined_ds:
-                # MERRA-2 T2M ya está en Kelvin, convertir a Celsius
-                temperature_2m_celsius = combined_ds['T2M'] - 273.15
-                data_for_frontend['temperature_2m'] = temperature_2m_celsius.values.flatten().tolist()
-            else:
-                logger.warning("Variable T2M no encontrada")
-                data_for_frontend['temperature_2m'] = []
-
-            # Procesar presión superficial
-            if 'PS' in combined_ds:
-                # MERRA-2 PS está en Pa, convertir a hPa
-                surface_pressure_hpa = combined_ds['PS'] / 100.0
-                data_for_frontend['surface_pressure'] = surface_pressure_hpa.values.flatten().tolist()
-            else:
-                logger.warning("Variable PS no encontrada")
-                data_for_frontend['surface_pressure'] = []
-
-            # Generar análisis adicionales (compatibles con ERA5)
-            if data_for_frontend['wind_speed_10m'] and data_for_frontend['wind_direction_10m']:
-                wind_df = pd.DataFrame({
-                    "timestamp": pd.to_datetime(timestamps),
-                    "speed": data_for_frontend["wind_speed_10m"],
-                    "direction": data_for_frontend["wind_direction_10m"]
-                })
-
-                # Rosa de vientos
-                bins = np.arange(0, 361, 30)
-                labels = [f"{i}-{i+30}" for i in bins[:-1]]
-                wind_df["dir_bin"] = pd.cut(wind_df["direction"], bins=bins, labels=labels, right=False)
-                data_for_frontend["wind_rose_data"] = wind_df.groupby("dir_bin")["speed"].count().reindex(labels, fill_value=0).to_dict()
-
-                # Patrones horarios
-                wind_df["hour"] = wind_df["timestamp"].dt.hour
-                data_for_frontend["hourly_patterns"] = wind_df.groupby("hour")["speed"].mean().round(2).to_dict()
-
-                # Series temporales
-                wind_df["date"] = wind_df["timestamp"].dt.date
-                daily_avg = wind_df.groupby("date")["speed"].mean().round(2)
-                data_for_frontend["time_series"] = {date.isoformat(): val for date, val in daily_avg.items()}
-            else:
-                # Valores por defecto si no hay datos de viento
-                data_for_frontend["wind_rose_data"] = {}
-                data_for_frontend["hourly_patterns"] = {}
-                data_for_frontend["time_series"] = {}
+            data_for_frontend = builder.build(response_format)
 
             # Metadatos
             data_for_frontend['metadata'] = {
-                'total_points': len(timestamps) * combined_ds.sizes.get('lat', 1) * combined_ds.sizes.get('lon', 1),
-                'spatial_resolution': f"{combined_ds.sizes.get('lat', 1)} lat x {combined_ds.sizes.get('lon', 1)} lon puntos",
-                'temporal_resolution': f"{len(timestamps)} timesteps",
+                'total_points': builder.total_points,
+                'spatial_resolution': f"{builder.n_lat} lat x {builder.n_lon} lon puntos",
+                'temporal_resolution': f"{len(builder.timestamps)} timesteps",
                 'area': f"lat:[{lat_min},{lat_max}], lon:[{lon_min},{lon_max}]",
                 'period': f"{start_date} to {end_date}",
-                'test_mode': False,
+                'test_mode': config.test_mode,
                 'region': 'Caribe Colombiano (MERRA-2)',
                 'generated_at': datetime.now().isoformat(),
                 'version': 'merra2-v2.0'
@@ -346,8 +660,316 @@ class MERRA2Service:
             logger.error(f"Error convirtiendo datos MERRA-2: {e}")
             raise
 
+    def adjust_date_range(self, start_date: str, end_date: str) -> Tuple[str, str, List]:
+        """
+        Ajusta el rango pedido al periodo disponible en MERRA-2 (~2 meses de retraso,
+        inicio en 1980).
+
+        Returns:
+            Tuple: (start_date, end_date, fechas) corregidos
+        """
+        # 🛠️ Validación y ajuste automático de fechas
+        today = datetime.utcnow().date()
+        max_valid_date = today - timedelta(days=MERRA2_DATA_DELAY_DAYS)
+
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
+
+        if end_dt > max_valid_date:
+            logger.warning(f"⚠️ Fecha inicial {start_date} posterior a fecha final ajustada {end_dt}. Recalculando rango...")
+            end_dt = max_valid_date
+
+        if start_dt > end_dt:
+            logger.warning(f"⚠️ Fecha inicial {start_dt} posterior a fecha final ajustada {end_dt}. Recalculando rango...")
+            start_dt = end_dt - timedelta(days=7)
+
+        if start_dt < MIN_MERRA2_DATE:
+            logger.warning(f"⚠️ Fecha inicial muy antigua. Ajustando a mínimo permitido {MIN_MERRA2_DATE}")
+            start_dt = MIN_MERRA2_DATE
+
+        # Reconvertir a string para flujo normal
+        start_date = start_dt.strftime('%Y-%m-%d')
+        end_date = end_dt.strftime('%Y-%m-%d')
+        logger.info(f"📅 Fechas corregidas: {start_date} a {end_date}")
+
+        # Generar lista de fechas corregida
+        dates = [start_dt + timedelta(days=x) for x in range((end_dt - start_dt).days + 1)]
+        return start_date, end_date, dates
+
+    def open_merra2_blocks(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                           dates: List, hours: Optional[List[int]] = None, cancel_event=None,
+                           max_workers: Optional[int] = None) -> Iterator[xr.Dataset]:
+        """
+        Descarga en paralelo los archivos diarios MERRA-2 y devuelve sus bloques
+        temporales recortados a la región, en orden de fecha. Un día que falla tras
+        sus reintentos se omite sin detener a los demás. Los archivos temporales se
+        eliminan cuando el iterador se agota o se cierra.
+
+        Con MERRA2_SUBSET_MODE=opendap cada día se pide ya recortado (área, horas y
+        variables) al servicio OPeNDAP de GES DISC; si ese recorte falla se descarga
+        el archivo global completo de ese día. Con la caché MERRA-2 activa los días
+        ya descargados (por esta u otra solicitud que cubra el área) se leen de disco,
+        y los recortes nuevos se piden con las 24 horas y el área ampliada a bloques
+        alineados para que sirvan a solicitudes vecinas.
+
+        Con MERRA2_DECODE_WORKERS > 0 la descarga, la decodificación (en procesos) y
+        la fusión ordenada de los días se solapan (DecodePipeline) y el iterador
+        devuelto expone sus métricas por etapa en `metrics`.
+
+        Args:
+            lat_min, lat_max, lon_min, lon_max: Límites geográficos
+            dates: Fechas a descargar
+            hours: Horas UTC (por defecto las 24)
+            cancel_event: threading.Event opcional para abandonar la descarga
+            max_workers: Límite de concurrencia; por defecto MERRA2_MAX_CONCURRENT_DOWNLOADS
+
+        Returns:
+            Iterator[xr.Dataset]: Bloques (time, lat, lon) con U10M, V10M, T2M, PS
+        """
+        check_cancelled(cancel_event, "MERRA-2")
+        cache = get_merra2_cache()
+        fetch = self._day_fetcher(lat_min, lat_max, lon_min, lon_max, hours, cancel_event)
+        workers = max(1, min(max_workers or max_concurrent_downloads(), len(dates)))
+
+        logger.info(f"📥 Obteniendo {len(dates)} archivos MERRA-2 "
+                    f"({'recorte OPeNDAP' if merra2_subset_mode() == 'opendap' else 'globales'}, "
+                    f"caché {'activa' if cache is not None else 'inactiva'}), concurrencia={workers}")
+        decoders = decode_workers()
+        if decoders > 0:
+            return self._open_pipeline(fetch, dates, (lat_min, lat_max, lon_min, lon_max, hours),
+                                       workers, decoders, cancel_event)
+
+        # Destino de cada día: en memoria salvo REANALYSIS_SPOOL_MODE=disk
+        temp_files = [new_download_target(name=f"MERRA2_{date:%Y%m%d}.nc4") for date in dates]
+
+        started = time.monotonic()
+        paths = [None] * len(dates)
+        futures = {}
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="merra2-dl") as executor:
+                futures = {executor.submit(fetch, date, path): i
+                           for i, (date, path) in enumerate(zip(dates, temp_files))}
+                try:
+                    for future in as_completed(futures):
+                        i = futures[future]
+                        paths[i] = future.result()
+                        if not paths[i]:
+                            logger.warning(f"No se pudo descargar archivo para {dates[i].strftime('%Y-%m-%d')}")
+                        check_cancelled(cancel_event, "MERRA-2")
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+            # Mantener el orden de fechas para la concatenación temporal
+            downloaded = [path for path in paths if path]
+            logger.info(f"📥 MERRA-2: {len(downloaded)}/{len(dates)} archivos en "
+                        f"{time.monotonic() - started:.1f}s")
+            if not downloaded:
+                raise ValueError("No se pudieron descargar datos para ninguna fecha")
+        except BaseException:
+            # Incluye los días que terminaron después del fallo o la cancelación
+            self._release_cache_entries([future.result() for future in futures
+                                         if future.done() and not future.cancelled() and future.exception() is None],
+                                        temp_files)
+            self._remove_temp_files(temp_files)
+            raise
+
+        return self._iter_region_blocks(downloaded, temp_files, lat_min, lat_max, lon_min, lon_max, hours)
+
+    def _day_fetcher(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                     hours: Optional[List[int]] = None, cancel_event=None) -> Callable:
+        """
+        Función fetch(date, temp_path, cancel) que obtiene el archivo de un día: de la
+        caché MERRA-2 si ya lo contiene o, si no, descargándolo en temp_path (recorte
+        OPeNDAP o archivo global) y guardándolo en ella. Las entradas de la caché se
+        devuelven fijadas (no se desalojan mientras se leen): quien llama las libera
+        con cache.release(ruta).
+
+        Returns:
+            Callable: Devuelve la ruta del día (entrada de la caché o temp_path), o None
+        """
+        cache = get_merra2_cache()
+        window = merra2_window(lat_min, lat_max, lon_min, lon_max)
+        subset = merra2_subset_mode() == 'opendap'
+        if cache is not None:
+            fetch_window, slab = snap_window(window, cache_block_cells()), MERRA2_FULL_SLAB
+        else:
+            fetch_window, slab = window, time_slab(hours)
+        if not subset:
+            fetch_window, slab = MERRA2_FULL_WINDOW, MERRA2_FULL_SLAB
+        constraint = opendap_constraint(fetch_window, slab) if subset else None
+
+        session = self.config_manager.session_pool.session()
+
+        def download(date, temp_path, cancel):
+            obtained = self._download_day(date, constraint, temp_path, session, cancel)
+            if obtained is None:
+                return None
+            if cache is None:
+                return temp_path
+            entry_window, entry_slab = (fetch_window, slab) if obtained == 'subset' else (
+                MERRA2_FULL_WINDOW, MERRA2_FULL_SLAB)
+            try:
+                return cache.store_file(MERRA2_COLLECTION, date, entry_window, entry_slab, temp_path,
+                                        MERRA2_VARIABLES, pin=True)
+            except ValueError as e:
+                logger.error(f"❌ Archivo MERRA-2 de {date} descartado (integridad): {e}")
+                return None
+
+        def fetch(date, temp_path, cancel=cancel_event):
+            if cache is None:
+                return download(date, temp_path, cancel)
+            path = cache.find(MERRA2_COLLECTION, date, window, hours, pin=True)
+            if path is not None:
+                return path
+            # Una sola descarga por clave: quien espere el candado encuentra la entrada hecha
+            with cache.lock(MERRA2_COLLECTION, date, fetch_window, slab):
+                return (cache.find(MERRA2_COLLECTION, date, window, hours, pin=True)
+                        or download(date, temp_path, cancel))
+
+        return fetch
+
+    def _open_pipeline(self, fetch: Callable, dates: List, region: Tuple, fetch_workers: int,
+                       decoders: int, cancel_event=None) -> DecodePipeline:
+        """
+        Canal descarga → decodificación → fusión ordenada: los días se recortan en
+        procesos a medida que llegan y sus descargas se liberan al decodificarse.
+        """
+        owned = set()
+        owned_lock = threading.Lock()
+        cache = get_merra2_cache()
+
+        def fetch_day(index):
+            target = new_download_target(name=f"MERRA2_{dates[index]:%Y%m%d}.nc4")
+            with owned_lock:
+                owned.add(target)
+            path = None
+            try:
+                # El canal detiene sus descargas al cerrarse, y se cierra si se cancela la solicitud
+                path = fetch(dates[index], target, pipeline.stop_event)
+                return path
+            finally:
+                if path is not target:
+                    release(target)
+
+        def release(target):
+            with owned_lock:
+                cached = target not in owned
+                owned.discard(target)
+            if not cached:
+                release_download_target(target)
+            elif cache is not None:
+                cache.release(target)  # entrada fijada de la caché
+
+        pipeline = DecodePipeline(
+            [date.strftime('%Y-%m-%d') for date in dates], fetch_day, decode_merra2_day, region,
+            fetch_workers=fetch_workers, decode_workers=decoders, queue_size=pipeline_queue_size(),
+            release=release, cancel_event=cancel_event, name="MERRA-2"
+        )
+        return pipeline
+
+    def _download_day(self, date, constraint: Optional[str], temp_path: DownloadTarget, session: requests.Session,
+                      cancel_event=None) -> Optional[str]:
+        """
+        Descarga el archivo de un día: el recorte OPeNDAP si hay restricción y, si
+        falla, el archivo global completo.
+
+        Returns:
+            str: 'subset' o 'full' según lo descargado, o None si no se pudo descargar
+        """
+        year, month, day = date.strftime('%Y'), date.strftime('%m'), date.strftime('%d')
+        if constraint is not None:
+            url = self.config_manager.get_merra2_opendap_url(year, month, day, constraint)
+            if self.download_merra2_file(url, temp_path, session=session, cancel_event=cancel_event):
+                return 'subset'
+            logger.warning(f"⚠️ Recorte OPeNDAP no disponible para {date}; descargando archivo completo")
+        # Descargar archivo SLV (Single-Level Variables)
+        urls = self.config_manager.get_merra2_urls(year, month, day)
+        if self.download_merra2_file(urls['slv'], temp_path, session=session, cancel_event=cancel_event):
+            return 'full'
+        return None
+
+    def _iter_region_blocks(self, paths, temp_files, lat_min, lat_max, lon_min, lon_max, hours=None):
+        """Abre perezosamente y recorta los archivos descargados; limpia los temporales al terminar."""
+        try:
+            yield from iter_mfdataset_blocks(
+                paths,
+                preprocess=lambda ds: self.subset_region(ds, lat_min, lat_max, lon_min, lon_max, hours),
+                steps_per_file=len(set(hours)) if hours else MERRA2_N_TIMES
+            )
+        finally:
+            self._release_cache_entries(paths, temp_files)
+            self._remove_temp_files(temp_files)
+
+    def _remove_temp_files(self, temp_files: List[DownloadTarget]):
+        # Limpiar archivos temporales y descargas en memoria
+        for temp_file in temp_files:
+            release_download_target(temp_file)
+
+    @staticmethod
+    def _release_cache_entries(paths: Iterable, temp_files: List[DownloadTarget]):
+        """Libera las entradas de la caché MERRA-2 fijadas por fetch (lo que no es un temporal)."""
+        cache = get_merra2_cache()
+        if cache is None:
+            return
+        temporary = {id(temp_file) for temp_file in temp_files}
+        for path in paths:
+            if path and id(path) not in temporary:
+                cache.release(path)
+
+    def missing_merra2_dates(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                             dates: List) -> List:
+        """
+        Fechas cuyo día completo (24 horas) del área no está en la caché MERRA-2.
+
+        Raises:
+            ValueError: Si la caché MERRA-2 está desactivada
+        """
+        cache = get_merra2_cache()
+        if cache is None:
+            raise ValueError("Caché MERRA-2 desactivada")
+        window = merra2_window(lat_min, lat_max, lon_min, lon_max)
+        return [date for date in dates if cache.find(MERRA2_COLLECTION, date, window) is None]
+
+    def warm_merra2_cache(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                          dates: List, cancel_event=None) -> Dict[str, int]:
+        """
+        Descarga a la caché MERRA-2, de uno en uno y sin decodificarlos, los días del
+        área que todavía no tiene (precarga en segundo plano).
+
+        Args:
+            lat_min, lat_max, lon_min, lon_max: Límites geográficos
+            dates: Fechas a precargar
+            cancel_event: threading.Event opcional para abandonar la precarga
+
+        Returns:
+            Dict: Días que ya estaban en caché ('cached'), descargados ('downloaded') y fallidos ('failed')
+
+        Raises:
+            ValueError: Si la caché MERRA-2 está desactivada
+        """
+        missing = self.missing_merra2_dates(lat_min, lat_max, lon_min, lon_max, dates)
+        cache = get_merra2_cache()
+        fetch = self._day_fetcher(lat_min, lat_max, lon_min, lon_max, None, cancel_event)
+        counts = {'cached': len(dates) - len(missing), 'downloaded': 0, 'failed': 0}
+        for date in missing:
+            check_cancelled(cancel_event, "MERRA-2")
+            target = new_download_target(name=f"MERRA2_{date:%Y%m%d}.nc4")
+            try:
+                # Con la caché activa fetch devuelve la entrada guardada, nunca el destino
+                path = fetch(date, target)
+            finally:
+                release_download_target(target)
+            if path:
+                cache.release(path)
+            counts['downloaded' if path else 'failed'] += 1
+        return counts
+
     def get_merra2_data(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float,
-                       start_date: str, end_date: str) -> Dict:
+                       start_date: str, end_date: str, hours: Optional[List[int]] = None, cancel_event=None,
+                       config: Optional[SourceRequestConfig] = None,
+                       response_format: Optional[ResponseFormat] = None) -> Dict:
         """
         Función principal para obtener datos MERRA-2.
 
@@ -355,6 +977,10 @@ class MERRA2Service:
             lat_min, lat_max: Límites de latitud
             lon_min, lon_max: Límites de longitud
             start_date, end_date: Fechas en formato YYYY-MM-DD
+            hours: Horas UTC a incluir (por defecto las 24)
+            cancel_event: threading.Event opcional para abandonar la descarga
+            config: Configuración de la solicitud (por defecto la del servicio)
+            response_format: Esquema de la respuesta ('flat' por defecto)
 
         Returns:
             Dict: Datos en formato compatible con ERA5
@@ -363,82 +989,115 @@ class MERRA2Service:
             logger.info(f"Iniciando descarga MERRA-2 para área: lat=[{lat_min},{lat_max}], lon=[{lon_min},{lon_max}]")
             logger.info(f"Período: {start_date} a {end_date}")
 
-            # 🛠️ Validación y ajuste automático de fechas
-            today = datetime.utcnow().date()
-            approx_data_delay_days = 60  # ~2 meses de retraso en MERRA-2
-            max_valid_date = today - timedelta(days=approx_data_delay_days)
+            start_date, end_date, dates = self.adjust_date_range(start_date, end_date)
 
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
+            # Recortar y convertir a formato ERA5 por bloques
+            blocks = self.open_merra2_blocks(lat_min, lat_max, lon_min, lon_max, dates, hours, cancel_event)
+            try:
+                data = self.convert_to_era5_format(blocks, lat_min, lat_max, lon_min, lon_max,
+                                                   start_date, end_date, config, response_format)
+            finally:
+                blocks.close()
+            if isinstance(blocks, DecodePipeline):
+                data['metadata']['pipeline'] = blocks.metrics.summary()
+            return data
 
-            if end_dt > max_valid_date:
-                logger.warning(f"⚠️ Fecha inicial {start_date} posterior a fecha final ajustada {end_dt}. Recalculando rango...")
-                end_dt = max_valid_date
+        except SourceCancelled:
+            logger.info("MERRA-2 cancelado: otra fuente respondió antes")
+            raise
+        except Exception as e:
+            logger.error(f"Error en get_merra2_data: {e}")
+            raise
 
-            if start_dt > end_dt:
-                logger.warning(f"⚠️ Fecha inicial {start_dt} posterior a fecha final ajustada {end_dt}. Recalculando rango...")
-                start_dt = end_dt - timedelta(days=7)
+    def get_merra2_point_data(self, lat: float, lon: float, start_date: str, end_date: str,
+                              hours: Optional[List[int]] = None, method: str = 'bilinear', cancel_event=None,
+                              config: Optional[SourceRequestConfig] = None,
+                              response_format: Optional[ResponseFormat] = None) -> Dict:
+        """
+        Serie temporal MERRA-2 en un punto, interpolada desde los 2x2 nodos de la
+        malla (0.5° x 0.625°) que lo encierran.
 
-            if start_dt < MIN_MERRA2_DATE:
-                logger.warning(f"⚠️ Fecha inicial muy antigua. Ajustando a mínimo permitido {MIN_MERRA2_DATE}")
-                start_dt = MIN_MERRA2_DATE
+        Args:
+            lat, lon: Punto de interés
+            start_date, end_date: Fechas en formato YYYY-MM-DD
+            hours: Horas UTC a incluir (por defecto las 24)
+            method: 'nearest', 'bilinear' o 'idw'
+            cancel_event: threading.Event opcional para abandonar la descarga
+            config: Configuración de la solicitud
+            response_format: Esquema de la respuesta ('flat' por defecto)
 
-            # Reconvertir a string para flujo normal
-            start_date = start_dt.strftime('%Y-%m-%d')
-            end_date = end_dt.strftime('%Y-%m-%d')
-            logger.info(f"📅 Fechas corregidas: {start_date} a {end_date}")
+        Returns:
+            Dict: Datos en formato compatible con ERA5 (una sola celda)
+        """
+        try:
+            start_date, end_date, dates = self.adjust_date_range(start_date, end_date)
+            lat0, lat1 = enclosing_cells(lat, MERRA2_LAT_STEP, origin=-90.0)
+            lon0, lon1 = enclosing_cells(lon, MERRA2_LON_STEP, origin=-180.0)
+            logger.info(f"Serie MERRA-2 en ({lat}, {lon}): nodos lat={lat0}..{lat1}, lon={lon0}..{lon1}")
+
+            # Margen mínimo para no perder nodos por redondeo en el recorte
+            eps = 1e-6
+            blocks = self.open_merra2_blocks(lat0 - eps, lat1 + eps, lon0 - eps, lon1 + eps, dates, hours,
+                                             cancel_event)
+            try:
+                data = self.convert_to_era5_format(iter_point_blocks(blocks, lat, lon, method),
+                                                   lat0, lat1, lon0, lon1, start_date, end_date, config,
+                                                   response_format)
+            finally:
+                blocks.close()
+
+            data['metadata'].update({
+                'spatial_resolution': '1 punto interpolado',
+                'point': {'lat': lat, 'lon': lon},
+                'interpolation': method,
+                'grid_cells': {'lat': [lat0, lat1], 'lon': [lon0, lon1]},
+            })
+            return data
+
+        except SourceCancelled:
+            logger.info("MERRA-2 cancelado: otra fuente respondió antes")
+            raise
+        except Exception as e:
+            logger.error(f"Error en get_merra2_point_data: {e}")
+            raise
+
+    def open_merra2_stream(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                           start_date: str, end_date: str, hours: Optional[List[int]] = None, cancel_event=None,
+                           config: Optional[SourceRequestConfig] = None) -> FrontendBlockStream:
+        """
+        Como get_merra2_data, pero devuelve los campos derivados por bloques para
+        emitirlos en streaming en lugar de construir la respuesta completa.
 
-            # Generar lista de fechas corregida
-            dates = [start_dt + timedelta(days=x) for x in range((end_dt - start_dt).days + 1)]
+        Returns:
+            FrontendBlockStream: Bloques derivados con metadatos de la fuente
+        """
+        config = config or self.config
+        try:
+            start_date, end_date, dates = self.adjust_date_range(start_date, end_date)
+            blocks = self.open_merra2_blocks(lat_min, lat_max, lon_min, lon_max, dates, hours, cancel_event)
+            return FrontendBlockStream(blocks, 'merra2', metadata={
+                'area': f"lat:[{lat_min},{lat_max}], lon:[{lon_min},{lon_max}]",
+                'period': f"{start_date} to {end_date}",
+                'test_mode': config.test_mode,
+                'region': 'Caribe Colombiano (MERRA-2)',
+                'version': 'merra2-v2.0'
+            })
+        except SourceCancelled:
+            logger.info("MERRA-2 cancelado: otra fuente respondió antes")
+            raise
 
-            datasets = []
-            temp_files = []
 
-            try:
-                # Descargar archivos para cada fecha
-                for date in dates:
-                    year = date.strftime('%Y')
-                    month = date.strftime('%m')
-                    day = date.strftime('%d')
-
-                    # Obtener URLs para esta fecha
-                    urls = self.config_manager.get_merra2_urls(year, month, day)
-
-                    # Descargar archivo SLV (Single-Level Variables)
-                    slv_url = urls['slv']
-
-                    # Crear archivo temporal
-                    with tempfile.NamedTemporaryFile(suffix=".nc4", delete=False) as tmp_file:
-                        temp_path = tmp_file.name
-                        temp_files.append(temp_path)
-
-                    # Descargar archivo
-                    if self.download_merra2_file(slv_url, temp_path):
-                        # Procesar archivo
-                        ds = self.process_merra2_data(temp_path, lat_min, lat_max, lon_min, lon_max)
-                        if ds is not None:
-                            datasets.append(ds)
-                        else:
-                            logger.warning(f"No se pudo procesar archivo para {date.strftime('%Y-%m-%d')}")
-                    else:
-                        logger.warning(f"No se pudo descargar archivo para {date.strftime('%Y-%m-%d')}")
-
-                if not datasets:
-                    raise ValueError("No se pudieron descargar datos para ninguna fecha")
-
-                # Convertir a formato ERA5
-                result = self.convert_to_era5_format(datasets, lat_min, lat_max, lon_min, lon_max, start_date, end_date)
-                return result
+_merra2_service = None
+_merra2_service_lock = threading.Lock()
 
-            finally:
-                # Limpiar archivos temporales
-                for temp_file in temp_files:
-                    try:
-                        if os.path.exists(temp_file):
-                            os.unlink(temp_file)
-                    except Exception as e:
-                        logger.warning(f"No se pudo eliminar archivo temporal {temp_file}: {e}")
 
-        except Exception as e:
-            logger.error(f"Error en get_merra2_data: {e}")
-            raise
+def get_merra2_service() -> MERRA2Service:
+    """
+    Instancia compartida de MERRA2Service. Evita validar credenciales NASA
+    en cada solicitud; la configuración por solicitud se pasa a cada llamada.
+    """
+    global _merra2_service
+    with _merra2_service_lock:
+        if _merra2_service is None:
+            _merra2_service = MERRA2Service()
+        return _merra2_service
@@ -1,12 +1,92 @@
 import logging
 import os
 import netrc
+import threading
+import time
 from typing import Optional, Tuple, Dict
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
 logger = logging.getLogger(__name__)
 
+
+class EarthdataSession(requests.Session):
+    """
+    Sesión que conserva la autenticación básica en las redirecciones entre
+    GES DISC y Earthdata Login (requests la elimina al cambiar de host), de modo
+    que la cookie de sesión de GES DISC se obtiene en la primera descarga y las
+    siguientes ya no pasan por Earthdata.
+    """
+
+    def __init__(self, auth_host: str):
+        super().__init__()
+        self.auth_host = auth_host
+
+    def rebuild_auth(self, prepared_request, response):
+        headers = prepared_request.headers
+        if 'Authorization' in headers:
+            original = urlparse(response.request.url).hostname
+            redirect = urlparse(prepared_request.url).hostname
+            if original != redirect and self.auth_host not in (original, redirect):
+                del headers['Authorization']
+
+
+class EarthdataSessionPool:
+    """
+    Sesión autenticada de larga duración compartida por los hilos de descarga:
+    reutiliza las conexiones keep-alive (hasta max_connections por host) y las
+    cookies de autenticación. Se reconstruye al superar max_age_seconds o tras
+    invalidate() (p. ej. un 401 por cookie caducada).
+    """
+
+    def __init__(self, manager: "NASAConfigManager", max_connections: int, max_age_seconds: float):
+        self.manager = manager
+        self.max_connections = max(1, max_connections)
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._session: Optional[EarthdataSession] = None
+        self._created_at = 0.0
+        self.sessions_created = 0
+
+    def _build(self) -> EarthdataSession:
+        session = EarthdataSession(urlparse(self.manager.earthdata_login_url).hostname)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_connections)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        self.manager.configure_session(session)
+        return session
+
+    def session(self) -> requests.Session:
+        """Sesión compartida vigente (se crea o renueva si hace falta)."""
+        with self._lock:
+            expired = time.monotonic() - self._created_at > self.max_age_seconds
+            if self._session is None or expired:
+                if self._session is not None:
+                    self._session.close()
+                self._session = self._build()
+                self._created_at = time.monotonic()
+                self.sessions_created += 1
+            return self._session
+
+    def invalidate(self, session: Optional[requests.Session] = None):
+        """Descarta la sesión (solo si sigue siendo session, cuando se indica)."""
+        with self._lock:
+            if self._session is not None and (session is None or session is self._session):
+                self._session.close()
+                self._session = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'active': self._session is not None,
+                'age_seconds': round(time.monotonic() - self._created_at, 1) if self._session else None,
+                'cookies': len(self._session.cookies) if self._session else 0,
+                'sessions_created': self.sessions_created,
+                'max_connections': self.max_connections,
+            }
+
 class NASAConfigManager:
     def __init__(self, username: str = None, password: str = None):
         """
@@ -16,14 +96,29 @@ class NASAConfigManager:
         self.username = username
         self.password = password
         self.config_method = "unknown"
-        self.ges_disc_base_url = "https://goldsmr4.gesdisc.eosdis.nasa.gov"
+        # Las URLs se pueden redirigir a servidores locales (ver backend/mock_servers)
+        self.ges_disc_base_url = os.getenv('NASA_GES_DISC_URL', "https://goldsmr4.gesdisc.eosdis.nasa.gov").rstrip('/')
         self.merra2_base_path = "/data/MERRA2"
-        self.earthdata_login_url = "https://urs.earthdata.nasa.gov"
+        # Servicio OPeNDAP (Hyrax) de GES DISC para recortes en el servidor
+        self.opendap_base_url = os.getenv('NASA_OPENDAP_URL', f"{self.ges_disc_base_url}/opendap").rstrip('/')
+        self.earthdata_login_url = os.getenv('NASA_EARTHDATA_URL', "https://urs.earthdata.nasa.gov").rstrip('/')
         
         # Intentar cargar credenciales en orden de prioridad
         self._load_credentials()
         logger.info(f"✅ Credenciales cargadas usando método: {self.config_method}")
 
+        self.session_pool = EarthdataSessionPool(
+            self,
+            max_connections=int(os.getenv('EARTHDATA_POOL_CONNECTIONS', '10')),
+            max_age_seconds=60 * float(os.getenv('EARTHDATA_SESSION_MAX_AGE_MINUTES', '60')),
+        )
+        # Resultado de validate_credentials con TTL y refresco en segundo plano
+        self.validation_ttl_seconds = 60 * float(os.getenv('NASA_VALIDATION_TTL_MINUTES', '30'))
+        self._validation: Optional[Dict] = None
+        self._validated_at = 0.0
+        self._validation_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
     def _load_credentials(self):
         """Carga credenciales desde variables de entorno, parámetros o archivo .netrc"""
         
@@ -62,17 +157,12 @@ class NASAConfigManager:
         """Retorna las credenciales cargadas"""
         return self.username, self.password
 
-    def get_auth_session(self) -> requests.Session:
-        """
-        Crea una sesión autenticada para NASA Earthdata.
-        Implementa el flujo de autenticación estándar de NASA.
-        """
-        session = requests.Session()
-        
+    def configure_session(self, session: requests.Session) -> requests.Session:
+        """Aplica credenciales y cabeceras de NASA Earthdata a una sesión (sin peticiones)."""
         if not self.username or not self.password:
             logger.error("❌ No hay credenciales disponibles para autenticación")
             return session
-        
+
         # Configurar autenticación básica
         session.auth = HTTPBasicAuth(self.username, self.password)
         
@@ -86,6 +176,19 @@ class NASAConfigManager:
         
         # Configurar para manejar redirecciones de NASA
         session.max_redirects = 10
+        return session
+
+    def get_auth_session(self) -> requests.Session:
+        """
+        Crea una sesión autenticada para NASA Earthdata.
+        Implementa el flujo de autenticación estándar de NASA.
+        Para descargas repetidas use session_pool.session(), que reutiliza
+        conexiones y cookies sin repetir la autenticación inicial.
+        """
+        session = self.configure_session(
+            EarthdataSession(urlparse(self.earthdata_login_url).hostname))
+        if not self.username or not self.password:
+            return session
         
         # Realizar autenticación inicial con Earthdata Login
         try:
@@ -115,6 +218,15 @@ class NASAConfigManager:
             "flx": f"{self.ges_disc_base_url}{self.merra2_base_path}/M2T1NXFLX.5.12.4/{year_month}/MERRA2_400.tavg1_2d_flx_Nx.{date_str}.nc4"
         }
 
+    def get_merra2_opendap_url(self, year: str, month: str, day: str, constraint: str) -> str:
+        """
+        URL OPeNDAP del archivo SLV diario con una restricción DAP2 (variables e
+        índices); la extensión .nc4 final pide la respuesta en NetCDF.
+        """
+        date_str = f"{year}{month}{day}"
+        return (f"{self.opendap_base_url}/MERRA2/M2T1NXSLV.5.12.4/{year}/{month}/"
+                f"MERRA2_400.tavg1_2d_slv_Nx.{date_str}.nc4.nc4?{constraint}")
+
     def validate_credentials(self) -> Dict:
         """
         Valida las credenciales realizando una prueba de conexión real.
@@ -136,7 +248,7 @@ class NASAConfigManager:
             return result
 
         try:
-            session = self.get_auth_session()
+            session = self.session_pool.session()
             
             # Paso 1: Verificar autenticación con Earthdata Login
             logger.info("🔍 Verificando autenticación con NASA Earthdata...")
@@ -200,6 +312,44 @@ class NASAConfigManager:
 
         return result
 
+    def cached_validation(self, block: bool = True) -> Optional[Dict]:
+        """
+        Resultado de validate_credentials guardado durante NASA_VALIDATION_TTL_MINUTES.
+        Un resultado caducado se sigue devolviendo mientras se refresca en segundo plano.
+
+        Args:
+            block: Si no hay ningún resultado aún, validar en el hilo llamador (True)
+                   o lanzar la validación en segundo plano y devolver None (False)
+
+        Returns:
+            Dict: Último resultado de validación, o None si aún no existe y block=False
+        """
+        with self._validation_lock:
+            result = self._validation
+            fresh = result is not None and time.monotonic() - self._validated_at < self.validation_ttl_seconds
+        if fresh:
+            return result
+        if result is None and block:
+            return self._refresh_validation()
+        self._start_background_refresh()
+        return result
+
+    def _start_background_refresh(self):
+        with self._validation_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_validation, name="earthdata-validation", daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh_validation(self) -> Dict:
+        result = self.validate_credentials()
+        with self._validation_lock:
+            self._validation = result
+            self._validated_at = time.monotonic()
+        log_validation_status(result)
+        return result
+
     def create_netrc_file(self, username: str, password: str, netrc_path: str = None) -> bool:
         """
         Crea un archivo .netrc con las credenciales proporcionadas.
@@ -226,3 +376,34 @@ password {password}
         except Exception as e:
             logger.error(f"❌ Error creando archivo .netrc: {e}")
             return False
+
+
+def log_validation_status(result: Dict):
+    """Registra el estado de las credenciales NASA devuelto por validate_credentials."""
+    status = result["status"]
+    if status == "fully_functional":
+        logger.info("✅ Credenciales NASA validadas correctamente")
+        return
+    logger.warning(f"⚠️ Problema con credenciales NASA: {status}")
+    if status == "credentials_missing":
+        logger.error("❌ Credenciales NASA faltantes. Configure NASA_USERNAME y NASA_PASSWORD")
+    elif status == "invalid_credentials":
+        logger.error("❌ Credenciales NASA inválidas. Verifique usuario y contraseña")
+    elif status == "merra2_access_denied":
+        logger.error("❌ Acceso denegado a MERRA-2. Verifique permisos de cuenta NASA Earthdata")
+
+
+_managers: Dict[Tuple, NASAConfigManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_nasa_config_manager(username: str = None, password: str = None) -> NASAConfigManager:
+    """
+    Gestor compartido por credenciales y URLs, para que el pool de sesiones y la
+    validación cacheada sobrevivan a las instancias de los servicios.
+    """
+    key = (username, password, os.getenv('NASA_GES_DISC_URL'), os.getenv('NASA_EARTHDATA_URL'))
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = NASAConfigManager(username=username, password=password)
+        return _managers[key]
@@ -0,0 +1,461 @@
+"""
+Precarga en segundo plano de las cachés de reanálisis para las regiones habituales.
+
+La mayoría de las consultas piden el Caribe colombiano y periodos recientes. En una
+ventana horaria de poca carga (PREFETCH_WINDOW_UTC) el planificador descarga los días
+nuevos de ERA5/ERA5T y MERRA-2 de cada región configurada a la caché de tiles ERA5
+(que guarda también los agregados diarios de la pirámide) y a la caché MERRA-2,
+reemplaza los días ERA5T cuya versión final ya está publicada, y completa los
+niveles mes/año de la pirámide, de modo que las solicitudes interactivas
+sobre periodos recientes se sirvan desde disco.
+
+Para no competir con los usuarios ni exceder los límites de CDS y GES DISC: una sola
+solicitud a la vez por fuente, un intervalo mínimo y un máximo por hora de solicitudes,
+y la fuente se omite mientras su circuit breaker no esté cerrado.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.services.era5_cache import get_era5_cache
+from src.services.era5_request_planner import DEFAULT_HOURS, plan_era5_requests
+from src.services.merra2_cache import get_merra2_cache
+from src.services.merra2_service import MERRA2_DATA_DELAY_DAYS, get_merra2_service
+from src.services.source_config import SourceRequestConfig
+from src.services.source_orchestrator import SourceCancelled, get_source_orchestrator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PrefetchRegion:
+    """Región que se mantiene precargada."""
+    name: str
+    lat_min: float
+    lat_max: float
+    lon_min: float
+    lon_max: float
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        return self.lat_min, self.lat_max, self.lon_min, self.lon_max
+
+
+# Caribe colombiano (caribbean_bbox de ClimateAnalysisModule)
+DEFAULT_REGIONS = [PrefetchRegion("Caribe Colombiano", 10.0, 13.0, -82.0, -74.0)]
+
+
+def prefetch_enabled() -> bool:
+    """Si se arranca el planificador (PREFETCH_ENABLED)."""
+    return os.environ.get("PREFETCH_ENABLED", "True").lower() == "true"
+
+
+def prefetch_regions() -> List[PrefetchRegion]:
+    """
+    Regiones de PREFETCH_REGIONS ("Nombre:lat_min,lat_max,lon_min,lon_max;..."),
+    o el Caribe colombiano si no se configura ninguna válida.
+    """
+    regions = []
+    for entry in os.environ.get("PREFETCH_REGIONS", "").split(";"):
+        if not entry.strip():
+            continue
+        try:
+            name, _, bounds = entry.rpartition(":")
+            lat_min, lat_max, lon_min, lon_max = (float(v) for v in bounds.split(","))
+            if lat_min >= lat_max or lon_min >= lon_max:
+                raise ValueError("rangos invertidos")
+            regions.append(PrefetchRegion(name.strip() or bounds, lat_min, lat_max, lon_min, lon_max))
+        except ValueError as e:
+            logger.warning(f"⚠️ Región de precarga inválida '{entry}': {e}")
+    return regions or list(DEFAULT_REGIONS)
+
+
+def _parse_clock(value: str) -> int:
+    hours, _, minutes = value.strip().partition(":")
+    return (int(hours) * 60 + int(minutes or 0)) % (24 * 60)
+
+
+def prefetch_window() -> Tuple[int, int]:
+    """
+    Ventana de poca carga en minutos UTC desde medianoche (PREFETCH_WINDOW_UTC,
+    "HH:MM-HH:MM"; puede cruzar la medianoche). Por defecto 06:00-10:00 UTC,
+    01:00-05:00 en Colombia.
+    """
+    start, _, end = os.environ.get("PREFETCH_WINDOW_UTC", "06:00-10:00").partition("-")
+    return _parse_clock(start), _parse_clock(end)
+
+
+def prefetch_lookback_days() -> int:
+    """Días hacia atrás, desde el último publicado, que se mantienen en caché (PREFETCH_LOOKBACK_DAYS)."""
+    return max(1, int(os.environ.get("PREFETCH_LOOKBACK_DAYS", "31")))
+
+
+def era5_latency_days() -> int:
+    """Retraso con que CDS publica los días ERA5T (PREFETCH_ERA5_LATENCY_DAYS)."""
+    return max(0, int(os.environ.get("PREFETCH_ERA5_LATENCY_DAYS", "5")))
+
+
+def era5_final_lag_days() -> int:
+    """
+    Días tras los que CDS sustituye ERA5T por ERA5 final (PREFETCH_ERA5_FINAL_LAG_DAYS):
+    los días cacheados como ERA5T y más antiguos se vuelven a descargar.
+    """
+    return max(0, int(os.environ.get("PREFETCH_ERA5_FINAL_LAG_DAYS", "90")))
+
+
+def prefetch_hours() -> List[int]:
+    """Horas UTC ERA5 a precargar (PREFETCH_ERA5_HOURS: lista separada por comas o 'all')."""
+    value = os.environ.get("PREFETCH_ERA5_HOURS")
+    if not value:
+        return list(DEFAULT_HOURS)
+    if value.strip().lower() == "all":
+        return list(range(24))
+    return sorted({int(h) % 24 for h in value.split(",") if h.strip()})
+
+
+def max_requests_per_hour() -> int:
+    """Máximo de solicitudes de precarga por fuente y hora (PREFETCH_MAX_REQUESTS_PER_HOUR)."""
+    return max(1, int(os.environ.get("PREFETCH_MAX_REQUESTS_PER_HOUR", "30")))
+
+
+def request_interval_seconds() -> float:
+    """Pausa mínima entre solicitudes de precarga a una fuente (PREFETCH_REQUEST_INTERVAL_SECONDS)."""
+    return max(0.0, float(os.environ.get("PREFETCH_REQUEST_INTERVAL_SECONDS", "20")))
+
+
+def check_interval_seconds() -> float:
+    """Cada cuánto comprueba el planificador si está en la ventana (PREFETCH_CHECK_MINUTES)."""
+    return max(1.0, 60 * float(os.environ.get("PREFETCH_CHECK_MINUTES", "10")))
+
+
+def in_window(moment: datetime, window: Tuple[int, int]) -> bool:
+    """Si la hora (UTC) de moment cae en la ventana [inicio, fin)."""
+    start, end = window
+    minute = moment.hour * 60 + moment.minute
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+
+def seconds_left_in_window(moment: datetime, window: Tuple[int, int]) -> float:
+    """Segundos hasta el fin de la ventana (0 fuera de ella)."""
+    if not in_window(moment, window):
+        return 0.0
+    elapsed = moment.hour * 3600 + moment.minute * 60 + moment.second
+    return float((window[1] * 60 - elapsed) % (24 * 3600))
+
+
+def prefetch_period(today: date, latency_days: int, lookback_days: int) -> List[date]:
+    """
+    Días a mantener en caché: del primer día del mes de (último publicado -
+    lookback_days) al último publicado (today - latency_days). Empezar en un inicio de
+    mes permite guardar los agregados mensuales completos en la pirámide.
+    """
+    last = today - timedelta(days=latency_days)
+    first = (last - timedelta(days=lookback_days)).replace(day=1)
+    return [first + timedelta(days=k) for k in range((last - first).days + 1)]
+
+
+class RateLimiter:
+    """Como mucho max_per_hour solicitudes por hora y min_interval segundos entre dos seguidas."""
+
+    def __init__(self, max_per_hour: int, min_interval: float):
+        self.max_per_hour = max_per_hour
+        self.min_interval = min_interval
+        self._sent = deque()
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        """Segundos hasta que se permita la siguiente solicitud."""
+        with self._lock:
+            now = time.monotonic()
+            while self._sent and now - self._sent[0] >= 3600:
+                self._sent.popleft()
+            wait = 0.0
+            if self._sent:
+                wait = self._sent[-1] + self.min_interval - now
+            if len(self._sent) >= self.max_per_hour:
+                wait = max(wait, self._sent[0] + 3600 - now)
+            return max(0.0, wait)
+
+    def acquire(self, stop_event: threading.Event, deadline: float) -> bool:
+        """
+        Espera turno y lo registra.
+
+        Returns:
+            bool: False si se detiene el planificador o el turno llega después de deadline (monotónico)
+        """
+        while True:
+            if time.monotonic() >= deadline:
+                return False
+            wait = self.delay()
+            if wait <= 0:
+                with self._lock:
+                    self._sent.append(time.monotonic())
+                return True
+            if time.monotonic() + wait >= deadline:
+                return False
+            if stop_event.wait(min(wait, 60.0)):
+                return False
+
+    def state(self) -> Dict:
+        with self._lock:
+            recent = len(self._sent)
+        return {"max_per_hour": self.max_per_hour, "min_interval_seconds": self.min_interval,
+                "recent_requests": recent, "next_in_seconds": round(self.delay(), 1)}
+
+
+class PrefetchScheduler:
+    """
+    Hilo que, una vez al día dentro de la ventana de poca carga, recorre las fuentes
+    y regiones configuradas y descarga a las cachés los días que falten.
+    """
+
+    SOURCES = ("era5", "merra2")
+
+    def __init__(self, era5_service_factory: Callable, merra2_service_factory: Callable = get_merra2_service,
+                 regions: Optional[List[PrefetchRegion]] = None, window: Optional[Tuple[int, int]] = None,
+                 config: Optional[SourceRequestConfig] = None):
+        """
+        Args:
+            era5_service_factory: Devuelve el ERA5Service compartido (vive en las rutas)
+            merra2_service_factory: Devuelve el MERRA2Service compartido
+            regions: Regiones a precargar (por defecto PREFETCH_REGIONS)
+            window: Ventana (inicio, fin) en minutos UTC (por defecto PREFETCH_WINDOW_UTC)
+            config: Configuración de las descargas (por defecto la del entorno)
+        """
+        self.regions = regions or prefetch_regions()
+        self.window = window or prefetch_window()
+        self.config = config or SourceRequestConfig.from_environment()
+        self._services = {"era5": era5_service_factory, "merra2": merra2_service_factory}
+        self._limiters = {name: RateLimiter(max_requests_per_hour(), request_interval_seconds())
+                          for name in self.SOURCES}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._last_day: Optional[date] = None
+        self.last_run: Optional[Dict] = None
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Arranca el hilo del planificador (daemon)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="prefetch", daemon=True)
+            self._thread.start()
+        start, end = self.window
+        logger.info(f"🌙 Precarga de cachés activa: {len(self.regions)} regiones, ventana "
+                    f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d} UTC")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Detiene el planificador; la descarga en curso se abandona en su próximo punto de cancelación."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        interval = check_interval_seconds()
+        while not self._stop.is_set():
+            now = datetime.utcnow()
+            if in_window(now, self.window) and self._last_day != now.date():
+                try:
+                    self.run_once(now)
+                except Exception as e:
+                    logger.error(f"❌ Error en la precarga de cachés: {e}")
+                self._last_day = now.date()
+            self._stop.wait(interval)
+
+    # ------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------
+
+    def run_once(self, now: Optional[datetime] = None, budget_seconds: Optional[float] = None) -> Dict:
+        """
+        Una pasada por todas las fuentes y regiones.
+
+        Args:
+            now: Instante de referencia (UTC) para calcular los días publicados
+            budget_seconds: Tiempo disponible; por defecto lo que queda de la ventana
+
+        Returns:
+            Dict: Resumen de la pasada por fuente y región
+        """
+        now = now or datetime.utcnow()
+        if budget_seconds is None:
+            budget_seconds = seconds_left_in_window(now, self.window)
+        deadline = time.monotonic() + budget_seconds
+        with self._lock:
+            if self._running:
+                raise RuntimeError("Ya hay una precarga en curso")
+            self._running = True
+
+        started = time.monotonic()
+        run = {"started_at": now.isoformat(), "sources": {}}
+        logger.info(f"🌙 Precarga de cachés iniciada ({budget_seconds / 60:.0f} min disponibles)")
+        try:
+            for source in self.SOURCES:
+                run["sources"][source] = self._run_source(source, now.date(), deadline)
+        finally:
+            run["duration_seconds"] = round(time.monotonic() - started, 1)
+            run["finished_at"] = datetime.utcnow().isoformat()
+            with self._lock:
+                self._running = False
+                self.last_run = run
+        logger.info(f"🌙 Precarga de cachés terminada en {run['duration_seconds']}s: "
+                    + ", ".join(f"{name}={summary['status']}" for name, summary in run["sources"].items()))
+        return run
+
+    def _skip_reason(self, source: str) -> Optional[str]:
+        if self.config.test_mode:
+            return "modo de prueba"
+        if source == "era5":
+            if get_era5_cache() is None:
+                return "caché ERA5 desactivada"
+            if not self.config.cds_url or not self.config.cds_key:
+                return "credenciales de CDS no configuradas"
+        else:
+            if get_merra2_cache() is None:
+                return "caché MERRA-2 desactivada"
+            if not all(self._services["merra2"]().config_manager.get_credentials()):
+                return "credenciales NASA no configuradas"
+        return None
+
+    def _run_source(self, source: str, today: date, deadline: float) -> Dict:
+        summary = {"status": "done", "regions": {}}
+        reason = self._skip_reason(source)
+        if reason is not None:
+            logger.info(f"🌙 Precarga {source} omitida: {reason}")
+            return {"status": "skipped", "reason": reason}
+
+        prefetch = self._prefetch_era5 if source == "era5" else self._prefetch_merra2
+        for region in self.regions:
+            result = {}
+            summary["regions"][region.name] = result
+            try:
+                prefetch(region, today, deadline, result)
+            except SourceCancelled:
+                result["status"] = summary["status"] = "stopped"
+            except Exception as e:
+                logger.error(f"❌ Precarga {source} de {region.name} fallida: {e}")
+                result["status"] = summary["status"] = "error"
+                result["error"] = str(e)
+            if result.get("status") != "done":
+                # Sin tiempo, detenida o la fuente falla: no insistir en esta pasada
+                summary["status"] = result.get("status", summary["status"])
+                break
+        return summary
+
+    def _acquire(self, source: str, deadline: float, result: Dict) -> bool:
+        """Turno para una solicitud a la fuente; anota en result por qué no se obtuvo."""
+        breaker = get_source_orchestrator().breaker(source).state()
+        if breaker["state"] != "closed":
+            result["status"] = "breaker_open"
+            return False
+        if self._stop.is_set():
+            result["status"] = "stopped"
+            return False
+        if not self._limiters[source].acquire(self._stop, deadline):
+            result["status"] = "stopped" if self._stop.is_set() else "out_of_window"
+            return False
+        return True
+
+    def _prefetch_era5(self, region: PrefetchRegion, today: date, deadline: float, result: Dict):
+        service = self._services["era5"]()
+        hours = prefetch_hours()
+        days = prefetch_period(today, era5_latency_days(), prefetch_lookback_days())
+        # Días ERA5T que ya tienen versión final, dentro o fuera del periodo precargado
+        final_before = today - timedelta(days=era5_final_lag_days())
+        preliminary = service.preliminary_era5_days(*region.bounds, final_before)
+        missing = service.missing_era5_days(*region.bounds, sorted(set(days) | set(preliminary)), hours,
+                                            final_before)
+        result.update(pending_days=len(missing), preliminary_days=len(preliminary), downloaded_days=0)
+        # Una solicitud CDS por mes, como en las consultas interactivas
+        for chunk in plan_era5_requests(missing, hours):
+            if not self._acquire("era5", deadline, result):
+                return
+            service.warm_era5_cache(*region.bounds, chunk.dates, hours, self._stop, self.config, final_before)
+            result["downloaded_days"] += len(chunk.dates)
+            logger.info(f"🌙 ERA5 {region.name}: {chunk} precargado")
+        # Niveles mes/año de la pirámide a partir de los agregados diarios ya guardados
+        result["pyramid"] = service.pyramid_summaries(*region.bounds, days, hours) is not None
+        result["status"] = "done"
+
+    def _prefetch_merra2(self, region: PrefetchRegion, today: date, deadline: float, result: Dict):
+        service = self._services["merra2"]()
+        days = prefetch_period(today, MERRA2_DATA_DELAY_DAYS, prefetch_lookback_days())
+        missing = service.missing_merra2_dates(*region.bounds, days)
+        result.update(pending_days=len(missing), downloaded_days=0)
+        for day in missing:
+            if not self._acquire("merra2", deadline, result):
+                return
+            counts = service.warm_merra2_cache(*region.bounds, [day], self._stop)
+            if counts["failed"]:
+                raise ValueError(f"no se pudo descargar el día {day}")
+            result["downloaded_days"] += counts["downloaded"]
+        if missing:
+            logger.info(f"🌙 MERRA-2 {region.name}: {result['downloaded_days']} días precargados")
+        result["status"] = "done"
+
+    def status(self) -> Dict:
+        """Estado del planificador, límites por fuente y resumen de la última pasada."""
+        start, end = self.window
+        with self._lock:
+            running, last_run = self._running, self.last_run
+        return {
+            "active": self._thread is not None and self._thread.is_alive(),
+            "running": running,
+            "window_utc": f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}",
+            "regions": [asdict(region) for region in self.regions],
+            "rate_limits": {name: limiter.state() for name, limiter in self._limiters.items()},
+            "last_run": last_run,
+        }
+
+
+_scheduler: Optional[PrefetchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_prefetch_scheduler() -> Optional[PrefetchScheduler]:
+    """Planificador del proceso, o None si no se ha arrancado."""
+    return _scheduler
+
+
+def start_prefetch_scheduler(era5_service_factory: Callable) -> Optional[PrefetchScheduler]:
+    """
+    Arranca una vez por proceso el planificador de precarga.
+
+    Args:
+        era5_service_factory: Devuelve el ERA5Service compartido
+
+    Returns:
+        PrefetchScheduler: O None si PREFETCH_ENABLED=false, en modo de prueba o en un
+        proceso hijo (p. ej. los de decodificación MERRA-2, que reimportan main)
+    """
+    global _scheduler
+    if multiprocessing.parent_process() is not None:
+        return None
+    if not prefetch_enabled():
+        logger.info("🌙 Precarga de cachés desactivada (PREFETCH_ENABLED=false)")
+        return None
+    config = SourceRequestConfig.from_environment()
+    if config.test_mode:
+        logger.info("🌙 Precarga de cachés desactivada en modo de prueba")
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PrefetchScheduler(era5_service_factory, config=config)
+            _scheduler.start()
+        return _scheduler
@@ -0,0 +1,824 @@
+"""
+Procesamiento por bloques de datos de reanálisis (ERA5 / MERRA-2).
+
+Los campos derivados (velocidad, dirección, temperatura, presión) se calculan
+bloque a bloque en el eje temporal sobre datasets abiertos de forma perezosa,
+y los agregados para el frontend (rosa de vientos, patrón horario, serie diaria)
+se reducen de forma incremental. Así la memoria pico depende del tamaño de bloque
+y no de área x periodo. Si dask está instalado los archivos se abren con chunks.
+"""
+
+import base64
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from src.services.download_spool import NETCDF_IO_LOCK, DownloadTarget, netcdf_source
+
+try:
+    import dask  # noqa: F401
+    HAS_DASK = True
+except ImportError:
+    HAS_DASK = False
+
+logger = logging.getLogger(__name__)
+
+# Variables del payload del frontend, en el orden en que se devuelven
+FRONTEND_VARIABLES = [
+    'wind_speed_10m', 'wind_direction_10m',
+    'wind_speed_100m', 'wind_direction_100m',
+    'temperature_2m', 'surface_pressure',
+]
+
+# Sectores de 30° para la rosa de vientos
+DIRECTION_BINS = np.arange(0, 361, 30)
+DIRECTION_LABELS = [f"{i}-{i+30}" for i in DIRECTION_BINS[:-1]]
+
+# Histograma de velocidad a 10 m: intervalos de 1 m/s hasta 30 m/s y uno abierto
+SPEED_BIN_WIDTH = 1.0
+SPEED_BIN_COUNT = 31
+SPEED_LABELS = [f"{i}-{i + 1}" for i in range(SPEED_BIN_COUNT - 1)] + [f"{SPEED_BIN_COUNT - 1}+"]
+
+# Exponente de la ley de potencia para extrapolar viento de 10 m a 100 m sobre océano
+POWER_LAW_EXPONENT = 0.1
+
+# Esquemas de respuesta de /api/wind-data: 'flat' (listas planas, el original) o
+# 'grid' (coordenadas, dims, shape y un array tipado por variable)
+RESPONSE_SCHEMAS = ('flat', 'grid')
+RESPONSE_ENCODINGS = ('json', 'base64')
+# Tipos binarios: float32, o int16 empaquetado al estilo CF (scale_factor/add_offset)
+RESPONSE_DTYPES = ('float32', 'int16')
+INT16_MISSING = -32768
+GRID_SCHEMA_VERSION = 'wind-grid-v1'
+GRID_DIMS = ['time', 'latitude', 'longitude']
+
+# Unidades y decimales con que se serializan las variables en el esquema 'grid' (JSON)
+VARIABLE_UNITS = {
+    'wind_speed_10m': 'm/s', 'wind_direction_10m': 'deg',
+    'wind_speed_100m': 'm/s', 'wind_direction_100m': 'deg',
+    'temperature_2m': 'degC', 'surface_pressure': 'hPa',
+}
+VARIABLE_DECIMALS = {
+    'wind_speed_10m': 3, 'wind_direction_10m': 1,
+    'wind_speed_100m': 3, 'wind_direction_100m': 1,
+    'temperature_2m': 2, 'surface_pressure': 2,
+}
+
+# Métodos de interpolación a un punto (modo punto de /api/wind-data)
+INTERPOLATION_METHODS = ('nearest', 'bilinear', 'idw')
+IDW_POWER = 2
+
+
+@dataclass(frozen=True)
+class ResponseFormat:
+    """
+    Forma de la respuesta pedida por el cliente.
+
+    schema='grid' devuelve coordenadas (time como inicio + paso), dims, shape y cada
+    variable como un solo array plano en orden C; encoding='base64' codifica esos
+    arrays en binario little-endian (float32, o int16 empaquetado con dtype='int16')
+    en lugar de listas JSON. include_values=False devuelve solo agregados y metadatos.
+    """
+    schema: str = 'flat'
+    encoding: str = 'json'
+    dtype: str = 'float32'
+    include_values: bool = True
+
+    @classmethod
+    def from_request(cls, data: Optional[Dict]) -> "ResponseFormat":
+        """
+        Lee "schema" y "encoding" del cuerpo de la solicitud.
+
+        Raises:
+            ValueError: Valores no admitidos
+        """
+        data = data or {}
+        schema = data.get('schema', 'flat')
+        encoding = data.get('encoding', 'json')
+        dtype = data.get('dtype', 'float32')
+        if schema not in RESPONSE_SCHEMAS:
+            raise ValueError(f'Parámetro schema inválido. Use uno de {list(RESPONSE_SCHEMAS)}')
+        if encoding not in RESPONSE_ENCODINGS:
+            raise ValueError(f'Parámetro encoding inválido. Use uno de {list(RESPONSE_ENCODINGS)}')
+        if dtype not in RESPONSE_DTYPES:
+            raise ValueError(f'Parámetro dtype inválido. Use uno de {list(RESPONSE_DTYPES)}')
+        if encoding != 'json' and schema != 'grid':
+            raise ValueError('encoding="base64" requiere schema="grid"')
+        if dtype != 'float32' and encoding != 'base64':
+            raise ValueError('dtype="int16" requiere encoding="base64"')
+        include_values = data.get('include_values', True)
+        if not isinstance(include_values, bool):
+            raise ValueError('Parámetro include_values inválido. Use true o false')
+        return cls(schema=schema, encoding=encoding, dtype=dtype, include_values=include_values)
+
+
+def payload_has_data(payload: Optional[Dict]) -> bool:
+    """
+    True si un payload (de cualquier esquema) contiene valores de viento a 10 m,
+    o agregados cuando se pidió include_values=False.
+    """
+    if not payload:
+        return False
+    if payload.get('values_included') is False:
+        return bool(payload.get('time_series'))
+    if payload.get('schema') == GRID_SCHEMA_VERSION:
+        return 'wind_speed_10m' in payload.get('variables', {}) and payload['shape'][0] > 0
+    return len(payload.get('wind_speed_10m', [])) > 0
+
+
+def time_coordinate(times) -> Dict:
+    """
+    Eje temporal compacto: inicio y paso en segundos si es regular, o desplazamientos
+    en segundos desde el inicio si no lo es (horas sueltas, días ausentes).
+    """
+    index = pd.DatetimeIndex(times)
+    coord = {'start': index[0].isoformat() if len(index) else None, 'count': len(index)}
+    if len(index) > 1:
+        seconds = ((index - index[0]) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+        steps = np.diff(seconds)
+        if (steps == steps[0]).all():
+            coord['step_seconds'] = int(steps[0])
+        else:
+            coord['offsets_seconds'] = seconds.tolist()
+    return coord
+
+
+def encode_array(values: np.ndarray, var: str, encoding: str = 'json', dtype: str = 'float32') -> Dict:
+    """
+    Serializa un array de una variable para el esquema 'grid'.
+
+    En JSON los valores se redondean a VARIABLE_DECIMALS y NaN se envía como null.
+    En base64 con dtype='int16' el valor es packed * scale_factor + add_offset, con
+    INT16_MISSING para los datos ausentes; la resolución nunca es peor que
+    VARIABLE_DECIMALS salvo que el rango de la variable no quepa en 16 bits.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    decimals = VARIABLE_DECIMALS.get(var, 3)
+    encoded = {'dtype': dtype, 'units': VARIABLE_UNITS.get(var), 'encoding': encoding}
+
+    if encoding == 'json':
+        rounded = np.round(values, decimals)
+        data = rounded.tolist()
+        if not np.isfinite(rounded).all():
+            data = [v if np.isfinite(v) else None for v in data]
+        encoded['decimals'] = decimals
+        encoded['data'] = data
+        return encoded
+
+    encoded['byte_order'] = 'little'
+    if dtype == 'int16':
+        finite = np.isfinite(values)
+        low, high = (values[finite].min(), values[finite].max()) if finite.any() else (0.0, 0.0)
+        add_offset = round(float(low + high) / 2, decimals)
+        scale_factor = max(10.0 ** -decimals, float(high - low) / 65000)
+        packed = np.round((np.where(finite, values, add_offset) - add_offset) / scale_factor)
+        packed = np.where(finite, packed, INT16_MISSING).astype('<i2')
+        encoded.update({'scale_factor': scale_factor, 'add_offset': add_offset, 'missing_value': INT16_MISSING})
+        raw = packed.tobytes()
+    else:
+        raw = values.astype('<f4').tobytes()
+    encoded['data'] = base64.b64encode(raw).decode('ascii')
+    return encoded
+
+
+def time_chunk_size() -> int:
+    """Número de pasos de tiempo por bloque (REANALYSIS_TIME_CHUNK)."""
+    return max(1, int(os.environ.get("REANALYSIS_TIME_CHUNK", "96")))
+
+
+def iter_time_blocks(ds: xr.Dataset, size: int = None) -> Iterator[xr.Dataset]:
+    """Recorre un dataset en bloques consecutivos del eje temporal."""
+    size = size or time_chunk_size()
+    for start in range(0, ds.sizes['time'], size):
+        yield ds.isel(time=slice(start, start + size))
+
+
+def iter_file_blocks(paths: Iterable[DownloadTarget],
+                     preprocess: Optional[Callable[[xr.Dataset], xr.Dataset]] = None,
+                     size: int = None) -> Iterator[xr.Dataset]:
+    """
+    Abre archivos NetCDF de forma perezosa (con chunks de dask si está disponible)
+    y los recorre por bloques temporales. Los archivos deben estar en orden temporal.
+    Los archivos ilegibles se omiten con una advertencia.
+
+    Args:
+        paths: Rutas de archivos NetCDF o descargas en memoria (DownloadSpool)
+        preprocess: Función aplicada al dataset recién abierto (p. ej. recorte regional)
+        size: Pasos de tiempo por bloque
+    """
+    size = size or time_chunk_size()
+    chunks = {'time': size} if HAS_DASK else None
+    for path in paths:
+        with NETCDF_IO_LOCK:
+            try:
+                opened = xr.open_dataset(netcdf_source(path), chunks=chunks)
+            except Exception as e:
+                logger.warning(f"No se pudo abrir {path}: {e}")
+                continue
+        yield from _iter_loaded_blocks(opened, size, preprocess)
+
+
+class ClosingBlocks:
+    """
+    Iterador de bloques que ejecuta on_close una sola vez al agotarse, al fallar o al
+    cerrarse, aunque no se haya empezado a recorrer (un generador sin arrancar no
+    ejecuta su finally al cerrarlo).
+    """
+
+    def __init__(self, blocks: Iterator[xr.Dataset], on_close: Callable[[], None]):
+        self._blocks = blocks
+        self._on_close = on_close
+
+    def __iter__(self) -> "ClosingBlocks":
+        return self
+
+    def __next__(self) -> xr.Dataset:
+        try:
+            return next(self._blocks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        close = getattr(self._blocks, 'close', None)
+        if close is not None:
+            close()
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+
+def _iter_loaded_blocks(opened: xr.Dataset, size: int,
+                        preprocess: Optional[Callable[[xr.Dataset], xr.Dataset]] = None) -> Iterator[xr.Dataset]:
+    """
+    Bloques temporales ya leídos de un dataset abierto, que se cierra al terminar.
+    La lectura de cada bloque y el cierre se hacen con NETCDF_IO_LOCK: HDF5 no es
+    seguro entre hilos y la caché ERA5 o las solicitudes vecinas leen a la vez.
+    """
+    try:
+        with NETCDF_IO_LOCK:
+            ds = preprocess(opened) if preprocess is not None else opened
+        if ds is None:
+            return
+        for block in iter_time_blocks(ds, size):
+            # Un solo cómputo por bloque, en el hilo llamador: los hilos de dask solo
+            # añadirían coste en bloques pequeños y de todos modos leerían en serie
+            with NETCDF_IO_LOCK:
+                block = block.load(scheduler='synchronous') if HAS_DASK else block.load()
+            yield block
+    finally:
+        with NETCDF_IO_LOCK:
+            opened.close()
+
+
+def _open_file_group(paths: List[DownloadTarget], preprocess, size: int) -> Optional[xr.Dataset]:
+    """
+    Abre un grupo de archivos como un solo dataset perezoso: cada archivo se recorta
+    en la apertura (preprocess) y se combinan por coordenadas sin copiar datos.
+    Sin dask, los recortes se cargan (son pequeños) y se concatenan en el eje temporal.
+    """
+    if HAS_DASK:
+        return xr.open_mfdataset(
+            [netcdf_source(path) for path in paths], preprocess=preprocess, combine='by_coords', chunks={'time': size},
+            data_vars='minimal', coords='minimal', compat='override', parallel=False,
+        )
+
+    parts = []
+    for path in paths:
+        with xr.open_dataset(netcdf_source(path)) as ds:
+            ds = preprocess(ds) if preprocess is not None else ds
+            if ds is not None:
+                parts.append(ds.load())
+    if not parts:
+        return None
+    return xr.concat(parts, dim='time', data_vars='minimal', coords='minimal', compat='override')
+
+
+def iter_mfdataset_blocks(paths: Iterable[DownloadTarget],
+                          preprocess: Optional[Callable[[xr.Dataset], xr.Dataset]] = None,
+                          steps_per_file: int = 24,
+                          size: int = None) -> Iterator[xr.Dataset]:
+    """
+    Como iter_file_blocks, pero abre los archivos por grupos con open_mfdataset, de
+    modo que cada bloque temporal abarca varios archivos (p. ej. varios días MERRA-2)
+    en lugar de uno. Cada grupo tiene los archivos que caben en un bloque, así que
+    los descriptores abiertos y la memoria no dependen de la longitud del rango, y
+    los archivos de un grupo se cierran al pasar al siguiente o al cerrar el iterador.
+    Si un grupo no se puede abrir junto (archivo dañado o mallas distintas) se
+    recorre archivo a archivo, omitiendo los ilegibles.
+
+    Args:
+        paths: Rutas de archivos NetCDF en orden temporal
+        preprocess: Recorte aplicado a cada archivo al abrirlo
+        steps_per_file: Pasos de tiempo por archivo tras el recorte
+        size: Pasos de tiempo por bloque
+    """
+    size = size or time_chunk_size()
+    paths = list(paths)
+    per_group = max(1, size // max(1, steps_per_file))
+    for start in range(0, len(paths), per_group):
+        group = paths[start:start + per_group]
+        try:
+            with NETCDF_IO_LOCK:
+                ds = _open_file_group(group, preprocess, size)
+        except Exception as e:
+            logger.warning(f"No se pudieron combinar {len(group)} archivos ({e}); se leen por separado")
+            yield from iter_file_blocks(group, preprocess, size)
+            continue
+        if ds is not None:
+            yield from _iter_loaded_blocks(ds, size)
+
+
+def enclosing_cells(value: float, step: float, origin: float = 0.0) -> Tuple[float, float]:
+    """
+    Nodos de una malla regular (origin + k * step) que encierran un valor.
+    Si el valor cae sobre un nodo, ese nodo es el inferior.
+    """
+    k = np.floor((value - origin) / step + 1e-9)
+    low = round(float(origin + k * step), 6)
+    return low, round(low + step, 6)
+
+
+def _linear_weights_1d(coords: np.ndarray, x: float) -> np.ndarray:
+    """Pesos de interpolación lineal en un eje (coordenadas en cualquier orden)."""
+    order = np.argsort(coords)
+    c = coords[order]
+    w = np.zeros(len(c))
+    if len(c) == 1:
+        w[0] = 1.0
+    else:
+        x = min(max(x, c[0]), c[-1])
+        j = int(np.clip(np.searchsorted(c, x, side='right') - 1, 0, len(c) - 2))
+        t = (x - c[j]) / (c[j + 1] - c[j])
+        w[j], w[j + 1] = 1.0 - t, t
+    out = np.empty_like(w)
+    out[order] = w
+    return out
+
+
+def point_weights(lats, lons, lat: float, lon: float, method: str = 'bilinear') -> np.ndarray:
+    """
+    Pesos (n_lat, n_lon) que interpolan una malla al punto (lat, lon).
+
+    Args:
+        lats, lons: Coordenadas de la malla (normalmente los 2x2 nodos que encierran el punto)
+        lat, lon: Punto de interés
+        method: 'nearest', 'bilinear' o 'idw' (inverso de la distancia al cuadrado)
+
+    Returns:
+        np.ndarray: Pesos que suman 1
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if method not in INTERPOLATION_METHODS:
+        raise ValueError(f"Método de interpolación desconocido: {method}")
+
+    if method == 'bilinear':
+        return np.outer(_linear_weights_1d(lats, lat), _linear_weights_1d(lons, lon))
+
+    # Distancia equirrectangular (suficiente a escala de una celda)
+    dy = lats[:, None] - lat
+    dx = (lons[None, :] - lon) * np.cos(np.deg2rad(lat))
+    distance = np.hypot(dy, dx)
+    weights = np.zeros(distance.shape)
+    if method == 'nearest' or distance.min() < 1e-9:
+        weights[np.unravel_index(np.argmin(distance), distance.shape)] = 1.0
+        return weights
+    weights = 1.0 / distance ** IDW_POWER
+    return weights / weights.sum()
+
+
+def interpolate_to_point(block: xr.Dataset, lat: float, lon: float, method: str = 'bilinear') -> xr.Dataset:
+    """
+    Interpola todas las variables de un bloque al punto (lat, lon), para todos
+    los pasos de tiempo a la vez. Se aplica a las variables nativas (componentes
+    u/v) antes de derivar velocidad y dirección. Los nodos sin dato (NaN) se
+    excluyen renormalizando los pesos.
+
+    Returns:
+        xr.Dataset: Bloque con dimensiones de latitud y longitud de tamaño 1
+    """
+    lat_dim = 'latitude' if 'latitude' in block.dims else 'lat'
+    lon_dim = 'longitude' if 'longitude' in block.dims else 'lon'
+    weights = xr.DataArray(point_weights(block[lat_dim].values, block[lon_dim].values, lat, lon, method),
+                           dims=(lat_dim, lon_dim))
+
+    out = {}
+    for name, var in block.data_vars.items():
+        if lat_dim not in var.dims or lon_dim not in var.dims:
+            continue
+        total = (var.fillna(0) * weights).sum((lat_dim, lon_dim))
+        norm = (var.notnull() * weights).sum((lat_dim, lon_dim))
+        value = total / norm.where(norm > 0)
+        out[name] = value.expand_dims({lat_dim: [lat], lon_dim: [lon]}, axis=[-2, -1])
+    return xr.Dataset(out)
+
+
+def iter_point_blocks(blocks: Iterator[xr.Dataset], lat: float, lon: float,
+                      method: str = 'bilinear') -> Iterator[xr.Dataset]:
+    """Interpola al punto cada bloque; cerrar este iterador cierra también el de origen."""
+    try:
+        for block in blocks:
+            yield interpolate_to_point(block, lat, lon, method)
+    finally:
+        close = getattr(blocks, 'close', None)
+        if close is not None:
+            close()
+
+
+def speed_direction(u, v):
+    """Velocidad y dirección meteorológica (de donde sopla, 0-360°) a partir de u/v."""
+    speed = np.sqrt(u**2 + v**2)
+    direction = (180 / np.pi) * np.arctan2(u, v)
+    direction = (direction + 360) % 360
+    return speed, direction
+
+
+def derive_frontend_fields(block: xr.Dataset, source: str) -> xr.Dataset:
+    """
+    Calcula los campos del frontend para un bloque y lo materializa.
+
+    Args:
+        block: Bloque con las variables nativas de la fuente
+        source: 'era5' (u10, v10, u100, v100, t2m, sp), 'merra2' (U10M, V10M, T2M, PS)
+                o 'simulated' (el bloque ya contiene las variables del frontend)
+
+    Returns:
+        xr.Dataset: Variables FRONTEND_VARIABLES disponibles, dims (time, latitude, longitude)
+    """
+    rename = {k: v for k, v in (('lat', 'latitude'), ('lon', 'longitude')) if k in block.dims}
+    if rename:
+        block = block.rename(rename)
+
+    out = {}
+    if source == 'era5':
+        if 'u10' in block and 'v10' in block:
+            out['wind_speed_10m'], out['wind_direction_10m'] = speed_direction(block['u10'], block['v10'])
+        if 'u100' in block and 'v100' in block:
+            out['wind_speed_100m'], out['wind_direction_100m'] = speed_direction(block['u100'], block['v100'])
+        if 't2m' in block:
+            out['temperature_2m'] = block['t2m'] - 273.15
+        if 'sp' in block:
+            out['surface_pressure'] = block['sp'] / 100.0
+    elif source == 'merra2':
+        if 'U10M' in block and 'V10M' in block:
+            speed, direction = speed_direction(block['U10M'], block['V10M'])
+            out['wind_speed_10m'], out['wind_direction_10m'] = speed, direction
+            # MERRA-2 no tiene viento a 100 m: extrapolación con ley de potencia
+            out['wind_speed_100m'] = speed * (100 / 10) ** POWER_LAW_EXPONENT
+            out['wind_direction_100m'] = direction
+        if 'T2M' in block:
+            # MERRA-2 T2M está en Kelvin
+            out['temperature_2m'] = block['T2M'] - 273.15
+        if 'PS' in block:
+            # MERRA-2 PS está en Pa
+            out['surface_pressure'] = block['PS'] / 100.0
+    elif source == 'simulated':
+        out = {var: block[var] for var in FRONTEND_VARIABLES if var in block}
+    else:
+        raise ValueError(f"Fuente desconocida: {source}")
+
+    fields = xr.Dataset({k: v.transpose('time', 'latitude', 'longitude') for k, v in out.items()})
+    return fields.compute()
+
+
+class WindAggregate:
+    """
+    Agregados aditivos de la velocidad y dirección del viento a 10 m.
+
+    Cada array tiene como últimas dimensiones cell_shape (celdas de la malla, o ()
+    para totales del área), de modo que dos agregados se combinan sumando y uno por
+    celda se puede recortar a una ventana antes de reducirlo. Es la unidad que se
+    guarda en la pirámide temporal (día, mes, año) y de la que salen los resúmenes
+    del payload.
+
+    Arrays:
+        hour_count, hour_sum: (24, ...) pasos válidos y suma de velocidad por hora UTC
+        sumsq, sumcube: (...) suma de cuadrados y de cubos de la velocidad
+        speed_hist: (SPEED_BIN_COUNT, ...) histograma de velocidad
+        dir_hist: (12, ...) histograma de dirección (sectores de 30°)
+        day_count, day_sum: (n_days, ...) por día desde first_day (ordinal)
+    """
+
+    ARRAYS = ('hour_count', 'hour_sum', 'sumsq', 'sumcube', 'speed_hist', 'dir_hist', 'day_count', 'day_sum')
+
+    def __init__(self, first_day: int, arrays: Dict[str, np.ndarray]):
+        self.first_day = int(first_day)
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @property
+    def n_days(self) -> int:
+        return self.day_count.shape[0]
+
+    @property
+    def cell_shape(self) -> Tuple[int, ...]:
+        return self.sumsq.shape
+
+    @property
+    def count(self) -> int:
+        return int(self.hour_count.sum())
+
+    @classmethod
+    def from_block(cls, speed: np.ndarray, direction: np.ndarray, times) -> "WindAggregate":
+        """
+        Agregados de un bloque.
+
+        Args:
+            speed, direction: Arrays (time, ...) de velocidad (m/s) y dirección (°)
+            times: Instantes del eje temporal
+        """
+        times = pd.DatetimeIndex(times)
+        speed = np.asarray(speed, dtype=float)
+        direction = np.asarray(direction, dtype=float)
+        cells = speed.shape[1:]
+        ordinals = np.array([d.toordinal() for d in times.date], dtype=np.int64)
+        first_day = int(ordinals.min())
+        n_days = int(ordinals.max()) - first_day + 1
+
+        finite = np.isfinite(speed)
+        values = np.where(finite, speed, 0.0)
+        valid = finite & np.isfinite(direction)
+
+        hour_count = np.zeros((24,) + cells, dtype=np.int64)
+        hour_sum = np.zeros((24,) + cells)
+        day_count = np.zeros((n_days,) + cells, dtype=np.int64)
+        day_sum = np.zeros((n_days,) + cells)
+        np.add.at(hour_count, times.hour.values, finite)
+        np.add.at(hour_sum, times.hour.values, values)
+        np.add.at(day_count, ordinals - first_day, finite)
+        np.add.at(day_sum, ordinals - first_day, values)
+
+        speed_bin = np.clip(np.floor(values / SPEED_BIN_WIDTH), 0, SPEED_BIN_COUNT - 1).astype(np.int64)
+        # Mismos intervalos que np.histogram con DIRECTION_BINS (360° cae en el último)
+        sector = np.clip(np.floor(np.where(valid, direction, 0.0) / 30), 0, len(DIRECTION_LABELS) - 1).astype(np.int64)
+        speed_hist = np.stack([((speed_bin == k) & finite).sum(axis=0) for k in range(SPEED_BIN_COUNT)])
+        dir_hist = np.stack([((sector == k) & valid).sum(axis=0) for k in range(len(DIRECTION_LABELS))])
+
+        return cls(first_day, {
+            'hour_count': hour_count, 'hour_sum': hour_sum,
+            'sumsq': (values ** 2).sum(axis=0), 'sumcube': (values ** 3).sum(axis=0),
+            'speed_hist': speed_hist.astype(np.int64), 'dir_hist': dir_hist.astype(np.int64),
+            'day_count': day_count, 'day_sum': day_sum,
+        })
+
+    def merge(self, other: Optional["WindAggregate"]) -> "WindAggregate":
+        """Suma de dos agregados de la misma forma de celdas (periodos en cualquier orden)."""
+        if other is None:
+            return self
+        first_day = min(self.first_day, other.first_day)
+        n_days = max(self.first_day + self.n_days, other.first_day + other.n_days) - first_day
+        arrays = {}
+        for name in self.ARRAYS:
+            a, b = getattr(self, name), getattr(other, name)
+            if name.startswith('day_'):
+                out = np.zeros((n_days,) + a.shape[1:], dtype=a.dtype)
+                out[self.first_day - first_day:self.first_day - first_day + self.n_days] += a
+                out[other.first_day - first_day:other.first_day - first_day + other.n_days] += b
+                arrays[name] = out
+            else:
+                arrays[name] = a + b
+        return WindAggregate(first_day, arrays)
+
+    def select_cells(self, index: Tuple) -> "WindAggregate":
+        """Recorta las celdas (index se aplica a las dimensiones de celda)."""
+        arrays = {}
+        for name in self.ARRAYS:
+            a = getattr(self, name)
+            arrays[name] = a[index] if a.ndim == len(self.cell_shape) else a[(slice(None),) + tuple(index)]
+        return WindAggregate(self.first_day, arrays)
+
+    def total(self) -> "WindAggregate":
+        """Reduce las celdas: agregados del área completa (cell_shape = ())."""
+        n_cell_dims = len(self.cell_shape)
+        arrays = {}
+        for name in self.ARRAYS:
+            a = getattr(self, name)
+            axes = tuple(range(a.ndim - n_cell_dims, a.ndim))
+            arrays[name] = a.sum(axis=axes) if axes else a
+        return WindAggregate(self.first_day, arrays)
+
+    def save(self, file):
+        """Guarda el agregado en formato .npz (file: ruta u objeto de archivo)."""
+        np.savez(file, first_day=self.first_day, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, file) -> "WindAggregate":
+        with np.load(file) as data:
+            return cls(int(data['first_day']), {name: data[name] for name in cls.ARRAYS})
+
+    def summaries(self) -> Dict:
+        """Rosa de vientos, patrón horario, serie diaria y estadísticos de la velocidad (totales)."""
+        agg = self.total() if self.cell_shape else self
+        n = agg.count
+        statistics = {}
+        if n:
+            mean = agg.hour_sum.sum() / n
+            statistics = {
+                'count': n,
+                'mean': round(float(mean), 3),
+                'std': round(float(np.sqrt(max(agg.sumsq / n - mean ** 2, 0.0))), 3),
+                'mean_cubed': round(float(agg.sumcube / n), 3),
+                'histogram': {label: int(c) for label, c in zip(SPEED_LABELS, agg.speed_hist)},
+            }
+        return {
+            "wind_rose_data": {label: int(c) for label, c in zip(DIRECTION_LABELS, agg.dir_hist)},
+            "hourly_patterns": {
+                h: round(float(agg.hour_sum[h] / agg.hour_count[h]), 2)
+                for h in range(24) if agg.hour_count[h] > 0
+            },
+            "time_series": {
+                date.fromordinal(agg.first_day + k).isoformat(): round(float(agg.day_sum[k] / agg.day_count[k]), 2)
+                for k in range(agg.n_days) if agg.day_count[k] > 0
+            },
+            "speed_statistics": statistics,
+        }
+
+
+class FrontendPayloadBuilder:
+    """
+    Construye el payload de /api/wind-data a partir de bloques temporales
+    de campos derivados, reduciendo los agregados de forma incremental.
+    """
+
+    def __init__(self, keep_values: bool = True, summaries: Optional[Dict] = None):
+        """
+        Args:
+            keep_values: Si es False solo se acumulan timestamps y agregados
+                         (modo streaming: los valores ya se emitieron por bloques)
+            summaries: Resúmenes ya calculados (p. ej. desde la pirámide temporal);
+                       si se indican, no se agregan los bloques
+        """
+        self.keep_values = keep_values
+        self._summaries = summaries
+        self.timestamps: List[str] = []
+        self.present = set()
+        self.n_lat = 0
+        self.n_lon = 0
+        self.latitudes: Optional[np.ndarray] = None
+        self.longitudes: Optional[np.ndarray] = None
+        self._times: List[np.ndarray] = []
+        self._arrays: Dict[str, List[np.ndarray]] = {var: [] for var in FRONTEND_VARIABLES}
+        self._aggregate: Optional[WindAggregate] = None
+
+    @property
+    def total_points(self) -> int:
+        return len(self.timestamps) * self.n_lat * self.n_lon
+
+    def add(self, fields: xr.Dataset):
+        """Añade un bloque (time, latitude, longitude) de campos derivados."""
+        times = pd.DatetimeIndex(fields.time.values)
+        self.n_lat = fields.sizes.get('latitude', 1)
+        self.n_lon = fields.sizes.get('longitude', 1)
+        if self.latitudes is None and 'latitude' in fields.coords:
+            self.latitudes = fields['latitude'].values
+            self.longitudes = fields['longitude'].values
+        self.timestamps.extend(t.isoformat() for t in times)
+        self._times.append(times.values)
+
+        for var in FRONTEND_VARIABLES:
+            if var in fields:
+                self.present.add(var)
+                if self.keep_values:
+                    self._arrays[var].append(fields[var].values.ravel())
+
+        if self._summaries is not None or 'wind_speed_10m' not in fields or 'wind_direction_10m' not in fields:
+            return
+
+        block = WindAggregate.from_block(fields['wind_speed_10m'].values.reshape(len(times), -1),
+                                         fields['wind_direction_10m'].values.reshape(len(times), -1),
+                                         times).total()
+        self._aggregate = block.merge(self._aggregate)
+
+    def summaries(self) -> Dict:
+        """Rosa de vientos, patrón horario, serie diaria y estadísticos de la velocidad a 10 m."""
+        if self._summaries is not None:
+            return self._summaries
+        if 'wind_speed_10m' not in self.present or self._aggregate is None:
+            return {"wind_rose_data": {}, "hourly_patterns": {}, "time_series": {}, "speed_statistics": {}}
+        return self._aggregate.summaries()
+
+    def values(self, var: str) -> np.ndarray:
+        """Valores acumulados de una variable, aplanados en orden (time, latitude, longitude)."""
+        arrays = self._arrays[var]
+        return np.concatenate(arrays) if arrays else np.array([])
+
+    def build(self, response_format: Optional[ResponseFormat] = None) -> Dict:
+        """
+        Payload con los valores y agregados en el esquema pedido: 'flat' (timestamps
+        y listas planas por variable) o 'grid' (ver build_grid). Con
+        include_values=False solo se devuelven los agregados.
+        """
+        response_format = response_format or ResponseFormat()
+        if not response_format.include_values:
+            payload = {'values_included': False}
+            payload.update(self.summaries())
+            return payload
+        for var in FRONTEND_VARIABLES:
+            if var not in self.present:
+                logger.warning(f"Variable {var} no disponible en los datos de origen.")
+        if response_format.schema == 'grid':
+            return self.build_grid(response_format.encoding, response_format.dtype)
+
+        payload = {'timestamps': self.timestamps}
+        payload.update({var: self.values(var).tolist() for var in FRONTEND_VARIABLES})
+        payload.update(self.summaries())
+        return payload
+
+    def build_grid(self, encoding: str = 'json', dtype: str = 'float32') -> Dict:
+        """
+        Payload compacto: vectores de coordenadas, orden de dimensiones, shape y un
+        array plano (orden C) por variable. El tiempo se envía como inicio + paso.
+        """
+        times = np.concatenate(self._times) if self._times else np.array([], dtype='datetime64[ns]')
+        lats = self.latitudes if self.latitudes is not None else np.array([])
+        lons = self.longitudes if self.longitudes is not None else np.array([])
+        payload = {
+            'schema': GRID_SCHEMA_VERSION,
+            'dims': GRID_DIMS,
+            'shape': [len(times), self.n_lat, self.n_lon],
+            'order': 'C',
+            'coords': {
+                'time': time_coordinate(times),
+                'latitude': np.round(lats.astype(float), 6).tolist(),
+                'longitude': np.round(lons.astype(float), 6).tolist(),
+            },
+            'variables': {
+                var: encode_array(self.values(var), var, encoding, dtype)
+                for var in FRONTEND_VARIABLES if var in self.present
+            },
+        }
+        payload.update(self.summaries())
+        return payload
+
+
+def build_frontend_payload(blocks: Iterable[xr.Dataset], source: str,
+                           response_format: Optional[ResponseFormat] = None,
+                           summaries: Optional[Dict] = None) -> FrontendPayloadBuilder:
+    """
+    Deriva y acumula todos los bloques de una fuente.
+
+    Args:
+        blocks: Bloques temporales con las variables nativas de la fuente
+        source: 'era5', 'merra2' o 'simulated'
+        response_format: Si no incluye valores, solo se acumulan agregados
+        summaries: Resúmenes ya calculados (no se agregan los bloques)
+
+    Returns:
+        FrontendPayloadBuilder: Con los datos acumulados (usar .build() para el dict)
+    """
+    keep_values = response_format is None or response_format.include_values
+    builder = FrontendPayloadBuilder(keep_values=keep_values, summaries=summaries)
+    for block in blocks:
+        builder.add(derive_frontend_fields(block, source))
+    return builder
+
+
+class FrontendBlockStream:
+    """
+    Bloques de campos derivados de una fuente, listos para emitirse uno a uno.
+
+    El primer bloque se lee al construir el objeto, de modo que abrir la fuente
+    (descargas, lectura de caché) ocurre antes de empezar a responder y un
+    stream vacío se puede detectar y descartar (bool(stream) es False).
+    """
+
+    def __init__(self, blocks: Iterator[xr.Dataset], source: str, metadata: Optional[Dict] = None):
+        """
+        Args:
+            blocks: Bloques temporales con las variables nativas de la fuente
+            source: 'era5', 'merra2' o 'simulated' (ver derive_frontend_fields)
+            metadata: Metadatos de la fuente para la cabecera de la respuesta
+        """
+        self.source = source
+        self.metadata = metadata or {}
+        self._blocks = iter(blocks)
+        try:
+            first = next(self._blocks, None)
+            self._first = derive_frontend_fields(first, source) if first is not None else None
+        except Exception:
+            self.close()
+            raise
+
+    def __bool__(self) -> bool:
+        return self._first is not None
+
+    def __iter__(self) -> Iterator[xr.Dataset]:
+        first, self._first = self._first, None
+        if first is None:
+            return
+        yield first
+        for block in self._blocks:
+            yield derive_frontend_fields(block, self.source)
+
+    def close(self):
+        """Libera los recursos de la fuente (archivos temporales, datasets abiertos)."""
+        close = getattr(self._blocks, 'close', None)
+        if close is not None:
+            close()
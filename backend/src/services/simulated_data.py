@@ -0,0 +1,110 @@
+"""
+Generador vectorizado de datos de viento simulados.
+
+Produce el mismo dataset estándar que las fuentes reales tras derivar campos
+(time, latitude, longitude) con las variables del frontend, generando arreglos
+completos con numpy.random.Generator. Con la misma semilla el resultado es
+idéntico, por lo que sirve tanto de fallback como de fixture reproducible.
+"""
+
+import logging
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+# Horas sinópticas usadas por defecto
+DEFAULT_SIMULATED_HOURS = [0, 6, 12, 18]
+
+# Malla simulada por defecto (puntos de latitud x longitud)
+DEFAULT_GRID_SIZE = 5
+
+# Valores base del Caribe colombiano
+BASE_WIND_10M = 6.5
+SHEAR_FACTOR_100M = 1.27
+BASE_PRESSURE_HPA = 1013
+BASE_TEMPERATURE_C = 28
+
+
+def default_seed() -> Optional[int]:
+    """Semilla por defecto (SIMULATED_DATA_SEED); None genera datos distintos en cada llamada."""
+    seed = os.environ.get("SIMULATED_DATA_SEED")
+    return int(seed) if seed not in (None, "") else None
+
+
+def simulated_times(start_date: str, end_date: str, hours: Iterable[int] = None) -> pd.DatetimeIndex:
+    """Instantes de start_date a end_date (incluidas) en las horas UTC pedidas."""
+    hours = sorted({int(h) for h in (hours if hours is not None else DEFAULT_SIMULATED_HOURS)})
+    days = pd.date_range(start_date, end_date, freq='D')
+    offsets = pd.to_timedelta(hours, unit='h')
+    return pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel())
+
+
+def generate_simulated_dataset(lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                               start_date: str, end_date: str, hours: Iterable[int] = None,
+                               n_lat: int = DEFAULT_GRID_SIZE, n_lon: int = DEFAULT_GRID_SIZE,
+                               seed: Optional[int] = None) -> xr.Dataset:
+    """
+    Genera un dataset de viento simulado para el área y periodo.
+
+    Args:
+        lat_min, lat_max, lon_min, lon_max: Límites geográficos
+        start_date, end_date: Fechas en formato YYYY-MM-DD
+        hours: Horas UTC a generar (por defecto las cuatro sinópticas; range(24) para horario)
+        n_lat, n_lon: Tamaño de la malla
+        seed: Semilla del generador; misma semilla, mismos datos
+
+    Returns:
+        xr.Dataset: Variables del frontend con dims (time, latitude, longitude)
+    """
+    if n_lat < 1 or n_lon < 1:
+        raise ValueError("La malla simulada debe tener al menos un punto por eje")
+
+    rng = np.random.default_rng(seed)
+    times = simulated_times(start_date, end_date, hours)
+    shape = (len(times), n_lat, n_lon)
+
+    # Ciclo diurno y estacional, uno por paso de tiempo (se difunden sobre la malla)
+    hour_phase = (2 * np.pi * times.hour.values / 24)[:, None, None]
+    day_phase = (2 * np.pi * times.dayofyear.values / 365.25)[:, None, None]
+    time_factor = 0.8 + 0.4 * np.sin(hour_phase)
+    seasonal_factor = 0.9 + 0.2 * np.sin(day_phase)
+
+    wind_10 = BASE_WIND_10M * time_factor * (0.7 + 0.6 * rng.random(shape)) * seasonal_factor
+    wind_speed_10m = np.round(np.clip(wind_10, 1.0, 12.0), 2)
+    wind_speed_100m = np.round(np.clip(wind_10 * SHEAR_FACTOR_100M, 1.5, 15.0), 2)
+    wind_direction_10m = np.round(rng.uniform(0, 360, shape), 1)
+    wind_direction_100m = np.round(rng.uniform(0, 360, shape), 1)
+
+    pressure = BASE_PRESSURE_HPA + 5 * np.sin(hour_phase) + 3 * (rng.random(shape) - 0.5)
+    surface_pressure = np.round(np.clip(pressure, 1000, 1025), 1)
+
+    temp_var = 4 * np.sin(hour_phase - np.pi / 4) + 2 * (rng.random(shape) - 0.5)
+    temperature_2m = np.round(np.clip(BASE_TEMPERATURE_C + temp_var * seasonal_factor, 20, 35), 1)
+
+    dims = ('time', 'latitude', 'longitude')
+    ds = xr.Dataset(
+        {
+            'wind_speed_10m': (dims, wind_speed_10m),
+            'wind_direction_10m': (dims, wind_direction_10m),
+            'wind_speed_100m': (dims, wind_speed_100m),
+            'wind_direction_100m': (dims, wind_direction_100m),
+            'temperature_2m': (dims, temperature_2m),
+            'surface_pressure': (dims, surface_pressure),
+        },
+        coords={
+            'time': times,
+            # Latitud descendente, como en ERA5
+            'latitude': np.linspace(lat_max, lat_min, n_lat),
+            'longitude': np.linspace(lon_min, lon_max, n_lon),
+        },
+        attrs={'source': 'simulated'},
+    )
+    if seed is not None:
+        ds.attrs['seed'] = int(seed)
+    logger.info(f"🎲 Dataset simulado: {len(times)} timesteps x {n_lat}x{n_lon} puntos (seed={seed})")
+    return ds
@@ -0,0 +1,39 @@
+"""
+Configuración por solicitud para las fuentes de datos (ERA5, MERRA-2, simulado).
+Sustituye la modificación temporal de os.environ["TEST_MODE"], que no es segura
+cuando el servidor atiende varias solicitudes en hilos concurrentes.
+"""
+
+import os
+from dataclasses import dataclass, replace
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class SourceRequestConfig:
+    """
+    Configuración inmutable de una solicitud. Se crea en la ruta y se pasa
+    explícitamente a los servicios, que son instancias compartidas del proceso.
+    """
+    test_mode: bool = False
+    cds_url: Optional[str] = None
+    cds_key: Optional[str] = None
+
+    @classmethod
+    def from_environment(cls, **overrides) -> "SourceRequestConfig":
+        """
+        Instantánea de la configuración del entorno, con valores sobrescritos opcionales.
+
+        Args:
+            **overrides: Campos a sobrescribir (p. ej. test_mode=False)
+        """
+        config = cls(
+            test_mode=os.environ.get("TEST_MODE", "False").lower() == "true",
+            cds_url=os.environ.get("CDSAPI_URL"),
+            cds_key=os.environ.get("CDSAPI_KEY"),
+        )
+        return replace(config, **overrides) if overrides else config
+
+    def with_overrides(self, **overrides) -> "SourceRequestConfig":
+        """Copia de la configuración con algunos campos modificados."""
+        return replace(self, **overrides)
@@ -0,0 +1,283 @@
+"""
+Orquestador de fuentes de datos de reanálisis.
+Lanza las fuentes en orden de preferencia con arranque especulativo (hedging):
+si la primera no responde en un tiempo configurable se inicia la siguiente en
+paralelo, se devuelve el primer resultado válido y se cancela el resto.
+Cada fuente tiene un circuit breaker que la omite durante un tiempo tras
+fallos repetidos.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SourceCancelled(Exception):
+    """La fuente fue cancelada porque otra respondió antes."""
+
+
+def check_cancelled(cancel_event: Optional[threading.Event], source: str = ""):
+    """Punto de cancelación cooperativa para los servicios de descarga."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise SourceCancelled(f"Fuente {source} cancelada".strip())
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por fuente.
+
+    Tras failure_threshold fallos consecutivos se abre y la fuente se omite
+    durante cooldown_seconds; después se permite un intento de prueba
+    (semiabierto) que lo cierra si tiene éxito o lo reabre si falla.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown_seconds:
+                return False
+            if self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            logger.info(f"🔌 Circuit breaker {self.name}: semiabierto, intento de prueba")
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"🔌 Circuit breaker {self.name}: cerrado")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                logger.warning(f"🔌 Circuit breaker {self.name}: abierto durante {self.cooldown_seconds:.0f}s "
+                               f"({self._failures} fallos consecutivos)")
+
+    def release_trial(self):
+        """Libera un intento de prueba que terminó sin veredicto (p. ej. cancelado)."""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def state(self) -> Dict:
+        with self._lock:
+            if self._opened_at is None:
+                status = "closed"
+                retry_in = 0
+            else:
+                retry_in = max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+                status = "open" if retry_in > 0 else "half_open"
+            return {
+                "state": status,
+                "consecutive_failures": self._failures,
+                "retry_in_seconds": round(retry_in, 1),
+            }
+
+
+@dataclass
+class OrchestrationResult:
+    """Resultado de una ejecución del orquestador."""
+    data: Optional[Dict]
+    source: Optional[str]
+    latencies: Dict[str, Dict] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def attempted_sources(self) -> List[str]:
+        return [name for name, info in self.latencies.items()
+                if info["status"] not in ("skipped", "not_started")]
+
+
+class SourceOrchestrator:
+    """
+    Ejecuta fuentes de datos con hedging y circuit breakers.
+
+    Cada fuente es una función fetch(cancel_event) -> dict que debe consultar
+    cancel_event periódicamente (check_cancelled) para abandonar el trabajo
+    cuando otra fuente ya respondió.
+    """
+
+    def __init__(self, hedge_delay_seconds: float = None, failure_threshold: int = None,
+                 cooldown_minutes: float = None, total_timeout_seconds: float = None,
+                 max_workers: int = None):
+        self.hedge_delay_seconds = hedge_delay_seconds if hedge_delay_seconds is not None else \
+            float(os.environ.get("SOURCE_HEDGE_DELAY_SECONDS", "30"))
+        self.failure_threshold = failure_threshold or int(os.environ.get("SOURCE_BREAKER_FAILURES", "3"))
+        self.cooldown_seconds = 60 * (cooldown_minutes if cooldown_minutes is not None else
+                                      float(os.environ.get("SOURCE_BREAKER_COOLDOWN_MINUTES", "10")))
+        self.total_timeout_seconds = total_timeout_seconds or \
+            float(os.environ.get("SOURCE_TOTAL_TIMEOUT_SECONDS", "600"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.environ.get("SOURCE_MAX_WORKERS", "16")),
+            thread_name_prefix="source")
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, self.failure_threshold, self.cooldown_seconds)
+            return self._breakers[name]
+
+    def breaker_states(self) -> Dict[str, Dict]:
+        with self._lock:
+            names = list(self._breakers)
+        return {name: self.breaker(name).state() for name in names}
+
+    def run(self, sources: List[Tuple[str, Callable[[threading.Event], Dict]]],
+            is_valid: Callable[[Any], bool],
+            discard: Optional[Callable[[Any], None]] = None) -> OrchestrationResult:
+        """
+        Ejecuta las fuentes en orden de preferencia y devuelve el primer resultado válido.
+
+        La fuente k se arranca cuando han pasado k * hedge_delay segundos o
+        cuando todas las fuentes ya iniciadas han fallado, lo que ocurra antes.
+
+        Args:
+            sources: Lista ordenada de (nombre, fetch)
+            is_valid: Valida el resultado de una fuente
+            discard: Libera un resultado que no se devuelve: rechazado por is_valid, de
+                     una fuente perdedora o que termina después de elegir el ganador
+
+        Returns:
+            OrchestrationResult: data/source a None si ninguna fuente tuvo éxito
+        """
+        result = OrchestrationResult(data=None, source=None)
+        pending = []
+        for name, fetch in sources:
+            if self.breaker(name).allow():
+                pending.append((name, fetch))
+            else:
+                logger.warning(f"⏭️ Fuente {name} omitida: circuit breaker abierto")
+                result.latencies[name] = {"status": "skipped", "seconds": 0.0,
+                                          "reason": "circuit_breaker_open"}
+                result.errors[name] = "circuit breaker abierto"
+
+        started_at = time.monotonic()
+        running = {}  # future -> (name, cancel_event, start_time)
+        next_start = started_at
+
+        def launch():
+            nonlocal next_start
+            name, fetch = pending.pop(0)
+            cancel_event = threading.Event()
+            logger.info(f"🚀 Iniciando fuente {name}")
+            future = self._executor.submit(fetch, cancel_event)
+            running[future] = (name, cancel_event, time.monotonic())
+            next_start = time.monotonic() + self.hedge_delay_seconds
+
+        try:
+            while pending or running:
+                now = time.monotonic()
+                if pending and (not running or now >= next_start):
+                    launch()
+                    continue
+
+                deadline = started_at + self.total_timeout_seconds
+                if now >= deadline:
+                    logger.error("⏱️ Tiempo total agotado esperando fuentes de datos")
+                    for future, (name, _, t0) in running.items():
+                        self.breaker(name).record_failure()
+                        result.latencies[name] = {"status": "timeout", "seconds": round(now - t0, 3)}
+                        result.errors[name] = "tiempo total agotado"
+                    break
+
+                timeout = deadline - now
+                if pending:
+                    timeout = min(timeout, max(0.0, next_start - now))
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name, _, t0 = running.pop(future)
+                    elapsed = round(time.monotonic() - t0, 3)
+                    breaker = self.breaker(name)
+                    try:
+                        data = future.result()
+                        if not is_valid(data):
+                            self._discard(discard, name, data)
+                            raise ValueError(f"{name.upper()} devolvió datos vacíos")
+                    except SourceCancelled:
+                        breaker.release_trial()
+                        result.latencies[name] = {"status": "cancelled", "seconds": elapsed}
+                        continue
+                    except Exception as e:
+                        breaker.record_failure()
+                        logger.warning(f"⚠️ {name.upper()} falló en {elapsed}s: {e}")
+                        result.latencies[name] = {"status": "failed", "seconds": elapsed, "error": str(e)}
+                        result.errors[name] = str(e)
+                        continue
+
+                    breaker.record_success()
+                    logger.info(f"✅ {name.upper()}: datos obtenidos en {elapsed}s")
+                    result.latencies[name] = {"status": "success", "seconds": elapsed}
+                    result.data = data
+                    result.source = name
+                    return result
+        finally:
+            # Cancelar las fuentes perdedoras o pendientes
+            now = time.monotonic()
+            for future, (name, cancel_event, t0) in running.items():
+                cancel_event.set()
+                future.cancel()
+                self.breaker(name).release_trial()
+                result.latencies.setdefault(name, {"status": "cancelled", "seconds": round(now - t0, 3)})
+                if discard is not None:
+                    # Las que ya terminaron se liberan ahora; las que sigan, al terminar
+                    future.add_done_callback(self._late_discard(discard, name))
+            for name, _ in pending:
+                self.breaker(name).release_trial()
+                result.latencies.setdefault(name, {"status": "not_started", "seconds": 0.0})
+
+        return result
+
+    @staticmethod
+    def _discard(discard: Optional[Callable[[Any], None]], name: str, data: Any):
+        if discard is None or data is None:
+            return
+        try:
+            discard(data)
+        except Exception as e:
+            logger.warning(f"No se pudo liberar el resultado descartado de {name}: {e}")
+
+    @classmethod
+    def _late_discard(cls, discard: Callable[[Any], None], name: str) -> Callable:
+        """Callback que libera el resultado de una fuente que ya no se va a usar."""
+        def callback(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            cls._discard(discard, name, future.result())
+        return callback
+
+
+_orchestrator = None
+_orchestrator_lock = threading.Lock()
+
+
+def get_source_orchestrator() -> SourceOrchestrator:
+    """Orquestador compartido del proceso (los circuit breakers persisten entre solicitudes)."""
+    global _orchestrator
+    with _orchestrator_lock:
+        if _orchestrator is None:
+            _orchestrator = SourceOrchestrator()
+        return _orchestrator
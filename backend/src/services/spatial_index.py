@@ -0,0 +1,133 @@
+"""
+Índice espacial de puntos (lat, lon) para consultas por radio.
+
+Un BallTree de scikit-learn con métrica haversine sobre radianes devuelve los
+candidatos dentro de un radio sin recorrer todos los puntos. La distancia haversine
+(esfera de radio medio) difiere de la geodésica WGS84 en menos de un 0.6 %, así que
+solo los candidatos en la franja [r·(1-ε), r·(1+ε)] se comprueban con
+geopy.geodesic: el resultado coincide con filtrar todos los puntos por distancia
+geodésica, que es lo que se hacía fila a fila con DataFrame.apply.
+"""
+
+from typing import Iterable, Optional
+
+import numpy as np
+from geopy.distance import geodesic
+from sklearn.neighbors import BallTree
+
+# Radio medio de la Tierra (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+# Cota del error relativo de haversine frente a la geodésica del elipsoide WGS84
+HAVERSINE_RELATIVE_ERROR = 0.006
+
+# Elipsoide WGS84 y cota del error relativo de la fórmula de Lambert frente a la
+# geodésica (medido < 1.5e-6 hasta 1500 km; se deja margen)
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+LAMBERT_RELATIVE_ERROR = 1e-5
+
+
+def lambert_distance_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Distancia sobre el elipsoide WGS84 con la fórmula de Lambert para líneas largas,
+    vectorizada: aproxima la geodésica de geopy con error relativo del orden de 1e-6.
+    """
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    h = np.sin((beta2 - beta1) / 2) ** 2 + np.cos(beta1) * np.cos(beta2) * np.sin(np.radians(lon2 - lon1) / 2) ** 2
+    sigma = 2 * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+    p, q = (beta1 + beta2) / 2, (beta2 - beta1) / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        return np.where(sigma > 0, WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y)), 0.0)
+
+
+class RadiusIndex:
+    """
+    BallTree haversine sobre un conjunto fijo de puntos. Las consultas devuelven
+    posiciones (0..n-1) en el orden de los arrays de entrada.
+    """
+
+    def __init__(self, lats: Iterable[float], lons: Iterable[float], leaf_size: int = 40):
+        """
+        Args:
+            lats, lons: Coordenadas en grados de los puntos indexados
+            leaf_size: Tamaño de hoja del BallTree
+        """
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self._tree: Optional[BallTree] = None
+        if len(self.lats):
+            self._tree = BallTree(np.radians(np.column_stack([self.lats, self.lons])),
+                                  metric="haversine", leaf_size=leaf_size)
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def query_radius(self, lat: float, lon: float, radius_km: float, exact: bool = True) -> np.ndarray:
+        """
+        Posiciones, en orden ascendente, de los puntos a radius_km o menos de (lat, lon).
+
+        Args:
+            lat, lon: Punto de consulta en grados
+            radius_km: Radio en km
+            exact: Si es True, los candidatos cercanos al borde se deciden con la
+                   distancia geodésica WGS84; si no, basta la distancia haversine
+
+        Returns:
+            np.ndarray: Posiciones (int) de los puntos dentro del radio
+        """
+        if self._tree is None or radius_km < 0:
+            return np.empty(0, dtype=int)
+        outer = radius_km * (1 + HAVERSINE_RELATIVE_ERROR) if exact else radius_km
+        query = np.radians([[lat, lon]])
+        positions, distances = self._tree.query_radius(query, r=outer / EARTH_RADIUS_KM, return_distance=True)
+        positions, distances = positions[0], distances[0] * EARTH_RADIUS_KM
+
+        if exact:
+            border = np.flatnonzero(distances > radius_km * (1 - HAVERSINE_RELATIVE_ERROR))
+            if len(border):
+                outside = [k for k in border
+                           if geodesic((self.lats[positions[k]], self.lons[positions[k]]), (lat, lon)).km > radius_km]
+                positions = np.delete(positions, outside)
+        return np.sort(positions)
+
+    def within_radius(self, lats: Iterable[float], lons: Iterable[float], radius_km: float,
+                      exact: bool = True) -> np.ndarray:
+        """
+        Matriz de pertenencia de varios puntos de consulta a la vez: distancias
+        haversine vectorizadas (consultas x puntos indexados). Con exact, los pares
+        en la franja del borde se deciden con la fórmula de Lambert (vectorizada) y
+        solo los que quedan a menos de su error del radio con geopy.geodesic, así que
+        el resultado coincide con query_radius. El llamador acota la memoria
+        consultando por bloques.
+
+        Args:
+            lats, lons: Puntos de consulta en grados
+            radius_km: Radio en km
+            exact: Decidir con la distancia geodésica WGS84 los pares cercanos al borde
+
+        Returns:
+            np.ndarray: bool (consultas x puntos); [q, i] indica que el punto i está a
+                        radius_km o menos de la consulta q
+        """
+        lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+        q_lats, q_lons = np.radians(lats)[:, None], np.radians(lons)[:, None]
+        p_lats, p_lons = np.radians(self.lats)[None, :], np.radians(self.lons)[None, :]
+        a = (np.sin((p_lats - q_lats) / 2) ** 2 +
+             np.cos(q_lats) * np.cos(p_lats) * np.sin((p_lons - q_lons) / 2) ** 2)
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+        if not exact:
+            return distances <= radius_km
+
+        inside = distances <= radius_km * (1 - HAVERSINE_RELATIVE_ERROR)
+        q, i = np.nonzero((distances > radius_km * (1 - HAVERSINE_RELATIVE_ERROR)) &
+                          (distances <= radius_km * (1 + HAVERSINE_RELATIVE_ERROR)))
+        lambert = lambert_distance_km(lats[q], lons[q], self.lats[i], self.lons[i])
+        inside[q, i] = lambert <= radius_km
+        doubtful = np.flatnonzero(np.abs(lambert - radius_km) <= radius_km * LAMBERT_RELATIVE_ERROR)
+        for k in doubtful:
+            inside[q[k], i[k]] = geodesic((self.lats[i[k]], self.lons[i[k]]), (lats[q[k]], lons[q[k]])).km <= radius_km
+        return inside
@@ -0,0 +1,162 @@
+"""
+Pirámide temporal de agregados del viento a 10 m guardada junto a la caché ERA5.
+
+Por cada tile de la caché, máscara de horas UTC y periodo se guarda un
+WindAggregate por celda (conteos, sumas, sumas de cuadrados y cubos,
+histogramas de velocidad y dirección) en tres niveles: día, mes y año.
+Los niveles superiores se construyen sumando los inferiores la primera vez que
+se piden, de modo que los resúmenes de cualquier rango de fechas se obtienen
+combinando unas pocas entradas (años completos, meses completos y días sueltos)
+en lugar de recorrer los datos horarios.
+"""
+
+import calendar
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from src.services.disk_cache import DiskLRUCache
+from src.services.reanalysis_processing import WindAggregate
+
+logger = logging.getLogger(__name__)
+
+# Función que calcula el agregado diario de un tile desde los datos crudos (o None)
+DayLoader = Callable[[Tuple[int, int], date], Optional[WindAggregate]]
+
+
+def _month_end(day: date) -> date:
+    return date(day.year, day.month, calendar.monthrange(day.year, day.month)[1])
+
+
+class WindPyramid:
+    """
+    Entradas .npz en un DiskLRUCache propio, con claves
+    day/YYYY/MM/DD/..., month/YYYY/MM/... y year/YYYY/... por tile y máscara.
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int):
+        """
+        Args:
+            root_dir: Directorio de la pirámide (separado del de los tiles)
+            max_bytes: Cuota de disco en bytes
+        """
+        self.store = DiskLRUCache(root_dir, max_bytes)
+        self._lock = threading.Lock()
+        self.built = {'day': 0, 'month': 0, 'year': 0}
+
+    @staticmethod
+    def _key(level: str, period: str, tile: Tuple[int, int], mask: int) -> str:
+        return f"{level}/{period}/tile_{tile[0]}_{tile[1]}_h{mask:06x}.npz"
+
+    def _get(self, key: str) -> Optional[WindAggregate]:
+        path = self.store.get(key)
+        if path is None:
+            return None
+        try:
+            return WindAggregate.load(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Entrada de pirámide ilegible {key}: {e}")
+            self.store.discard(key)
+            return None
+
+    def _put(self, key: str, level: str, aggregate: WindAggregate):
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                aggregate.save(f)
+
+        self.store.put(key, write)
+        with self._lock:
+            self.built[level] += 1
+
+    def store_day(self, tile: Tuple[int, int], day: date, mask: int, aggregate: WindAggregate):
+        """Guarda (o reemplaza) el agregado diario de un tile para una máscara de horas."""
+        self._put(self._key('day', f"{day:%Y/%m/%d}", tile, mask), 'day', aggregate)
+
+    def discard_day(self, tile: Tuple[int, int], day: date):
+        """
+        Descarta, para todas las máscaras, los agregados de un tile que incluyen el día
+        (día, su mes y su año): se usa cuando sus datos ERA5T se reemplazan por los finales.
+        """
+        suffix = f"/tile_{tile[0]}_{tile[1]}_h"
+        prefixes = (f"day/{day:%Y/%m/%d}{suffix}", f"month/{day:%Y/%m}{suffix}", f"year/{day:%Y}{suffix}")
+        for key in self.store.keys():
+            if key.startswith(prefixes):
+                self.store.discard(key)
+
+    def day(self, tile: Tuple[int, int], day: date, mask: int, loader: DayLoader) -> Optional[WindAggregate]:
+        key = self._key('day', f"{day:%Y/%m/%d}", tile, mask)
+        aggregate = self._get(key)
+        if aggregate is None:
+            aggregate = loader(tile, day)
+            if aggregate is not None:
+                self._put(key, 'day', aggregate)
+        return aggregate
+
+    def month(self, tile: Tuple[int, int], year: int, month: int, mask: int,
+              loader: DayLoader) -> Optional[WindAggregate]:
+        key = self._key('month', f"{year:04d}/{month:02d}", tile, mask)
+        aggregate = self._get(key)
+        if aggregate is None:
+            first = date(year, month, 1)
+            aggregate = self._merge_days(tile, first, _month_end(first), mask, loader)
+            if aggregate is not None:
+                self._put(key, 'month', aggregate)
+        return aggregate
+
+    def year(self, tile: Tuple[int, int], year: int, mask: int, loader: DayLoader) -> Optional[WindAggregate]:
+        key = self._key('year', f"{year:04d}", tile, mask)
+        aggregate = self._get(key)
+        if aggregate is None:
+            for month in range(1, 13):
+                part = self.month(tile, year, month, mask, loader)
+                if part is None:
+                    return None
+                aggregate = part.merge(aggregate)
+            self._put(key, 'year', aggregate)
+        return aggregate
+
+    def _merge_days(self, tile, first: date, last: date, mask: int, loader: DayLoader) -> Optional[WindAggregate]:
+        aggregate = None
+        day = first
+        while day <= last:
+            part = self.day(tile, day, mask, loader)
+            if part is None:
+                return None
+            aggregate = part.merge(aggregate)
+            day += timedelta(days=1)
+        return aggregate
+
+    def aggregate(self, tile: Tuple[int, int], first: date, last: date, mask: int,
+                  loader: DayLoader) -> Optional[WindAggregate]:
+        """
+        Agregado por celda de un tile para el rango [first, last], cubierto con
+        años completos, meses completos y días sueltos.
+
+        Returns:
+            WindAggregate: O None si falta algún día en la pirámide y en los datos crudos
+        """
+        aggregate = None
+        day = first
+        while day <= last:
+            if day.month == 1 and day.day == 1 and date(day.year, 12, 31) <= last:
+                part = self.year(tile, day.year, mask, loader)
+                following = date(day.year + 1, 1, 1)
+            elif day.day == 1 and _month_end(day) <= last:
+                part = self.month(tile, day.year, day.month, mask, loader)
+                following = _month_end(day) + timedelta(days=1)
+            else:
+                part = self.day(tile, day, mask, loader)
+                following = day + timedelta(days=1)
+            if part is None:
+                return None
+            aggregate = part.merge(aggregate)
+            day = following
+        return aggregate
+
+    def stats(self) -> Dict:
+        """Estadísticas de la pirámide (uso de disco y entradas construidas por nivel)."""
+        stats = self.store.stats()
+        with self._lock:
+            stats['built'] = dict(self.built)
+        return stats
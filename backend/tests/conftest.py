@@ -0,0 +1,6 @@
+"""Configuración común de las pruebas del backend (importa el paquete src)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
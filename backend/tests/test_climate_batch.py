@@ -0,0 +1,59 @@
+"""Validación de las solicitudes de /climate-analysis/batch."""
+
+import time
+import tracemalloc
+
+import pytest
+from flask import Flask
+
+from src.routes.climate import climate_bp
+from src.services.climate_analysis_module import grid_axis, grid_axis_size
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(climate_bp, url_prefix="/api")
+    return app.test_client()
+
+
+def post_batch(client, body: str):
+    return client.post("/api/climate-analysis/batch", data=body, content_type="application/json")
+
+
+def test_grid_axis_size_matches_grid_axis():
+    for start, stop, step in [(10.0, 12.0, 0.25), (-76.0, -74.3, 0.1), (5.0, 5.0, 1.0), (0.0, 1.0, 0.3)]:
+        assert grid_axis_size(start, stop, step) == len(grid_axis(start, stop, step))
+
+
+def test_tiny_step_is_rejected_before_building_axes(client):
+    tracemalloc.start()
+    started = time.monotonic()
+    response = post_batch(client, '{"grid": {"lat_min": 10, "lat_max": 12, "lon_min": -76, "lon_max": -74, '
+                                  '"step": 1e-7}}')
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert response.status_code == 400
+    assert "máximo" in response.get_json()["error"]
+    assert peak < 50 * 1024 * 1024
+    assert time.monotonic() - started < 5
+
+
+@pytest.mark.parametrize("body", [
+    '{"grid": {"lat_min": -Infinity, "lat_max": 12, "lon_min": -76, "lon_max": -74, "step": 0.5}}',
+    '{"grid": {"lat_min": 10, "lat_max": 12, "lon_min": -76, "lon_max": -74, "step": NaN}}',
+    '{"grid": {"lat_min": 10, "lat_max": 12, "lon_min": -76, "lon_max": -74, "step": 1e-320}}',
+    '{"points": [[10.5, Infinity]]}',
+    '{"points": [[10.5, -75.0]], "radius_km": Infinity}',
+])
+def test_non_finite_inputs_are_rejected(client, body):
+    response = post_batch(client, body)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_small_grid_is_analyzed(client):
+    response = post_batch(client, '{"grid": {"lat_min": 10, "lat_max": 11, "lon_min": -76, "lon_max": -75, '
+                                  '"step": 0.5}, "radius_km": 150}')
+    assert response.status_code == 200
+    assert response.get_json()["data"]["count"] == 9
@@ -0,0 +1,128 @@
+"""Ráster climatológico: igualdad con el cálculo exacto en los nodos, lectura entre nodos y fallbacks."""
+
+import json
+import math
+import shutil
+
+import numpy as np
+import pytest
+
+from src.services.climate_analysis_module import ClimateAnalysisModule
+from src.services.climate_raster import build_climate_raster, get_climate_raster, metadata_path
+
+BBOX = {"min_lat": 11.0, "max_lat": 12.0, "min_lon": -80.0, "max_lon": -79.0}
+STEP = 0.5
+RADII = (100.0, 200.0)
+NODES = [(lat, lon) for lat in (11.0, 11.5, 12.0) for lon in (-80.0, -79.5, -79.0)]
+
+
+@pytest.fixture(scope="module")
+def module():
+    module = ClimateAnalysisModule()
+    assert module.load_data()
+    return module
+
+
+@pytest.fixture(scope="module")
+def built_raster(module, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("raster") / "climate_raster.npy")
+    build_climate_raster(module, path, STEP, RADII, BBOX)
+    return path
+
+
+@pytest.fixture
+def raster_at(monkeypatch):
+    def use(path):
+        monkeypatch.setenv("CLIMATE_RASTER_ENABLED", "true")
+        monkeypatch.setenv("CLIMATE_RASTER_PATH", str(path))
+        return get_climate_raster()
+    return use
+
+
+def assert_same(actual, expected):
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected)
+        for key in expected:
+            assert_same(actual[key], expected[key])
+    elif isinstance(expected, float) and math.isnan(expected):
+        assert math.isnan(actual)
+    else:
+        assert actual == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("radius_km", RADII)
+@pytest.mark.parametrize("lat, lon", NODES)
+def test_nodes_match_exact_path(module, built_raster, raster_at, lat, lon, radius_km):
+    raster = raster_at(built_raster)
+    snapshot = module.store.get()
+    exact = module.calculate_metrics(lat, lon, radius_km, snapshot)
+    probabilities = module.predict_impact_details(exact, snapshot)["class_probabilities"]
+
+    metrics, raster_probabilities = raster.lookup(lat, lon, radius_km)
+
+    assert type(metrics["event_density"]) is int and metrics["event_density"] == exact["event_density"]
+    assert metrics["historical_pressure_min"] == exact["historical_pressure_min"]
+    assert_same(metrics, exact)
+    assert_same(raster_probabilities, probabilities)
+
+    result = module.analyze_point(lat, lon, radius_km)
+    assert result["metrics_source"] == "raster"
+    assert result["predicted_impact"] == max(probabilities, key=probabilities.get)
+
+
+@pytest.mark.parametrize("interpolation", ["bilinear", "nearest"])
+def test_counts_and_extrema_between_nodes_are_real_values(module, built_raster, raster_at, interpolation):
+    raster = raster_at(built_raster)
+    snapshot = module.store.get()
+    # Esquinas (11.0, -79.5), (11.0, -79.0), (11.5, -79.5), (11.5, -79.0); la más cercana es la primera
+    corners = [module.calculate_metrics(lat, lon, 200.0, snapshot)
+               for lat, lon in [(11.0, -79.5), (11.0, -79.0), (11.5, -79.5), (11.5, -79.0)]]
+
+    metrics, _ = raster.lookup(11.2, -79.4, 200.0, interpolation)
+
+    assert type(metrics["event_density"]) is int
+    assert metrics["event_density"] == corners[0]["event_density"]
+    assert type(metrics["historical_pressure_min"]) is int
+    if interpolation == "bilinear":
+        pressures = [c["historical_pressure_min"] for c in corners if c["historical_pressure_min"] != -999]
+        assert metrics["historical_pressure_min"] == (min(pressures) if pressures else -999)
+    else:
+        assert metrics["historical_pressure_min"] == corners[0]["historical_pressure_min"]
+
+
+def test_radius_not_precalculated_uses_exact_path(module, built_raster, raster_at):
+    raster_at(built_raster)
+    assert module.analyze_point(11.5, -79.5, 150.0)["metrics_source"] == "exact"
+
+
+def test_point_outside_grid_uses_exact_path(module, built_raster, raster_at):
+    raster = raster_at(built_raster)
+    assert raster.lookup(12.6, -79.5, 200.0) is None
+    assert module.analyze_point(12.6, -79.5, 200.0)["metrics_source"] == "exact"
+
+
+def test_stale_raster_uses_exact_path(module, built_raster, raster_at, tmp_path):
+    path = tmp_path / "climate_raster.npy"
+    shutil.copy(built_raster, path)
+    with open(metadata_path(built_raster)) as f:
+        meta = json.load(f)
+    meta["hurdat_sha256"] = "stale"
+    with open(metadata_path(str(path)), "w") as f:
+        json.dump(meta, f)
+
+    raster = raster_at(path)
+    assert raster is not None
+    assert module.analyze_point(11.5, -79.5, 200.0)["metrics_source"] == "exact"
+
+
+def test_corrupt_raster_uses_exact_path(module, built_raster, raster_at, tmp_path):
+    path = tmp_path / "climate_raster.npy"
+    path.write_bytes(b"not a numpy array")
+    shutil.copy(metadata_path(built_raster), metadata_path(str(path)))
+
+    assert raster_at(path) is None
+    assert module.analyze_point(11.5, -79.5, 200.0)["metrics_source"] == "exact"
+
+    # Forma distinta de la anunciada en el .json
+    np.save(path, np.zeros((1, 1, 1, 1)))
+    assert raster_at(path) is None
@@ -0,0 +1,75 @@
+"""Límites de fechas: ERA5_MAX_RANGE_DAYS para ERA5, 31 días para MERRA-2 y puntos totales en simulado."""
+
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+import src.routes.era5 as era5_routes
+from src.services.source_orchestrator import SourceOrchestrator
+
+AREA = {"lat_min": 10.0, "lat_max": 11.0, "lon_min": -76.0, "lon_max": -75.0}
+LONG_RANGE = {"start_date": "2024-01-01", "end_date": "2024-03-01"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    orchestrator = SourceOrchestrator(hedge_delay_seconds=0.05, failure_threshold=3, cooldown_minutes=1,
+                                      total_timeout_seconds=10, max_workers=4)
+    monkeypatch.setattr(era5_routes, "get_source_orchestrator", lambda: orchestrator)
+    app = Flask(__name__)
+    app.register_blueprint(era5_routes.era5_bp, url_prefix="/api")
+    return app.test_client()
+
+
+def test_simulated_data_accepts_long_ranges_within_point_limit(client):
+    response = client.post("/api/simulated_data", json={**AREA, **LONG_RANGE, "n_lat": 2, "n_lon": 2})
+    assert response.status_code == 200
+    assert len(response.get_json()["timestamps"]) == 61 * 4
+
+
+def test_simulated_data_is_bounded_by_total_points(client, monkeypatch):
+    monkeypatch.setenv("SIMULATED_MAX_POINTS", "1000")
+    # 61 días x 4 horas x 4 celdas = 976 puntos
+    assert client.post("/api/simulated_data", json={**AREA, **LONG_RANGE, "n_lat": 2, "n_lon": 2}).status_code == 200
+    response = client.post("/api/simulated_data", json={**AREA, **LONG_RANGE, "n_lat": 2, "n_lon": 3})
+    assert response.status_code == 400
+    assert "1000" in response.get_json()["error"]
+
+
+def test_wind_data_long_range_skips_merra2_and_falls_back_to_simulated(client, monkeypatch):
+    merra2_calls = []
+
+    def get_real_wind_data(self, *args, **kwargs):
+        raise RuntimeError("CDS caído")
+
+    monkeypatch.setattr(era5_routes.ERA5Service, "get_real_wind_data", get_real_wind_data)
+    monkeypatch.setattr(era5_routes, "get_merra2_service", lambda: SimpleNamespace(
+        get_merra2_data=lambda *args, **kwargs: merra2_calls.append(args)))
+
+    response = client.post("/api/wind-data", json={**AREA, **LONG_RANGE})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["data_source"] == "simulated"
+    assert body["fallback_info"]["attempted_sources"] == ["era5"]
+    assert merra2_calls == []
+
+
+def test_wind_data_rejects_range_over_era5_limit(client, monkeypatch):
+    monkeypatch.setenv("ERA5_MAX_RANGE_DAYS", "40")
+    response = client.post("/api/wind-data", json={**AREA, **LONG_RANGE})
+    assert response.status_code == 400
+
+
+def test_wind_data_short_range_falls_back_to_simulated(client, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("fuente caída")
+
+    monkeypatch.setattr(era5_routes.ERA5Service, "get_real_wind_data", fail)
+    monkeypatch.setattr(era5_routes, "get_merra2_service", lambda: SimpleNamespace(get_merra2_data=fail))
+
+    response = client.post("/api/wind-data", json={**AREA, "start_date": "2024-01-01", "end_date": "2024-01-02"})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["data_source"] == "simulated"
+    assert body["fallback_info"]["attempted_sources"] == ["era5", "merra2"]
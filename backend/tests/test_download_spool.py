@@ -0,0 +1,38 @@
+"""Pruebas del presupuesto del directorio de vuelco de las descargas."""
+
+import os
+import tempfile
+
+from src.services import download_spool
+from src.services.download_spool import DownloadSpool, release_download_target, spool_file_path
+
+
+def test_spill_falls_back_to_temp_dir_when_budget_is_exhausted(tmp_path, monkeypatch):
+    monkeypatch.setenv("REANALYSIS_SPOOL_DIR_MAX_MB", "1")
+    spool = DownloadSpool(max_memory_bytes=256 * 1024, spill_dir=str(tmp_path))
+    with spool.open("wb") as f:
+        for _ in range(8):
+            f.write(b"x" * 200 * 1024)
+
+    # Volcado al tmpfs simulado y, al superar 1 MB, movido al temporal del sistema
+    assert spool.path is not None
+    assert os.path.dirname(spool.path) == tempfile.gettempdir()
+    assert spool.size == 8 * 200 * 1024
+    assert download_spool._space_reserved == 0
+    spool.close()
+    assert download_spool._space_reserved == 0
+
+
+def test_spool_file_path_reserves_and_releases(tmp_path, monkeypatch):
+    monkeypatch.setenv("REANALYSIS_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setenv("REANALYSIS_SPOOL_DIR_MAX_MB", "1")
+
+    first = spool_file_path(768 * 1024)
+    second = spool_file_path(768 * 1024)
+    assert os.path.dirname(first) == str(tmp_path)
+    assert os.path.dirname(second) == tempfile.gettempdir()
+
+    release_download_target(second)
+    release_download_target(first)
+    assert not os.path.exists(first) and not os.path.exists(second)
+    assert download_spool._space_reserved == 0
@@ -0,0 +1,187 @@
+"""Pruebas de la caché de tiles ERA5 con escrituras y lecturas desde varios hilos."""
+
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from src.services.download_spool import NETCDF_IO_LOCK
+from src.services.era5_cache import ERA5TileCache, hours_mask
+
+LATS = np.arange(11.75, 9.99, -0.25)
+LONS = np.arange(-76.0, -74.24, 0.25)
+VARIABLES = ("u10", "v10", "t2m")
+
+
+def make_dataset(day: date, hours, seed: float, variables=VARIABLES) -> xr.Dataset:
+    """Dataset ERA5 sintético cuyo valor depende de la semilla, la hora y la celda."""
+    times = pd.DatetimeIndex([pd.Timestamp(day) + pd.Timedelta(hours=h) for h in hours])
+    cells = np.arange(len(LATS) * len(LONS), dtype=np.float32).reshape(len(LATS), len(LONS)) / 1000
+    values = np.stack([seed + h / 100 + cells for h in hours]).astype(np.float32)
+    return xr.Dataset({var: (("time", "latitude", "longitude"), values) for var in variables},
+                      coords={"time": times, "latitude": LATS, "longitude": LONS})
+
+
+def test_concurrent_store_and_load(tmp_path):
+    cache = ERA5TileCache(cache_dir=str(tmp_path / "tiles"), tile_size_deg=2.0, max_bytes=10 ** 9,
+                          pyramid_dir=str(tmp_path / "pyramid"))
+    window = ERA5TileCache.cell_window(float(LATS.min()), float(LATS.max()), float(LONS.min()), float(LONS.max()))
+    errors = []
+
+    def worker(k):
+        # Cada hilo es dueño de su día: alterna horas para forzar la fusión con la entrada previa
+        day = date(2024, 1, 1) + timedelta(days=k)
+        try:
+            for it in range(30):
+                hours = [0, 6] if it % 2 else [12, 18]
+                expected = make_dataset(day, hours, seed=k * 100 + it)
+                cache.store_dataset(expected)
+                loaded = cache.load(window, [day], ["u10", "v10"], hours)
+                for var in ("u10", "v10"):
+                    np.testing.assert_allclose(loaded[var].values, expected[var].values)
+                for tile in cache.tiles_for_window(window):
+                    assert cache.day_aggregate(tile, day, hours) is not None
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors, errors
+    day = date(2024, 1, 1)
+    merged = cache.load(window, [day], ["t2m"], [0, 6, 12, 18])
+    assert not np.isnan(merged["t2m"].values).any()
+
+
+def with_expver(ds: xr.Dataset, expver: str) -> xr.Dataset:
+    """Como lo entrega CDS: valid_time y la versión de cada paso en la coordenada expver."""
+    ds = ds.rename({"time": "valid_time"})
+    return ds.assign_coords(expver=("valid_time", [expver] * ds.sizes["valid_time"]))
+
+
+def test_era5t_days_are_replaced_by_final_data(tmp_path):
+    cache = ERA5TileCache(cache_dir=str(tmp_path / "tiles"), tile_size_deg=2.0, max_bytes=10 ** 9,
+                          pyramid_dir=str(tmp_path / "pyramid"))
+    window = ERA5TileCache.cell_window(float(LATS.min()), float(LATS.max()), float(LONS.min()), float(LONS.max()))
+    day, later = date(2024, 1, 1), date(2024, 1, 2)
+
+    cache.store_dataset(with_expver(make_dataset(day, [0, 6, 12, 18], seed=1), "0005"))
+    cache.store_dataset(with_expver(make_dataset(later, [0, 6], seed=1), "0001"))
+    tile = cache.tiles_for_window(window)[0]
+    # Agregado diario de otra máscara calculado desde los datos ERA5T
+    assert cache.pyramid.day(tile, day, hours_mask([0]), lambda t, d: cache.day_aggregate(t, d, [0]))
+    assert cache.preliminary_days(window, final_before=later) == {day}
+    assert cache.preliminary_days(window, final_before=day - timedelta(days=1)) == set()
+    assert not cache.find_missing(window, [day, later], ["u10"], [0, 6])
+    assert {m[1] for m in cache.find_missing(window, [day, later], ["u10"], [0, 6], final_before=later)} == {day}
+
+    # Los datos finales reemplazan las horas ERA5T en lugar de fusionarse con ellas
+    final = make_dataset(day, [0, 6], seed=2)
+    cache.store_dataset(with_expver(final, "0001"))
+    assert cache.preliminary_days(window, final_before=later) == set()
+    assert cache.find_missing(window, [day], ["u10"], [12])
+    loaded = cache.load(window, [day], ["u10"], [0, 6])
+    np.testing.assert_allclose(loaded["u10"].values, final["u10"].values)
+    assert not any(key.startswith(f"day/2024/01/01/tile_{tile[0]}_{tile[1]}_h000001")
+                   for key in cache.pyramid.store.keys())
+    assert cache.stats()["preliminary_entries"] == 0
+
+    # El marcador ERA5T sobrevive a reconstruir el índice desde disco
+    cache.store_dataset(with_expver(make_dataset(later, [12], seed=3), "0005"))
+    reopened = ERA5TileCache(cache_dir=str(tmp_path / "tiles"), tile_size_deg=2.0, max_bytes=10 ** 9,
+                             pyramid_dir=str(tmp_path / "pyramid"))
+    assert reopened.preliminary_days(window, final_before=later) == {later}
+
+
+def test_lease_keeps_entries_until_released(tmp_path):
+    # Cuota para poco más de un día: sin fijar, guardar el segundo día desalojaría el primero
+    cache = ERA5TileCache(cache_dir=str(tmp_path / "tiles"), tile_size_deg=2.0, max_bytes=50_000,
+                          pyramid_dir=str(tmp_path / "pyramid"))
+    window = ERA5TileCache.cell_window(float(LATS.min()), float(LATS.max()), float(LONS.min()), float(LONS.max()))
+    days, hours = [date(2024, 1, 1), date(2024, 1, 2)], [0, 6]
+    first = make_dataset(days[0], hours, seed=1)
+
+    lease = cache.lease()
+    assert cache.find_missing(window, days, list(VARIABLES), hours, lease=lease)
+    cache.store_dataset(first, lease)
+    cache.store_dataset(make_dataset(days[1], hours, seed=2), lease)
+    # Otra solicitud reemplaza las entradas del primer día al fusionar otra hora
+    cache.store_dataset(make_dataset(days[0], [12], seed=3))
+
+    blocks = cache.iter_load(window, days, ["u10"], hours, days_per_block=1, lease=lease)
+    np.testing.assert_allclose(next(blocks)["u10"].values, first["u10"].values)
+    blocks.close()
+
+    stats = cache.store.stats()
+    assert stats["pinned"] == 0 and stats["size_bytes"] <= 50_000
+    # Las entradas reemplazadas mientras estaban fijadas se borran al soltarlas
+    assert len(list((tmp_path / "tiles").rglob("*.nc"))) == stats["entries"]
+
+
+def test_window_over_quota_is_served_without_cache(tmp_path, monkeypatch):
+    import src.routes.era5 as era5_routes
+
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+
+    def retrieve_era5_file(self, chunk, area, variables, config=None):
+        path = str(downloads / f"{chunk.year}{chunk.month:02d}.nc")
+        xr.concat([make_dataset(day, list(chunk.hours), seed=day.day, variables=variables) for day in chunk.dates],
+                  dim="time").to_netcdf(path)
+        return path
+
+    monkeypatch.setattr(era5_routes.ERA5Service, "retrieve_era5_file", retrieve_era5_file)
+    days = [date(2024, 1, 1) + timedelta(days=k) for k in range(5)]
+    bounds = (float(LATS.min()), float(LATS.max()), float(LONS.min()), float(LONS.max()))
+
+    for max_bytes, cached in ((50_000, False), (10 ** 9, True)):
+        cache = ERA5TileCache(cache_dir=str(tmp_path / f"tiles{max_bytes}"), tile_size_deg=2.0,
+                              max_bytes=max_bytes, pyramid_dir=str(tmp_path / f"pyramid{max_bytes}"))
+        monkeypatch.setattr(era5_routes, "get_era5_cache", lambda: cache)
+        blocks = era5_routes.ERA5Service().open_era5_blocks(*bounds, days, [0, 6])
+        loaded = xr.concat(list(blocks), dim="time")
+        assert loaded.sizes["time"] == 10
+        assert (cache.store.stats()["entries"] > 0) == cached
+        assert cache.store.stats()["pinned"] == 0
+        assert not list(downloads.iterdir())
+
+
+def test_store_releases_netcdf_lock_between_entries(tmp_path, monkeypatch):
+    import src.routes.era5 as era5_routes
+
+    cache = ERA5TileCache(cache_dir=str(tmp_path / "tiles"), tile_size_deg=2.0, max_bytes=10 ** 9,
+                          pyramid_dir=str(tmp_path / "pyramid"))
+    acquired = []
+    write_entry = cache._write_entry
+
+    def checked_write_entry(*args, **kwargs):
+        # Un lector de otro hilo debe poder tomar el candado antes de cada escritura
+        def probe():
+            if NETCDF_IO_LOCK.acquire(timeout=1):
+                NETCDF_IO_LOCK.release()
+                acquired.append(True)
+            else:
+                acquired.append(False)
+
+        reader = threading.Thread(target=probe)
+        reader.start()
+        reader.join()
+        return write_entry(*args, **kwargs)
+
+    def retrieve_era5_file(self, chunk, area, variables, config=None):
+        path = str(tmp_path / "download.nc")
+        make_dataset(chunk.dates[0], list(chunk.hours), seed=1, variables=variables).to_netcdf(path)
+        return path
+
+    monkeypatch.setattr(cache, "_write_entry", checked_write_entry)
+    monkeypatch.setattr(era5_routes, "get_era5_cache", lambda: cache)
+    monkeypatch.setattr(era5_routes.ERA5Service, "retrieve_era5_file", retrieve_era5_file)
+    blocks = era5_routes.ERA5Service().open_era5_blocks(
+        float(LATS.min()), float(LATS.max()), float(LONS.min()), float(LONS.max()), [date(2024, 1, 1)], [0, 6])
+    blocks.close()
+    assert acquired and all(acquired)
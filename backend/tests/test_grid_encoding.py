@@ -0,0 +1,91 @@
+"""Ida y vuelta de encode_array (esquema 'grid'): float32 y int16 empaquetado en base64."""
+
+import base64
+
+import numpy as np
+import pytest
+
+from src.services.reanalysis_processing import INT16_MISSING, VARIABLE_DECIMALS, encode_array
+
+
+def decode(encoded: dict) -> np.ndarray:
+    """Lo que hace un cliente con la respuesta: bytes little-endian y, en int16, escala y desplazamiento."""
+    raw = base64.b64decode(encoded["data"])
+    if encoded["dtype"] == "int16":
+        packed = np.frombuffer(raw, dtype="<i2")
+        values = packed * encoded["scale_factor"] + encoded["add_offset"]
+        return np.where(packed == encoded["missing_value"], np.nan, values)
+    return np.frombuffer(raw, dtype="<f4").astype(float)
+
+
+def sample(var: str) -> np.ndarray:
+    rng = np.random.default_rng(7)
+    base = {"wind_speed_10m": (0, 25), "wind_direction_10m": (0, 360),
+            "temperature_2m": (250, 310), "surface_pressure": (95000, 103000)}[var]
+    values = rng.uniform(*base, size=(4, 3, 5))
+    values[1, 2, 3] = np.nan
+    return values
+
+
+@pytest.mark.parametrize("var", ["wind_speed_10m", "wind_direction_10m", "temperature_2m", "surface_pressure"])
+def test_float32_round_trip(var):
+    values = sample(var)
+    encoded = encode_array(values, var, encoding="base64", dtype="float32")
+
+    assert encoded["byte_order"] == "little"
+    decoded = decode(encoded)
+    np.testing.assert_allclose(decoded, values.ravel().astype(np.float32), equal_nan=True)
+
+
+@pytest.mark.parametrize("var", ["wind_speed_10m", "wind_direction_10m", "temperature_2m", "surface_pressure"])
+def test_int16_round_trip_within_packing_tolerance(var):
+    values = sample(var)
+    encoded = encode_array(values, var, encoding="base64", dtype="int16")
+
+    assert encoded["missing_value"] == INT16_MISSING
+    packed = np.frombuffer(base64.b64decode(encoded["data"]), dtype="<i2")
+    # Un valor presente nunca se confunde con el de dato ausente
+    assert (packed[np.isfinite(values.ravel())] != INT16_MISSING).all()
+
+    decoded = decode(encoded)
+    assert np.isnan(decoded[np.isnan(values.ravel())]).all()
+    finite = np.isfinite(values.ravel())
+    error = np.abs(decoded[finite] - values.ravel()[finite])
+    assert error.max() <= encoded["scale_factor"] / 2 + 1e-9
+    # Resolución no peor que VARIABLE_DECIMALS si el rango cabe en 16 bits
+    if np.ptp(values[np.isfinite(values)]) / 65000 <= 10.0 ** -VARIABLE_DECIMALS[var]:
+        assert encoded["scale_factor"] == pytest.approx(10.0 ** -VARIABLE_DECIMALS[var])
+
+
+def test_int16_wide_range_scales_instead_of_overflowing():
+    values = np.linspace(-1e6, 1e6, 101)
+    encoded = encode_array(values, "surface_pressure", encoding="base64", dtype="int16")
+    decoded = decode(encoded)
+    assert encoded["scale_factor"] > 10.0 ** -VARIABLE_DECIMALS["surface_pressure"]
+    assert np.abs(decoded - values).max() <= encoded["scale_factor"] / 2 + 1e-6
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int16"])
+def test_all_nan_round_trip(dtype):
+    values = np.full((2, 3), np.nan)
+    encoded = encode_array(values, "temperature_2m", encoding="base64", dtype=dtype)
+    decoded = decode(encoded)
+    assert decoded.shape == (6,)
+    assert np.isnan(decoded).all()
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int16"])
+@pytest.mark.parametrize("constant", [0.0, 7.123456, -101325.5])
+def test_constant_round_trip(dtype, constant):
+    values = np.full((3, 4), constant)
+    encoded = encode_array(values, "wind_speed_10m", encoding="base64", dtype=dtype)
+    decoded = decode(encoded)
+    tolerance = encoded["scale_factor"] / 2 if dtype == "int16" else abs(constant) * 1e-7
+    assert np.abs(decoded - constant).max() <= tolerance + 1e-9
+
+
+def test_json_rounds_and_sends_nan_as_null():
+    values = np.array([1.23456, np.nan, 2.0])
+    encoded = encode_array(values, "temperature_2m")
+    assert encoded["decimals"] == VARIABLE_DECIMALS["temperature_2m"]
+    assert encoded["data"] == [1.23, None, 2.0]
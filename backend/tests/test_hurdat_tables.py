@@ -0,0 +1,126 @@
+"""EventTable.metrics y batch_metrics frente al cálculo original con pandas."""
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services.hurdat_tables import EventTable
+
+# Tres tormentas: A cambia de tipo (TS -> HU), B solo tiene presiones -999 y C es de otro año
+EVENTS = pd.DataFrame({
+    "storm_id": ["AL011990"] * 4 + ["AL021990"] * 2 + ["AL011995"] * 3,
+    "storm_type": ["TS", "TS", "HU", "HU", "TD", "TS", "HU", "HU", "TS"],
+    "date": ["19900801"] * 4 + ["19900901"] * 2 + ["19950710"] * 3,
+    "time": ["0000", "0600", "1200", "1800", "0000", "1200", "0000", "0600", "1800"],
+    "max_sustained_wind_knots": [35, 50, 70, 65, 25, 40, 90, 80, 45],
+    "min_central_pressure_mb": [-999, 1000, 985, 990, -999, -999, 970, 975, 1002],
+    "latitude_float": [11.0] * 9,
+    "longitude_float": [-78.0] * 9,
+})
+
+SUBSETS = {
+    "una_tormenta_dos_tipos": [0, 1, 2, 3],
+    "solo_presion_faltante": [4, 5],
+    "un_registro": [5],
+    "varias_tormentas_y_anos": [1, 2, 4, 5, 6, 8],
+    "todos": list(range(len(EVENTS))),
+}
+
+
+def pandas_metrics(nearby_events: pd.DataFrame) -> dict:
+    """Cálculo original de calculate_metrics sobre los eventos cercanos (sin la búsqueda por radio)."""
+    nearby_events = nearby_events.copy()
+    event_density = nearby_events["storm_id"].nunique()
+    nearby_events["year"] = pd.to_datetime(nearby_events["date"] + nearby_events["time"], format="%Y%m%d%H%M").dt.year
+    total_years = nearby_events["year"].nunique()
+    event_frequency = (nearby_events.groupby("storm_type")["storm_id"].nunique() / total_years).to_dict()
+    event_intensity_profile = nearby_events.groupby("storm_type")["max_sustained_wind_knots"].mean().to_dict()
+    nearby_events["max_sustained_wind_ms"] = nearby_events["max_sustained_wind_knots"] * 0.514444
+    useful_wind_events = nearby_events[(nearby_events["max_sustained_wind_ms"] >= 12) &
+                                       (nearby_events["max_sustained_wind_ms"] <= 25)]
+    severe_wind_events = nearby_events[nearby_events["max_sustained_wind_ms"] > 30]
+    storm_durations = nearby_events.groupby("storm_id").apply(lambda x: (
+        pd.to_datetime(x["date"] + x["time"], format="%Y%m%d%H%M").max() -
+        pd.to_datetime(x["date"] + x["time"], format="%Y%m%d%H%M").min()).total_seconds() / 3600,
+        include_groups=False)
+    valid_pressures = nearby_events[nearby_events["min_central_pressure_mb"] != -999]["min_central_pressure_mb"]
+    return {
+        "event_density": event_density,
+        "event_frequency": event_frequency,
+        "event_intensity_profile": event_intensity_profile,
+        "energy_opportunity_score": useful_wind_events["storm_id"].nunique() / event_density,
+        "extreme_risk_index": severe_wind_events["storm_id"].nunique() / event_density,
+        "event_duration_stats": {
+            "average_duration_hours": storm_durations.mean(),
+            "std_dev_duration_hours": storm_durations.std(),
+        },
+        "historical_pressure_min": valid_pressures.min() if not valid_pressures.empty else -999,
+    }
+
+
+def assert_close(actual, expected):
+    if isinstance(expected, float) and math.isnan(expected):
+        assert math.isnan(actual)
+    else:
+        assert actual == pytest.approx(expected)
+
+
+@pytest.fixture(scope="module")
+def table():
+    return EventTable.from_frame(EVENTS)
+
+
+@pytest.mark.parametrize("name", SUBSETS)
+def test_metrics_match_pandas(table, name):
+    positions = np.array(SUBSETS[name])
+    expected = pandas_metrics(EVENTS.iloc[positions])
+    actual = table.metrics(positions)
+
+    assert actual["event_density"] == expected["event_density"]
+    for key in ("event_frequency", "event_intensity_profile"):
+        assert set(actual[key]) == set(expected[key])
+        for category, value in expected[key].items():
+            assert_close(actual[key][category], value)
+    for key in ("energy_opportunity_score", "extreme_risk_index", "historical_pressure_min"):
+        assert_close(actual[key], expected[key])
+    for key, value in expected["event_duration_stats"].items():
+        assert_close(actual["event_duration_stats"][key], value)
+
+
+def test_batch_metrics_match_pandas(table):
+    names = list(SUBSETS)
+    within = np.zeros((len(names) + 1, len(EVENTS)), dtype=bool)
+    for row, name in enumerate(names):
+        within[row, SUBSETS[name]] = True
+    batch = table.batch_metrics(within)
+    categories = [str(c) for c in table.categories]
+
+    for row, name in enumerate(names):
+        expected = pandas_metrics(EVENTS.iloc[SUBSETS[name]])
+        assert batch["event_density"][row] == expected["event_density"]
+        for key in ("event_frequency", "event_intensity_profile"):
+            for column, category in enumerate(categories):
+                assert_close(batch[key][row, column], expected[key].get(category, float("nan")))
+        for key in ("energy_opportunity_score", "extreme_risk_index", "historical_pressure_min"):
+            assert_close(batch[key][row], expected[key])
+        for key, value in expected["event_duration_stats"].items():
+            assert_close(batch[key][row], value)
+
+    # Punto sin eventos cercanos: los valores de las métricas vacías
+    assert batch["event_density"][-1] == 0
+    assert batch["std_dev_duration_hours"][-1] == 0
+    assert batch["historical_pressure_min"][-1] == -999
+    assert np.isnan(batch["event_frequency"][-1]).all()
+
+
+def test_fixture_covers_edge_cases(table):
+    # ddof=1: una sola tormenta da desviación NaN
+    assert math.isnan(table.metrics(np.array(SUBSETS["una_tormenta_dos_tipos"]))
+                      ["event_duration_stats"]["std_dev_duration_hours"])
+    # Tormentas distintas por tipo, no registros: A aporta dos registros TS y cuenta una vez
+    assert table.metrics(np.array(SUBSETS["una_tormenta_dos_tipos"]))["event_frequency"] == {"HU": 1.0, "TS": 1.0}
+    # Solo presiones -999: se devuelve -999 en lugar de un mínimo
+    assert table.metrics(np.array(SUBSETS["solo_presion_faltante"]))["historical_pressure_min"] == -999
+    assert table.metrics(np.array(SUBSETS["todos"]))["historical_pressure_min"] == 970
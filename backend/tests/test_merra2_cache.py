@@ -0,0 +1,68 @@
+"""Pruebas de la caché MERRA-2: las entradas fijadas no se desalojan mientras se leen."""
+
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import xarray as xr
+
+from src.services.disk_cache import DiskLRUCache
+from src.services.merra2_cache import MERRA2GranuleCache
+
+VARIABLES = ["U10M", "V10M"]
+WINDOW = (0, 9, 0, 9)
+SLAB = (0, 1, 23)
+
+
+def write_day(path: str):
+    """NetCDF de un día con la forma de una entrada (24 horas sobre la ventana)."""
+    shape = (24, WINDOW[1] - WINDOW[0] + 1, WINDOW[3] - WINDOW[2] + 1)
+    data = {v: (("time", "lat", "lon"), np.random.default_rng(0).random(shape, dtype=np.float32)) for v in VARIABLES}
+    xr.Dataset(data).to_netcdf(path)
+
+
+def test_pinned_entries_survive_eviction(tmp_path):
+    cache = MERRA2GranuleCache(cache_dir=str(tmp_path / "cache"), max_bytes=60 * 1024)
+    days = [date(2024, 1, 1) + timedelta(days=k) for k in range(5)]
+    paths = []
+    for day in days:
+        source = str(tmp_path / f"{day}.nc4")
+        write_day(source)
+        paths.append(cache.store_file("M2T1NXSLV", day, WINDOW, SLAB, source, VARIABLES, pin=True))
+
+    # Las cinco superan la cuota, pero siguen en disco mientras estén fijadas
+    assert [os.path.exists(p) for p in paths] == [True] * 5
+    assert cache.find("M2T1NXSLV", days[0], WINDOW, pin=True) == paths[0]
+
+    for path in paths:
+        cache.release(path)
+    assert os.path.exists(paths[0])
+    cache.release(paths[0])
+
+    stats = cache.stats()
+    assert stats["pinned"] == 0
+    assert stats["size_bytes"] <= stats["max_bytes"]
+    assert stats["evictions"] > 0
+
+
+def test_unpinned_entries_are_evicted(tmp_path):
+    cache = MERRA2GranuleCache(cache_dir=str(tmp_path / "cache"), max_bytes=60 * 1024)
+    paths = []
+    for k in range(5):
+        day = date(2024, 1, 1) + timedelta(days=k)
+        source = str(tmp_path / f"{day}.nc4")
+        write_day(source)
+        paths.append(cache.store_file("M2T1NXSLV", day, WINDOW, SLAB, source, VARIABLES))
+
+    assert os.path.exists(paths[-1])
+    assert not os.path.exists(paths[0])
+    assert cache.stats()["size_bytes"] <= 60 * 1024
+
+
+def test_discarded_pinned_entry_is_deleted_on_unpin(tmp_path):
+    store = DiskLRUCache(str(tmp_path / "store"), max_bytes=10 ** 6)
+    path = store.put("a.bin", lambda tmp: open(tmp, "wb").write(b"x" * 10), pin=True)
+    store.discard("a.bin")
+    assert not store.contains("a.bin") and os.path.exists(path)
+    store.unpin("a.bin")
+    assert not os.path.exists(path)
@@ -0,0 +1,156 @@
+"""Descarga reanudable de MERRA-2 contra el GES DISC simulado, con inyección de fallos."""
+
+import base64
+from dataclasses import dataclass
+from datetime import date
+
+import pytest
+import requests
+
+from mock_servers import MockServerConfig, SyntheticFileStore, create_gesdisc_app, serve_in_thread
+from mock_servers.gesdisc import parse_dap_constraint
+from src.services.merra2_service import MERRA2Service
+
+DAY = date(2020, 1, 1)
+# Recorte OPeNDAP de unos MB: se sirve igual que el archivo diario (Range, ETag, Digest)
+CONSTRAINT = "U10M[0:23][100:260][100:300],V10M[0:23][100:260][100:300]"
+FILE_PATH = (f"/opendap/MERRA2/M2T1NXSLV.5.12.4/{DAY:%Y/%m}/"
+             f"MERRA2_400.tavg1_2d_slv_Nx.{DAY:%Y%m%d}.nc4.nc4?{CONSTRAINT}")
+
+
+@dataclass
+class DropOnceConfig(MockServerConfig):
+    """Corta la primera respuesta de archivo a la mitad; las siguientes llegan completas."""
+    drops: int = 0
+
+    def disconnect_after(self, length: int):
+        if self.drops:
+            return None
+        self.drops += 1
+        return length // 2
+
+
+class FaultInjector:
+    """
+    Middleware WSGI sobre el GES DISC simulado: registra la cabecera Range de cada
+    descarga de datos, puede ignorar Range/If-Range y puede anunciar un Digest erróneo.
+    """
+
+    def __init__(self, app, ignore_range: bool = False, corrupt_digests: int = 0):
+        self.app = app
+        self.name = app.name
+        self.ignore_range = ignore_range
+        self.corrupt_digests = corrupt_digests
+        self.ranges = []
+
+    def __call__(self, environ, start_response):
+        if not environ["PATH_INFO"].startswith("/opendap/"):
+            return self.app(environ, start_response)
+        self.ranges.append(environ.get("HTTP_RANGE"))
+        if self.ignore_range:
+            environ.pop("HTTP_RANGE", None)
+            environ.pop("HTTP_IF_RANGE", None)
+        corrupt = self.corrupt_digests > 0
+        self.corrupt_digests -= int(corrupt)
+
+        def start(status, headers, exc_info=None):
+            if corrupt:
+                wrong = base64.b64encode(bytes(32)).decode()
+                headers = [(k, f"SHA-256={wrong}" if k.lower() == "digest" else v) for k, v in headers]
+            return start_response(status, headers, exc_info)
+
+        return self.app(environ, start)
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    # Compartido: generar los NetCDF sintéticos (también el que consulta la validación) es lo más lento
+    return SyntheticFileStore(str(tmp_path_factory.mktemp("mock")))
+
+
+@pytest.fixture
+def gesdisc(store, monkeypatch):
+    """(iniciar, bytes de referencia); iniciar arranca el GES DISC simulado y devuelve (servicio, sesión, url, inyector)."""
+    with open(store.merra2_subset_file(DAY, parse_dap_constraint(CONSTRAINT)), "rb") as f:
+        reference = f.read()
+    servers = []
+
+    def start(config=None, **faults):
+        injector = FaultInjector(create_gesdisc_app(config or MockServerConfig(), store), **faults)
+        handle = serve_in_thread(injector)
+        servers.append(handle)
+        for name in ("NASA_GES_DISC_URL", "NASA_EARTHDATA_URL"):
+            monkeypatch.setenv(name, handle.url)
+        monkeypatch.setenv("NASA_USERNAME", "mock")
+        monkeypatch.setenv("NASA_PASSWORD", "mock")
+        monkeypatch.setenv("MERRA2_RETRY_BACKOFF_SECONDS", "0")
+        session = requests.Session()
+        session.auth = ("mock", "mock")
+        return MERRA2Service(), session, handle.url + FILE_PATH, injector
+
+    yield start, reference
+    for handle in servers:
+        handle.stop()
+
+
+def resume_offset(range_header: str) -> int:
+    assert range_header.startswith("bytes=") and range_header.endswith("-")
+    return int(range_header[len("bytes="):-1])
+
+
+def download(service, session, url, path, retries=1):
+    states = []
+    ok = service.download_merra2_file(url, str(path), session=session, retries=retries, progress=states.append)
+    return ok, (states[-1] if states else None)
+
+
+def test_dropped_transfer_resumes_with_range(gesdisc, tmp_path):
+    start, reference = gesdisc
+    service, session, url, injector = start(DropOnceConfig())
+
+    ok, state = download(service, session, url, tmp_path / "day.nc4")
+
+    assert ok
+    assert (tmp_path / "day.nc4").read_bytes() == reference
+    assert state.resumes == 1
+    assert injector.ranges[0] is None
+    assert 0 < resume_offset(injector.ranges[1]) < len(reference)
+    # Solo se transfiere cada byte una vez
+    assert state.bytes_transferred == len(reference)
+
+
+def test_server_ignoring_range_restarts_from_zero(gesdisc, tmp_path):
+    start, reference = gesdisc
+    service, session, url, injector = start(DropOnceConfig(), ignore_range=True)
+
+    ok, state = download(service, session, url, tmp_path / "day.nc4")
+
+    assert ok
+    assert (tmp_path / "day.nc4").read_bytes() == reference
+    offset = resume_offset(injector.ranges[1])
+    # La respuesta 200 sustituye lo descargado en lugar de añadirse al final
+    assert state.resumes == 1
+    assert state.bytes_transferred == offset + len(reference)
+
+
+def test_checksum_mismatch_restarts_download(gesdisc, tmp_path):
+    start, reference = gesdisc
+    service, session, url, injector = start(corrupt_digests=1)
+
+    ok, state = download(service, session, url, tmp_path / "day.nc4")
+
+    assert ok
+    assert (tmp_path / "day.nc4").read_bytes() == reference
+    assert injector.ranges == [None, None]
+    assert state.bytes_transferred == 2 * len(reference)
+
+
+def test_persistent_checksum_mismatch_fails(gesdisc, tmp_path):
+    start, reference = gesdisc
+    service, session, url, injector = start(corrupt_digests=10)
+
+    ok, _ = download(service, session, url, tmp_path / "day.nc4", retries=1)
+
+    assert not ok
+    assert injector.ranges == [None, None]
+    assert (tmp_path / "day.nc4").read_bytes() == b""
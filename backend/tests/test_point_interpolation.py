@@ -0,0 +1,116 @@
+"""Interpolación a un punto (modo punto de /api/wind-data) sobre una malla sintética."""
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from src.services.reanalysis_processing import interpolate_to_point, point_weights
+
+LATS = np.array([10.0, 10.25])
+LONS = np.array([-75.0, -74.75])
+TIMES = pd.date_range("2024-01-01", periods=3, freq="6h")
+
+
+def linear_field(lat, lon, t):
+    """Campo lineal en lat y lon: la interpolación bilineal lo reproduce exactamente."""
+    return 2.0 * lat + 3.0 * lon + t
+
+
+def make_block(lats=LATS, lons=LONS, lat_dim="latitude", lon_dim="longitude") -> xr.Dataset:
+    t, lat, lon = np.meshgrid(np.arange(len(TIMES)), lats, lons, indexing="ij")
+    values = linear_field(lat, lon, t)
+    dims = ("time", lat_dim, lon_dim)
+    coords = {"time": TIMES, lat_dim: lats, lon_dim: lons}
+    return xr.Dataset({"u10": (dims, values), "v10": (dims, -values)}, coords=coords)
+
+
+@pytest.mark.parametrize("method", ["nearest", "bilinear", "idw"])
+def test_weights_on_a_node_select_that_node(method):
+    weights = point_weights(LATS, LONS, 10.25, -75.0, method)
+    expected = np.zeros((2, 2))
+    expected[1, 0] = 1.0
+    np.testing.assert_allclose(weights, expected)
+
+
+@pytest.mark.parametrize("method", ["nearest", "bilinear", "idw"])
+def test_weights_sum_to_one(method):
+    weights = point_weights(LATS, LONS, 10.1, -74.8, method)
+    assert weights.shape == (2, 2)
+    assert weights.sum() == pytest.approx(1.0)
+    assert (weights >= 0).all()
+
+
+def test_bilinear_weights_on_grid_edge_use_only_that_edge():
+    weights = point_weights(LATS, LONS, 10.0, -74.8, "bilinear")
+    np.testing.assert_allclose(weights, [[0.2, 0.8], [0.0, 0.0]])
+
+
+def test_bilinear_weights_clamp_points_outside_the_cells():
+    np.testing.assert_allclose(point_weights(LATS, LONS, 9.9, -75.1, "bilinear"), [[1.0, 0.0], [0.0, 0.0]])
+
+
+def test_weights_follow_descending_latitude():
+    for method in ("nearest", "bilinear", "idw"):
+        ascending = point_weights(LATS, LONS, 10.2, -74.9, method)
+        descending = point_weights(LATS[::-1], LONS, 10.2, -74.9, method)
+        np.testing.assert_allclose(descending, ascending[::-1])
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        point_weights(LATS, LONS, 10.1, -74.9, "cubic")
+
+
+@pytest.mark.parametrize("lats", [LATS, LATS[::-1]], ids=["ascending", "descending"])
+def test_bilinear_reproduces_linear_field(lats):
+    lat, lon = 10.1, -74.85
+    result = interpolate_to_point(make_block(lats=lats), lat, lon, "bilinear")
+
+    assert result["u10"].dims == ("time", "latitude", "longitude")
+    assert result["u10"].shape == (len(TIMES), 1, 1)
+    assert float(result["latitude"][0]) == lat and float(result["longitude"][0]) == lon
+    expected = linear_field(lat, lon, np.arange(len(TIMES)))
+    np.testing.assert_allclose(result["u10"].values.ravel(), expected)
+    np.testing.assert_allclose(result["v10"].values.ravel(), -expected)
+
+
+@pytest.mark.parametrize("method", ["nearest", "bilinear", "idw"])
+def test_point_on_node_returns_node_values(method):
+    result = interpolate_to_point(make_block(lat_dim="lat", lon_dim="lon"), 10.0, -74.75, method)
+    expected = linear_field(10.0, -74.75, np.arange(len(TIMES)))
+    assert result["u10"].dims == ("time", "lat", "lon")
+    np.testing.assert_allclose(result["u10"].values.ravel(), expected)
+
+
+def test_point_on_grid_edge_interpolates_along_the_edge():
+    result = interpolate_to_point(make_block(), 10.25, -74.9, "bilinear")
+    np.testing.assert_allclose(result["u10"].values.ravel(), linear_field(10.25, -74.9, np.arange(len(TIMES))))
+
+
+def test_nearest_and_idw_match_their_weights():
+    block = make_block(lats=LATS[::-1])
+    lat, lon = 10.05, -74.8
+    nearest = interpolate_to_point(block, lat, lon, "nearest")
+    np.testing.assert_allclose(nearest["u10"].values.ravel(), linear_field(10.0, -74.75, np.arange(len(TIMES))))
+
+    idw = interpolate_to_point(block, lat, lon, "idw")
+    weights = point_weights(block["latitude"].values, block["longitude"].values, lat, lon, "idw")
+    expected = (block["u10"].values * weights).sum(axis=(1, 2))
+    np.testing.assert_allclose(idw["u10"].values.ravel(), expected)
+
+
+def test_missing_nodes_are_excluded_by_renormalizing():
+    block = make_block()
+    block["u10"][:, 0, 0] = np.nan
+    lat, lon = 10.1, -74.85
+    weights = point_weights(LATS, LONS, lat, lon, "bilinear")
+    values = block["u10"].values[0]
+    valid = ~np.isnan(values)
+    expected = (values[valid] * weights[valid]).sum() / weights[valid].sum()
+
+    result = interpolate_to_point(block, lat, lon, "bilinear")
+    assert float(result["u10"][0, 0, 0]) == pytest.approx(expected)
+
+    block["u10"][:] = np.nan
+    assert np.isnan(interpolate_to_point(block, lat, lon, "bilinear")["u10"]).all()
@@ -0,0 +1,41 @@
+"""Precarga ERA5: los días ERA5T cacheados se reemplazan pasado el retraso de ERA5 final."""
+
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from src.services.prefetch_scheduler import PrefetchRegion, PrefetchScheduler
+
+REGION = PrefetchRegion("Prueba", 10.0, 11.0, -76.0, -75.0)
+
+
+def test_prefetch_refetches_final_era5_days(monkeypatch):
+    monkeypatch.setenv("PREFETCH_REQUEST_INTERVAL_SECONDS", "0")
+    monkeypatch.setenv("PREFETCH_ERA5_FINAL_LAG_DAYS", "90")
+    today = date(2024, 6, 1)
+    stale_day = date(2024, 2, 10)
+    calls = {}
+
+    def preliminary_era5_days(*bounds_and_final_before):
+        calls["preliminary_before"] = bounds_and_final_before[-1]
+        return [stale_day]
+
+    def missing_era5_days(*args):
+        *_, days, hours, final_before = args
+        calls["checked_days"], calls["missing_before"] = days, final_before
+        return [stale_day]
+
+    def warm_era5_cache(*args):
+        calls.setdefault("warmed", []).append((args[4], args[-1]))
+
+    service = SimpleNamespace(preliminary_era5_days=preliminary_era5_days, missing_era5_days=missing_era5_days,
+                              warm_era5_cache=warm_era5_cache, pyramid_summaries=lambda *args: None)
+    scheduler = PrefetchScheduler(lambda: service, regions=[REGION], window=(0, 0))
+    result = {}
+    scheduler._prefetch_era5(REGION, today, time.monotonic() + 60, result)
+
+    final_before = today - timedelta(days=90)
+    assert calls["preliminary_before"] == calls["missing_before"] == final_before
+    assert stale_day in calls["checked_days"]
+    assert calls["warmed"] == [([stale_day], final_before)]
+    assert result["status"] == "done" and result["preliminary_days"] == 1
@@ -0,0 +1,43 @@
+"""Datos simulados: límite de malla y consumo de sus timestamps por /wind-analysis."""
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from src.routes.analysis import analysis_bp
+from src.routes.era5 import era5_bp
+
+REQUEST = {"lat_min": 10.0, "lat_max": 11.0, "lon_min": -76.0, "lon_max": -75.0,
+           "start_date": "2024-01-01", "end_date": "2024-01-02", "seed": 7}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(era5_bp, url_prefix="/api")
+    app.register_blueprint(analysis_bp, url_prefix="/api")
+    return app.test_client()
+
+
+@pytest.mark.parametrize("grid", [{"n_lat": 0}, {"n_lon": 101}, {"n_lat": 100000, "n_lon": 100000}])
+def test_grid_size_is_capped(client, grid):
+    response = client.post("/api/simulated_data", json={**REQUEST, **grid})
+    assert response.status_code == 400
+
+
+def test_grid_cap_is_configurable(client, monkeypatch):
+    monkeypatch.setenv("SIMULATED_MAX_GRID_SIZE", "3")
+    assert client.post("/api/simulated_data", json={**REQUEST, "n_lat": 4}).status_code == 400
+    assert client.post("/api/simulated_data", json={**REQUEST, "n_lat": 3, "n_lon": 3}).status_code == 200
+
+
+def test_time_series_uses_one_point_per_timestep(client):
+    data = client.post("/api/simulated_data", json={**REQUEST, "n_lat": 3, "n_lon": 4}).get_json()
+    timestamps, speeds = data["timestamps"], data["wind_speed_10m"]
+    assert len(speeds) == len(timestamps) * 12
+
+    analysis = client.post("/api/wind-analysis", json={"wind_speeds": speeds, "timestamps": timestamps}).get_json()
+    series = analysis["analysis"]["time_series"]
+    assert [entry["time"] for entry in series] == timestamps
+    expected = np.asarray(speeds).reshape(len(timestamps), -1).mean(axis=1)
+    np.testing.assert_allclose([entry["speed"] for entry in series], expected)
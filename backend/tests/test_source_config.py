@@ -0,0 +1,97 @@
+"""Dos solicitudes simultáneas con configuraciones distintas sobre el ERA5Service compartido."""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+import src.routes.era5 as era5_routes
+from src.routes.era5 import ERA5Service
+from src.services.source_config import SourceRequestConfig
+
+# Velocidad (u10) que sirve cada cuenta de CDS simulada
+SPEED_BY_KEY = {"uid-a:key-a": 3.0, "uid-b:key-b": 9.0}
+
+
+class FakeResult:
+    content_length = None
+
+    def __init__(self, key, request):
+        self.key = key
+        self.request = request
+
+    def download(self, path):
+        north, west, south, east = self.request["area"]
+        times = pd.DatetimeIndex([f"{self.request['year'][0]}-{self.request['month'][0]}-{day}T{hour}"
+                                  for day in self.request["day"] for hour in self.request["time"]])
+        lats = np.arange(north, south - 1e-9, -0.25)
+        lons = np.arange(west, east + 1e-9, 0.25)
+        shape = (len(times), len(lats), len(lons))
+        speed = SPEED_BY_KEY[self.key]
+        fields = {"u10": speed, "v10": 0.0, "u100": speed, "v100": 0.0, "t2m": 300.0, "sp": 101325.0}
+        xr.Dataset({var: (("valid_time", "latitude", "longitude"), np.full(shape, value, dtype=np.float32))
+                    for var, value in fields.items()},
+                   coords={"valid_time": times, "latitude": lats, "longitude": lons}).to_netcdf(path)
+
+
+@pytest.fixture
+def cds_calls(monkeypatch):
+    """Sustituye cdsapi.Client; registra (url, key, solicitud) y hace coincidir ambas descargas."""
+    calls = []
+    overlap = threading.Barrier(2)
+
+    class FakeClient:
+        def __init__(self, url, key):
+            self.url, self.key = url, key
+
+        def retrieve(self, name, request):
+            calls.append((self.url, self.key, request))
+            overlap.wait(10)
+            return FakeResult(self.key, request)
+
+    monkeypatch.setattr(era5_routes.cdsapi, "Client", FakeClient)
+    monkeypatch.setenv("ERA5_CACHE_ENABLED", "false")
+    return calls
+
+
+def test_concurrent_requests_use_their_own_config(cds_calls):
+    # Servicio compartido creado con la configuración del entorno (modo prueba)
+    service = ERA5Service(SourceRequestConfig(test_mode=True))
+    requests = {
+        "req-a": (SourceRequestConfig(cds_url="https://cds-a.test/api", cds_key="uid-a:key-a"),
+                  (10.0, 10.5, -76.0, -75.5, "2024-01-01", "2024-01-02", [0, 12])),
+        "req-b": (SourceRequestConfig(cds_url="https://cds-b.test/api", cds_key="uid-b:key-b"),
+                  (11.0, 12.0, -75.0, -74.0, "2024-02-10", "2024-02-10", [6])),
+    }
+    results, errors = {}, []
+
+    def run(name):
+        config, (lat_min, lat_max, lon_min, lon_max, start, end, hours) = requests[name]
+        try:
+            results[name] = service.generate_frontend_compatible_data(
+                lat_min, lat_max, lon_min, lon_max, start, end, hours, config=config)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in requests]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors, errors
+
+    for name, (config, (lat_min, lat_max, lon_min, lon_max, start, end, hours)) in requests.items():
+        # Las credenciales de cada solicitud solo se usaron contra su servidor y para su área
+        calls = [(url, req) for url, key, req in cds_calls if key == config.cds_key]
+        assert calls and all(url == config.cds_url for url, _ in calls)
+        assert all(req["area"] == [lat_max, lon_min, lat_min, lon_max] for _, req in calls)
+
+        data = results[name]
+        assert data["metadata"]["test_mode"] is False
+        assert data["metadata"]["period"] == f"{start} to {end}"
+        n_days = len(pd.date_range(start, end))
+        assert len(data["timestamps"]) == n_days * len(hours)
+        assert sorted({pd.Timestamp(t).hour for t in data["timestamps"]}) == hours
+        np.testing.assert_allclose(data["wind_speed_10m"], SPEED_BY_KEY[config.cds_key], rtol=1e-5)
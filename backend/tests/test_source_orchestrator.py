@@ -0,0 +1,65 @@
+"""Pruebas del orquestador de fuentes: los resultados no devueltos se liberan."""
+
+import threading
+import time
+
+from src.services.source_orchestrator import SourceOrchestrator
+
+
+class Resource:
+    def __init__(self, name, valid=True):
+        self.name = name
+        self.valid = valid
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+def make_orchestrator(**kwargs):
+    return SourceOrchestrator(hedge_delay_seconds=kwargs.pop("hedge_delay_seconds", 0.05), failure_threshold=3,
+                              cooldown_minutes=1, total_timeout_seconds=5, max_workers=4, **kwargs)
+
+
+def test_invalid_and_late_results_are_discarded():
+    invalid = Resource("era5", valid=False)
+    winner = Resource("merra2")
+    late = Resource("backup")
+    release_late = threading.Event()
+
+    def slow(cancel_event):
+        release_late.wait(5)
+        return late  # ignora la cancelación y termina después del ganador
+
+    def delayed_winner(cancel_event):
+        time.sleep(0.1)
+        return winner
+
+    result = make_orchestrator().run(
+        [("era5", lambda cancel_event: invalid), ("backup", slow), ("merra2", delayed_winner)],
+        is_valid=lambda r: r.valid, discard=Resource.close)
+
+    assert result.source == "merra2" and result.data is winner
+    assert invalid.closed.is_set()
+    assert not late.closed.is_set()
+    release_late.set()
+    assert late.closed.wait(5)
+    assert not winner.closed.is_set()
+
+
+def test_results_finished_with_the_winner_are_discarded():
+    first, second = Resource("a"), Resource("b")
+    barrier = threading.Barrier(2)
+
+    def fetch(resource):
+        def run(cancel_event):
+            barrier.wait(5)
+            return resource
+        return run
+
+    result = make_orchestrator(hedge_delay_seconds=0).run(
+        [("a", fetch(first)), ("b", fetch(second))], is_valid=lambda r: True, discard=Resource.close)
+
+    loser = second if result.data is first else first
+    assert loser.closed.wait(5)
+    assert not result.data.closed.is_set()
@@ -0,0 +1,76 @@
+"""El modo streaming de /wind-data cierra el stream ganador y los descartados."""
+
+import json
+import threading
+from types import SimpleNamespace
+
+from flask import Flask
+
+import src.routes.era5 as era5_routes
+from src.services.reanalysis_processing import FrontendBlockStream, iter_time_blocks
+from src.services.simulated_data import generate_simulated_dataset
+from src.services.source_orchestrator import SourceOrchestrator
+
+AREA = (10.0, 12.0, -76.0, -74.0)
+DATES = ("2024-01-01", "2024-01-03")
+
+
+def tracked_stream(closed: threading.Event, source: str) -> FrontendBlockStream:
+    """Stream de datos simulados que marca `closed` al liberarse sus bloques."""
+    ds = generate_simulated_dataset(*AREA, *DATES, seed=1)
+
+    def blocks():
+        try:
+            yield from iter_time_blocks(ds, 4)
+        finally:
+            closed.set()
+
+    return FrontendBlockStream(blocks(), "simulated", metadata={"source": source})
+
+
+def test_stream_closes_winner_and_late_loser(monkeypatch):
+    era5_closed, merra2_closed = threading.Event(), threading.Event()
+    release_era5 = threading.Event()
+
+    def open_real_wind_stream(*args, **kwargs):
+        release_era5.wait(5)  # ERA5 termina después de que MERRA-2 gane
+        return tracked_stream(era5_closed, "era5")
+
+    def open_merra2_stream(*args, **kwargs):
+        return tracked_stream(merra2_closed, "merra2")
+
+    monkeypatch.setattr(era5_routes, "get_era5_service",
+                        lambda: SimpleNamespace(open_real_wind_stream=open_real_wind_stream))
+    monkeypatch.setattr(era5_routes, "get_merra2_service",
+                        lambda: SimpleNamespace(open_merra2_stream=open_merra2_stream))
+    orchestrator = SourceOrchestrator(hedge_delay_seconds=0.05, failure_threshold=3, cooldown_minutes=1,
+                                      total_timeout_seconds=10, max_workers=4)
+    monkeypatch.setattr(era5_routes, "get_source_orchestrator", lambda: orchestrator)
+
+    app = Flask(__name__)
+    with app.test_request_context():
+        response = era5_routes.stream_wind_data(*AREA, *DATES, None)
+        lines = [json.loads(line) for line in response.response]
+        response.close()
+
+    assert lines[0]["data_source"] == "merra2"
+    assert lines[-1]["type"] == "summary"
+    assert merra2_closed.is_set()
+    assert not era5_closed.is_set()
+    release_era5.set()
+    assert era5_closed.wait(5)
+
+
+def test_unread_stream_is_closed(monkeypatch):
+    closed = threading.Event()
+    monkeypatch.setattr(era5_routes, "get_era5_service",
+                        lambda: SimpleNamespace(open_real_wind_stream=lambda *a, **k: tracked_stream(closed, "era5")))
+    monkeypatch.setattr(era5_routes, "get_source_orchestrator",
+                        lambda: SourceOrchestrator(hedge_delay_seconds=5, failure_threshold=3, cooldown_minutes=1,
+                                                   total_timeout_seconds=10, max_workers=4))
+
+    app = Flask(__name__)
+    with app.test_request_context():
+        response = era5_routes.stream_wind_data(*AREA, *DATES, None)
+        response.close()  # el cliente se desconecta sin leer el cuerpo
+    assert closed.is_set()
@@ -259,11 +259,18 @@ const prepareChartData = (analysis, era5Data, unit = 'kmh') => {
   })));
 
   if (timeSeriesData.length === 0 && windSpeeds100m.length > 0 && timestamps.length > 0) {
-    const minLength = Math.min(windSpeeds100m.length, timestamps.length);
-    for (let i = 0; i < minLength; i++) {
+    // Un timestamp por paso de tiempo y los valores de todas las celdas del área
+    // (orden tiempo, lat, lon): se grafica la media espacial de cada paso
+    const cellsPerStep = windSpeeds100m.length % timestamps.length === 0
+      ? windSpeeds100m.length / timestamps.length
+      : 1;
+    const steps = Math.min(timestamps.length, Math.floor(windSpeeds100m.length / cellsPerStep));
+    for (let i = 0; i < steps; i++) {
+      const cells = windSpeeds100m.slice(i * cellsPerStep, (i + 1) * cellsPerStep);
+      const mean = cells.reduce((sum, value) => sum + safeNumber(value), 0) / cells.length;
       timeSeriesData.push({
         time: timestamps[i],
-        speed: convertWindSpeed(windSpeeds100m[i], unit)
+        speed: convertWindSpeed(mean, unit)
       });
     }
   }